@@ -3,27 +3,69 @@ import os
 import json
 import tempfile
 import re
-from datetime import datetime
+import shutil
+import threading
+import types
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
 
 import azure.functions as func
-from azure.identity import DefaultAzureCredential
-from azure.keyvault.secrets import SecretClient
 
 from shared.parser import extract_dates, extract_ledgers, SqlParseError
-from shared.metadata import get_ledger_metadata
-from shared.fetcher import fetch_per_ledger_chunked
-from shared.excel_export import save_to_excel
-from shared.emailer import send_email_with_excel, EmailSendError
-from shared.connection import ConnectionStringError
-
-# --- Key Vault / Secret setup at module level (for cold start cache) ---
-_credential = DefaultAzureCredential()
+from shared.exporters import normalize_format, UnknownFormatError
+from shared.consolidation import parse_databases, ledger_key, ConsolidationError
+from shared.artifacts import get_artifact_store, ArtifactNotFoundError
+from shared.secret_cache import SecretCache
+from shared.jobs import get_job_queue, JobWorker, JobNotFoundError
+from shared.coalescing import get_coalescer, request_key, LEADER, DUPLICATE
+from shared.stamping import stamp_report, REQUESTED_BY, REQUESTED_AT
+from shared import tracing
+
+# --- Cold start ---
+# Importing pandas/pytds/xlsxwriter (through shared.*), building the Azure
+# credential and reading the startup secrets all happen in _warm_up(), off the
+# import path. With STARTUP_PREWARM on (default) it starts in the background at
+# import; otherwise on the first request. Requests wait for it via _ready().
 _kv_url = os.environ.get("KEYVAULT_URL")
 if not _kv_url:
     raise RuntimeError("KEYVAULT_URL environment variable must be set")
-_kv_client = SecretClient(vault_url=_kv_url, credential=_credential)
 
-logging.info(f"Using Key Vault URL: {_kv_url}")
+_STARTUP_SECRETS = (
+    "sql-connection-template",
+    "email-smtp-server",
+    "email-smtp-port",
+    "email-username",
+    "email-password",
+)
+
+_secrets = None
+_secrets_lock = threading.Lock()
+_startup = None
+_startup_lock = threading.Lock()
+_startup_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="warm-up")
+
+def _get_secrets() -> SecretCache:
+    """Key Vault client behind a SecretCache, built on first use."""
+    global _secrets
+    if _secrets is None:
+        with _secrets_lock:
+            if _secrets is None:
+                from azure.identity import DefaultAzureCredential
+                from azure.keyvault.secrets import SecretClient
+                logging.info(f"Using Key Vault URL: {_kv_url}")
+                client = SecretClient(vault_url=_kv_url, credential=DefaultAzureCredential())
+                # Secrets are re-read through the cache on every request, so rotations
+                # are picked up within SECRET_TTL_SECONDS without restarting the host.
+                _secrets = SecretCache(
+                    client,
+                    ttl=float(os.environ.get("SECRET_TTL_SECONDS", "300")),
+                    max_stale=float(os.environ.get("SECRET_MAX_STALE_SECONDS", "3600")),
+                    negative_ttl=float(os.environ.get("SECRET_NEGATIVE_TTL_SECONDS", "60")),
+                )
+    return _secrets
 
 def safe_get_secret(client, name, required=True, default=None):
     try:
@@ -34,137 +76,764 @@ def safe_get_secret(client, name, required=True, default=None):
             raise
         return default
 
-_smtp_server   = safe_get_secret(_kv_client, "email-smtp-server", required=False)
-_smtp_port     = int(safe_get_secret(_kv_client, "email-smtp-port", required=False, default=587))
-_smtp_username = safe_get_secret(_kv_client, "email-username", required=False)
-_smtp_password = safe_get_secret(_kv_client, "email-password", required=False)
-_sql_template  = safe_get_secret(_kv_client, "sql-connection-template")  # Required!
+def _smtp_config():
+    """(server, port, username, password) for the current request."""
+    secrets = _get_secrets()
+    return (
+        safe_get_secret(secrets, "email-smtp-server", required=False),
+        int(safe_get_secret(secrets, "email-smtp-port", required=False, default=587)),
+        safe_get_secret(secrets, "email-username", required=False),
+        safe_get_secret(secrets, "email-password", required=False),
+    )
 
-logging.info(f"SMTP config: server={_smtp_server}, port={_smtp_port}, user={_smtp_username}")
+def _import_pipeline() -> types.SimpleNamespace:
+    """The report modules; these pull in pandas, pytds, xlsxwriter and dateutil."""
+    from shared.metadata import get_ledger_metadata
+    from shared.metadata_cache import get_metadata_cache
+    from shared.fetcher import fetch_per_ledger_chunked, iter_per_ledger_chunked, LEDGER_SCHEMA
+    from shared.emailer import send_email_with_excel, send_email_with_link, EmailSendError
+    from shared.artifacts import artifact_key, signed_link
+    from shared.exporters import get_exporter
+    from shared.watermarks import get_watermark_store, watermark_key, plan_delta, carry_forward
+    from shared.connection import ConnectionStringError
+    from shared.pool import get_pool
+    from shared.chunk_cache import get_chunk_cache
+    from shared.chunking import get_chunking
+    from shared.scheduler import get_scheduler
+    return types.SimpleNamespace(
+        get_ledger_metadata=get_ledger_metadata,
+        get_metadata_cache=get_metadata_cache,
+        fetch_per_ledger_chunked=fetch_per_ledger_chunked,
+        iter_per_ledger_chunked=iter_per_ledger_chunked,
+        LEDGER_SCHEMA=LEDGER_SCHEMA,
+        send_email_with_excel=send_email_with_excel,
+        send_email_with_link=send_email_with_link,
+        get_artifact_store=get_artifact_store,
+        artifact_key=artifact_key,
+        signed_link=signed_link,
+        get_exporter=get_exporter,
+        get_watermark_store=get_watermark_store,
+        watermark_key=watermark_key,
+        plan_delta=plan_delta,
+        carry_forward=carry_forward,
+        EmailSendError=EmailSendError,
+        ConnectionStringError=ConnectionStringError,
+        get_pool=get_pool,
+        get_chunk_cache=get_chunk_cache,
+        get_chunking=get_chunking,
+        get_scheduler=get_scheduler,
+    )
 
-def main(req: func.HttpRequest) -> func.HttpResponse:
-    logging.info("Ledger Report triggered.")
+def _warm_up() -> types.SimpleNamespace:
+    """Heavy imports and startup secrets, concurrently. Returns the pipeline namespace."""
+    with ThreadPoolExecutor(max_workers=len(_STARTUP_SECRETS) + 1) as ex:
+        pipeline = ex.submit(_import_pipeline)
+        secrets = _get_secrets()
+        fetched = {name: ex.submit(safe_get_secret, secrets, name, required=False) for name in _STARTUP_SECRETS}
+        if fetched["sql-connection-template"].result() is None:
+            # Required, as when it was read at import: fail the warm-up (retried on the next request)
+            raise RuntimeError("Required secret 'sql-connection-template' is not available")
+        logging.info(
+            f"SMTP config: server={fetched['email-smtp-server'].result()}, "
+            f"port={fetched['email-smtp-port'].result() or 587}, user={fetched['email-username'].result()}"
+        )
+        return pipeline.result()
+
+def _start_warm_up():
+    global _startup
+    with _startup_lock:
+        if _startup is None:
+            _startup = _startup_executor.submit(_warm_up)
+        return _startup
+
+def _ready() -> types.SimpleNamespace:
+    """Wait for warm-up (starting it if needed); a failed warm-up is retried on the next call."""
+    global _startup
+    fut = _start_warm_up()
     try:
-        body = req.get_json()
-        logging.info("Incoming payload: %s", json.dumps(body, indent=2))
-    except Exception as e:
-        logging.error(f"Failed to parse JSON body: {e}")
-        return func.HttpResponse("Invalid JSON body", status_code=400)
+        return fut.result()
+    except Exception:
+        with _startup_lock:
+            if _startup is fut:
+                _startup = None
+        raise
 
-    # Validate required request fields
-    for fld in ("sql_proc", "email_to", "db_code"):
+if os.environ.get("STARTUP_PREWARM", "1").lower() in ("1", "true", "yes"):
+    _start_warm_up()
+
+# Ledgers sent per stored-proc call (1 = one call per ledger per month)
+_ledgers_per_call = int(os.environ.get("LEDGERS_PER_CALL", "1"))
+# Run each chunk as a parameterized RPC call of the parsed proc instead of rewritten SQL text
+_sql_rpc = os.environ.get("SQL_RPC", "1").lower() in ("1", "true", "yes")
+# Convert dates/amounts/repeated strings to compact dtypes while fetching (see LEDGER_SCHEMA)
+_fetch_dtypes = os.environ.get("FETCH_DTYPES", "1").lower() in ("1", "true", "yes")
+# xlsx reports: write sheets through xlsxwriter's constant_memory mode (see save_to_excel_streaming),
+# fed ledger by ledger from the fetch as in EXCEL_PIPELINE
+_excel_streaming = os.environ.get("EXCEL_STREAMING", "0").lower() in ("1", "true", "yes")
+# Export each ledger as soon as it is fetched (in request order) instead of after the whole fetch
+_excel_pipeline = os.environ.get("EXCEL_PIPELINE", "0").lower() in ("1", "true", "yes")
+# Pipelined mode: ledgers fetched or in flight ahead of the export before the fetch waits
+_pipeline_ahead = int(os.environ.get("EXCEL_PIPELINE_AHEAD", "16"))
+# Consolidated reports: databases fetched at once (each still under the DB scheduler's per-database limit)
+_consolidate_max_databases = int(os.environ.get("CONSOLIDATE_MAX_DATABASES", "4"))
+# Default delivery when a request has no `delivery`: "attachment" or "link" (a signed download link)
+_report_delivery = os.environ.get("REPORT_DELIVERY", "attachment").strip().lower()
+# Download links: the ReportDownload function's URL (anonymous; never a URL with a
+# ?code= function key) and how long a link stays valid
+_artifact_base_url = os.environ.get("ARTIFACT_BASE_URL")
+_link_ttl = float(os.environ.get("ARTIFACT_LINK_TTL_HOURS", "72")) * 3600
+_DELIVERY_MODES = ("attachment", "link")
+# Running jobs not updated for this long are requeued when the worker starts
+_job_stale_seconds = float(os.environ.get("JOB_STALE_SECONDS", "3600"))
+
+class ReportError(Exception):
+    """A report step failed; carries the HTTP status code to answer with."""
+
+    def __init__(self, message, status_code=500):
+        super().__init__(message)
+        self.status_code = status_code
+
+def _parse_request(body) -> dict:
+    """
+    Validate the request body and parse dates/ledgers out of sql_proc.
+    Raises ReportError (400) on bad input.
+    """
+    if not isinstance(body, dict):
+        raise ReportError("Invalid JSON body", 400)
+
+    # Validate required request fields; a consolidated request lists `databases` instead of db_code
+    consolidated = body.get("databases") is not None
+    for fld in ("sql_proc", "email_to") if consolidated else ("sql_proc", "email_to", "db_code"):
         if fld not in body or not body[fld]:
-            return func.HttpResponse(f"Missing required field: {fld}", status_code=400)
+            raise ReportError(f"Missing required field: {fld}", 400)
 
     sql_proc = body["sql_proc"]
     email_to = body["email_to"].strip()
     currency = body.get("currency", "QAR")
     db_code = body.get("db_code")  # Use db_code from JSON, NOT the URL param
-    if not db_code:
-        return func.HttpResponse("Missing db_code in request body.", status_code=400)
+    try:
+        report_format = normalize_format(body.get("format"))  # xlsx (default), xlsx-lite, csv.gz, parquet
+    except UnknownFormatError as e:
+        raise ReportError(str(e), 400)
 
     # Parse parameters from SQL string (dates, ledgers)
+    databases = None
     try:
         from_date, to_date = extract_dates(sql_proc)
-        ledger_ids = extract_ledgers(sql_proc)
-        if not ledger_ids:
-            return func.HttpResponse("No ledgers specified in @StrLedgers parameter.", status_code=400)
+        if consolidated:
+            # Each database brings its own ledgers; @StrLedgers in sql_proc is ignored
+            databases = parse_databases(body["databases"])
+            ledger_ids = [ledger_key(d["db_code"], lid) for d in databases for lid in d["ledger_ids"]]
+            db_code = None
+        else:
+            ledger_ids = extract_ledgers(sql_proc)
     except SqlParseError as e:
         logging.error(f"SQL parameter parse error: {e}")
-        return func.HttpResponse(f"SQL parameter parse error: {e}", status_code=400)
+        raise ReportError(f"SQL parameter parse error: {e}", 400)
+    except ConsolidationError as e:
+        raise ReportError(str(e), 400)
+    if not ledger_ids:
+        raise ReportError("No ledgers specified in @StrLedgers parameter.", 400)
+    if consolidated and body.get("delta"):
+        raise ReportError("Delta reports are not supported for consolidated (multi-database) requests.", 400)
+    delivery = str(body.get("delivery") or _report_delivery).strip().lower()
+    if delivery not in _DELIVERY_MODES:
+        raise ReportError(f"Unknown delivery '{body.get('delivery')}'; expected one of: {', '.join(_DELIVERY_MODES)}", 400)
 
-    # --- Per-request secrets (DB name per user) ---
+    return {
+        "sql_proc": sql_proc,
+        "email_to": email_to,
+        "currency": currency,
+        "db_code": db_code,
+        "from_date": from_date,
+        "to_date": to_date,
+        "ledger_ids": ledger_ids,
+        "format": report_format,
+        "delta": bool(body.get("delta")),
+        "databases": databases,
+        "delivery": delivery,
+    }
+
+def _conn_str(secrets: SecretCache, db_code) -> str:
+    """Connection string of a db_code: the template with the db-map-{db_code} database name."""
+    tpl = secrets.get("sql-connection-template")
+    dbnm = secrets.get(f"db-map-{db_code}")
+    return tpl.replace("{db}", dbnm)
+
+def _pipeline() -> types.SimpleNamespace:
+    """The pipeline namespace (see _ready); raises ReportError."""
     try:
-        tpl = _sql_template
-        dbnm = _kv_client.get_secret(f"db-map-{db_code}").value
-        conn_str = tpl.replace("{db}", dbnm)
+        with tracing.span("startup"):
+            return _ready()
     except Exception as e:
-        logging.error(f"Key Vault (per-request) error: {e}")
-        return func.HttpResponse(f"Key Vault error: {e}", status_code=500)
+        logging.error(f"Startup error: {e}")
+        raise ReportError(f"Startup error: {e}")
 
-    # --- Fetch metadata for ledgers ---
+def _fetch_metadata(p, conn_str, ledger_ids, db_code, job_id, consolidated=False) -> dict:
+    """Metadata of one database's ledgers; errors (tagged with the db_code when consolidated) become ReportError."""
+    where, attrs = (f" ({db_code})", {"db": db_code}) if consolidated else ("", {})
     try:
-        metadata = get_ledger_metadata(conn_str, ledger_ids)
+        with tracing.span("metadata", ledgers=len(ledger_ids), **attrs):
+            return p.get_ledger_metadata(conn_str, ledger_ids, job_id=job_id,
+                                         cache=p.get_metadata_cache(), db_code=db_code)
     except Exception as e:
-        logging.error(f"Ledger metadata fetch error: {e}")
-        return func.HttpResponse(f"Ledger metadata fetch error: {e}", status_code=500)
+        logging.error(f"Ledger metadata fetch error{where}: {e}")
+        raise ReportError(f"Ledger metadata fetch error{where}: {e}")
 
-    # --- Fetch data for each ledger (parallel, chunked) ---
+def _fetch_args(p, params, conn_str, ledger_ids, db_code, metadata, from_date, job_id) -> dict:
+    """Arguments of fetch_per_ledger_chunked/iter_per_ledger_chunked for one database's ledgers."""
+    return dict(
+        conn_str=conn_str,
+        sql_template=params["sql_proc"],
+        ledgers=ledger_ids,
+        from_date=from_date,
+        to_date=params["to_date"],
+        max_workers=8,  # Tune as needed
+        retry_attempts=2,
+        ledgers_per_call=_ledgers_per_call,
+        ledger_keys={lid: m.get("code") for lid, m in metadata.items() if m},
+        chunk_cache=p.get_chunk_cache(),
+        db_code=db_code,
+        chunking=p.get_chunking(),
+        job_id=job_id,
+        schema=p.LEDGER_SCHEMA if _fetch_dtypes else None,
+        rpc=_sql_rpc
+    )
+
+def _fetch_ledgers(p, fetch_args: dict, progress, consolidated=False) -> dict:
+    """One database's ledgers as {lid: DataFrame}; fetch errors become ReportError."""
+    db_code = fetch_args["db_code"]
+    where, attrs = (f" ({db_code})", {"db": db_code}) if consolidated else ("", {})
     try:
-        data_dict = fetch_per_ledger_chunked(
-            conn_str=conn_str,
-            sql_template=sql_proc,
-            ledgers=ledger_ids,
+        with tracing.span("fetch", ledgers=len(fetch_args["ledgers"]), **attrs) as fetched:
+            frames = p.fetch_per_ledger_chunked(progress=progress, **fetch_args)
+            fetched.set(rows=sum(len(df) for df in frames.values()))
+    except (p.ConnectionStringError, Exception) as e:
+        logging.error(f"Ledger data fetch error{where}: {e}")
+        raise ReportError(f"Ledger data fetch error{where}: {e}")
+    return frames
+
+def _export_report(p, params, metadata, ledgers, name, from_date, pipelined=False, consolidated=False,
+                   **span_attrs):
+    """
+    Export fetched ledgers (a dict, or the pipelined generator) as <name>_<date>
+    in the requested format, with requester placeholders: each recipient's
+    copy is stamped at delivery (see _deliver_report). Returns (report path,
+    summaries, artifact, write_workbook, ledger_weights); raises ReportError.
+    """
+    exporter = p.get_exporter(params.get("format"), streaming=_excel_streaming)
+    excel_filename = f"{name}_{datetime.now():%d-%m-%Y}{exporter.suffix}"
+    # Own directory per report: the file name alone repeats for a company within a day
+    excel_path = os.path.join(tempfile.mkdtemp(prefix="ledger-report-"), excel_filename)
+
+    def export(ledgers, out_path, requested_by=REQUESTED_BY, requested_at=REQUESTED_AT):
+        return exporter.export(
+            ledgers=ledgers,
+            out_path=out_path,
+            metadata=metadata,
+            requested_by=requested_by,
             from_date=from_date,
-            to_date=to_date,
-            max_workers=8,  # Tune as needed
-            retry_attempts=2
+            to_date=params["to_date"],
+            currency=params["currency"],
+            requested_at=requested_at,
+            consolidated=consolidated
         )
-    except (ConnectionStringError, Exception) as e:
-        logging.error(f"Ledger data fetch error: {e}")
-        return func.HttpResponse(f"Ledger data fetch error: {e}", status_code=500)
+
+    try:
+        with tracing.span("export", ledgers=len(params["ledger_ids"]), format=exporter.name,
+                          **span_attrs) as exported:
+            if pipelined:
+                summaries = export(ledgers, excel_path)
+                artifact = _store_artifact(p, params, None, excel_path, excel_filename, summaries)
+            else:
+                summaries, artifact, reused = _export_or_reuse(
+                    p, params, exporter, export, metadata, ledgers, excel_path, excel_filename, from_date)
+                exported.set(reused=reused)
+            exported.set(bytes=os.path.getsize(excel_path))
+    except ReportError:
+        # Fetch failure surfacing through the pipelined export
+        shutil.rmtree(os.path.dirname(excel_path), ignore_errors=True)
+        raise
+    except Exception as e:
+        logging.error(f"Excel export error: {e}")
+        shutil.rmtree(os.path.dirname(excel_path), ignore_errors=True)
+        raise ReportError(f"Excel export error: {e}")
+    finally:
+        if pipelined:
+            ledgers.close()  # stops the fetch if the export failed part-way
+
+    if pipelined:
+        # Frames were dropped while exporting: oversized reports can be zipped but not split
+        return excel_path, summaries, artifact, None, None
+    write_workbook = lambda subset, out_path, requested_by, requested_at: export(
+        {lid: ledgers[lid] for lid in subset}, out_path, requested_by, requested_at)
+    ledger_weights = {lid: len(df) for lid, df in ledgers.items()}
+    return excel_path, summaries, artifact, write_workbook, ledger_weights
+
+def _build_report(params: dict, report) -> types.SimpleNamespace:
+    """
+    Metadata lookup, fetch and Excel export for one parsed request.
+    Returns what delivery needs (workbook path, metadata, subject parts);
+    raises ReportError on failure.
+    """
+    if params.get("databases"):
+        return _build_consolidated_report(params, report)
+
+    sql_proc = params["sql_proc"]
+    email_to = params["email_to"]
+    currency = params["currency"]
+    db_code = params["db_code"]
+    from_date = params["from_date"]
+    to_date = params["to_date"]
+    ledger_ids = params["ledger_ids"]
+    job_id = params.get("job_id") or uuid.uuid4().hex  # groups this request's DB queries
+
+    p = _pipeline()
+
+    # --- Per-request secrets (DB name per user) ---
+    try:
+        with tracing.span("keyvault"):
+            conn_str = _conn_str(_get_secrets(), db_code)
+    except Exception as e:
+        logging.error(f"Key Vault (per-request) error: {e}")
+        raise ReportError(f"Key Vault error: {e}")
+
+    # --- Fetch metadata for ledgers ---
+    report("metadata")
+    metadata = _fetch_metadata(p, conn_str, ledger_ids, db_code, job_id)
 
     # --- Build file name and subject using company name ---
     company_name = metadata[ledger_ids[0]].get("company_name", "Ledger")
     safe_company = re.sub(r'[\\/*?:"<>|]', "_", company_name)[:30]
-    date_str = datetime.now().strftime("%d-%m-%Y")
-    time_str = datetime.now().strftime("%H:%M")
-    excel_filename = f"{safe_company}_LedgerReport_{date_str}.xlsx"
-    excel_path = os.path.join(tempfile.gettempdir(), excel_filename)
-    requested_at = datetime.now()
 
-    # --- Export to Excel ---
+    # --- Delta mode: only vouchers after this recipient's last delivered report ---
+    watermarks = p.get_watermark_store()
+    report_key = p.watermark_key(sql_proc, currency) if watermarks is not None else None
+    delta = None
+    if params.get("delta") and watermarks is not None:
+        delta = p.plan_delta(watermarks, email_to, db_code, report_key, ledger_ids, from_date, to_date)
+
+    # --- Fetch data for each ledger (parallel, chunked) ---
+    report("fetch", 0, len(ledger_ids))
+    fetch_args = _fetch_args(p, params, conn_str, ledger_ids, db_code, metadata,
+                             delta.start if delta else from_date, job_id)
+
+    def fetch():
+        fetched_dict = _fetch_ledgers(p, fetch_args, lambda done, total: report("fetch", done, total))
+        _log_db_stats(p)
+        return fetched_dict
+
+    # Delta frames are checked against the carried balances before export, so they are not pipelined.
+    # A streaming xlsx export always is: holding every fetched frame would defeat constant_memory
+    pipelined = (_excel_pipeline or (_excel_streaming and params["format"] == "xlsx")) and delta is None
+    if pipelined:
+        # Sheets are written while later ledgers are still loading; the
+        # export stage is reported once the last ledger has arrived
+        ledgers = _fetch_pipelined(p, fetch_args, lambda done, total: report(
+            "fetch" if done < total else "export", done, total))
+    else:
+        ledgers = fetch()
+        if delta is not None:
+            carried = p.carry_forward(ledgers, delta)
+            if carried is None:
+                delta = None
+                fetch_args["from_date"] = from_date
+                ledgers = fetch()
+            else:
+                ledgers = carried
+        report("export")
+
+    # --- Export (workbook or the requested format, see shared.exporters) ---
+    excel_path, summaries, artifact, write_workbook, ledger_weights = _export_report(
+        p, params, metadata, ledgers, f"{safe_company}_LedgerReport", fetch_args["from_date"], pipelined=pipelined)
+
+    return types.SimpleNamespace(
+        p=p,
+        excel_path=excel_path,
+        metadata=metadata,
+        ledger_ids=ledger_ids,
+        company_name=company_name,
+        write_workbook=write_workbook,
+        ledger_weights=ledger_weights,
+        delta_since=delta.since if delta else None,
+        watermarks=watermarks,
+        watermark=(db_code, report_key, from_date, to_date, summaries),
+        artifact=artifact,
+        delivery=params["delivery"],
+    )
+
+def _build_consolidated_report(params: dict, report) -> types.SimpleNamespace:
+    """
+    _build_report for a request over several databases (params["databases"]).
+
+    Connection strings are resolved concurrently; each database's metadata
+    and ledgers are then fetched in parallel, up to CONSOLIDATE_MAX_DATABASES
+    databases at a time, every query still under the DB scheduler's limit
+    for its database. One report holds every company's ledger sheets (keyed
+    "DB:ledger_id", see shared.consolidation) and a combined Summary sheet.
+    A database that fails fails the whole report.
+    """
+    from_date = params["from_date"]
+    to_date = params["to_date"]
+    databases = params["databases"]
+    job_id = params.get("job_id") or uuid.uuid4().hex  # groups this request's DB queries
+    db_codes = [d["db_code"] for d in databases]
+
+    p = _pipeline()
+
+    # --- Per-database connection strings, concurrently ---
     try:
-        save_to_excel(
-            data_dict=data_dict,
-            out_path=excel_path,
-            metadata=metadata,
-            requested_by=email_to,
-            from_date=from_date,
-            to_date=to_date,
-            currency=currency,
-            requested_at=requested_at
-        )
+        with tracing.span("keyvault", databases=len(databases)):
+            secrets = _get_secrets()
+            with ThreadPoolExecutor(max_workers=len(databases), thread_name_prefix="consolidate-kv") as ex:
+                conn_strs = dict(zip(db_codes, ex.map(tracing.bind(lambda db: _conn_str(secrets, db)), db_codes)))
     except Exception as e:
-        logging.error(f"Excel export error: {e}")
-        if os.path.exists(excel_path):
-            os.remove(excel_path)
-        return func.HttpResponse(f"Excel export error: {e}", status_code=500)
+        logging.error(f"Key Vault (per-request) error: {e}")
+        raise ReportError(f"Key Vault error: {e}")
+
+    # --- Metadata and ledgers of each database, in parallel ---
+    report("metadata")
+    total = sum(len(d["ledger_ids"]) for d in databases)
+    fetched = {db: 0 for db in db_codes}
+    progress_lock = threading.Lock()
+
+    def progress(db, done):
+        with progress_lock:
+            fetched[db] = done
+            report("fetch", sum(fetched.values()), total)
+
+    def fetch_database(database):
+        db_code, ids = database["db_code"], database["ledger_ids"]
+        conn_str = conn_strs[db_code]
+        metadata = _fetch_metadata(p, conn_str, ids, db_code, job_id, consolidated=True)
+        fetch_args = _fetch_args(p, params, conn_str, ids, db_code, metadata, from_date, job_id)
+        frames = _fetch_ledgers(p, fetch_args, lambda done, _: progress(db_code, done), consolidated=True)
+        return metadata, frames
+
+    workers = max(1, min(_consolidate_max_databases, len(databases)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="consolidate") as ex:
+        results = list(ex.map(tracing.bind(fetch_database), databases))
+    _log_db_stats(p)
+
+    # Report order: databases as requested, then each database's ledgers
+    metadata, data_dict = {}, {}
+    for database, (db_metadata, frames) in zip(databases, results):
+        db_code = database["db_code"]
+        for lid in database["ledger_ids"]:
+            key = ledger_key(db_code, lid)
+            m = db_metadata.get(lid)
+            metadata[key] = dict(m, db_code=db_code) if m else {}
+            data_dict[key] = frames[lid]
+
+    # --- File name and subject ---
+    companies = list(dict.fromkeys(
+        metadata[ledger_key(d["db_code"], d["ledger_ids"][0])].get("company_name") or d["db_code"]
+        for d in databases
+    ))
+    company_name = f"Consolidated ({len(companies)} companies)" if len(companies) > 1 else companies[0]
+
+    # --- Export: every company's sheets plus the combined summary ---
+    report("export")
+    excel_path, summaries, artifact, write_workbook, ledger_weights = _export_report(
+        p, params, metadata, data_dict, "Consolidated_LedgerReport", from_date, consolidated=True,
+        databases=len(databases))
+
+    return types.SimpleNamespace(
+        p=p,
+        excel_path=excel_path,
+        metadata=metadata,
+        ledger_ids=list(data_dict),
+        company_name=company_name,
+        write_workbook=write_workbook,
+        ledger_weights=ledger_weights,
+        delta_since=None,
+        watermarks=None,  # delta reports are per database; see _parse_request
+        watermark=(None, None, from_date, to_date, summaries),
+        artifact=artifact,
+        delivery=params["delivery"],
+    )
+
+def _export_or_reuse(p, params, exporter, export, metadata, data_dict, excel_path, filename, header_from):
+    """
+    Export `data_dict` to excel_path, or copy the stored report with the same
+    content key (shared.artifacts) instead. Returns (summaries, artifact or
+    None, reused); new reports are added to the store.
+    """
+    store = p.get_artifact_store()
+    if store is None:
+        return export(data_dict, excel_path), None, False
+
+    # Attached or linked, the file is the same
+    key = p.artifact_key(request_key(dict(params, delivery=None)), exporter.name,
+                         {"streaming": _excel_streaming, "from_date": header_from}, metadata, data_dict)
+    stored = store.get(key)
+    if stored is not None:
+        try:
+            store.download(key, excel_path)
+            logging.info(f"Reusing stored report {key[:12]} ({stored.size} bytes).")
+            return stored.summaries, stored, True
+        except ArtifactNotFoundError:
+            pass  # evicted since the lookup
+    summaries = export(data_dict, excel_path)
+    return summaries, _store_artifact(p, params, key, excel_path, filename, summaries), False
+
+def _store_artifact(p, params, key, path, filename, summaries):
+    """
+    Add a built report to the artifact store; without a content key (pipelined
+    builds) only when it is to be delivered as a link. Returns the artifact,
+    or None when it is not stored.
+    """
+    store = p.get_artifact_store()
+    if store is None or (key is None and params.get("delivery") != "link"):
+        return None
+    try:
+        return store.put(key or uuid.uuid4().hex, path, filename, summaries)
+    except Exception as e:
+        logging.warning(f"Failed to store report artifact: {e}")
+        return None
+
+def _deliver_report(built: types.SimpleNamespace, email_to: str, requested_at: datetime, report) -> str:
+    """
+    Email a built report to one recipient, who asked for it at `requested_at`;
+    the workbook is left in place. The attachment (and each split part) is
+    this recipient's own copy, stamped with their email and request time.
+    """
+    p = built.p
 
     # --- Compose subject ---
     email_subject = (
-        f"Ledger Report – {company_name} (Requested by: {email_to} on {date_str} {time_str})"
+        f"Ledger Report – {built.company_name} (Requested by: {email_to} on {requested_at:%d-%m-%Y %H:%M})"
     )
+    if built.delta_since is not None:
+        email_subject += f" – changes since {built.delta_since:%d-%b-%Y %H:%M}"
 
-    # --- Send email with Excel attachment ---
+    # --- Send email with Excel attachment (or a download link) ---
+    report("email")
+    with tracing.span("keyvault"):
+        smtp_server, smtp_port, smtp_username, smtp_password = _smtp_config()
+        link = _download_link(built, email_to, requested_at) if built.delivery == "link" else None
+    stamped_dir = None
     try:
-        send_email_with_excel(
-            recipient=email_to,
-            file_path=excel_path,
-            metadata=metadata,
-            requested_ledgers=ledger_ids,
-            smtp_server=_smtp_server,
-            smtp_port=_smtp_port,
-            smtp_username=_smtp_username,
-            smtp_password=_smtp_password,
-            subject=email_subject,
-            body=None,
-            cleanup=True,  # Deletes the file after sending
-            retries=2
-        )
-    except EmailSendError as e:
+        if link is None:
+            with tracing.span("stamp"):
+                stamped_dir = tempfile.mkdtemp(prefix="ledger-report-")
+                file_path = os.path.join(stamped_dir, os.path.basename(built.excel_path))
+                stamp_report(built.excel_path, file_path, email_to, requested_at)
+            # Split parts are exported for this recipient directly
+            export_part = built.write_workbook
+            write_workbook = (
+                lambda subset, out_path: export_part(subset, out_path, email_to, requested_at)
+            ) if export_part is not None else None
+        with tracing.span("email", link=link is not None) as sent:
+            if link is not None:
+                delivery = p.send_email_with_link(
+                    recipient=email_to,
+                    link=link,
+                    file_name=built.artifact.name,
+                    file_bytes=built.artifact.size,
+                    expires_at=datetime.now() + timedelta(seconds=_link_ttl),
+                    metadata=built.metadata,
+                    requested_ledgers=built.ledger_ids,
+                    smtp_server=smtp_server,
+                    smtp_port=smtp_port,
+                    smtp_username=smtp_username,
+                    smtp_password=smtp_password,
+                    subject=email_subject
+                )
+            else:
+                delivery = p.send_email_with_excel(
+                    recipient=email_to,
+                    file_path=file_path,
+                    metadata=built.metadata,
+                    requested_ledgers=built.ledger_ids,
+                    smtp_server=smtp_server,
+                    smtp_port=smtp_port,
+                    smtp_username=smtp_username,
+                    smtp_password=smtp_password,
+                    subject=email_subject,
+                    body=None,
+                    cleanup=False,  # The stamped copy's directory is removed below
+                    write_workbook=write_workbook,
+                    ledger_weights=built.ledger_weights
+                )
+            sent.set(parts=delivery["parts"], bytes=delivery["bytes_sent"], attempts=delivery["attempts"])
+        logging.info("Email delivery: %s", delivery)
+    except p.EmailSendError as e:
         logging.error(f"Email send error: {e}")
-        return func.HttpResponse(f"Failed to send email: {e}", status_code=500)
+        raise ReportError(f"Failed to send email: {e}")
     except Exception as e:
         logging.error(f"Unexpected email error: {e}")
-        return func.HttpResponse(f"Unexpected email error: {e}", status_code=500)
+        raise ReportError(f"Unexpected email error: {e}")
     finally:
-        # Just in case cleanup did not occur
-        if os.path.exists(excel_path):
-            try:
-                os.remove(excel_path)
-            except Exception:
-                pass
+        if stamped_dir is not None:
+            shutil.rmtree(stamped_dir, ignore_errors=True)
+
+    # --- Watermark for this recipient's next delta report ---
+    db_code, report_key, period_from, period_to, summaries = built.watermark
+    if built.watermarks is not None and summaries:
+        try:
+            built.watermarks.record(email_to, db_code, report_key, period_from, period_to, summaries)
+        except Exception as e:
+            logging.warning(f"Failed to record report watermarks for {email_to}: {e}")
 
     logging.info("Ledger report generated and emailed successfully.")
-    return func.HttpResponse(f"Report generated and sent to {email_to}.", status_code=200)
+    return f"Report generated and sent to {email_to}."
+
+def _download_link(built: types.SimpleNamespace, email_to: str, requested_at: datetime) -> Optional[str]:
+    """
+    Signed download link to a built report for one recipient (served by
+    ReportDownload), or None when links cannot be made (no stored artifact,
+    ARTIFACT_BASE_URL or artifact-link-secret) and the report is attached
+    instead.
+    """
+    if _artifact_base_url and "code" in parse_qs(urlsplit(_artifact_base_url).query):
+        # A function key in an emailed URL would let anyone holding the link request reports
+        logging.error("ARTIFACT_BASE_URL carries a function key (?code=); attaching the report instead.")
+        return None
+    secret = safe_get_secret(_get_secrets(), "artifact-link-secret", required=False)
+    if built.artifact is None or not _artifact_base_url or not secret:
+        logging.warning("Link delivery is not available (artifact store, ARTIFACT_BASE_URL or "
+                        "artifact-link-secret missing); attaching the report instead.")
+        return None
+    return built.p.signed_link(_artifact_base_url, built.artifact.key, secret, _link_ttl,
+                               email_to, requested_at.timestamp())
+
+def _drop_frames(built: types.SimpleNamespace):
+    """Kept reports are only emailed again as-is: no need to hold the frames for splitting."""
+    built.write_workbook = built.ledger_weights = None
+
+def _discard_report(built: types.SimpleNamespace):
+    """Delete a built report's workbook and drop its frames."""
+    _drop_frames(built)
+    shutil.rmtree(os.path.dirname(built.excel_path), ignore_errors=True)
+
+def _run_report(params: dict, report=None) -> str:
+    """
+    Metadata lookup, fetch, Excel export and email for one parsed request.
+    `report(stage, done=None, total=None)` is told about each stage as it starts
+    (and each finished ledger during fetch). Returns the success message;
+    raises ReportError on failure.
+
+    Identical requests (shared.coalescing.request_key) share one build: a
+    request arriving while the same report is in progress waits for it
+    (stage "coalesced"), and within COALESCE_WINDOW_SECONDS of completion the
+    finished workbook is reused. Every request still emails its own stamped
+    copy itself, with its own stages and outcome.
+    """
+    report = report or (lambda stage, done=None, total=None: None)
+    email_to = params["email_to"]
+    requested_at = datetime.now()
+    coalescer = get_coalescer(discard=_discard_report, idle=_drop_frames)
+    if coalescer is None:
+        built = _build_report(params, report)
+        try:
+            return _deliver_report(built, email_to, requested_at, report)
+        finally:
+            _discard_report(built)
+
+    batch, role = coalescer.join(request_key(params), email_to)
+    deliver = lambda built: _deliver_report(built, email_to, requested_at, report)
+    if role == LEADER:
+        try:
+            built = _build_report(params, report)
+        except BaseException as e:
+            coalescer.fail(batch, e)
+            raise
+        coalescer.publish(batch, built)
+        logging.info("Request coalescing stats: %s", coalescer.stats())
+        return coalescer.deliver(batch, email_to, deliver)
+
+    report("coalesced")
+    with tracing.span("coalesced", role=role):
+        if role == DUPLICATE:
+            return coalescer.wait(batch, email_to)
+        return coalescer.deliver(batch, email_to, deliver)
+
+def _fetch_pipelined(p, fetch_args: dict, progress):
+    """
+    Ledgers as (lid, DataFrame) in request order, yielded as soon as each one
+    and every ledger before it are fetched; fetch errors become ReportError.
+    """
+    try:
+        # Not activated: this generator yields to the export inside the span
+        with tracing.span("fetch", activate=False, ledgers=len(fetch_args["ledgers"])) as fetched:
+            for lid, df in p.iter_per_ledger_chunked(
+                ordered=True, max_ahead=_pipeline_ahead, progress=progress, **fetch_args
+            ):
+                fetched.add(rows=len(df))
+                yield lid, df
+    except (p.ConnectionStringError, Exception) as e:
+        logging.error(f"Ledger data fetch error: {e}")
+        raise ReportError(f"Ledger data fetch error: {e}")
+    _log_db_stats(p)
+
+def _log_db_stats(p):
+    logging.info("DB pool stats: %s", p.get_pool().stats())
+    logging.info("DB scheduler stats: %s", p.get_scheduler().stats())
+
+def _run_job(payload: dict, report) -> str:
+    return _run_report(_parse_request(payload), report)
+
+_worker = None
+
+def _get_worker() -> JobWorker:
+    """In-process worker draining the job queue; started on the first async submission."""
+    global _worker
+    if _worker is None:
+        queue = get_job_queue()
+        queue.requeue_stale(_job_stale_seconds)
+        _worker = JobWorker(queue, _run_job)
+    _worker.start()
+    return _worker
+
+def _job_status(job_id) -> func.HttpResponse:
+    if not job_id:
+        return func.HttpResponse("Missing job id.", status_code=400)
+    try:
+        status = get_job_queue().get(job_id)
+    except JobNotFoundError as e:
+        return func.HttpResponse(str(e), status_code=404)
+    return func.HttpResponse(json.dumps(status), status_code=200, mimetype="application/json")
+
+def _timing_headers(trace) -> dict:
+    """Per-stage timing summary of a request (shared.tracing) as Server-Timing."""
+    if trace is None:
+        return {}
+    return {"Server-Timing": trace.server_timing(), "X-Trace-Id": trace.trace_id}
+
+def main(req: func.HttpRequest) -> func.HttpResponse:
+    if req.method == "GET":
+        return _job_status(req.route_params.get("job_id"))
+
+    logging.info("Ledger Report triggered.")
+    try:
+        body = req.get_json()
+        logging.info("Incoming payload: %s", json.dumps(body, indent=2))
+    except Exception as e:
+        logging.error(f"Failed to parse JSON body: {e}")
+        return func.HttpResponse("Invalid JSON body", status_code=400)
+
+    try:
+        params = _parse_request(body)
+    except ReportError as e:
+        return func.HttpResponse(str(e), status_code=e.status_code)
+
+    # --- Async mode: queue the job and answer 202 with a status URL ---
+    if body.get("async") or req.params.get("mode") == "async":
+        job_id = get_job_queue().enqueue(body)
+        _get_worker().notify()
+        status_url = f"{req.url.split('?', 1)[0].rstrip('/')}/{job_id}"
+        return func.HttpResponse(
+            json.dumps({"job_id": job_id, "status": "queued", "status_url": status_url}),
+            status_code=202,
+            mimetype="application/json",
+            headers={"Location": status_url}
+        )
+
+    trace = None
+    try:
+        with tracing.start_trace("report") as trace:
+            message = _run_report(params)
+    except ReportError as e:
+        return func.HttpResponse(str(e), status_code=e.status_code, headers=_timing_headers(trace))
+    return func.HttpResponse(message, status_code=200, headers=_timing_headers(trace))
@@ -0,0 +1,81 @@
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from datetime import datetime
+
+import azure.functions as func
+
+from shared.artifacts import get_artifact_store, verify_link, ArtifactNotFoundError
+from shared.secret_cache import SecretCache
+from shared.stamping import stamp_report
+
+# Download links emailed by MyFunction (delivery "link"). Anonymous: the
+# link's HMAC signature (shared.artifacts.signed_link) is the only
+# credential, so the emailed URL never carries a function key, which would
+# also let its holder request reports.
+
+_secrets = None
+_secrets_lock = threading.Lock()
+
+def _get_secrets() -> SecretCache:
+    """Key Vault client behind a SecretCache, built on first use."""
+    global _secrets
+    if _secrets is None:
+        with _secrets_lock:
+            if _secrets is None:
+                from azure.identity import DefaultAzureCredential
+                from azure.keyvault.secrets import SecretClient
+                kv_url = os.environ.get("KEYVAULT_URL")
+                if not kv_url:
+                    raise RuntimeError("KEYVAULT_URL environment variable must be set")
+                client = SecretClient(vault_url=kv_url, credential=DefaultAzureCredential())
+                _secrets = SecretCache(
+                    client,
+                    ttl=float(os.environ.get("SECRET_TTL_SECONDS", "300")),
+                    max_stale=float(os.environ.get("SECRET_MAX_STALE_SECONDS", "3600")),
+                    negative_ttl=float(os.environ.get("SECRET_NEGATIVE_TTL_SECONDS", "60")),
+                )
+    return _secrets
+
+def _link_secret():
+    try:
+        return _get_secrets().get("artifact-link-secret")
+    except Exception as e:
+        logging.error(f"Key Vault error for secret 'artifact-link-secret': {e}")
+        return None
+
+def main(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    GET ?artifact=&to=&at=&expires=&sig=: the stored report behind a download
+    link, stamped with the link's recipient and request time.
+    """
+    from shared.delivery import attachment_type
+
+    query = req.params
+    secret = _link_secret()
+    if not secret or not verify_link(query, secret):
+        return func.HttpResponse("Invalid or expired download link.", status_code=403)
+    key = query["artifact"]
+    store = get_artifact_store()
+    stamped_dir = tempfile.mkdtemp(prefix="ledger-download-")
+    try:
+        artifact = store.get(key) if store is not None else None
+        if artifact is None:
+            raise ArtifactNotFoundError(key)
+        path = store.download(key, os.path.join(stamped_dir, "artifact"))
+        stamped = stamp_report(path, os.path.join(stamped_dir, artifact.name), query["to"],
+                               datetime.fromtimestamp(int(query["at"])))
+        with open(stamped, "rb") as f:
+            data = f.read()
+    except ArtifactNotFoundError:
+        return func.HttpResponse("This report is no longer available; please request it again.", status_code=404)
+    finally:
+        shutil.rmtree(stamped_dir, ignore_errors=True)
+    return func.HttpResponse(
+        data,
+        status_code=200,
+        mimetype="/".join(attachment_type(artifact.name)),
+        headers={"Content-Disposition": f'attachment; filename="{artifact.name}"'}
+    )
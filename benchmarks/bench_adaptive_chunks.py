@@ -0,0 +1,62 @@
+"""
+Round-trip and latency benchmark for chunking strategies: fixed calendar
+months vs. adaptive windows, on a mix of quiet and busy ledgers. The adaptive
+strategy is run twice to show the per-ledger density it keeps between requests.
+
+    python -m benchmarks.bench_adaptive_chunks --months 24 --quiet 5 --busy 20000
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+
+from dateutil.relativedelta import relativedelta
+
+from .fake_pytds import FakeBackend, install
+from .synthetic import SyntheticLedgers
+
+CONN_STR = "Server=fake,1433;Database=erp;User Id=bench;Password=bench"
+SQL = ("EXEC dbo.Fin_LedgerReport @StrLedgers='1', "
+       "@FromDate='01-Jan-2024 00:00:00', @ToDate='31-Dec-2024 23:59:59'")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--months", type=int, default=24)
+    ap.add_argument("--quiet-ledgers", type=int, default=6)
+    ap.add_argument("--busy-ledgers", type=int, default=2)
+    ap.add_argument("--quiet", type=int, default=5, help="vouchers per month on quiet ledgers")
+    ap.add_argument("--busy", type=int, default=20000, help="vouchers per month on busy ledgers")
+    ap.add_argument("--target-rows", type=int, default=10000)
+    ap.add_argument("--latency", type=float, default=0.005, help="seconds per round trip")
+    args = ap.parse_args(argv)
+
+    count = args.quiet_ledgers + args.busy_ledgers
+    volume = {str(1001 + i): (args.busy if i < args.busy_ledgers else args.quiet) for i in range(count)}
+    data = SyntheticLedgers(ledger_count=count, volume=volume)
+    backend = FakeBackend(data, latency=args.latency)
+    install(backend)
+    from shared.fetcher import fetch_per_ledger_chunked
+    from shared.chunking import AdaptiveChunking, MONTHLY
+
+    from_date = datetime(2023, 1, 1)
+    to_date = from_date + relativedelta(months=args.months) - timedelta(seconds=1)
+    adaptive = AdaptiveChunking(target_rows=args.target_rows)
+
+    results = []
+    for run, strategy in (("monthly", MONTHLY), ("adaptive_first", adaptive), ("adaptive_repeat", adaptive)):
+        backend.stats = type(backend.stats)()
+        t0 = time.perf_counter()
+        out = fetch_per_ledger_chunked(
+            CONN_STR, SQL, data.ledger_ids, from_date, to_date, max_workers=8,
+            db_code="BENCH", chunking=strategy,
+        )
+        results.append({
+            "run": run,
+            "seconds": round(time.perf_counter() - t0, 4),
+            "result_rows": sum(len(df) for df in out.values()),
+            **backend.stats.as_dict(),
+        })
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Report artifact store benchmark: the same report requested again and again
+(scheduled sends, repeated clicks) through MyFunction.main against local
+Key Vault/DB/SMTP stubs, with the artifact store off and on. Download links
+are served by ReportDownload.main.
+
+Reports per mode the wall time and export stage time per request and how
+many exports were reused. Then checks, with the store on:
+- concurrent identical requests (coalescing off) all succeed and leave one
+  artifact;
+- a reused report shows its own requester, not the first build's;
+- delivery "link" emails a signed link whose download returns the
+  stored file stamped with the link's recipient; a tampered or expired
+  link is refused (403), an evicted artifact is gone (404);
+- retention eviction empties the store.
+
+    python -m benchmarks.bench_artifacts --requests 5 --ledgers 6 --vouchers 500
+"""
+import argparse
+import email
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+SECRETS = {
+    "sql-connection-template": "Server=fake,1433;Database={db};User Id=bench;Password=bench",
+    "email-username": "reports@example.com",
+    "email-password": "secret",
+    "db-map-BENCH": "erp",
+    "artifact-link-secret": "bench-link-secret",
+}
+
+BASE_URL = "https://reports.example.com/reports/download"
+
+def _requested_by(workbook: bytes) -> str:
+    """The "Requested by" title line of a workbook's first sheet."""
+    import pandas as pd
+    return pd.read_excel(io.BytesIO(workbook), sheet_name=0, header=None).iloc[4, 0]
+
+def _attachment(message: dict) -> bytes:
+    msg = email.message_from_bytes(message["data"])
+    return next(part for part in msg.walk() if part.get_filename()).get_payload(decode=True)
+
+def _stage_ms(response, stage: str) -> float:
+    m = re.search(rf"(?:^|, ){stage};dur=([\d.]+)", response.headers.get("Server-Timing", ""))
+    return float(m.group(1)) if m else 0.0
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--requests", type=int, default=5, help="identical requests per mode")
+    ap.add_argument("--ledgers", type=int, default=6)
+    ap.add_argument("--vouchers", type=int, default=500, help="vouchers per ledger per month")
+    ap.add_argument("--concurrent", type=int, default=4, help="identical requests sent at once")
+    args = ap.parse_args(argv)
+
+    from .fake_azure import HttpRequest, install as install_azure
+    from .fake_pytds import FakeBackend, install as install_pytds
+    from .fake_smtp import StubSmtpServer
+    from .synthetic import SyntheticLedgers
+
+    store_dir = tempfile.mkdtemp(prefix="bench_artifacts_")
+    server = StubSmtpServer(keep_data=True).start()
+    os.environ.update({"KEYVAULT_URL": "https://fake.vault.local/", "STARTUP_PREWARM": "0",
+                       "SMTP_STARTTLS": "0", "COALESCE_REQUESTS": "0", "DELTA_REPORTS": "0",
+                       "ARTIFACT_STORE_DIR": store_dir, "ARTIFACT_BASE_URL": BASE_URL})
+    install_azure(dict(SECRETS, **{"email-smtp-server": server.host, "email-smtp-port": str(server.port)}))
+    data = SyntheticLedgers(ledger_count=args.ledgers, vouchers_per_month=args.vouchers)
+    install_pytds(FakeBackend(data))
+    import MyFunction
+    import ReportDownload
+    from shared.artifacts import get_artifact_store, signed_link
+
+    body = {
+        "sql_proc": f"EXEC dbo.Fin_LedgerReport @StrLedgers='{','.join(data.ledger_ids)}', "
+                    f"@FromDate='01-Jan-2024', @ToDate='30-Jun-2024'",
+        "email_to": "finance@example.com",
+        "db_code": "BENCH",
+    }
+
+    def post(payload):
+        return MyFunction.main(HttpRequest("POST", "http://localhost/MyFunction", body=payload))
+
+    def get(params):
+        return ReportDownload.main(HttpRequest("GET", BASE_URL, params=params))
+
+    MyFunction._ready()
+    runs = []
+    for mode, enabled in (("store_off", "0"), ("store_on", "1")):
+        os.environ["ARTIFACT_STORE"] = enabled
+        walls, exports, statuses = [], [], []
+        for _ in range(args.requests):
+            t0 = time.perf_counter()
+            resp = post(body)
+            walls.append(time.perf_counter() - t0)
+            exports.append(_stage_ms(resp, "export"))
+            statuses.append(resp.status_code)
+        runs.append({
+            "mode": mode,
+            "statuses": sorted(set(statuses)),
+            "first_wall_s": round(walls[0], 3),
+            "repeat_wall_s": round(sum(walls[1:]) / max(1, len(walls) - 1), 3),
+            "first_export_ms": exports[0],
+            "repeat_export_ms": round(sum(exports[1:]) / max(1, len(exports) - 1), 1),
+        })
+    store = get_artifact_store()
+    runs[-1]["store"] = store.stats()
+
+    # --- Reuse for another requester ---
+    sent = len(server.messages)
+    post(dict(body, email_to="controller@example.com"))
+    reuse_requested_by = _requested_by(_attachment(server.messages[sent]))
+
+    # --- Concurrent identical requests ---
+    store.retention_seconds = 0
+    store.evict()
+    store.retention_seconds = 3600
+    statuses, lock = [], threading.Lock()
+    barrier = threading.Barrier(args.concurrent)
+
+    def concurrent_request():
+        barrier.wait()
+        code = post(body).status_code
+        with lock:
+            statuses.append(code)
+
+    threads = [threading.Thread(target=concurrent_request) for _ in range(args.concurrent)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    concurrent = {"statuses": sorted(statuses), "artifacts": store.stats()["artifacts"]}
+
+    # --- Link delivery and download ---
+    sent = len(server.messages)
+    link_status = post(dict(body, delivery="link")).status_code
+    time.sleep(0.2)
+    message = email.message_from_bytes(server.messages[sent]["data"])
+    text = message.get_payload(decode=True).decode("utf-8") if not message.is_multipart() else ""
+    link = re.search(r"https://\S+", text).group(0)
+    query = {k: v[0] for k, v in parse_qs(urlsplit(link).query).items()}
+    download = get(query)
+    tampered = get(dict(query, sig="0" * 64))
+    stale = signed_link(BASE_URL, query["artifact"], SECRETS["artifact-link-secret"], ttl_seconds=-60,
+                        recipient=query["to"], requested_at=int(query["at"]))
+    expired = get({k: v[0] for k, v in parse_qs(urlsplit(stale).query).items()})
+    store.delete(query["artifact"])
+    evicted = get(query)
+
+    # --- Retention ---
+    post(body)
+    before = store.stats()["artifacts"]
+    store.retention_seconds = 0
+    removed = store.evict()
+    after = store.stats()["artifacts"]
+
+    server.stop()
+    shutil.rmtree(store_dir, ignore_errors=True)
+    print(json.dumps({
+        "ledgers": args.ledgers,
+        "requests": args.requests,
+        "runs": runs,
+        "concurrent": concurrent,
+        "reuse_requested_by": reuse_requested_by,
+        "link": {
+            "status": link_status,
+            "attachments": sum(1 for part in message.walk() if part.get_filename()),
+            "download_status": download.status_code,
+            "download_requested_by": _requested_by(download.get_body()) if download.status_code == 200 else None,
+            "tampered_status": tampered.status_code,
+            "expired_status": expired.status_code,
+            "evicted_status": evicted.status_code,
+        },
+        "retention": {"artifacts_before": before, "evicted": removed, "artifacts_after": after},
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
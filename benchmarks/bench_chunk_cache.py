@@ -0,0 +1,59 @@
+"""
+Round-trip benchmark for the closed-period chunk cache: the same year-to-date
+request run cold, then warm, against the fake pytds backend.
+
+    python -m benchmarks.bench_chunk_cache --ledgers 10 --months 12 --latency 0.005
+"""
+import argparse
+import json
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from dateutil.relativedelta import relativedelta
+
+from .fake_pytds import FakeBackend, install
+from .synthetic import SyntheticLedgers
+
+CONN_STR = "Server=fake,1433;Database=erp;User Id=bench;Password=bench"
+SQL = ("EXEC dbo.Fin_LedgerReport @StrLedgers='1', "
+       "@FromDate='01-Jan-2024 00:00:00', @ToDate='31-Dec-2024 23:59:59'")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--ledgers", type=int, default=10)
+    ap.add_argument("--months", type=int, default=12)
+    ap.add_argument("--vouchers", type=int, default=200, help="vouchers per ledger per month")
+    ap.add_argument("--latency", type=float, default=0.005, help="seconds per round trip")
+    args = ap.parse_args(argv)
+
+    data = SyntheticLedgers(ledger_count=args.ledgers, vouchers_per_month=args.vouchers)
+    backend = FakeBackend(data, latency=args.latency)
+    install(backend)
+    from shared.fetcher import fetch_per_ledger_chunked
+    from shared.chunk_cache import ChunkCache
+
+    # Year-to-date up to today, so the last month(s) stay open
+    now = datetime.now()
+    to_date = datetime(now.year, now.month, now.day) + timedelta(days=1) - timedelta(seconds=1)
+    from_date = datetime(now.year, now.month, 1) - relativedelta(months=args.months - 1)
+    cache = ChunkCache(tempfile.mkdtemp(prefix="bench_chunks_"))
+
+    results = []
+    for run in ("no_cache", "cold", "warm"):
+        backend.stats = type(backend.stats)()
+        t0 = time.perf_counter()
+        out = fetch_per_ledger_chunked(
+            CONN_STR, SQL, data.ledger_ids, from_date, to_date, max_workers=8,
+            chunk_cache=None if run == "no_cache" else cache, db_code="BENCH",
+        )
+        results.append({
+            "run": run,
+            "seconds": round(time.perf_counter() - t0, 4),
+            "result_rows": sum(len(df) for df in out.values()),
+            **backend.stats.as_dict(),
+        })
+    print(json.dumps({"runs": results, "cache": cache.stats()}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Request coalescing benchmark: a burst of identical report requests (same
+db_code, ledgers, dates and proc) for different recipients, sent to
+MyFunction.main concurrently, against local Key Vault/DB/SMTP stubs.
+
+Each mode runs in a fresh interpreter (the coalescer is process-wide):
+- off: COALESCE_REQUESTS=0, every request fetches and exports on its own;
+- in_flight: identical requests join the one being built (window 0);
+- window: as in_flight, and a second burst arriving after the first has
+  finished is emailed from the kept workbook (COALESCE_WINDOW_SECONDS).
+
+Reports wall time per burst, DB round trips, emails the relay received and
+the coalescer's counters. Every recipient must get exactly one email per burst,
+with a workbook that names them (not whoever led the build) as the requester.
+
+    python -m benchmarks.bench_coalescing --requests 12 --recipients 8 --db-latency 0.01
+"""
+import argparse
+import email
+import io
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+import zipfile
+from collections import Counter
+
+SECRETS = {
+    "sql-connection-template": "Server=fake,1433;Database={db};User Id=bench;Password=bench",
+    "email-username": "reports@example.com",
+    "email-password": "secret",
+    "db-map-BENCH": "erp",
+}
+
+MODES = {
+    "off": {"COALESCE_REQUESTS": "0"},
+    "in_flight": {"COALESCE_REQUESTS": "1", "COALESCE_WINDOW_SECONDS": "0"},
+    "window": {"COALESCE_REQUESTS": "1", "COALESCE_WINDOW_SECONDS": "30"},
+}
+
+def _burst(main, HttpRequest, requests, recipients):
+    """`requests` concurrent POSTs spread over `recipients` addresses; returns (wall, statuses)."""
+    body = {
+        "sql_proc": "EXEC dbo.Fin_LedgerReport @StrLedgers='1001,1002,1003,1004', "
+                    "@FromDate='01-Jan-2024', @ToDate='31-Mar-2024'",
+        "db_code": "BENCH",
+    }
+    statuses = Counter()
+    lock = threading.Lock()
+    start = threading.Barrier(requests)
+
+    def request(i):
+        start.wait()
+        resp = main(HttpRequest("POST", "http://localhost/MyFunction",
+                                body=dict(body, email_to=f"user{i % recipients}@example.com")))
+        with lock:
+            statuses[resp.status_code] += 1
+
+    threads = [threading.Thread(target=request, args=(i,)) for i in range(requests)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return round(time.perf_counter() - t0, 3), dict(statuses)
+
+def _stamped_for_recipient(message: dict) -> bool:
+    """Whether the "Requested by" lines of a relayed message's workbook name its recipient only."""
+    msg = email.message_from_bytes(message["data"])
+    names = set()
+    for part in msg.walk():
+        if part.get_filename():
+            with zipfile.ZipFile(io.BytesIO(part.get_payload(decode=True))) as zf:
+                for name in zf.namelist():
+                    names.update(re.findall(rb"Requested by: (\S+) at", zf.read(name)))
+    return names == {msg["To"].encode("utf-8")}
+
+def _child(args):
+    from .fake_azure import HttpRequest, install as install_azure
+    from .fake_pytds import FakeBackend, install as install_pytds
+    from .fake_smtp import StubSmtpServer
+    from .synthetic import SyntheticLedgers
+
+    server = StubSmtpServer(message_latency=args.smtp_latency, keep_data=True).start()
+    os.environ.update(MODES[args.mode])
+    os.environ.update({"KEYVAULT_URL": "https://fake.vault.local/", "STARTUP_PREWARM": "0",
+                       "SMTP_STARTTLS": "0"})
+    install_azure(dict(SECRETS, **{"email-smtp-server": server.host, "email-smtp-port": str(server.port)}))
+    backend = FakeBackend(SyntheticLedgers(ledger_count=4, vouchers_per_month=args.vouchers),
+                          latency=args.db_latency)
+    install_pytds(backend)
+    import MyFunction
+
+    bursts = []
+    for _ in range(2 if args.mode == "window" else 1):
+        wall, statuses = _burst(MyFunction.main, HttpRequest, args.requests, args.recipients)
+        bursts.append({"wall_s": wall, "statuses": statuses})
+    time.sleep(0.2)  # let the transport finish logging out
+    per_recipient = Counter(rcpt for m in server.messages for rcpt in m["to"])
+    row = {
+        "mode": args.mode,
+        "bursts": bursts,
+        "db_round_trips": backend.stats.as_dict()["round_trips"],
+        "emails": len(server.messages),
+        "emails_per_recipient": sorted(set(per_recipient.values())),
+        "stamped_for_recipient": all(_stamped_for_recipient(m) for m in server.messages),
+    }
+    coalescer = MyFunction.get_coalescer()
+    if coalescer is not None:
+        row["coalescer"] = coalescer.stats()
+    server.stop()
+    return row
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--requests", type=int, default=12, help="concurrent requests per burst")
+    ap.add_argument("--recipients", type=int, default=8, help="distinct email_to addresses")
+    ap.add_argument("--vouchers", type=int, default=500, help="vouchers per ledger per month")
+    ap.add_argument("--db-latency", type=float, default=0.01, help="seconds per DB round trip")
+    ap.add_argument("--smtp-latency", type=float, default=0.01, help="seconds per email at the relay")
+    ap.add_argument("--mode", choices=list(MODES))
+    ap.add_argument("--child", action="store_true")
+    args = ap.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(_child(args)))
+        return
+
+    common = ["--requests", str(args.requests), "--recipients", str(args.recipients),
+              "--vouchers", str(args.vouchers), "--db-latency", str(args.db_latency),
+              "--smtp-latency", str(args.smtp_latency)]
+    results = []
+    for mode in MODES:
+        out = subprocess.run([sys.executable, "-m", "benchmarks.bench_coalescing", "--child",
+                              "--mode", mode, *common],
+                             check=True, capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
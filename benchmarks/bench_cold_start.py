@@ -0,0 +1,126 @@
+"""
+Cold-start benchmark for MyFunction against local Key Vault/DB stubs and the
+stub SMTP relay.
+
+Each measurement runs in a fresh interpreter:
+- import time of each heavy module on its own;
+- MyFunction import time and time to first (and second) response, with
+  STARTUP_PREWARM on and off, plus "blocking" (import followed by a full
+  warm-up before the first request, i.e. the old import-time behaviour).
+
+    python -m benchmarks.bench_cold_start --kv-latency 0.05 --db-latency 0.005
+"""
+import argparse
+import importlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+MODULES = [
+    "pandas", "xlsxwriter", "dateutil.relativedelta", "pyarrow",
+    "shared.parser", "shared.fetcher", "shared.excel_export", "shared.emailer",
+]
+
+SECRETS = {
+    "sql-connection-template": "Server=fake,1433;Database={db};User Id=bench;Password=bench",
+    "email-username": "reports@example.com",
+    "email-password": "secret",
+    "db-map-BENCH": "erp",
+}
+
+def _install_stubs(args):
+    from .fake_azure import install as install_azure
+    from .fake_pytds import FakeBackend, install as install_pytds
+    from .fake_smtp import StubSmtpServer
+    from .synthetic import SyntheticLedgers
+
+    relay = StubSmtpServer().start()
+    os.environ["SMTP_STARTTLS"] = "0"
+    secrets = dict(SECRETS, **{"email-smtp-server": relay.host, "email-smtp-port": str(relay.port)})
+    install_azure(secrets, kv_latency=args.kv_latency, credential_latency=args.credential_latency)
+    install_pytds(FakeBackend(SyntheticLedgers(ledger_count=2, vouchers_per_month=20), latency=args.db_latency))
+
+def _child_import(module):
+    t0 = time.perf_counter()
+    importlib.import_module(module)
+    return {"module": module, "seconds": round(time.perf_counter() - t0, 4)}
+
+def _child_first_response(args):
+    os.environ["KEYVAULT_URL"] = "https://fake.vault.local/"
+    os.environ["STARTUP_PREWARM"] = "0" if args.mode == "lazy" else "1"
+    _install_stubs(args)
+    from .fake_azure import HttpRequest
+
+    t0 = time.perf_counter()
+    import MyFunction
+    if args.mode == "blocking":
+        MyFunction._ready()
+    imported = time.perf_counter() - t0
+
+    if args.request_delay:
+        time.sleep(args.request_delay)
+    body = {
+        "sql_proc": "EXEC dbo.Fin_LedgerReport @StrLedgers='1001,1002', "
+                    "@FromDate='01-Jan-2024', @ToDate='31-Mar-2024'",
+        "email_to": "bench@example.com",
+        "db_code": "BENCH",
+    }
+    timings = []
+    for _ in range(2):
+        t1 = time.perf_counter()
+        resp = MyFunction.main(HttpRequest("POST", "http://localhost/MyFunction", body=body))
+        timings.append(round(time.perf_counter() - t1, 4))
+        assert resp.status_code == 200, resp.get_body()
+    return {
+        "mode": args.mode,
+        "import_s": round(imported, 4),
+        "first_response_s": timings[0],
+        "second_response_s": timings[1],
+        "time_to_first_response_s": round(imported + args.request_delay + timings[0], 4),
+    }
+
+def _run_child(extra):
+    cmd = [sys.executable, "-m", "benchmarks.bench_cold_start", *extra]
+    out = subprocess.run(cmd, check=True, capture_output=True, text=True,
+                         cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--kv-latency", type=float, default=0.05, help="seconds per Key Vault call")
+    ap.add_argument("--credential-latency", type=float, default=0.2, help="seconds to build the credential")
+    ap.add_argument("--db-latency", type=float, default=0.005, help="seconds per DB round trip")
+    ap.add_argument("--request-delay", type=float, default=0.0,
+                    help="seconds between import and the first request")
+    ap.add_argument("--child", choices=["import", "first-response"])
+    ap.add_argument("--module")
+    ap.add_argument("--mode", choices=["prewarm", "lazy", "blocking"], default="prewarm")
+    args = ap.parse_args(argv)
+
+    if args.child == "import":
+        # Fake pytds so shared.* imports without the real driver
+        from .fake_pytds import FakeBackend, install
+        from .synthetic import SyntheticLedgers
+        install(FakeBackend(SyntheticLedgers(ledger_count=1)))
+        print(json.dumps(_child_import(args.module)))
+        return
+    if args.child == "first-response":
+        print(json.dumps(_child_first_response(args)))
+        return
+
+    common = ["--kv-latency", str(args.kv_latency), "--credential-latency", str(args.credential_latency),
+              "--db-latency", str(args.db_latency), "--request-delay", str(args.request_delay)]
+    imports = []
+    for module in MODULES:
+        try:
+            imports.append(_run_child(["--child", "import", "--module", module]))
+        except subprocess.CalledProcessError:
+            imports.append({"module": module, "seconds": None, "error": "import failed"})
+    responses = [_run_child(["--child", "first-response", "--mode", mode, *common])
+                 for mode in ("blocking", "prewarm", "lazy")]
+    print(json.dumps({"imports": imports, "first_response": responses}, indent=2))
+
+if __name__ == "__main__":
+    main()
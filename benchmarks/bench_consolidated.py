@@ -0,0 +1,131 @@
+"""
+Consolidated report benchmark: group finance needs the same ledgers report
+for several companies, each in its own database (one fake backend per
+database, with its own latency), sent through MyFunction.main against local
+Key Vault/DB/SMTP stubs.
+
+Modes:
+- per_company: one request per db_code, one after the other (today's way);
+- consolidated: one request listing every database under `databases`.
+
+Reports wall time, Key Vault reads, DB round trips and the peak in-flight
+queries per database, and emails sent; checks that the consolidated
+workbook has a sheet per ledger plus the Summary sheet, and that the
+Summary's grand total closing balance matches the synthetic data.
+
+    python -m benchmarks.bench_consolidated --databases 4 --ledgers 5 --db-latency 0.01 --kv-latency 0.05
+"""
+import argparse
+import email
+import io
+import json
+import os
+import time
+from datetime import timedelta
+
+SECRETS = {
+    "sql-connection-template": "Server=fake,1433;Database={db};User Id=bench;Password=bench",
+    "email-username": "reports@example.com",
+    "email-password": "secret",
+}
+
+FROM_DATE, TO_DATE = "01-Jan-2024", "31-Mar-2024"
+
+def _attachment(message: dict) -> bytes:
+    """The report workbook attached to a relayed email."""
+    msg = email.message_from_bytes(message["data"])
+    for part in msg.walk():
+        if (part.get_filename() or "").endswith(".xlsx"):
+            return part.get_payload(decode=True)
+    raise ValueError("No .xlsx attachment in the message")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--databases", type=int, default=4)
+    ap.add_argument("--ledgers", type=int, default=5, help="ledgers per database")
+    ap.add_argument("--vouchers", type=int, default=200, help="vouchers per ledger per month")
+    ap.add_argument("--db-latency", type=float, default=0.01, help="seconds per DB round trip")
+    ap.add_argument("--kv-latency", type=float, default=0.05, help="seconds per Key Vault read")
+    args = ap.parse_args(argv)
+
+    from .fake_azure import HttpRequest, install as install_azure
+    from .fake_pytds import FakeBackend, install as install_pytds
+    from .fake_smtp import StubSmtpServer
+    from .synthetic import SyntheticLedgers
+
+    server = StubSmtpServer(keep_data=True).start()
+    os.environ.update({"KEYVAULT_URL": "https://fake.vault.local/", "STARTUP_PREWARM": "0",
+                       "SMTP_STARTTLS": "0", "COALESCE_REQUESTS": "0", "DELTA_REPORTS": "0",
+                       "METADATA_CACHE": "0", "SECRET_TTL_SECONDS": "0"})
+
+    codes = [f"CO{i + 1}" for i in range(args.databases)]
+    datasets = {code: SyntheticLedgers(ledger_count=args.ledgers, vouchers_per_month=args.vouchers,
+                                       seed=40 + i, company_name=f"Company {code} W.L.L.")
+                for i, code in enumerate(codes)}
+    backends = {f"erp_{code.lower()}": FakeBackend(datasets[code], latency=args.db_latency) for code in codes}
+    vault = install_azure(dict(SECRETS, **{"email-smtp-server": server.host, "email-smtp-port": str(server.port)},
+                               **{f"db-map-{code}": f"erp_{code.lower()}" for code in codes}),
+                          kv_latency=args.kv_latency)
+    install_pytds(backends)
+    import MyFunction
+
+    sql = (f"EXEC dbo.Fin_LedgerReport @StrLedgers='', "
+           f"@FromDate='{FROM_DATE}', @ToDate='{TO_DATE}'")
+    ledgers = {code: datasets[code].ledger_ids for code in codes}
+    requests = {
+        "per_company": [
+            {"sql_proc": sql.replace("@StrLedgers=''", f"@StrLedgers='{','.join(ledgers[code])}'"),
+             "email_to": "group.finance@example.com", "db_code": code}
+            for code in codes
+        ],
+        "consolidated": [
+            {"sql_proc": sql, "email_to": "group.finance@example.com",
+             "databases": [{"db_code": code, "ledgers": ledgers[code]} for code in codes]}
+        ],
+    }
+
+    MyFunction._ready()  # warm-up (imports, startup secrets) is not part of either run
+    runs = []
+    for mode, bodies in requests.items():
+        for backend in backends.values():
+            backend.max_in_flight = 0
+        trips = sum(b.stats.as_dict()["round_trips"] for b in backends.values())
+        kv_reads, sent = vault.calls, len(server.messages)
+        t0 = time.perf_counter()
+        statuses = [MyFunction.main(HttpRequest("POST", "http://localhost/MyFunction", body=body)).status_code
+                    for body in bodies]
+        wall = time.perf_counter() - t0
+        time.sleep(0.2)  # let the transport finish logging out
+        row = {
+            "mode": mode,
+            "requests": len(bodies),
+            "statuses": statuses,
+            "wall_s": round(wall, 3),
+            "db_round_trips": sum(b.stats.as_dict()["round_trips"] for b in backends.values()) - trips,
+            "peak_in_flight_per_db": max(b.max_in_flight for b in backends.values()),
+            "keyvault_reads": vault.calls - kv_reads,
+            "emails": len(server.messages) - sent,
+        }
+        runs.append(row)
+
+    # --- Check the consolidated workbook ---
+    import pandas as pd
+    workbook = pd.ExcelFile(io.BytesIO(_attachment(server.messages[-1])))
+    summary = pd.read_excel(workbook, "Summary", header=4)
+    grand = summary[summary["Company"] == "Grand Total"].iloc[0]
+    end = pd.Timestamp(TO_DATE).to_pydatetime() + timedelta(microseconds=1)
+    expected = sum(datasets[code].opening_balance(lid, end) for code in codes for lid in ledgers[code])
+    server.stop()
+
+    print(json.dumps({
+        "databases": args.databases,
+        "ledgers_per_database": args.ledgers,
+        "runs": runs,
+        "consolidated_sheets": len(workbook.sheet_names),
+        "expected_sheets": args.databases * args.ledgers + 1,
+        "grand_total_closing": round(float(grand["Closing Balance"]), 2),
+        "grand_total_matches_data": abs(float(grand["Closing Balance"]) - expected) < 0.01 * len(summary),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Concurrent-request benchmark for the DB scheduler: one large report and
+several small ones hit the same database at once, against a fake backend
+whose latency grows with the number of in-flight calls.
+
+Runs "unlimited" (scheduler cap above the total worker count and no backoff,
+i.e. every worker thread queries at once) and "scheduled" (the per-database cap with
+round-robin hand-out and latency backoff) and prints per-request wall time,
+peak server concurrency and the scheduler's queue/wait metrics.
+
+    python -m benchmarks.bench_db_scheduler --small 4 --cap 8 --contention 0.5
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from dateutil.relativedelta import relativedelta
+
+from .fake_pytds import FakeBackend, install
+from .synthetic import SyntheticLedgers
+
+CONN_STR = "Server=fake,1433;Database=erp;User Id=bench;Password=bench"
+SQL = ("EXEC dbo.Fin_LedgerReport @StrLedgers='1', "
+       "@FromDate='01-Jan-2024 00:00:00', @ToDate='31-Dec-2024 23:59:59'")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--large-ledgers", type=int, default=24)
+    ap.add_argument("--small", type=int, default=4, help="number of small concurrent requests")
+    ap.add_argument("--small-ledgers", type=int, default=2)
+    ap.add_argument("--months", type=int, default=6)
+    ap.add_argument("--workers", type=int, default=8, help="max_workers per request")
+    ap.add_argument("--cap", type=int, default=8, help="scheduler max in-flight per database")
+    ap.add_argument("--latency", type=float, default=0.01)
+    ap.add_argument("--contention", type=float, default=0.5)
+    args = ap.parse_args(argv)
+
+    total_workers = args.workers * (1 + args.small)
+    os.environ["DB_POOL_MAX_PER_KEY"] = str(total_workers)
+    data = SyntheticLedgers(ledger_count=args.large_ledgers, vouchers_per_month=20)
+    backend = FakeBackend(data, latency=args.latency, contention=args.contention)
+    install(backend)
+    from shared import scheduler
+    from shared.fetcher import fetch_per_ledger_chunked
+
+    from_date = datetime(2024, 1, 1)
+    to_date = from_date + relativedelta(months=args.months) - timedelta(seconds=1)
+    requests = [("large", data.ledger_ids)] + [
+        (f"small-{i}", data.ledger_ids[i * args.small_ledgers:(i + 1) * args.small_ledgers])
+        for i in range(args.small)
+    ]
+
+    results = []
+    for run, cap, ratio in (("unlimited", total_workers, float("inf")), ("scheduled", args.cap, 2.0)):
+        scheduler._scheduler = scheduler.DbScheduler(max_in_flight=cap, backoff_ratio=ratio, cooldown=0.2)
+        backend.max_in_flight = 0
+        timings = {}
+
+        def one(name, ledgers):
+            t0 = time.perf_counter()
+            fetch_per_ledger_chunked(CONN_STR, SQL, ledgers, from_date, to_date,
+                                     max_workers=args.workers, job_id=name)
+            timings[name] = round(time.perf_counter() - t0, 3)
+
+        threads = [threading.Thread(target=one, args=r) for r in requests]
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+            time.sleep(0.01)  # large request first, small ones just behind it
+        for t in threads:
+            t.join()
+        results.append({
+            "run": run,
+            "wall_s": round(time.perf_counter() - t0, 3),
+            "requests_s": timings,
+            "server_peak_in_flight": backend.max_in_flight,
+            "scheduler": scheduler.get_scheduler().stats(),
+        })
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Delta report benchmark: one recipient's daily year-to-date report over a
+run of days, against the fake driver, sent either in full every day or as
+a delta after the first day (shared.watermarks: fetch from the stored
+watermark, opening carried from the last report's closing).
+
+Reports, per mode, the rows fetched, DB round trips, fetch and export time
+and report bytes over the run, and checks that every day's delta closing
+balances equal the full report's. A final day with a backdated posting
+(the proc's opening no longer matches the carried closing) must fall back
+to the full period and still match.
+
+    python -m benchmarks.bench_delta_reports --ledgers 10 --vouchers 400 --days 20 --format xlsx
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from .fake_pytds import FakeBackend, install
+from .synthetic import SyntheticLedgers
+
+CONN_STR = "Server=fake,1433;Database=erp;User Id=bench;Password=bench"
+RECIPIENT = "finance@example.com"
+
+def _proc(ledgers, from_date, to_date):
+    return (f"EXEC dbo.Fin_LedgerReport @StrLedgers='{','.join(ledgers)}', "
+            f"@FromDate='{from_date:%d-%b-%Y}', @ToDate='{to_date:%d-%b-%Y}'")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--ledgers", type=int, default=10)
+    ap.add_argument("--vouchers", type=int, default=400, help="vouchers per ledger per month")
+    ap.add_argument("--days", type=int, default=20, help="daily reports after the first")
+    ap.add_argument("--start", default="2024-06-30", help="to-date of the first report (from 1 Jan)")
+    ap.add_argument("--format", default="xlsx")
+    ap.add_argument("--db-latency", type=float, default=0.0, help="seconds per DB round trip")
+    args = ap.parse_args(argv)
+
+    data = SyntheticLedgers(ledger_count=args.ledgers, vouchers_per_month=args.vouchers)
+    backend = FakeBackend(data, latency=args.db_latency)
+    install(backend)
+    from shared.exporters import get_exporter
+    from shared.fetcher import fetch_per_ledger_chunked
+    from shared.watermarks import SqliteWatermarkStore, carry_forward, plan_delta, watermark_key
+
+    ledgers = data.ledger_ids
+    metadata = {lid: dict(m) for lid, m in data.ledgers.items()}
+    first_to = datetime.strptime(args.start, "%Y-%m-%d")
+    from_date = datetime(first_to.year, 1, 1)
+    exporter = get_exporter(args.format)
+    workdir = tempfile.mkdtemp(prefix="bench_delta_")
+    store = SqliteWatermarkStore(os.path.join(workdir, "watermarks.sqlite3"))
+    report_key = watermark_key(_proc(ledgers, from_date, first_to), "QAR")
+
+    def fetch(start, to_date):
+        before = backend.stats.as_dict()
+        t0 = time.perf_counter()
+        frames = fetch_per_ledger_chunked(CONN_STR, _proc(ledgers, start, to_date), ledgers, start, to_date,
+                                          max_workers=4, db_code="BENCH")
+        after = backend.stats.as_dict()
+        return frames, time.perf_counter() - t0, after["rows"] - before["rows"], after["round_trips"] - before["round_trips"]
+
+    def export(frames, start, to_date, name):
+        path = os.path.join(workdir, f"{name}{exporter.suffix}")
+        t0 = time.perf_counter()
+        summaries = exporter.export(frames, path, metadata, RECIPIENT, start, to_date, "QAR", datetime.now())
+        return summaries, time.perf_counter() - t0, os.path.getsize(path)
+
+    totals = {mode: {"rows_fetched": 0, "round_trips": 0, "fetch_s": 0.0, "export_s": 0.0, "bytes": 0}
+              for mode in ("full", "delta")}
+
+    def add(mode, fetch_s, rows, trips, export_s, size):
+        t = totals[mode]
+        t["rows_fetched"] += rows
+        t["round_trips"] += trips
+        t["fetch_s"] += fetch_s
+        t["export_s"] += export_s
+        t["bytes"] += size
+
+    # Day 0: the full report that sets the watermarks
+    frames, *_ = fetch(from_date, first_to)
+    summaries, *_ = export(frames, from_date, first_to, "day0")
+    store.record(RECIPIENT, "BENCH", report_key, from_date, first_to, summaries)
+
+    mismatches, deltas_sent = [], 0
+    for day in range(1, args.days + 1):
+        to_date = first_to + timedelta(days=day)
+
+        frames, fetch_s, rows, trips = fetch(from_date, to_date)
+        full, export_s, size = export(frames, from_date, to_date, f"full{day}")
+        add("full", fetch_s, rows, trips, export_s, size)
+
+        plan = plan_delta(store, RECIPIENT, "BENCH", report_key, ledgers, from_date, to_date)
+        frames, fetch_s, rows, trips = fetch(plan.start, to_date)
+        frames = carry_forward(frames, plan)
+        if frames is None:
+            mismatches.append({"day": day, "error": "unexpected fallback"})
+            continue
+        delta, export_s, size = export(frames, plan.start, to_date, f"delta{day}")
+        add("delta", fetch_s, rows, trips, export_s, size)
+        deltas_sent += 1
+        store.record(RECIPIENT, "BENCH", report_key, from_date, to_date, delta)
+
+        for lid in ledgers:
+            if abs(delta[lid][4] - full[lid][4]) > 0.005:
+                mismatches.append({"day": day, "ledger": lid, "full": full[lid][4], "delta": delta[lid][4]})
+
+    # A backdated posting before the last watermark: the carried closing is stale
+    to_date = first_to + timedelta(days=args.days + 1)
+    backdated = ledgers[0]
+    posted_on = first_to - timedelta(days=3)
+    balance = data.opening_balance
+    data.opening_balance = lambda lid, when: round(
+        balance(lid, when) + (250.0 if lid == backdated and when > posted_on else 0.0), 2)
+    plan = plan_delta(store, RECIPIENT, "BENCH", report_key, ledgers, from_date, to_date)
+    frames, *_ = fetch(plan.start, to_date)
+    fell_back = carry_forward(frames, plan) is None
+    frames, *_ = fetch(from_date, to_date)
+    refetched, *_ = export(frames, from_date, to_date, "backdated")
+    expected = balance(backdated, to_date + timedelta(seconds=1)) + 250.0
+    data.opening_balance = balance
+
+    for t in totals.values():
+        t["fetch_s"] = round(t["fetch_s"], 3)
+        t["export_s"] = round(t["export_s"], 3)
+
+    print(json.dumps({
+        "ledgers": args.ledgers,
+        "days": args.days,
+        "format": exporter.name,
+        "full": totals["full"],
+        "delta": totals["delta"],
+        "deltas_sent": deltas_sent,
+        "rows_ratio": round(totals["delta"]["rows_fetched"] / max(1, totals["full"]["rows_fetched"]), 4),
+        "closing_mismatches": mismatches,
+        "backdated": {
+            "fell_back_to_full": fell_back,
+            "closing_ok": abs(refetched[backdated][4] - round(expected, 2)) <= 0.01,
+        },
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Email delivery benchmark: the old in-memory attachment (f.read() into an
+EmailMessage, then send_message) vs. send_email_with_excel's streamed
+encoding, against the local stub relay.
+
+For a synthetic multi-ledger workbook it reports peak Python heap while
+sending (tracemalloc), bytes on the wire, encode time and the parts sent
+under several delivery policies (as-is, zipped, split by ledger under a
+small max message size). Every received message is parsed back and its
+attachment checked against what was sent. The split run includes
+re-exporting the part workbooks, which tracemalloc slows down considerably.
+
+    python -m benchmarks.bench_email_delivery --ledgers 8 --vouchers 2000 --max-mb 2
+"""
+import argparse
+import email
+import email.policy
+import io
+import json
+import os
+import smtplib
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+from shared.delivery import DeliveryPolicy
+from shared.emailer import send_email_with_excel
+from shared.excel_export import save_to_excel
+from shared.smtp_transport import SmtpTransport
+from .fake_smtp import StubSmtpServer
+from .synthetic import SyntheticLedgers
+
+def legacy_send(server, path):
+    """send_email_with_excel's message build and send before streaming."""
+    msg = EmailMessage()
+    msg["Subject"] = "Ledger Report"
+    msg["From"] = "reports@example.com"
+    msg["To"] = "bench@example.com"
+    msg.set_content("Please find attached the requested ledger report.")
+    with open(path, "rb") as f:
+        msg.add_attachment(f.read(), maintype="application",
+                           subtype="vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                           filename=os.path.basename(path))
+    with smtplib.SMTP(server.host, server.port) as smtp:
+        smtp.login("reports@example.com", "secret")
+        smtp.send_message(msg, from_addr="reports@example.com", to_addrs=["bench@example.com"])
+
+def _attachments(server):
+    """(filename, payload bytes) of every message the relay received."""
+    out = []
+    for m in server.messages:
+        parsed = email.message_from_bytes(m["data"], policy=email.policy.default)
+        for part in parsed.iter_attachments():
+            out.append((part.get_filename(), part.get_payload(decode=True)))
+    return out
+
+def _sheets(xlsx_bytes):
+    with zipfile.ZipFile(io.BytesIO(xlsx_bytes)) as zf:
+        return sum(1 for n in zf.namelist() if n.startswith("xl/worksheets/sheet"))
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--ledgers", type=int, default=8)
+    ap.add_argument("--vouchers", type=int, default=2000, help="vouchers per ledger per month")
+    ap.add_argument("--months", type=int, default=3)
+    ap.add_argument("--max-mb", type=float, default=2.0, help="max message size for the split run")
+    args = ap.parse_args(argv)
+
+    data = SyntheticLedgers(ledger_count=args.ledgers, vouchers_per_month=args.vouchers)
+    from_date = datetime(2024, 1, 1)
+    to_date = from_date + relativedelta(months=args.months) - timedelta(seconds=1)
+    data_dict = {lid: pd.DataFrame(data.rows(lid, from_date, to_date)) for lid in data.ledger_ids}
+    common = dict(metadata=data.ledgers, requested_by="bench@example.com", from_date=from_date,
+                  to_date=to_date, currency="QAR", requested_at=None)
+    workdir = tempfile.mkdtemp()
+
+    def write_workbook(ledgers, path):
+        save_to_excel({lid: data_dict[lid] for lid in ledgers}, path, **common)
+
+    source = os.path.join(workdir, "report.xlsx")
+    write_workbook(data.ledger_ids, source)
+    with open(source, "rb") as f:
+        original = f.read()
+
+    runs = [
+        ("legacy_in_memory", None),
+        ("streamed", DeliveryPolicy(max_message_bytes=10 ** 9, zip="never")),
+        ("streamed_zip", DeliveryPolicy(max_message_bytes=10 ** 9, zip="always", zip_level=6)),
+        ("streamed_split", DeliveryPolicy(max_message_bytes=int(args.max_mb * 1024 * 1024))),
+    ]
+    results = []
+    for run, policy in runs:
+        server = StubSmtpServer(keep_data=True).start()
+        path = os.path.join(workdir, f"{run}.xlsx")
+        with open(path, "wb") as f:
+            f.write(original)
+        row = {"run": run, "workbook_bytes": len(original)}
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        if policy is None:
+            legacy_send(server, path)
+            row["bytes_sent"] = server.messages[0]["bytes"]
+        else:
+            transport = SmtpTransport(server.host, server.port, "reports@example.com", "secret",
+                                      max_connections=1, starttls=False)
+            stats = send_email_with_excel(
+                recipient="bench@example.com", file_path=path, metadata=data.ledgers,
+                requested_ledgers=data.ledger_ids, smtp_server=server.host, smtp_port=server.port,
+                smtp_username="reports@example.com", smtp_password="secret",
+                cleanup=True, transport=transport, policy=policy,
+                write_workbook=write_workbook, ledger_weights={k: len(v) for k, v in data_dict.items()},
+            )
+            transport.close()
+            row.update(stats)
+        row["seconds"] = round(time.perf_counter() - t0, 3)
+        row["peak_heap_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+        tracemalloc.stop()
+
+        received = _attachments(server)
+        workbooks = []
+        for filename, payload in received:
+            if filename.endswith(".zip"):
+                with zipfile.ZipFile(io.BytesIO(payload)) as zf:
+                    payload = zf.read(zf.namelist()[0])
+            workbooks.append(payload)
+        row["emails"] = len(server.messages)
+        row["largest_message_bytes"] = max(m["bytes"] for m in server.messages)
+        row["sheets_received"] = sum(_sheets(w) for w in workbooks)
+        row["attachment_intact"] = (workbooks == [original]) if run != "streamed_split" \
+            else row["sheets_received"] == args.ledgers
+        row["encode_seconds"] = round(row.get("encode_seconds", 0.0), 4)
+        results.append(row)
+        server.stop()
+        if os.path.exists(path):
+            os.remove(path)
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
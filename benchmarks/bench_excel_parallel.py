@@ -0,0 +1,67 @@
+"""
+Benchmark of save_to_excel's two-stage export: sheets prepared inline vs.
+across the process pool, for a multi-ledger report. The pool is warmed up
+before timing (it is process-wide and reused across requests in the host).
+
+Prints wall time per run and whether the parallel workbook is byte-identical
+to the inline one (every zip member except docProps/core.xml; the header and
+footer clock is frozen).
+
+    python -m benchmarks.bench_excel_parallel --ledgers 16 --vouchers 2000 --workers 4
+"""
+import argparse
+import io
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from unittest import mock
+
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+from shared import excel_export
+from shared.excel_export import get_prepare_pool, save_to_excel
+from .bench_excel_transform import _FrozenDatetime, _members
+from .synthetic import SyntheticLedgers
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--ledgers", type=int, default=16)
+    ap.add_argument("--vouchers", type=int, default=2000, help="vouchers per ledger per month")
+    ap.add_argument("--months", type=int, default=6)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = ap.parse_args(argv)
+
+    os.environ["EXCEL_PREPARE_WORKERS"] = str(args.workers)
+    data = SyntheticLedgers(ledger_count=args.ledgers, vouchers_per_month=args.vouchers)
+    from_date = datetime(2024, 1, 1)
+    to_date = from_date + relativedelta(months=args.months) - timedelta(seconds=1)
+    data_dict = {lid: pd.DataFrame(data.rows(lid, from_date, to_date)) for lid in data.ledger_ids}
+    common = dict(data_dict=data_dict, metadata=data.ledgers, requested_by="bench@example.com",
+                  from_date=from_date, to_date=to_date, currency="QAR", requested_at=None)
+
+    # Spawn the workers (and their pandas import) outside the timed runs
+    list(get_prepare_pool().map(abs, range(args.workers)))
+
+    results, buffers = [], {}
+    for run, workers in (("inline", 1), ("process_pool", args.workers)):
+        buf = io.BytesIO()
+        with mock.patch.object(excel_export, "datetime", _FrozenDatetime):
+            t0 = time.perf_counter()
+            save_to_excel(out_path=buf, prepare_workers=workers, **common)
+            elapsed = time.perf_counter() - t0
+        buffers[run] = buf
+        results.append({"run": run, "workers": workers, "seconds": round(elapsed, 3)})
+
+    print(json.dumps({
+        "ledgers": args.ledgers,
+        "rows": sum(len(df) for df in data_dict.values()),
+        "cpu_count": os.cpu_count(),
+        "runs": results,
+        "speedup": round(results[0]["seconds"] / results[1]["seconds"], 2),
+        "byte_equivalent": _members(buffers["inline"]) == _members(buffers["process_pool"]),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
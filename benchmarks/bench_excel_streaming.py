@@ -0,0 +1,103 @@
+"""
+Memory/throughput benchmark: save_to_excel on a full data_dict vs.
+save_to_excel_streaming fed row batches straight from the synthetic generator.
+
+    python -m benchmarks.bench_excel_streaming --ledgers 2 --vouchers 20000 --months 12
+
+--compare re-reads both workbooks (needs openpyxl) and checks every cell,
+merged range and column width matches, ignoring the request timestamps.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+from shared.excel_export import save_to_excel, save_to_excel_streaming
+from .synthetic import SyntheticLedgers
+
+def _batches(data, lid, from_date, to_date, batch_rows):
+    batch = []
+    for row in data.iter_rows(lid, from_date, to_date):
+        batch.append(row)
+        if len(batch) >= batch_rows:
+            yield pd.DataFrame(batch)
+            batch = []
+    if batch:
+        yield pd.DataFrame(batch)
+
+def _measure(fn):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+def _workbook_cells(path):
+    from openpyxl import load_workbook
+    wb = load_workbook(path)
+    out = {}
+    for ws in wb.worksheets:
+        # Floats are rounded: streaming sums totals batch by batch, so the last
+        # bits can differ from one pandas sum over the whole column
+        cells = {
+            c.coordinate: round(c.value, 6) if isinstance(c.value, float) else c.value
+            for row in ws.iter_rows(min_row=6) for c in row if c.value not in (None, "")
+        }
+        widths = {k: round(d.width, 2) for k, d in ws.column_dimensions.items() if d.width}
+        out[ws.title] = (cells, sorted(str(r) for r in ws.merged_cells.ranges), widths)
+    return out
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--ledgers", type=int, default=2)
+    ap.add_argument("--months", type=int, default=12)
+    ap.add_argument("--vouchers", type=int, default=20000, help="vouchers per ledger per month")
+    ap.add_argument("--batch-rows", type=int, default=50000)
+    ap.add_argument("--compare", action="store_true")
+    args = ap.parse_args(argv)
+
+    data = SyntheticLedgers(ledger_count=args.ledgers, vouchers_per_month=args.vouchers)
+    from_date = datetime(2024, 1, 1)
+    to_date = from_date + relativedelta(months=args.months) - timedelta(seconds=1)
+    common = dict(metadata=data.ledgers, requested_by="bench@example.com", from_date=from_date,
+                  to_date=to_date, currency="QAR", requested_at=datetime.now())
+
+    tmp = tempfile.mkdtemp(prefix="bench_xlsx_")
+    legacy_path = os.path.join(tmp, "legacy.xlsx")
+    stream_path = os.path.join(tmp, "streaming.xlsx")
+
+    def legacy():
+        data_dict = {lid: pd.DataFrame(data.rows(lid, from_date, to_date)) for lid in data.ledger_ids}
+        save_to_excel(data_dict, legacy_path, **common)
+
+    def streaming():
+        save_to_excel_streaming(
+            ((lid, _batches(data, lid, from_date, to_date, args.batch_rows)) for lid in data.ledger_ids),
+            stream_path, **common
+        )
+
+    legacy_s, legacy_peak = _measure(legacy)
+    stream_s, stream_peak = _measure(streaming)
+    rows = sum(1 for lid in data.ledger_ids for _ in data.iter_rows(lid, from_date, to_date))
+
+    result = {
+        "rows": rows,
+        "legacy": {"seconds": round(legacy_s, 3), "peak_mb": round(legacy_peak / 2**20, 1),
+                   "bytes": os.path.getsize(legacy_path)},
+        "streaming": {"seconds": round(stream_s, 3), "peak_mb": round(stream_peak / 2**20, 1),
+                      "bytes": os.path.getsize(stream_path)},
+    }
+    if args.compare:
+        result["same_cells"] = _workbook_cells(legacy_path) == _workbook_cells(stream_path)
+    print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    main()
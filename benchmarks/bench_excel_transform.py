@@ -0,0 +1,144 @@
+"""
+Benchmark of save_to_excel's per-ledger post-processing: the previous
+implementation (regex passes repeated per step, Sl.No in a Python loop,
+map(len) widths) vs. the single-pass _prepare_sheet, on synthetic ledgers of
+10k/100k/1M rows.
+
+For every size it times the transform alone and the full workbook write, and
+checks that both implementations produce byte-identical workbooks (every zip
+member except docProps/core.xml, which carries the creation time; the clock
+used for header/footer timestamps is frozen).
+
+    python -m benchmarks.bench_excel_transform --sizes 10000,100000,1000000
+"""
+import argparse
+import io
+import json
+import time
+import zipfile
+from datetime import datetime, timedelta
+from unittest import mock
+
+import pandas as pd
+
+from shared import excel_export
+from shared.excel_export import (
+    _LEDGER_RE, _OPENING_RE, _CLOSING_RE, _SLNO_RE, _add_formats, _prepare_sheet,
+    _safe_sum, _unique_sheet_name, _write_footer, _write_sheet_header, _write_summary,
+    filter_opening_closing, save_to_excel,
+)
+from .synthetic import SyntheticLedgers
+
+class _FrozenDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2024, 6, 30, 12, 0, 0)
+
+def legacy_prepare(df):
+    """save_to_excel's per-ledger transform before it was vectorised."""
+    out = df.copy()
+    if "Voucher Date" in out.columns:
+        out["Voucher Date"] = pd.to_datetime(out["Voucher Date"], errors="coerce").dt.strftime("%d-%m-%Y")
+    out = filter_opening_closing(out, _OPENING_RE, _CLOSING_RE)
+    out = out.drop(columns=[c for c in out.columns if _LEDGER_RE.match(c)], errors='ignore')
+    out = out.drop(columns=[c for c in out.columns if _SLNO_RE.match(c)], errors='ignore')
+
+    sl_no = [''] * len(out)
+    is_valid = ~(out['Voucher Number'].str.contains(_OPENING_RE, na=False)) & ~(out['Voucher Number'].str.contains(_CLOSING_RE, na=False))
+    seq = 1
+    for idx, v in enumerate(is_valid):
+        if v:
+            sl_no[idx] = seq
+            seq += 1
+    out.insert(0, 'Sl.No', sl_no)
+
+    widths = []
+    for col in out.columns:
+        col_data = out[col].astype(str)
+        widths.append(min(max(col_data.map(len).max(), len(col)) + 2, 40))
+
+    opening_row = out.loc[out['Voucher Number'].str.contains(_OPENING_RE, na=False)]
+    closing_row = out.loc[out['Voucher Number'].str.contains(_CLOSING_RE, na=False)]
+    middle_rows = out[
+        ~(out['Voucher Number'].str.contains(_OPENING_RE, na=False)) &
+        ~(out['Voucher Number'].str.contains(_CLOSING_RE, na=False))
+    ]
+    opening_bal = _safe_sum(opening_row['Debit']) if 'Debit' in opening_row else 0.0
+    total_debit = _safe_sum(middle_rows['Debit']) if 'Debit' in middle_rows else 0.0
+    total_credit = _safe_sum(middle_rows['Credit']) if 'Credit' in middle_rows else 0.0
+    closing_bal = _safe_sum(closing_row['Debit']) if 'Debit' in closing_row else opening_bal
+    return out, widths, [opening_bal, total_debit, total_credit, len(middle_rows), closing_bal]
+
+def legacy_save_to_excel(data_dict, out_path, metadata, requested_by, from_date, to_date, currency, requested_at):
+    with pd.ExcelWriter(out_path, engine='xlsxwriter') as writer:
+        fmts = _add_formats(writer.book)
+        used_sheet_names = set()
+        for lid, df in data_dict.items():
+            m = metadata[lid]
+            sheet_name = _unique_sheet_name(m, used_sheet_names)
+            out, widths, summary_values = legacy_prepare(df)
+            out.to_excel(writer, sheet_name=sheet_name, startrow=7, index=False, header=False)
+            ws = writer.sheets[sheet_name]
+            _write_sheet_header(ws, out.columns.values, fmts, m, lid, sheet_name, requested_by, from_date, to_date, currency)
+            for i, width in enumerate(widths):
+                ws.set_column(i, i, width)
+            _write_summary(ws, 8 + len(out), len(out.columns), summary_values, fmts)
+            _write_footer(ws, requested_by)
+
+def _members(buf):
+    with zipfile.ZipFile(buf) as zf:
+        return {n: zf.read(n) for n in zf.namelist() if n != "docProps/core.xml"}
+
+def _frame(data, rows):
+    """One synthetic ledger with roughly `rows` rows over 12 months."""
+    lid = data.ledger_ids[0]
+    from_date = datetime(2024, 1, 1)
+    to_date = datetime(2025, 1, 1) - timedelta(seconds=1)
+    return lid, pd.DataFrame(data.rows(lid, from_date, to_date)), from_date, to_date
+
+def _best_of(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--sizes", default="10000,100000,1000000")
+    ap.add_argument("--repeat", type=int, default=3, help="transform timings are best of N")
+    ap.add_argument("--no-workbook", action="store_true", help="skip the full workbook write/compare")
+    args = ap.parse_args(argv)
+
+    results = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        data = SyntheticLedgers(ledger_count=1, vouchers_per_month=max(1, size // 12))
+        lid, df, from_date, to_date = _frame(data, size)
+        row = {
+            "rows": len(df),
+            "legacy_transform_s": round(_best_of(lambda: legacy_prepare(df), args.repeat), 4),
+            "vectorized_transform_s": round(_best_of(lambda: _prepare_sheet(df), args.repeat), 4),
+        }
+        row["transform_speedup"] = round(row["legacy_transform_s"] / row["vectorized_transform_s"], 2)
+
+        if not args.no_workbook:
+            common = dict(metadata=data.ledgers, requested_by="bench@example.com", from_date=from_date,
+                          to_date=to_date, currency="QAR", requested_at=None)
+            legacy_buf, new_buf = io.BytesIO(), io.BytesIO()
+            with mock.patch.object(excel_export, "datetime", _FrozenDatetime):
+                t0 = time.perf_counter()
+                legacy_save_to_excel({lid: df}, legacy_buf, **common)
+                row["legacy_workbook_s"] = round(time.perf_counter() - t0, 3)
+                t0 = time.perf_counter()
+                save_to_excel({lid: df}, new_buf, **common)
+                row["vectorized_workbook_s"] = round(time.perf_counter() - t0, 3)
+            row["byte_equivalent"] = _members(legacy_buf) == _members(new_buf)
+        results.append(row)
+        print(json.dumps(row), flush=True)
+
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
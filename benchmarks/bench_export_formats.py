@@ -0,0 +1,101 @@
+"""
+Report format benchmark: the same fetched ledgers exported by each
+exporter in shared.exporters (xlsx, xlsx streaming, xlsx-lite, csv.gz,
+parquet). Prepare runs inline (EXCEL_PREPARE_WORKERS=1) so the runs
+compare the writers.
+
+Prints export time and file size per format (with --heap, peak Python
+heap from tracemalloc instead, which slows every run down), and checks that every format reports the same per-ledger summary
+block (opening, debit, credit, entries, closing) and row count as the
+formatted workbook.
+
+    python -m benchmarks.bench_export_formats --ledgers 8 --vouchers 2000 --months 6
+"""
+import argparse
+import gzip
+import io
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from datetime import datetime, timedelta
+
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+from .synthetic import SyntheticLedgers
+
+def _zip_rows(path):
+    """Rows per ledger file in a csv.gz / parquet report, from the files themselves."""
+    rows = {}
+    with zipfile.ZipFile(path) as zf:
+        manifest = json.loads(zf.read("manifest.json"))
+        for entry in manifest["ledgers"]:
+            raw = zf.read(entry["file"])
+            if entry["file"].endswith(".csv.gz"):
+                df = pd.read_csv(io.BytesIO(gzip.decompress(raw)))
+            else:
+                df = pd.read_parquet(io.BytesIO(raw))
+            rows[entry["ledger_id"]] = len(df)
+    return rows, {e["ledger_id"]: list(e["summary"].values()) for e in manifest["ledgers"]}
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--ledgers", type=int, default=8)
+    ap.add_argument("--vouchers", type=int, default=2000, help="vouchers per ledger per month")
+    ap.add_argument("--months", type=int, default=6)
+    ap.add_argument("--heap", action="store_true", help="measure peak heap (timings are not comparable)")
+    args = ap.parse_args(argv)
+
+    os.environ["EXCEL_PREPARE_WORKERS"] = "1"
+    from shared.excel_export import _prepare_sheet
+    from shared.exporters import get_exporter
+
+    data = SyntheticLedgers(ledger_count=args.ledgers, vouchers_per_month=args.vouchers)
+    from_date = datetime(2024, 1, 1)
+    to_date = from_date + relativedelta(months=args.months) - timedelta(seconds=1)
+    data_dict = {lid: pd.DataFrame(data.rows(lid, from_date, to_date)) for lid in data.ledger_ids}
+    expected = {lid: _prepare_sheet(df) for lid, df in data_dict.items()}
+    workdir = tempfile.mkdtemp(prefix="bench-formats-")
+
+    runs = []
+    for label, fmt, streaming in (("xlsx", "xlsx", False), ("xlsx_streaming", "xlsx", True),
+                                  ("xlsx-lite", "xlsx-lite", False), ("csv.gz", "csv.gz", False),
+                                  ("parquet", "parquet", False)):
+        exporter = get_exporter(fmt, streaming=streaming)
+        path = os.path.join(workdir, f"report_{label}{exporter.suffix}")
+        if args.heap:
+            tracemalloc.start()
+        t0 = time.perf_counter()
+        summaries = exporter.export(dict(data_dict), path, data.ledgers, "bench@example.com",
+                                    from_date, to_date, "QAR", datetime.now())
+        seconds = time.perf_counter() - t0
+        row = {"format": label, "seconds": round(seconds, 3), "bytes": os.path.getsize(path)}
+        if args.heap:
+            row["peak_heap_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+            tracemalloc.stop()
+        if summaries:
+            row["summaries_match"] = all(
+                [round(v, 2) for v in summaries[lid]] == [round(v, 2) for v in expected[lid][2]]
+                for lid in data_dict
+            )
+        if path.endswith(".zip"):
+            rows, manifest_summaries = _zip_rows(path)
+            row["rows_match"] = rows == {lid: len(expected[lid][0]) for lid in data_dict}
+            row["manifest_matches"] = manifest_summaries == {lid: expected[lid][2] for lid in data_dict}
+        runs.append(row)
+
+    base = runs[0]
+    for row in runs:
+        row["speedup_vs_xlsx"] = round(base["seconds"] / row["seconds"], 1)
+        row["size_vs_xlsx"] = round(row["bytes"] / base["bytes"], 2)
+    print(json.dumps({
+        "ledgers": args.ledgers,
+        "rows": sum(len(df) for df in data_dict.values()),
+        "runs": runs,
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
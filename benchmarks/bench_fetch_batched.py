@@ -0,0 +1,57 @@
+"""
+Round-trip benchmark for fetch_per_ledger_chunked: one call per ledger vs.
+grouped @StrLedgers calls, against the fake pytds backend.
+
+    python -m benchmarks.bench_fetch_batched --ledgers 40 --months 24 --latency 0.005
+"""
+import argparse
+import json
+import time
+from datetime import datetime
+
+from dateutil.relativedelta import relativedelta
+
+from .fake_pytds import FakeBackend, install
+from .synthetic import SyntheticLedgers
+
+CONN_STR = "Server=fake,1433;Database=erp;User Id=bench;Password=bench"
+SQL = ("EXEC dbo.Fin_LedgerReport @StrLedgers='1', "
+       "@FromDate='01-Jan-2024 00:00:00', @ToDate='31-Dec-2024 23:59:59'")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--ledgers", type=int, default=40)
+    ap.add_argument("--months", type=int, default=24)
+    ap.add_argument("--vouchers", type=int, default=50, help="vouchers per ledger per month")
+    ap.add_argument("--latency", type=float, default=0.005, help="seconds per round trip")
+    ap.add_argument("--group-sizes", default="1,10,40")
+    args = ap.parse_args(argv)
+
+    data = SyntheticLedgers(ledger_count=args.ledgers, vouchers_per_month=args.vouchers)
+    backend = FakeBackend(data, latency=args.latency)
+    install(backend)
+    from shared.fetcher import fetch_per_ledger_chunked
+
+    from_date = datetime(2023, 1, 1)
+    to_date = from_date + relativedelta(months=args.months) - relativedelta(seconds=1)
+    keys = {lid: m["code"] for lid, m in data.ledgers.items()}
+
+    results = []
+    for size in (int(s) for s in args.group_sizes.split(",")):
+        backend.stats = type(backend.stats)()
+        t0 = time.perf_counter()
+        out = fetch_per_ledger_chunked(
+            CONN_STR, SQL, data.ledger_ids, from_date, to_date,
+            max_workers=8, ledgers_per_call=size, ledger_keys=keys,
+        )
+        elapsed = time.perf_counter() - t0
+        results.append({
+            "ledgers_per_call": size,
+            "seconds": round(elapsed, 4),
+            "rows": sum(len(df) for df in out.values()),
+            **backend.stats.as_dict(),
+        })
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
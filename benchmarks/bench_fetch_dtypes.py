@@ -0,0 +1,94 @@
+"""
+Fetch-time dtype normalization benchmark: fetch_per_ledger_chunked with
+inferred dtypes (Decimal amounts and string columns as objects) vs. with
+LEDGER_SCHEMA (datetime64, float64 amounts, categorical repeated strings).
+
+The fake driver returns Debit/Credit as Decimal, like pytds for money
+columns. For each run it reports fetch time, peak Python heap during the
+fetch (tracemalloc), the per-column memory_report of the ledger frame and
+the time of the Excel sheet preparation (_prepare_sheet: summary sums,
+date formatting, column widths) on the fetched frame. Both workbooks are
+compared cell by cell (floats rounded to 6 digits).
+
+    python -m benchmarks.bench_fetch_dtypes --vouchers 20000 --months 12
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from unittest import mock
+
+from dateutil.relativedelta import relativedelta
+
+from .bench_excel_streaming import _workbook_cells
+from .bench_excel_transform import _FrozenDatetime
+from .fake_pytds import FakeBackend, install
+from .synthetic import SyntheticLedgers
+
+CONN_STR = "Server=fake,1433;Database=erp;User Id=bench;Password=bench"
+SQL = ("EXEC dbo.Fin_LedgerReport @StrLedgers='1', "
+       "@FromDate='01-Jan-2024 00:00:00', @ToDate='31-Dec-2024 23:59:59'")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--months", type=int, default=12)
+    ap.add_argument("--vouchers", type=int, default=20000, help="vouchers per month")
+    ap.add_argument("--batch-size", type=int, default=5000)
+    args = ap.parse_args(argv)
+
+    data = SyntheticLedgers(ledger_count=1, vouchers_per_month=args.vouchers)
+    install(FakeBackend(data, decimal_money=True))
+    from shared import excel_export
+    from shared.excel_export import _prepare_sheet, save_to_excel
+    from shared.fetcher import LEDGER_SCHEMA, fetch_per_ledger_chunked, memory_report
+
+    lid = data.ledger_ids[0]
+    from_date = datetime(2024, 1, 1)
+    to_date = from_date + relativedelta(months=args.months) - timedelta(seconds=1)
+    workdir = tempfile.mkdtemp()
+
+    results, workbooks = [], {}
+    for run, schema in (("inferred", None), ("schema", LEDGER_SCHEMA)):
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        df = fetch_per_ledger_chunked(CONN_STR, SQL, [lid], from_date, to_date, max_workers=1,
+                                      fetch_batch_size=args.batch_size, schema=schema)[lid]
+        fetch_s = time.perf_counter() - t0
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        t0 = time.perf_counter()
+        _, _, summary = _prepare_sheet(df)
+        prepare_s = time.perf_counter() - t0
+
+        path = os.path.join(workdir, f"{run}.xlsx")
+        with mock.patch.object(excel_export, "datetime", _FrozenDatetime):
+            save_to_excel({lid: df}, path, data.ledgers, "bench@example.com", from_date, to_date,
+                          "QAR", requested_at=None, prepare_workers=1)
+        workbooks[run] = _workbook_cells(path)
+
+        report = memory_report(df)
+        results.append({
+            "run": run,
+            "rows": report["rows"],
+            "fetch_s": round(fetch_s, 3),
+            "fetch_peak_heap_mb": round(peak / 2 ** 20, 1),
+            "frame_mb": round(report["bytes"] / 2 ** 20, 2),
+            "columns": {col: f'{c["dtype"]} {c["bytes"] / 2 ** 20:.2f} MB' for col, c in report["columns"].items()},
+            "prepare_sheet_s": round(prepare_s, 3),
+            "summary": [round(v, 2) for v in summary],
+        })
+
+    inferred, typed = workbooks["inferred"], workbooks["schema"]
+    print(json.dumps({
+        "runs": results,
+        "frame_memory_ratio": round(results[0]["frame_mb"] / results[1]["frame_mb"], 2),
+        "cells_equal": all(inferred[s][0] == typed[s][0] for s in inferred),
+        "column_widths_equal": all(inferred[s][2] == typed[s][2] for s in inferred),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
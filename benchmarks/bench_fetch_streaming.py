@@ -0,0 +1,90 @@
+"""
+Memory/throughput benchmark: legacy fetchall + per-chunk pd.concat (dict rows)
+vs. the streaming fetchmany path in fetch_per_ledger_chunked.
+
+    python -m benchmarks.bench_fetch_streaming --vouchers 20000 --months 12
+"""
+import argparse
+import json
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+from .fake_pytds import FakeBackend, install
+from .synthetic import SyntheticLedgers
+
+CONN_STR = "Server=fake,1433;Database=erp;User Id=bench;Password=bench"
+SQL = ("EXEC dbo.Fin_LedgerReport @StrLedgers='1', "
+       "@FromDate='01-Jan-2024 00:00:00', @ToDate='31-Dec-2024 23:59:59'")
+
+def legacy_fetch(pytds, lid, from_date, to_date):
+    """The pre-streaming loop: dict rows, fetchall, pd.concat per month."""
+    from shared.fetcher import _build_chunk_sql
+    df_all = pd.DataFrame()
+    with pytds.connect(as_dict=True) as conn:
+        cursor = conn.cursor()
+        current = from_date
+        while current <= to_date:
+            chunk_end = min(current + relativedelta(months=1) - timedelta(seconds=1), to_date)
+            cursor.execute(_build_chunk_sql(SQL, lid, current, chunk_end))
+            all_sets = []
+            while True:
+                if cursor.description:
+                    all_sets.append(cursor.fetchall() or [])
+                if not cursor.nextset():
+                    break
+            for result_set in all_sets:
+                if result_set:
+                    df_all = pd.concat([df_all, pd.DataFrame(result_set)], ignore_index=True)
+                    break
+            current = chunk_end + timedelta(seconds=1)
+    return df_all
+
+def _measure(fn):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    df = fn()
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return df, elapsed, peak
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--months", type=int, default=12)
+    ap.add_argument("--vouchers", type=int, default=20000, help="vouchers per month")
+    ap.add_argument("--batch-size", type=int, default=5000)
+    args = ap.parse_args(argv)
+
+    data = SyntheticLedgers(ledger_count=1, vouchers_per_month=args.vouchers)
+    backend = FakeBackend(data)
+    pytds = install(backend)
+    from shared.fetcher import fetch_per_ledger_chunked
+
+    lid = data.ledger_ids[0]
+    from_date = datetime(2024, 1, 1)
+    to_date = from_date + relativedelta(months=args.months) - timedelta(seconds=1)
+    # Warm the generator's per-month cache-free path once so both runs pay the same
+    data.rows(lid, from_date, from_date)
+
+    legacy_df, legacy_s, legacy_peak = _measure(lambda: legacy_fetch(pytds, lid, from_date, to_date))
+    stream_out, stream_s, stream_peak = _measure(lambda: fetch_per_ledger_chunked(
+        CONN_STR, SQL, [lid], from_date, to_date, max_workers=1, fetch_batch_size=args.batch_size
+    ))
+    stream_df = stream_out[lid]
+
+    rows = len(stream_df)
+    print(json.dumps({
+        "rows": rows,
+        "legacy": {"seconds": round(legacy_s, 3), "peak_mb": round(legacy_peak / 2**20, 1),
+                   "rows_per_s": round(len(legacy_df) / legacy_s)},
+        "streaming": {"seconds": round(stream_s, 3), "peak_mb": round(stream_peak / 2**20, 1),
+                      "rows_per_s": round(rows / stream_s)},
+        "same_values": bool(legacy_df.equals(stream_df)),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
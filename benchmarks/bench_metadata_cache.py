@@ -0,0 +1,77 @@
+"""
+Ledger metadata cache benchmark: a stream of report requests, each asking
+get_ledger_metadata for a few ledgers of one database (some ids unknown),
+from concurrent threads, against the fake driver with per-query latency.
+
+Modes:
+- none: every request runs the metadata join (the old behaviour);
+- on_demand: MetadataCache, only ids not cached are queried;
+- prefetch: MetadataCache(prefetch=True), the ledger master is loaded once.
+
+Reports wall time, metadata queries (DB round trips), the cache's stats
+and whether every mode returned the same metadata for every request.
+
+    python -m benchmarks.bench_metadata_cache --requests 400 --ledgers 300 --db-latency 0.01
+"""
+import argparse
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .fake_pytds import FakeBackend, install
+from .synthetic import SyntheticLedgers
+
+CONN_STR = "Server=fake,1433;Database=erp;User Id=bench;Password=bench"
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--requests", type=int, default=400)
+    ap.add_argument("--ledgers", type=int, default=300, help="ledgers in the master")
+    ap.add_argument("--per-request", type=int, default=5, help="ledgers per request")
+    ap.add_argument("--hot", type=int, default=40, help="ledgers most requests draw from")
+    ap.add_argument("--unknown", type=float, default=0.05, help="share of requested ids that do not exist")
+    ap.add_argument("--db-latency", type=float, default=0.01, help="seconds per DB round trip")
+    ap.add_argument("--threads", type=int, default=8)
+    args = ap.parse_args(argv)
+
+    data = SyntheticLedgers(ledger_count=args.ledgers, vouchers_per_month=1)
+    backend = FakeBackend(data, latency=args.db_latency)
+    install(backend)
+    from shared.metadata import get_ledger_metadata
+    from shared.metadata_cache import MetadataCache
+
+    rnd = random.Random(7)
+    ids = data.ledger_ids
+    requests = []
+    for _ in range(args.requests):
+        pool = ids[:args.hot] if rnd.random() < 0.8 else ids
+        picked = rnd.sample(pool, args.per_request)
+        picked = [str(900000 + rnd.randrange(50)) if rnd.random() < args.unknown else lid for lid in picked]
+        requests.append(list(dict.fromkeys(picked)))
+
+    runs, answers = [], {}
+    for mode in ("none", "on_demand", "prefetch"):
+        cache = None if mode == "none" else MetadataCache(prefetch=mode == "prefetch")
+        before = backend.stats.as_dict()["round_trips"]
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as ex:
+            answers[mode] = list(ex.map(
+                lambda lids: get_ledger_metadata(CONN_STR, lids, cache=cache, db_code="BENCH"), requests))
+        row = {
+            "mode": mode,
+            "wall_s": round(time.perf_counter() - t0, 3),
+            "metadata_queries": backend.stats.as_dict()["round_trips"] - before,
+        }
+        if cache is not None:
+            row["cache"] = cache.stats()
+        runs.append(row)
+
+    print(json.dumps({
+        "requests": args.requests,
+        "runs": runs,
+        "same_metadata": answers["none"] == answers["on_demand"] == answers["prefetch"],
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
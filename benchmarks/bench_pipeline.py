@@ -0,0 +1,101 @@
+"""
+End-to-end fetch + export benchmark: the whole fetch followed by the export
+("sequential") vs. sheets written as ledgers arrive in request order
+("pipelined", with at most --ahead ledgers fetched ahead of the export),
+against the fake backend.
+
+Each mode runs in a fresh interpreter so peak RSS (ru_maxrss) is comparable.
+Prints wall time, peak RSS and the workbook size per mode; --streaming writes
+through save_to_excel_streaming instead of save_to_excel.
+
+    python -m benchmarks.bench_pipeline --ledgers 16 --workers 4 --ahead 4 --vouchers 5000 --latency 0.3 --streaming
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from dateutil.relativedelta import relativedelta
+
+CONN_STR = "Server=fake,1433;Database=erp;User Id=bench;Password=bench"
+SQL = ("EXEC dbo.Fin_LedgerReport @StrLedgers='1', "
+       "@FromDate='01-Jan-2024 00:00:00', @ToDate='31-Dec-2024 23:59:59'")
+
+def _child(args):
+    from .fake_pytds import FakeBackend, install
+    from .synthetic import SyntheticLedgers
+
+    os.environ["EXCEL_PREPARE_WORKERS"] = "1"
+    data = SyntheticLedgers(ledger_count=args.ledgers, vouchers_per_month=args.vouchers)
+    install(FakeBackend(data, latency=args.latency))
+    from shared.excel_export import iter_frame_batches, save_to_excel, save_to_excel_streaming
+    from shared.fetcher import fetch_per_ledger_chunked, iter_per_ledger_chunked
+
+    from_date = datetime(2024, 1, 1)
+    to_date = from_date + relativedelta(months=args.months) - timedelta(seconds=1)
+    fetch_args = dict(conn_str=CONN_STR, sql_template=SQL, ledgers=data.ledger_ids,
+                      from_date=from_date, to_date=to_date, max_workers=args.workers)
+    out_path = os.path.join(tempfile.mkdtemp(), "bench_pipeline.xlsx")
+    export_args = dict(out_path=out_path, metadata=data.ledgers, requested_by="bench@example.com",
+                       from_date=from_date, to_date=to_date, currency="QAR", requested_at=None)
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    t0 = time.perf_counter()
+    if args.mode == "pipelined":
+        ledgers = iter_per_ledger_chunked(ordered=True, max_ahead=args.ahead, **fetch_args)
+    else:
+        ledgers = fetch_per_ledger_chunked(**fetch_args).items()
+    fetched = time.perf_counter() - t0
+    if args.streaming:
+        save_to_excel_streaming(((lid, iter_frame_batches(df)) for lid, df in ledgers), **export_args)
+    else:
+        save_to_excel(ledgers, **export_args)
+    elapsed = time.perf_counter() - t0
+
+    size = os.path.getsize(out_path)
+    os.remove(out_path)
+    return {
+        "mode": args.mode,
+        "exporter": "streaming" if args.streaming else "xlsxwriter",
+        "wall_s": round(elapsed, 3),
+        "fetch_before_export_s": round(fetched, 3) if args.mode == "sequential" else None,
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "peak_rss_over_baseline_mb": round(
+            (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline_kb) / 1024, 1),
+        "xlsx_bytes": size,
+    }
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--ledgers", type=int, default=12)
+    ap.add_argument("--vouchers", type=int, default=3000, help="vouchers per ledger per month")
+    ap.add_argument("--months", type=int, default=6)
+    ap.add_argument("--workers", type=int, default=8)
+    ap.add_argument("--latency", type=float, default=0.02, help="seconds per round trip")
+    ap.add_argument("--ahead", type=int, default=8, help="pipelined: max ledgers fetched ahead of the export")
+    ap.add_argument("--streaming", action="store_true")
+    ap.add_argument("--mode", choices=["sequential", "pipelined"])
+    args = ap.parse_args(argv)
+
+    if args.mode:
+        print(json.dumps(_child(args)))
+        return
+
+    common = ["--ledgers", str(args.ledgers), "--vouchers", str(args.vouchers),
+              "--months", str(args.months), "--workers", str(args.workers),
+              "--latency", str(args.latency), "--ahead", str(args.ahead)] + (["--streaming"] if args.streaming else [])
+    results = []
+    for mode in ("sequential", "pipelined"):
+        out = subprocess.run([sys.executable, "-m", "benchmarks.bench_pipeline", "--mode", mode, *common],
+                             check=True, capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Email delivery benchmark against the local stub relay: a burst of report
+emails sent the old way (new SMTP connection + AUTH per email, immediate
+retry) vs. through SmtpTransport (persistent sessions, send queue, backoff
+with jitter).
+
+The relay charges a handshake (connect + AUTH latency) per session and
+throttles new sessions above --connect-rate per second with 421, like a
+hosted relay under a burst.
+
+    python -m benchmarks.bench_smtp --emails 40 --senders 8 --connect-rate 5
+"""
+import argparse
+import json
+import smtplib
+import threading
+import time
+from email.message import EmailMessage
+
+from shared.smtp_transport import SmtpTransport
+from .fake_smtp import StubSmtpServer
+
+def _message(i, attachment):
+    msg = EmailMessage()
+    msg["Subject"] = f"Ledger Report {i}"
+    msg["From"] = "reports@example.com"
+    msg["To"] = f"user{i}@example.com"
+    msg.set_content("Please find attached the requested ledger report.")
+    msg.add_attachment(attachment, maintype="application",
+                       subtype="vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                       filename=f"report_{i}.xlsx")
+    return msg
+
+def legacy_send(server, msg, retries):
+    """send_email_with_excel's delivery loop before the transport existed."""
+    for attempt in range(1, retries + 1):
+        try:
+            with smtplib.SMTP(server.host, server.port) as smtp:
+                smtp.login("reports@example.com", "secret")
+                smtp.send_message(msg, from_addr="reports@example.com", to_addrs=[msg["To"]])
+            return
+        except Exception:
+            if attempt == retries:
+                raise
+
+def _burst(send, emails, senders, attachment):
+    work = list(range(emails))
+    lock = threading.Lock()
+    outcome = {"delivered": 0, "failed": 0}
+
+    def sender():
+        while True:
+            with lock:
+                if not work:
+                    return
+                i = work.pop()
+            try:
+                send(_message(i, attachment))
+                key = "delivered"
+            except Exception:
+                key = "failed"
+            with lock:
+                outcome[key] += 1
+
+    threads = [threading.Thread(target=sender) for _ in range(senders)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return round(time.perf_counter() - t0, 3), outcome
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--emails", type=int, default=40)
+    ap.add_argument("--senders", type=int, default=8, help="concurrent requests sending")
+    ap.add_argument("--attachment-kb", type=int, default=256)
+    ap.add_argument("--connect-latency", type=float, default=0.05)
+    ap.add_argument("--auth-latency", type=float, default=0.05)
+    ap.add_argument("--message-latency", type=float, default=0.01)
+    ap.add_argument("--connect-rate", type=float, default=5, help="new sessions/s before 421 (0 = unlimited)")
+    ap.add_argument("--connections", type=int, default=2, help="SmtpTransport sessions")
+    ap.add_argument("--retries", type=int, default=3)
+    args = ap.parse_args(argv)
+
+    attachment = bytes(range(256)) * (args.attachment_kb * 4)
+    results = []
+    for mode in ("per_message", "transport"):
+        server = StubSmtpServer(connect_latency=args.connect_latency, auth_latency=args.auth_latency,
+                                message_latency=args.message_latency,
+                                connect_rate=args.connect_rate).start()
+        transport = None
+        try:
+            if mode == "per_message":
+                send = lambda msg: legacy_send(server, msg, args.retries)
+            else:
+                transport = SmtpTransport(server.host, server.port, "reports@example.com", "secret",
+                                          max_connections=args.connections, retries=args.retries,
+                                          backoff_base=0.2, starttls=False)
+                send = lambda msg: transport.send(msg, "reports@example.com", [msg["To"]])
+            wall, outcome = _burst(send, args.emails, args.senders, attachment)
+            row = {"mode": mode, "wall_s": wall, **outcome, "relay": server.stats()}
+            if transport is not None:
+                transport.close()
+                row["transport"] = transport.stats()
+            results.append(row)
+        finally:
+            server.stop()
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+SQL template binding benchmark: fetch_per_ledger_chunked with the chunk SQL
+rebuilt as text per chunk (rpc=False: three regex rewrites, literal dates)
+vs. the template compiled once and each chunk run as a parameterized RPC
+call (rpc=True: cursor.callproc with bound @StrLedgers/@FromDate/@ToDate).
+
+Reports the per-chunk preparation cost of both paths, then a full fetch of
+`--ledgers` ledgers over `--months` months against the fake driver: wall
+time, round trips, and distinct statements the server saw (with ad-hoc
+text every chunk is a new batch to compile and cache; over RPC it is one
+proc). Both fetches must return the same frames.
+
+    python -m benchmarks.bench_sql_binding --ledgers 40 --months 24 --db-latency 0.002
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+
+from dateutil.relativedelta import relativedelta
+
+from .fake_pytds import FakeBackend, install
+from .synthetic import SyntheticLedgers
+
+CONN_STR = "Server=fake,1433;Database=erp;User Id=bench;Password=bench"
+SQL = ("EXEC dbo.Fin_LedgerReport @StrLedgers='1', @FromDate='01-Jan-2024 00:00:00', "
+       "@ToDate='31-Dec-2024 23:59:59', @CompanyID=1, @Currency='QAR'")
+
+def _per_chunk_us(fn, n):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return round((time.perf_counter() - t0) / n * 1e6, 2)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--ledgers", type=int, default=40)
+    ap.add_argument("--months", type=int, default=24)
+    ap.add_argument("--vouchers", type=int, default=50, help="vouchers per ledger per month")
+    ap.add_argument("--db-latency", type=float, default=0.002, help="seconds per DB round trip")
+    ap.add_argument("--workers", type=int, default=8)
+    args = ap.parse_args(argv)
+
+    data = SyntheticLedgers(ledger_count=args.ledgers, vouchers_per_month=args.vouchers)
+    backend = FakeBackend(data, latency=args.db_latency)
+    install(backend)
+    from shared.fetcher import _build_chunk_sql, fetch_per_ledger_chunked
+    from shared.parser import compile_proc
+
+    start, end = datetime(2024, 1, 1), datetime(2024, 1, 31, 23, 59, 59)
+    call = compile_proc(SQL)
+    prepare = {
+        "text_us": _per_chunk_us(lambda: _build_chunk_sql(SQL, "1001", start, end), 20000),
+        "rpc_bind_us": _per_chunk_us(lambda: call.bind(StrLedgers="1001", FromDate=start, ToDate=end), 20000),
+    }
+
+    from_date = datetime(2024, 1, 1)
+    to_date = from_date + relativedelta(months=args.months) - timedelta(seconds=1)
+    runs, frames = [], {}
+    for name, rpc in (("text", False), ("rpc", True)):
+        before = backend.stats.as_dict()
+        backend.stats.statements.clear()
+        t0 = time.perf_counter()
+        frames[name] = fetch_per_ledger_chunked(CONN_STR, SQL, data.ledger_ids, from_date, to_date,
+                                                max_workers=args.workers, rpc=rpc)
+        wall = time.perf_counter() - t0
+        after = backend.stats.as_dict()
+        runs.append({
+            "run": name,
+            "wall_s": round(wall, 3),
+            "round_trips": after["round_trips"] - before["round_trips"],
+            "rows": after["rows"] - before["rows"],
+            "distinct_statements": after["distinct_statements"],
+        })
+
+    print(json.dumps({
+        "per_chunk_prepare": prepare,
+        "runs": runs,
+        "frames_equal": all(frames["text"][lid].equals(frames["rpc"][lid]) for lid in data.ledger_ids),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
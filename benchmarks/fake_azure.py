@@ -0,0 +1,104 @@
+"""
+In-process stand-ins for the Azure SDK modules MyFunction imports
+(azure.functions, azure.identity, azure.keyvault.secrets).
+
+Call `install(secrets)` before importing MyFunction. Key Vault lookups sleep
+`kv_latency` seconds and raise a 404-style error for unknown names, like
+azure.core's ResourceNotFoundError.
+"""
+import sys
+import threading
+import time
+import types
+from typing import Dict, Optional
+
+class ResourceNotFoundError(Exception):
+    status_code = 404
+
+class KeyVaultSecret:
+    def __init__(self, name, value):
+        self.name = name
+        self.value = value
+
+class FakeKeyVault:
+    def __init__(self, secrets: Dict[str, str], latency: float = 0.0):
+        self.secrets = dict(secrets)
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def get_secret(self, name):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if name not in self.secrets:
+            raise ResourceNotFoundError(f"Secret not found: {name}")
+        return KeyVaultSecret(name, self.secrets[name])
+
+class HttpResponse:
+    def __init__(self, body=None, status_code=200, headers=None, mimetype=None, charset=None):
+        self._body = body.encode("utf-8") if isinstance(body, str) else (body or b"")
+        self.status_code = status_code
+        self.headers = dict(headers or {})
+        self.mimetype = mimetype
+
+    def get_body(self) -> bytes:
+        return self._body
+
+class HttpRequest:
+    def __init__(self, method, url, body=None, params=None, route_params=None, headers=None):
+        self.method = method.upper()
+        self.url = url
+        self._body = body
+        self.params = dict(params or {})
+        self.route_params = dict(route_params or {})
+        self.headers = dict(headers or {})
+
+    def get_json(self):
+        if self._body is None:
+            raise ValueError("HTTP request does not contain valid JSON data")
+        return self._body
+
+def install(secrets: Dict[str, str], kv_latency: float = 0.0, credential_latency: float = 0.0,
+            vault: Optional[FakeKeyVault] = None) -> FakeKeyVault:
+    """Register the fake azure modules in sys.modules and return the fake vault."""
+    vault = vault or FakeKeyVault(secrets, latency=kv_latency)
+
+    azure = types.ModuleType("azure")
+    azure.__path__ = []
+    functions = types.ModuleType("azure.functions")
+    functions.HttpRequest = HttpRequest
+    functions.HttpResponse = HttpResponse
+
+    identity = types.ModuleType("azure.identity")
+
+    class DefaultAzureCredential:
+        def __init__(self, **kw):
+            if credential_latency:
+                time.sleep(credential_latency)
+
+    identity.DefaultAzureCredential = DefaultAzureCredential
+
+    keyvault = types.ModuleType("azure.keyvault")
+    keyvault.__path__ = []
+    kv_secrets = types.ModuleType("azure.keyvault.secrets")
+
+    class SecretClient:
+        def __init__(self, vault_url=None, credential=None, **kw):
+            self.vault_url = vault_url
+
+        def get_secret(self, name, **kw):
+            return vault.get_secret(name)
+
+    kv_secrets.SecretClient = SecretClient
+    azure.functions, azure.identity, azure.keyvault = functions, identity, keyvault
+    keyvault.secrets = kv_secrets
+    sys.modules.update({
+        "azure": azure,
+        "azure.functions": functions,
+        "azure.identity": identity,
+        "azure.keyvault": keyvault,
+        "azure.keyvault.secrets": kv_secrets,
+    })
+    return vault
@@ -0,0 +1,243 @@
+"""
+In-process stand-in for the parts of `pytds` the shared modules use.
+
+Call `install(backend)` before importing anything from `shared`; it registers
+this module as `pytds` in sys.modules (`install({name: backend, ...})` serves
+several databases). The cursor understands the ledger proc
+call (@StrLedgers/@FromDate/@ToDate), the ledger metadata query (by id or
+for the whole master), and `SELECT 1` health checks, and counts
+connects/round trips for the benchmarks.
+"""
+import itertools
+import re
+import sys
+import threading
+import time
+import types
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Optional, Union
+
+from .synthetic import SyntheticLedgers, COLUMNS
+
+_DATE_FORMATS = ("%d-%b-%Y %H:%M:%S", "%d-%b-%Y", "%Y-%m-%d", "%Y-%m-%d %H:%M:%S")
+
+def _param(sql: str, name: str) -> Optional[str]:
+    m = re.search(rf"@{name}\s*=\s*'([^']*)'", sql, re.IGNORECASE)
+    return m.group(1) if m else None
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    raise ValueError(f"Unparseable date {value!r}")
+
+class Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.round_trips = 0
+        self.rows = 0
+        self.statements = set()  # distinct batch texts / procs: plans an ad-hoc plan cache would hold
+
+    def add(self, **kw):
+        with self._lock:
+            for k, v in kw.items():
+                setattr(self, k, getattr(self, k) + v)
+
+    def statement(self, text):
+        with self._lock:
+            self.statements.add(text)
+
+    def as_dict(self):
+        return {"connects": self.connects, "round_trips": self.round_trips, "rows": self.rows,
+                "distinct_statements": len(self.statements)}
+
+class FakeBackend:
+    """
+    Args:
+        data: Synthetic ledger generator serving the proc and metadata queries.
+        latency: Seconds slept per round trip (execute/callproc).
+        connect_latency: Seconds slept per connect (login + TLS handshake).
+        contention: Extra latency per concurrent round trip, as a fraction of
+            `latency` (0.5 = each other in-flight call adds 50%), to model a
+            server that slows down under load.
+        leading_empty_set: Emit an empty result set before the data set, as
+            procs without SET NOCOUNT ON tend to.
+        decimal_money: Return Debit/Credit as Decimal, as pytds does for
+            money/decimal columns.
+    """
+
+    def __init__(self, data: SyntheticLedgers, latency: float = 0.0,
+                 connect_latency: float = 0.0, leading_empty_set: bool = True,
+                 contention: float = 0.0, decimal_money: bool = False):
+        self.data = data
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.contention = contention
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._flight_lock = threading.Lock()
+        self.leading_empty_set = leading_empty_set
+        self.decimal_money = decimal_money
+        self.stats = Stats()
+
+    def round_trip(self):
+        """Count one round trip and sleep for its (load-dependent) latency."""
+        self.stats.add(round_trips=1)
+        if not self.latency:
+            return
+        with self._flight_lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            delay = self.latency * (1 + self.contention * (self.in_flight - 1))
+        try:
+            time.sleep(delay)
+        finally:
+            with self._flight_lock:
+                self.in_flight -= 1
+
+    def proc_rows(self, ledgers, from_date, to_date):
+        """Lazy row iterator for a proc call, so fetchmany never materialises the set."""
+        for lid in ledgers:
+            for row in self.data.iter_rows(lid.strip(), from_date, to_date):
+                self.stats.add(rows=1)
+                if self.decimal_money:
+                    row["Debit"] = Decimal(f"{row['Debit']:.2f}")
+                    row["Credit"] = Decimal(f"{row['Credit']:.2f}")
+                yield row
+
+    def metadata_rows(self, ids):
+        rows = []
+        for lid in ids:
+            m = self.data.ledgers.get(str(lid))
+            if m:
+                rows.append((int(lid), m["code"], m["name"], m["company_name"], m["company_address"]))
+        return rows
+
+class FakeCursor:
+    def __init__(self, conn):
+        self._conn = conn
+        self._sets = []
+        self._rows = iter(())
+        self.description = None
+
+    def _load(self, sets):
+        self._sets = list(sets)
+        self._next()
+
+    def _next(self):
+        if not self._sets:
+            self.description, self._rows = None, iter(())
+            return False
+        cols, rows = self._sets.pop(0)
+        self.description = [(c, None, None, None, None, None, None) for c in cols] if cols else None
+        self._rows = iter(rows)
+        return True
+
+    def _run_proc(self, ledgers, from_date, to_date):
+        backend = self._conn.backend
+        rows = backend.proc_rows(ledgers.split(","), _parse_date(from_date), _parse_date(to_date))
+        if not self._conn.as_dict:
+            rows = (tuple(r[c] for c in COLUMNS) for r in rows)
+        sets = [(None, [])] if backend.leading_empty_set else []
+        sets.append((COLUMNS, rows))
+        self._load(sets)
+
+    def execute(self, sql, params=None):
+        backend = self._conn.backend
+        backend.round_trip()
+        backend.stats.statement(sql)
+        if "Fin_AccountLedger_Dtl" in sql:
+            cols = ["LedgerID", "code", "name", "company_name", "company_address"]
+            if params is not None:
+                ids = params
+            elif "WHERE" in sql.upper():
+                ids = re.findall(r"\d+", sql.upper().split("WHERE", 1)[-1])
+            else:
+                ids = list(backend.data.ledgers)  # whole ledger master
+            rows = backend.metadata_rows(ids)
+            if self._conn.as_dict:
+                rows = [dict(zip(cols, r)) for r in rows]
+            self._load([(cols, rows)])
+        elif re.match(r"\s*SELECT\s+1\b", sql, re.IGNORECASE):
+            self._load([(["one"], [{"one": 1} if self._conn.as_dict else (1,)])])
+        else:
+            self._run_proc(_param(sql, "StrLedgers") or "", _param(sql, "FromDate"), _param(sql, "ToDate"))
+
+    def callproc(self, procname, parameters=None):
+        backend = self._conn.backend
+        backend.round_trip()
+        backend.stats.statement(f"RPC {procname}")
+        params = {str(k).lstrip("@").lower(): v for k, v in (parameters or {}).items()}
+        self._run_proc(str(params.get("strledgers", "")), params.get("fromdate"), params.get("todate"))
+        return parameters
+
+    def fetchall(self):
+        return list(self._rows)
+
+    def fetchmany(self, size=None):
+        return list(itertools.islice(self._rows, size or 1))
+
+    def fetchone(self):
+        rows = self.fetchmany(1)
+        return rows[0] if rows else None
+
+    def nextset(self):
+        return True if self._next() else None
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    def __init__(self, backend, as_dict=False):
+        self.backend = backend
+        self.as_dict = as_dict
+        self.closed = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def install(backend: Union[FakeBackend, Dict[str, FakeBackend]]) -> types.ModuleType:
+    """
+    Register a fake `pytds` module bound to `backend` and return it. A dict
+    {database name: FakeBackend} serves several databases, each connect
+    going to the backend of its `database` (unknown names fail to connect).
+    """
+    mod = types.ModuleType("pytds")
+
+    def connect(server=None, database=None, user=None, password=None, port=None, as_dict=False, **kw):
+        target = backend
+        if isinstance(backend, dict):
+            target = backend.get(database)
+            if target is None:
+                raise mod.Error(f"Cannot open database \"{database}\" requested by the login.")
+        target.stats.add(connects=1)
+        if target.connect_latency:
+            time.sleep(target.connect_latency)
+        return FakeConnection(target, as_dict=as_dict)
+
+    mod.connect = connect
+    mod.Error = Exception
+    mod.backend = backend
+    sys.modules["pytds"] = mod
+    return mod
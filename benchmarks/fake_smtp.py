@@ -0,0 +1,171 @@
+"""
+Local SMTP relay stub for the email benchmarks, in the spirit of an aiosmtpd
+controller: `StubSmtpServer(...).start()` listens on 127.0.0.1 in a background
+thread and `stop()` shuts it down. No external dependencies.
+
+Speaks enough SMTP for smtplib: EHLO/HELO, AUTH PLAIN/LOGIN, MAIL, RCPT,
+DATA, RSET, NOOP, QUIT. STARTTLS is not offered, so clients must run with
+starttls disabled. Latencies model the relay's handshake and per-message cost,
+and `connect_rate` models a relay that throttles new sessions with 421.
+"""
+import base64
+import socketserver
+import threading
+import time
+from collections import deque
+from typing import List, Optional
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: "_Server"
+
+    def _reply(self, line: str):
+        self.wfile.write((line + "\r\n").encode())
+
+    def _readline(self) -> Optional[str]:
+        line = self.rfile.readline()
+        return line.decode(errors="replace").rstrip("\r\n") if line else None
+
+    def handle(self):
+        stub = self.server.stub
+        if not stub._admit():
+            self._reply("421 4.7.0 Too many connections, try again later")
+            return
+        stub._count("sessions")
+        time.sleep(stub.connect_latency)
+        self._reply("220 stub.local ESMTP ready")
+        messages = 0
+        mail_from, rcpts = None, []
+        while True:
+            line = self._readline()
+            if line is None:
+                return
+            cmd = line.split(" ", 1)[0].upper()
+            arg = line[len(cmd):].strip()
+            if cmd == "EHLO":
+                self.wfile.write(
+                    b"250-stub.local\r\n250-AUTH PLAIN LOGIN\r\n250-8BITMIME\r\n"
+                    + f"250 SIZE {stub.max_message_bytes}\r\n".encode()
+                )
+            elif cmd == "HELO":
+                self._reply("250 stub.local")
+            elif cmd == "AUTH":
+                parts = arg.split()
+                if parts and parts[0].upper() == "LOGIN":
+                    self._reply("334 VXNlcm5hbWU6")
+                    self._readline()
+                    self._reply("334 UGFzc3dvcmQ6")
+                    self._readline()
+                elif len(parts) > 1:
+                    base64.b64decode(parts[1])
+                time.sleep(stub.auth_latency)
+                stub._count("auths")
+                self._reply("235 2.7.0 Authentication successful")
+            elif cmd == "MAIL":
+                mail_from, rcpts = arg, []
+                self._reply("250 OK")
+            elif cmd == "RCPT":
+                rcpts.append(arg)
+                self._reply("250 OK")
+            elif cmd == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                size, lines = 0, []
+                while True:
+                    data = self.rfile.readline()
+                    if not data or data in (b".\r\n", b".\n"):
+                        break
+                    size += len(data)
+                    if stub.keep_data:
+                        lines.append(data[1:] if data.startswith(b"..") else data)
+                time.sleep(stub.message_latency)
+                if size > stub.max_message_bytes:
+                    self._reply("552 5.3.4 Message size exceeds fixed maximum message size")
+                    continue
+                messages += 1
+                if stub.messages_per_session and messages > stub.messages_per_session:
+                    stub._count("throttled")
+                    self._reply("421 4.7.0 Message limit for this session reached")
+                    return
+                stub._record(mail_from, rcpts, size, b"".join(lines) if stub.keep_data else None)
+                self._reply("250 OK queued")
+            elif cmd == "RSET":
+                mail_from, rcpts = None, []
+                self._reply("250 OK")
+            elif cmd == "NOOP":
+                self._reply("250 OK")
+            elif cmd == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class StubSmtpServer:
+    """
+    Args:
+        connect_latency: Seconds before the 220 greeting (TCP + TLS handshake).
+        auth_latency: Seconds per AUTH.
+        message_latency: Seconds per accepted DATA.
+        connect_rate: New sessions allowed per second; beyond that the
+            greeting is 421 (0 = unlimited).
+        messages_per_session: Messages accepted per session before a 421
+            and disconnect (0 = unlimited).
+        max_message_bytes: Advertised SIZE; larger messages get 552.
+        keep_data: Keep each message's DATA payload in `messages`.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, connect_latency: float = 0.0,
+                 auth_latency: float = 0.0, message_latency: float = 0.0, connect_rate: float = 0.0,
+                 messages_per_session: int = 0, max_message_bytes: int = 50 * 1024 * 1024,
+                 keep_data: bool = False):
+        self.connect_latency = connect_latency
+        self.auth_latency = auth_latency
+        self.message_latency = message_latency
+        self.connect_rate = connect_rate
+        self.messages_per_session = messages_per_session
+        self.max_message_bytes = max_message_bytes
+        self.keep_data = keep_data
+        self.messages: List[dict] = []
+        self._connects = deque()
+        self._lock = threading.Lock()
+        self.counters = {"sessions": 0, "auths": 0, "rejected_connects": 0, "throttled": 0}
+        self._server = _Server((host, port), _Handler)
+        self._server.stub = self
+        self.host, self.port = self._server.server_address[:2]
+        self._thread = None
+
+    def _count(self, key: str):
+        with self._lock:
+            self.counters[key] += 1
+
+    def _admit(self) -> bool:
+        if not self.connect_rate:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            while self._connects and now - self._connects[0] > 1.0:
+                self._connects.popleft()
+            if len(self._connects) >= self.connect_rate:
+                self.counters["rejected_connects"] += 1
+                return False
+            self._connects.append(now)
+            return True
+
+    def _record(self, mail_from, rcpts, size, data):
+        with self._lock:
+            self.messages.append({"from": mail_from, "to": list(rcpts), "bytes": size, "data": data})
+
+    def start(self) -> "StubSmtpServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-smtp", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self.counters, "messages": len(self.messages)}
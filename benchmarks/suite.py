@@ -0,0 +1,307 @@
+"""
+Offline benchmark suite: the report pipeline's main stages and the full
+HTTP path, end to end against the local stand-ins (synthetic ledgers, fake
+pytds with injected latency, fake Key Vault, stub SMTP relay). Nothing here
+needs SQL Server, Azure or a mail relay.
+
+Scenarios (each runs in a fresh interpreter, `--repeat` times; timings are
+medians, `*_s` metrics are seconds):
+    fetch           fetch_per_ledger_chunked, one proc call per ledger per month
+    fetch_grouped   the same with LEDGERS_PER_CALL-style grouping (4 per call)
+    excel           save_to_excel for the fetched ledgers
+    excel_streaming save_to_excel_streaming for the same data
+    email           send_email_with_excel of that workbook through the relay
+    main_sync       MyFunction.main POST, Key Vault -> DB -> Excel -> SMTP,
+                    with the per-stage timings of the request's trace
+    main_async      the same queued as a job, polled until it finishes
+
+Results are written as JSON (commit, environment, parameters and metrics per
+scenario). `--compare BASELINE.json` lists every timing that moved by more
+than `--threshold` against an earlier run and exits 1 on a slowdown:
+
+    python -m benchmarks.suite --ledgers 8 --vouchers 2000 --months 6
+    git checkout <other commit>
+    python -m benchmarks.suite --compare benchmarks/results/<first commit>.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+SECRETS = {
+    "sql-connection-template": "Server=fake,1433;Database={db};User Id=bench;Password=bench",
+    "email-username": "reports@example.com",
+    "email-password": "secret",
+    "db-map-BENCH": "erp",
+}
+CONN_STR = "Server=fake,1433;Database=erp;User Id=bench;Password=bench"
+
+def _dates(args):
+    from dateutil.relativedelta import relativedelta
+    from_date = datetime(2024, 1, 1)
+    return from_date, from_date + relativedelta(months=args.months) - timedelta(seconds=1)
+
+def _sql(ledger_ids, from_date, to_date):
+    return (f"EXEC dbo.Fin_LedgerReport @StrLedgers='{','.join(ledger_ids)}', "
+            f"@FromDate='{from_date:%d-%b-%Y}', @ToDate='{to_date:%d-%b-%Y}'")
+
+def _backend(args):
+    from .fake_pytds import FakeBackend, install
+    from .synthetic import SyntheticLedgers
+    data = SyntheticLedgers(ledger_count=args.ledgers, vouchers_per_month=args.vouchers)
+    backend = FakeBackend(data, latency=args.db_latency, decimal_money=True)
+    install(backend)
+    return data, backend
+
+def _frames(data, from_date, to_date):
+    import pandas as pd
+    return {lid: pd.DataFrame(data.rows(lid, from_date, to_date)) for lid in data.ledger_ids}
+
+def _relay(args):
+    from .fake_smtp import StubSmtpServer
+    return StubSmtpServer(connect_latency=args.smtp_latency, message_latency=args.smtp_latency).start()
+
+# --- Scenarios: each returns {metric: value} for one run ---
+
+def scenario_fetch(args, ledgers_per_call=1):
+    data, backend = _backend(args)
+    from shared.fetcher import LEDGER_SCHEMA, fetch_per_ledger_chunked
+    from_date, to_date = _dates(args)
+    t0 = time.perf_counter()
+    out = fetch_per_ledger_chunked(
+        CONN_STR, _sql(data.ledger_ids, from_date, to_date), data.ledger_ids, from_date, to_date,
+        max_workers=8, ledgers_per_call=ledgers_per_call,
+        ledger_keys={lid: m["code"] for lid, m in data.ledgers.items()}, schema=LEDGER_SCHEMA,
+    )
+    wall = time.perf_counter() - t0
+    rows = sum(len(df) for df in out.values())
+    return {"wall_s": wall, "rows": rows, "rows_per_sec": round(rows / wall), **backend.stats.as_dict()}
+
+def scenario_fetch_grouped(args):
+    return scenario_fetch(args, ledgers_per_call=4)
+
+def _excel(args, streaming):
+    data, _ = _backend(args)
+    from shared.excel_export import iter_frame_batches, save_to_excel, save_to_excel_streaming
+    from_date, to_date = _dates(args)
+    frames = _frames(data, from_date, to_date)
+    path = os.path.join(tempfile.mkdtemp(), "report.xlsx")
+    common = dict(out_path=path, metadata=data.ledgers, requested_by="bench@example.com",
+                  from_date=from_date, to_date=to_date, currency="QAR", requested_at=None)
+    t0 = time.perf_counter()
+    if streaming:
+        save_to_excel_streaming(((lid, iter_frame_batches(df)) for lid, df in frames.items()), **common)
+    else:
+        save_to_excel(frames, **common)
+    wall = time.perf_counter() - t0
+    return {"wall_s": wall, "rows": sum(len(df) for df in frames.values()), "bytes": os.path.getsize(path)}
+
+def scenario_excel(args):
+    return _excel(args, streaming=False)
+
+def scenario_excel_streaming(args):
+    return _excel(args, streaming=True)
+
+def scenario_email(args):
+    data, _ = _backend(args)
+    from shared.emailer import send_email_with_excel
+    from shared.excel_export import save_to_excel
+    from shared.smtp_transport import SmtpTransport
+    from_date, to_date = _dates(args)
+    path = os.path.join(tempfile.mkdtemp(), "report.xlsx")
+    save_to_excel(_frames(data, from_date, to_date), path, data.ledgers, "bench@example.com",
+                  from_date, to_date, "QAR", requested_at=None)
+    relay = _relay(args)
+    transport = SmtpTransport(relay.host, relay.port, "reports@example.com", "secret",
+                              max_connections=1, starttls=False)
+    try:
+        t0 = time.perf_counter()
+        stats = send_email_with_excel(
+            recipient="bench@example.com", file_path=path, metadata=data.ledgers,
+            requested_ledgers=data.ledger_ids, smtp_server=relay.host, smtp_port=relay.port,
+            smtp_username="reports@example.com",
+            smtp_password="secret", cleanup=True, transport=transport,
+        )
+        wall = time.perf_counter() - t0
+    finally:
+        transport.close()
+        relay.stop()
+    return {"wall_s": wall, "bytes_sent": stats["bytes_sent"], "parts": stats["parts"],
+            "encode_s": stats["encode_seconds"], "emails": relay.stats()["messages"]}
+
+def _main_stack(args):
+    """Fake Key Vault/DB/SMTP wired up, then MyFunction imported; returns (MyFunction, HttpRequest, body, backend, relay)."""
+    from .fake_azure import HttpRequest, install as install_azure
+    data, backend = _backend(args)
+    relay = _relay(args)
+    os.environ.update({
+        "KEYVAULT_URL": "https://fake.vault.local/",
+        "SMTP_STARTTLS": "0",
+        "TRACE_EXPORTERS": "memory",
+        "JOB_QUEUE_PATH": os.path.join(tempfile.mkdtemp(), "jobs.sqlite3"),
+    })
+    install_azure(dict(SECRETS, **{"email-smtp-server": relay.host, "email-smtp-port": str(relay.port)}),
+                  kv_latency=args.kv_latency)
+    import MyFunction
+    MyFunction._ready()
+    from_date, to_date = _dates(args)
+    body = {"sql_proc": _sql(data.ledger_ids, from_date, to_date), "email_to": "bench@example.com",
+            "db_code": "BENCH"}
+    return MyFunction, HttpRequest, body, backend, relay
+
+def _stage_ms(summary):
+    return {f"{name}_ms": stage["ms"] for name, stage in summary["stages"].items()}
+
+def scenario_main_sync(args):
+    MyFunction, HttpRequest, body, backend, relay = _main_stack(args)
+    from shared import tracing
+    t0 = time.perf_counter()
+    resp = MyFunction.main(HttpRequest("POST", "http://localhost/MyFunction", body=body))
+    wall = time.perf_counter() - t0
+    relay.stop()
+    if resp.status_code != 200:
+        raise RuntimeError(f"main() answered {resp.status_code}: {resp.get_body()!r}")
+    summary = tracing.get_exporters()[0].traces[-1].summary()
+    return {"wall_s": wall, **_stage_ms(summary), **backend.stats.as_dict(), "emails": relay.stats()["messages"]}
+
+def scenario_main_async(args):
+    MyFunction, HttpRequest, body, backend, relay = _main_stack(args)
+    t0 = time.perf_counter()
+    resp = MyFunction.main(HttpRequest("POST", "http://localhost/MyFunction", body=dict(body, **{"async": True})))
+    job_id = json.loads(resp.get_body())["job_id"]
+    while True:
+        status = json.loads(MyFunction.main(
+            HttpRequest("GET", f"http://localhost/MyFunction/{job_id}", route_params={"job_id": job_id})
+        ).get_body())
+        if status["status"] in ("succeeded", "failed"):
+            break
+        time.sleep(0.01)
+    wall = time.perf_counter() - t0
+    relay.stop()
+    if status["status"] != "succeeded":
+        raise RuntimeError(f"Job failed: {status.get('error')}")
+    return {"wall_s": wall, **_stage_ms(status["timings"]), **backend.stats.as_dict()}
+
+SCENARIOS = {
+    "fetch": scenario_fetch,
+    "fetch_grouped": scenario_fetch_grouped,
+    "excel": scenario_excel,
+    "excel_streaming": scenario_excel_streaming,
+    "email": scenario_email,
+    "main_sync": scenario_main_sync,
+    "main_async": scenario_main_async,
+}
+
+def _is_timing(metric: str) -> bool:
+    return metric.endswith("_s") or metric.endswith("_ms")
+
+def _run_scenario(name, args, passthrough):
+    """Run one scenario `--repeat` times, each in its own interpreter; timings are the median."""
+    runs = []
+    for _ in range(args.repeat):
+        out = subprocess.run([sys.executable, "-m", "benchmarks.suite", "--child", name, *passthrough],
+                             capture_output=True, text=True, cwd=ROOT)
+        if out.returncode != 0:
+            return {"error": (out.stderr.strip().splitlines() or ["failed"])[-1]}
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    metrics = {}
+    for key in runs[-1]:
+        values = [r[key] for r in runs if key in r]
+        if _is_timing(key):
+            metrics[key] = round(statistics.median(values), 4 if key.endswith("_s") else 1)
+        else:
+            metrics[key] = values[-1]
+    return metrics
+
+def _commit():
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                             text=True, cwd=ROOT, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                               capture_output=True, text=True, cwd=ROOT).stdout.strip()
+        return sha + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def compare(baseline: dict, current: dict, threshold: float) -> list:
+    """Timings that changed by more than `threshold` (a fraction) between two result files."""
+    changes = []
+    for name, metrics in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name, {})
+        for key, value in metrics.items():
+            old = before.get(key)
+            if not _is_timing(key) or not isinstance(old, (int, float)) or not old:
+                continue
+            change = (value - old) / old
+            if abs(change) > threshold:
+                changes.append({"scenario": name, "metric": key, "baseline": old, "current": value,
+                                "change_pct": round(change * 100, 1), "regression": change > 0})
+    return changes
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset to run")
+    ap.add_argument("--ledgers", type=int, default=8)
+    ap.add_argument("--vouchers", type=int, default=1000, help="vouchers per ledger per month")
+    ap.add_argument("--months", type=int, default=6, help="date span of the report")
+    ap.add_argument("--db-latency", type=float, default=0.005, help="seconds per DB round trip")
+    ap.add_argument("--kv-latency", type=float, default=0.02, help="seconds per Key Vault call")
+    ap.add_argument("--smtp-latency", type=float, default=0.01, help="relay handshake/message latency")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--out", help="results file (default benchmarks/results/<commit>.json)")
+    ap.add_argument("--compare", help="earlier results file to compare against")
+    ap.add_argument("--threshold", type=float, default=0.10, help="relative change reported by --compare")
+    ap.add_argument("--child", choices=list(SCENARIOS))
+    args = ap.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(SCENARIOS[args.child](args)))
+        return 0
+
+    params = {k: getattr(args, k) for k in ("ledgers", "vouchers", "months", "db_latency", "kv_latency",
+                                            "smtp_latency", "repeat")}
+    passthrough = [arg for k, v in params.items() if k != "repeat" for arg in (f"--{k.replace('_', '-')}", str(v))]
+    import pandas as pd
+    results = {
+        "commit": _commit(),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "environment": {"python": platform.python_version(), "pandas": pd.__version__,
+                        "platform": platform.platform(), "cpu_count": os.cpu_count()},
+        "params": params,
+        "scenarios": {},
+    }
+    for name in [s.strip() for s in args.scenarios.split(",") if s.strip()]:
+        if name not in SCENARIOS:
+            ap.error(f"unknown scenario: {name}")
+        results["scenarios"][name] = _run_scenario(name, args, passthrough)
+        print(f"{name}: {json.dumps(results['scenarios'][name])}", file=sys.stderr)
+
+    out = args.out or os.path.join(RESULTS_DIR, f"{results['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(results, f, indent=2)
+    report = {"results": out, "scenarios": results["scenarios"]}
+
+    status = 0
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("params") != params:
+            print("warning: baseline was run with different parameters", file=sys.stderr)
+        report["baseline"] = baseline.get("commit")
+        report["changes"] = compare(baseline, results, args.threshold)
+        status = 1 if any(c["regression"] for c in report["changes"]) else 0
+    print(json.dumps(report, indent=2))
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""
+Deterministic synthetic ERP ledger data for the offline benchmarks.
+
+Every voucher is derived from (seed, ledger id, month, index) only, so the same
+request always returns the same rows regardless of how it is chunked.
+"""
+import calendar
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+COLUMNS = [
+    "Ledger Code", "Ledger Name", "Sl No", "Voucher Date", "Voucher Number",
+    "Voucher Type", "Narration", "Debit", "Credit",
+]
+
+_VOUCHER_TYPES = ["Journal", "Payment", "Receipt", "Sales", "Purchase"]
+_NARRATIONS = [
+    "Being amount paid", "Being amount received", "Monthly accrual",
+    "Inter-company transfer", "Bank charges", "Sales invoice", "Purchase invoice",
+]
+
+class SyntheticLedgers:
+    """
+    Configurable synthetic ledger master plus voucher generator.
+
+    Args:
+        ledger_count: Number of ledgers (ids start at 1001).
+        vouchers_per_month: Vouchers per ledger per calendar month.
+        seed: Seed mixed into every generated value.
+        volume: Optional {ledger id: vouchers per month} overriding
+            vouchers_per_month for individual ledgers.
+        epoch: Date of each ledger's base opening balance; a range starting
+            later opens with that balance plus every voucher in between, so
+            consecutive ranges chain (closing of one = opening of the next).
+        company_name: Company every ledger belongs to (one per database).
+    """
+
+    def __init__(self, ledger_count: int = 10, vouchers_per_month: int = 200, seed: int = 42,
+                 volume: Optional[Dict[str, int]] = None, epoch: datetime = datetime(2024, 1, 1),
+                 company_name: str = "Synthetic Trading W.L.L."):
+        self.ledger_count = ledger_count
+        self.vouchers_per_month = vouchers_per_month
+        self.seed = seed
+        self.volume = dict(volume or {})
+        self.epoch = epoch
+        self._month_net: Dict[tuple, float] = {}
+        self.ledgers: Dict[str, Dict[str, str]] = {
+            str(1001 + i): {
+                "code": f"L{1001 + i:06d}",
+                "name": f"Synthetic Ledger {1001 + i}",
+                "company_name": company_name,
+                "company_address": "PO Box 1, Doha, Qatar",
+            }
+            for i in range(ledger_count)
+        }
+
+    @property
+    def ledger_ids(self) -> List[str]:
+        return list(self.ledgers)
+
+    def _month_vouchers(self, lid: str, year: int, month: int) -> List[dict]:
+        days = calendar.monthrange(year, month)[1]
+        n = self.volume.get(lid, self.vouchers_per_month)
+        rng = random.Random(f"{self.seed}:{lid}:{year}:{month}")
+        start = datetime(year, month, 1)
+        rows = []
+        for i in range(n):
+            amount = round(rng.uniform(10, 50000), 2)
+            debit = amount if rng.random() < 0.5 else 0.0
+            rows.append({
+                "Voucher Date": start + timedelta(days=(i * days) // max(n, 1), minutes=i % 1440),
+                "Voucher Number": f"{rng.choice(_VOUCHER_TYPES)[:2].upper()}/{year}/{month:02d}/{i + 1:05d}",
+                "Voucher Type": rng.choice(_VOUCHER_TYPES),
+                "Narration": rng.choice(_NARRATIONS),
+                "Debit": debit,
+                "Credit": 0.0 if debit else amount,
+            })
+        return rows
+
+    def _net(self, lid: str, year: int, month: int, before: Optional[datetime] = None) -> float:
+        """Debit - credit of a month's vouchers (dated before `before`, if given)."""
+        if before is None:
+            key = (lid, year, month)
+            if key not in self._month_net:
+                self._month_net[key] = self._net(lid, year, month, datetime.max)
+            return self._month_net[key]
+        return sum(v["Debit"] - v["Credit"] for v in self._month_vouchers(lid, year, month)
+                   if v["Voucher Date"] < before)
+
+    def opening_balance(self, lid: str, when: datetime) -> float:
+        """Balance just before `when`: the base opening plus the vouchers from epoch up to then."""
+        balance = random.Random(f"{self.seed}:{lid}:ob").uniform(-1e5, 1e5)
+        year, month = self.epoch.year, self.epoch.month
+        while (year, month) < (when.year, when.month):
+            balance += self._net(lid, year, month)
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        if when > self.epoch:
+            balance += self._net(lid, when.year, when.month, before=when)
+        return round(balance, 2)
+
+    def iter_rows(self, lid: str, from_date: datetime, to_date: datetime) -> Iterator[dict]:
+        """
+        Rows the ledger proc would return for one ledger and date range, lazily:
+        an opening balance row, the vouchers in range, and a closing balance row.
+        """
+        meta = self.ledgers.get(lid)
+        if meta is None:
+            return
+
+        def _row(sl_no, date, voucher_no, vtype, narration, debit, credit):
+            return {
+                "Ledger Code": meta["code"], "Ledger Name": meta["name"], "Sl No": sl_no,
+                "Voucher Date": date, "Voucher Number": voucher_no, "Voucher Type": vtype,
+                "Narration": narration, "Debit": debit, "Credit": credit,
+            }
+
+        opening = self.opening_balance(lid, from_date)
+        yield _row(None, from_date, "Opening Balance", "", "", opening, 0.0)
+
+        balance, sl_no = opening, 0
+        year, month = from_date.year, from_date.month
+        while (year, month) <= (to_date.year, to_date.month):
+            for v in self._month_vouchers(lid, year, month):
+                if from_date <= v["Voucher Date"] <= to_date:
+                    sl_no += 1
+                    balance += v["Debit"] - v["Credit"]
+                    yield _row(sl_no, v["Voucher Date"], v["Voucher Number"], v["Voucher Type"],
+                               v["Narration"], v["Debit"], v["Credit"])
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+        yield _row(None, to_date, "Closing Balance", "", "", round(balance, 2), 0.0)
+
+    def rows(self, lid: str, from_date: datetime, to_date: datetime) -> List[dict]:
+        return list(self.iter_rows(lid, from_date, to_date))
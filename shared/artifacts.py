@@ -0,0 +1,312 @@
+import abc
+import hashlib
+import hmac
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from typing import BinaryIO, Dict, List, Optional
+from urllib.parse import urlencode
+
+# Report artifacts: finished report files kept under a content key (see
+# artifact_key), so a request whose inputs and data are unchanged gets the
+# stored file instead of a new export, and can be delivered as a download
+# link (see signed_link/verify_link) instead of an attachment. Stored files
+# hold requester placeholders (shared.stamping): each delivery or download
+# is stamped with its own recipient and request time.
+
+class ArtifactNotFoundError(Exception):
+    """Raised when an artifact is not in the store (never stored, or evicted)."""
+    pass
+
+class Artifact:
+    """A stored report file: its key, file name, size, summaries and when it was stored."""
+
+    def __init__(self, key: str, name: str, size: int, created_at: float,
+                 summaries: Optional[Dict[str, List[float]]] = None):
+        self.key = key
+        self.name = name
+        self.size = size
+        self.created_at = created_at
+        self.summaries = summaries or {}
+
+    def as_dict(self) -> dict:
+        return {"key": self.key, "name": self.name, "size": self.size, "created_at": self.created_at,
+                "summaries": self.summaries}
+
+def _fingerprint_frames(data_dict) -> str:
+    """Hash of (ledger, columns, dtypes, row contents) for every frame, in order."""
+    import pandas as pd
+
+    h = hashlib.sha256()
+    for lid, df in data_dict.items():
+        h.update(f"{lid}|{list(df.columns)}|{[str(t) for t in df.dtypes]}|{len(df)}".encode("utf-8"))
+        if len(df):
+            h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+def artifact_key(request_key, exporter: str, options: dict, metadata: dict, data_dict) -> str:
+    """
+    Content key of a report: the normalized request (shared.coalescing.request_key),
+    the exporter and its options, the ledger metadata printed in the report,
+    and the fetched frames. Equal keys mean the same report content; the
+    requester and request time are not part of it (see shared.stamping).
+    """
+    inputs = json.dumps([list(request_key), exporter, options, metadata], sort_keys=True, default=str)
+    h = hashlib.sha256(inputs.encode("utf-8"))
+    h.update(_fingerprint_frames(data_dict).encode("ascii"))
+    return h.hexdigest()
+
+class ArtifactStore(abc.ABC):
+    """
+    Blob-style interface of the artifact store: immutable files under opaque
+    keys. put() must be atomic (a reader never sees a partial file, and of
+    two concurrent puts of one key, one wins whole); get() counts as a use
+    for retention. Backends: LocalArtifactStore.
+    """
+
+    @abc.abstractmethod
+    def get(self, key: str) -> Optional[Artifact]:
+        ...
+
+    @abc.abstractmethod
+    def put(self, key: str, path: str, name: str,
+            summaries: Optional[Dict[str, List[float]]] = None) -> Artifact:
+        """Store the file at `path` (left in place) under `key`."""
+        ...
+
+    @abc.abstractmethod
+    def open(self, key: str) -> BinaryIO:
+        """The artifact's bytes; raises ArtifactNotFoundError."""
+        ...
+
+    def download(self, key: str, dest_path: str) -> str:
+        """Copy an artifact to a local file (which may then be zipped, split or deleted)."""
+        with self.open(key) as src, open(dest_path, "wb") as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        return dest_path
+
+    @abc.abstractmethod
+    def delete(self, key: str):
+        ...
+
+    @abc.abstractmethod
+    def evict(self) -> int:
+        """Apply the retention policy; returns the number of artifacts removed."""
+        ...
+
+    @abc.abstractmethod
+    def stats(self) -> dict:
+        ...
+
+class LocalArtifactStore(ArtifactStore):
+    """
+    Artifact store on a local (or mounted) directory: each artifact is a
+    directory <root>/<key[:2]>/<key>/ holding the file and meta.json,
+    written under <root>/.tmp and renamed into place.
+
+    Retention: an artifact not used (stored or reused) for
+    `retention_seconds` is removed, and beyond `max_bytes` the least
+    recently used go first. evict() runs after every put.
+    """
+
+    _TMP = ".tmp"
+    _META = "meta.json"
+    _BLOB = "artifact"
+
+    def __init__(self, root: str, retention_seconds: float = 7 * 86400.0, max_bytes: int = 1024 ** 3):
+        self.root = root
+        self.retention_seconds = retention_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "puts": 0, "put_races": 0, "evictions": 0}
+        os.makedirs(os.path.join(root, self._TMP), exist_ok=True)
+
+    def _dir(self, key: str) -> str:
+        if len(key) < 8 or not all(c in "0123456789abcdef" for c in key):
+            raise ArtifactNotFoundError(f"Invalid artifact key: {key!r}")
+        return os.path.join(self.root, key[:2], key)
+
+    def _count(self, name: str, n: int = 1):
+        with self._lock:
+            self._stats[name] += n
+
+    def _read_meta(self, key: str) -> Optional[Artifact]:
+        try:
+            with open(os.path.join(self._dir(key), self._META), encoding="utf-8") as f:
+                meta = json.load(f)
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        return Artifact(meta["key"], meta["name"], meta["size"], meta["created_at"], meta.get("summaries"))
+
+    def get(self, key: str) -> Optional[Artifact]:
+        artifact = self._read_meta(key)
+        if artifact is None:
+            self._count("misses")
+            return None
+        self._touch(key)
+        self._count("hits")
+        return artifact
+
+    def _touch(self, key: str):
+        try:
+            os.utime(os.path.join(self._dir(key), self._META))
+        except FileNotFoundError:
+            pass
+
+    def put(self, key: str, path: str, name: str,
+            summaries: Optional[Dict[str, List[float]]] = None) -> Artifact:
+        final = self._dir(key)
+        artifact = Artifact(key, name, os.path.getsize(path), time.time(), summaries)
+        staging = os.path.join(self.root, self._TMP, uuid.uuid4().hex)
+        os.makedirs(staging)
+        try:
+            shutil.copyfile(path, os.path.join(staging, self._BLOB))
+            with open(os.path.join(staging, self._META), "w", encoding="utf-8") as f:
+                json.dump(artifact.as_dict(), f)
+            os.makedirs(os.path.dirname(final), exist_ok=True)
+            try:
+                os.rename(staging, final)
+            except OSError:
+                # Stored meanwhile by a concurrent build of the same report
+                if not os.path.exists(os.path.join(final, self._META)):
+                    raise
+                self._count("put_races")
+                self._touch(key)
+                return self._read_meta(key) or artifact
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        self._count("puts")
+        try:
+            self.evict()
+        except Exception as e:
+            logging.warning(f"Artifact eviction failed: {e}")
+        return artifact
+
+    def open(self, key: str) -> BinaryIO:
+        try:
+            return open(os.path.join(self._dir(key), self._BLOB), "rb")
+        except (FileNotFoundError, NotADirectoryError):
+            raise ArtifactNotFoundError(f"Artifact {key} not found (expired or evicted)")
+
+    def download(self, key: str, dest_path: str) -> str:
+        # Same filesystem: a hard link is enough, since artifacts are never modified in place
+        try:
+            os.link(os.path.join(self._dir(key), self._BLOB), dest_path)
+            return dest_path
+        except FileNotFoundError:
+            raise ArtifactNotFoundError(f"Artifact {key} not found (expired or evicted)")
+        except OSError:
+            return super().download(key, dest_path)
+
+    def delete(self, key: str):
+        final = self._dir(key)
+        # Renamed away first, so readers see the artifact whole or not at all
+        doomed = os.path.join(self.root, self._TMP, f"del-{uuid.uuid4().hex}")
+        try:
+            os.rename(final, doomed)
+        except FileNotFoundError:
+            return
+        shutil.rmtree(doomed, ignore_errors=True)
+
+    def _entries(self):
+        """(last_used, size, key) of every stored artifact."""
+        for prefix in os.listdir(self.root):
+            if prefix == self._TMP or not os.path.isdir(os.path.join(self.root, prefix)):
+                continue
+            for key in os.listdir(os.path.join(self.root, prefix)):
+                d = os.path.join(self.root, prefix, key)
+                try:
+                    used = os.path.getmtime(os.path.join(d, self._META))
+                    size = os.path.getsize(os.path.join(d, self._BLOB))
+                except OSError:
+                    continue
+                yield used, size, key
+
+    def evict(self) -> int:
+        now = time.time()
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for used, size, key in entries:
+            if now - used <= self.retention_seconds and total <= self.max_bytes:
+                break
+            self.delete(key)
+            total -= size
+            removed += 1
+        # Staging directories left by a crashed put
+        tmp = os.path.join(self.root, self._TMP)
+        for name in os.listdir(tmp):
+            path = os.path.join(tmp, name)
+            try:
+                if now - os.path.getmtime(path) > 3600:
+                    shutil.rmtree(path, ignore_errors=True)
+            except OSError:
+                pass
+        if removed:
+            self._count("evictions", removed)
+            logging.info(f"Evicted {removed} report artifacts ({total} bytes kept).")
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats)
+        entries = list(self._entries())
+        out["artifacts"] = len(entries)
+        out["bytes"] = sum(size for _, size, _ in entries)
+        return out
+
+# --- Download links ---
+
+def _link_signature(secret: str, key: str, recipient: str, requested_at: int, expires: int) -> str:
+    message = f"{key}|{recipient}|{requested_at}|{expires}"
+    return hmac.new(secret.encode("utf-8"), message.encode("utf-8"), hashlib.sha256).hexdigest()
+
+def signed_link(base_url: str, key: str, secret: str, ttl_seconds: float, recipient: str, requested_at: int) -> str:
+    """
+    Download link for an artifact: `base_url` with artifact, to (the
+    recipient), at (request time, epoch seconds), expires and sig query
+    parameters. The download is stamped with `to` and `at`.
+    """
+    expires = int(time.time() + ttl_seconds)
+    query = urlencode({"artifact": key, "to": recipient, "at": int(requested_at), "expires": expires,
+                       "sig": _link_signature(secret, key, recipient, int(requested_at), expires)})
+    return f"{base_url}{'&' if '?' in base_url else '?'}{query}"
+
+def verify_link(query, secret: str) -> bool:
+    """True for the query parameters of a link made by signed_link with `secret` that has not expired."""
+    try:
+        requested_at, expires = int(query.get("at")), int(query.get("expires"))
+    except (TypeError, ValueError):
+        return False
+    if expires < time.time() or not query.get("artifact") or not query.get("to"):
+        return False
+    expected = _link_signature(secret, query["artifact"], query["to"], requested_at, expires)
+    return hmac.compare_digest(expected, str(query.get("sig") or ""))
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_artifact_store() -> Optional[ArtifactStore]:
+    """
+    Process-wide artifact store, or None when ARTIFACT_STORE is off (default on).
+    Files live under ARTIFACT_STORE_DIR (default: ledger-artifacts in the temp
+    directory); ARTIFACT_RETENTION_HOURS (default 168) and ARTIFACT_STORE_MAX_MB
+    (default 1024) bound them.
+    """
+    global _store
+    if os.environ.get("ARTIFACT_STORE", "1").lower() not in ("1", "true", "yes"):
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = LocalArtifactStore(
+                    os.environ.get("ARTIFACT_STORE_DIR") or os.path.join(tempfile.gettempdir(), "ledger-artifacts"),
+                    retention_seconds=float(os.environ.get("ARTIFACT_RETENTION_HOURS", "168")) * 3600,
+                    max_bytes=int(float(os.environ.get("ARTIFACT_STORE_MAX_MB", "1024")) * 2**20),
+                )
+    return _store
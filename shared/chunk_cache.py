@@ -0,0 +1,170 @@
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+_PARAM_RES = {
+    name: re.compile(rf"@{name}\s*=\s*\'[^\']+\'", re.IGNORECASE)
+    for name in ("StrLedgers", "FromDate", "ToDate")
+}
+
+def template_hash(sql_template: str) -> str:
+    """
+    Hash of the proc call with the @StrLedgers/@FromDate/@ToDate values blanked
+    out, so requests for other ledgers or dates share cache entries while a
+    different proc or extra parameters do not.
+    """
+    normalized = sql_template
+    for name, rx in _PARAM_RES.items():
+        normalized = rx.sub(f"@{name}=?", normalized)
+    normalized = " ".join(normalized.split()).lower()
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+class ChunkCache:
+    """
+    On-disk cache of per-chunk proc results for closed accounting periods,
+    stored as Parquet files and evicted least-recently-used once the directory
+    grows past max_bytes.
+
+    Entries are keyed by (db_code, ledger, chunk start, chunk end, template hash),
+    one per calendar month (see shared.chunking.calendar_months), so entries
+    are shared whatever windows the chunking strategy picks.
+    A chunk is only cached once it ends before the first day of the month
+    `immutable_after_months` months before the current one (cutoff()), e.g.
+    with 1, in May everything up to the end of March is treated as closed.
+
+    Args:
+        directory: Cache directory (created if missing).
+        max_bytes: Total size of cached files before LRU eviction.
+        immutable_after_months: How many months back the books count as open.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 512 * 2**20, immutable_after_months: int = 1):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.immutable_after_months = max(0, int(immutable_after_months))
+        self._lock = threading.Lock()
+        self._index: "OrderedDict[str, int]" = OrderedDict()  # file name -> size, oldest first
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "errors": 0}
+        os.makedirs(directory, exist_ok=True)
+
+        entries = []
+        for name in os.listdir(directory):
+            if name.endswith(".parquet"):
+                st = os.stat(os.path.join(directory, name))
+                entries.append((st.st_mtime, name, st.st_size))
+        for _, name, size in sorted(entries):
+            self._index[name] = size
+            self._bytes += size
+
+    def cutoff(self, now: Optional[datetime] = None) -> datetime:
+        """Start of the open period: chunks ending before it are cached."""
+        now = now or datetime.now()
+        return datetime(now.year, now.month, 1) - relativedelta(months=self.immutable_after_months)
+
+    def is_immutable(self, chunk_end: datetime, now: Optional[datetime] = None) -> bool:
+        return chunk_end < self.cutoff(now)
+
+    def _name(self, db_code, ledger, start, end, tpl_hash) -> str:
+        raw = f"{db_code}|{ledger}|{start:%Y-%m-%dT%H:%M:%S}|{end:%Y-%m-%dT%H:%M:%S}|{tpl_hash}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest() + ".parquet"
+
+    def get(self, db_code, ledger, start, end, tpl_hash) -> Optional[pd.DataFrame]:
+        name = self._name(db_code, ledger, start, end, tpl_hash)
+        path = os.path.join(self.directory, name)
+        with self._lock:
+            if name not in self._index:
+                self._stats["misses"] += 1
+                return None
+            self._index.move_to_end(name)
+        try:
+            df = pd.read_parquet(path)
+            os.utime(path)  # LRU order survives restarts through mtime
+        except Exception as e:
+            logging.warning("Chunk cache read failed for %s: %s", name, e)
+            with self._lock:
+                self._stats["errors"] += 1
+                self._stats["misses"] += 1
+                self._forget_locked(name)
+            return None
+        with self._lock:
+            self._stats["hits"] += 1
+        return df
+
+    def put(self, db_code, ledger, start, end, tpl_hash, df: pd.DataFrame):
+        name = self._name(db_code, ledger, start, end, tpl_hash)
+        path = os.path.join(self.directory, name)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        try:
+            df.to_parquet(tmp, index=False)
+            size = os.path.getsize(tmp)
+            os.replace(tmp, path)
+        except Exception as e:
+            # e.g. mixed-type object columns Parquet cannot represent; just don't cache
+            logging.warning("Chunk cache write skipped for ledger %s %s→%s: %s", ledger, start, end, e)
+            with self._lock:
+                self._stats["errors"] += 1
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return
+        with self._lock:
+            if name in self._index:
+                self._bytes -= self._index.pop(name)
+            self._index[name] = size
+            self._bytes += size
+            self._stats["stores"] += 1
+            self._evict_locked()
+
+    def _forget_locked(self, name):
+        size = self._index.pop(name, None)
+        if size is not None:
+            self._bytes -= size
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except OSError:
+            pass
+
+    def _evict_locked(self):
+        while self._bytes > self.max_bytes and len(self._index) > 1:
+            name = next(iter(self._index))
+            self._forget_locked(name)
+            self._stats["evictions"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats)
+            out["entries"] = len(self._index)
+            out["bytes"] = self._bytes
+        return out
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_chunk_cache() -> Optional[ChunkCache]:
+    """
+    Process-wide chunk cache, or None when CHUNK_CACHE_DIR is not set.
+    Size and immutability come from CHUNK_CACHE_MAX_MB / CHUNK_CACHE_OPEN_MONTHS.
+    """
+    global _cache
+    directory = os.environ.get("CHUNK_CACHE_DIR")
+    if not directory:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ChunkCache(
+                    directory,
+                    max_bytes=int(float(os.environ.get("CHUNK_CACHE_MAX_MB", "512")) * 2**20),
+                    immutable_after_months=int(os.environ.get("CHUNK_CACHE_OPEN_MONTHS", "1")),
+                )
+    return _cache
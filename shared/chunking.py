@@ -0,0 +1,189 @@
+import os
+import threading
+from datetime import timedelta
+from typing import Dict, Hashable, Iterator, Optional, Tuple
+
+from dateutil.relativedelta import relativedelta
+
+_SECOND = timedelta(seconds=1)
+
+def month_end(moment):
+    """Last second of the calendar month `moment` falls in."""
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0) + relativedelta(months=1) - _SECOND
+
+def calendar_months(start, end) -> Iterator[Tuple]:
+    """Split [start, end] at calendar-month boundaries."""
+    current = start
+    while current <= end:
+        chunk_end = min(month_end(current), end)
+        yield current, chunk_end
+        current = chunk_end + _SECOND
+
+class _MonthlyPlanner:
+    """Calendar-month windows (the original fetcher behaviour); feedback is ignored."""
+
+    def __init__(self, from_date, to_date):
+        self.from_date = from_date
+        self.to_date = to_date
+
+    def windows(self) -> Iterator[Tuple]:
+        current = self.from_date
+        while current <= self.to_date:
+            chunk_end = min(current + relativedelta(months=1) - _SECOND, self.to_date)
+            yield current, chunk_end
+            current = chunk_end + _SECOND
+
+    def record(self, rows: int, seconds: float, window_days: Optional[float] = None, calls: int = 1):
+        pass
+
+class MonthlyChunking:
+    """Split [from_date, to_date] into calendar-month chunks."""
+
+    name = "monthly"
+
+    def planner(self, key: Hashable, from_date, to_date, align_until=None,
+                ledger_count: int = 1) -> _MonthlyPlanner:
+        return _MonthlyPlanner(from_date, to_date)
+
+class _AdaptivePlanner:
+    """
+    Windows sized from the previous chunk's row count and latency.
+    `windows()` is a generator: call record() after fetching each window and
+    the next one is sized from it. Windows ending before `align_until` are
+    stretched to the end of their calendar month, so closed periods split
+    into whole months for the chunk cache. `ledger_count` is the number of
+    ledgers sent per proc call.
+    """
+
+    def __init__(self, strategy: "AdaptiveChunking", key: Hashable, from_date, to_date,
+                 align_until=None, ledger_count: int = 1):
+        self.strategy = strategy
+        self.key = key
+        self.from_date = from_date
+        self.to_date = to_date
+        self.align_until = align_until
+        self.ledger_count = max(1, int(ledger_count))
+        density = strategy.density(key)
+        self.days = strategy.initial_days if density is None else strategy.days_for(density)
+        self._last = None  # (window days, rows, seconds, proc calls)
+
+    def windows(self) -> Iterator[Tuple]:
+        current = self.from_date
+        while current <= self.to_date:
+            chunk_end = min(current + timedelta(days=self.days) - _SECOND, self.to_date)
+            if self.align_until is not None and chunk_end < self.align_until:
+                chunk_end = min(month_end(chunk_end), self.to_date)
+            yield current, chunk_end
+            if self._last is not None:
+                self.days = self._next_days(*self._last)
+                self._last = None
+            current = chunk_end + _SECOND
+
+    def record(self, rows: int, seconds: float, window_days: Optional[float] = None, calls: int = 1):
+        """Rows and seconds of the last window, fetched in `calls` proc calls (or cache reads)."""
+        self._last = (window_days or self.days, rows, seconds, calls)
+
+    def _next_days(self, window_days: float, rows: int, seconds: float, calls: int = 1) -> float:
+        s = self.strategy
+        # Every call returns an opening and a closing balance row per ledger
+        vouchers = max(0, rows - 2 * self.ledger_count * calls)
+        density = vouchers / max(window_days, 1.0 / 24)
+        s.remember(self.key, density)
+        days = s.days_for(density)
+        if seconds > s.target_seconds:
+            days = min(days, window_days * s.target_seconds / seconds)
+        # Widen gradually so one quiet window does not jump straight to max_days
+        days = min(days, window_days * s.max_growth)
+        return max(s.min_days, min(s.max_days, days))
+
+class AdaptiveChunking:
+    """
+    Chunk windows that widen for quiet ledgers and narrow for busy ones.
+
+    Each window aims at `target_rows` rows, using the previous window's
+    rows-per-day, and is shrunk further when it took longer than
+    `target_seconds`. Densities are remembered per key (db_code, ledger) as an
+    exponential moving average, so the next request for the same ledger
+    starts from a sensible window instead of `initial_days`.
+
+    Args:
+        target_rows: Rows to aim for per proc call.
+        target_seconds: Latency above which the next window is narrowed.
+        min_days / max_days: Bounds on a window's length in days.
+        initial_days: First window for a ledger with no recorded density.
+        max_growth: Max factor a window may widen by from one chunk to the next.
+        smoothing: Weight of the newest density in the moving average.
+        max_keys: Densities remembered before the oldest are dropped.
+    """
+
+    name = "adaptive"
+
+    def __init__(
+        self,
+        target_rows: int = 20000,
+        target_seconds: float = 15.0,
+        min_days: float = 1.0,
+        max_days: float = 366.0,
+        initial_days: float = 31.0,
+        max_growth: float = 4.0,
+        smoothing: float = 0.5,
+        max_keys: int = 10000
+    ):
+        self.target_rows = max(1, int(target_rows))
+        self.target_seconds = target_seconds
+        self.min_days = min_days
+        self.max_days = max_days
+        self.initial_days = initial_days
+        self.max_growth = max_growth
+        self.smoothing = smoothing
+        self.max_keys = max_keys
+        self._densities: Dict[Hashable, float] = {}
+        self._lock = threading.Lock()
+
+    def days_for(self, density: float) -> float:
+        if density <= 0:
+            return self.max_days
+        return max(self.min_days, min(self.max_days, self.target_rows / density))
+
+    def density(self, key: Hashable) -> Optional[float]:
+        with self._lock:
+            return self._densities.get(key)
+
+    def remember(self, key: Hashable, density: float):
+        with self._lock:
+            old = self._densities.pop(key, None)
+            if old is not None:
+                density = self.smoothing * density + (1 - self.smoothing) * old
+            self._densities[key] = density  # re-inserted last: dict order is recency
+            while len(self._densities) > self.max_keys:
+                self._densities.pop(next(iter(self._densities)))
+
+    def planner(self, key: Hashable, from_date, to_date, align_until=None,
+                ledger_count: int = 1) -> _AdaptivePlanner:
+        return _AdaptivePlanner(self, key, from_date, to_date, align_until, ledger_count)
+
+MONTHLY = MonthlyChunking()
+
+_adaptive = None
+_adaptive_lock = threading.Lock()
+
+def get_chunking(name: Optional[str] = None):
+    """
+    Chunking strategy by name ('monthly' or 'adaptive'; default CHUNK_STRATEGY,
+    else monthly). The adaptive strategy is process-wide so ledger densities
+    carry over between requests; CHUNK_TARGET_ROWS sets its row target.
+    """
+    global _adaptive
+    name = (name or os.environ.get("CHUNK_STRATEGY") or "monthly").lower()
+    if name == "monthly":
+        return MONTHLY
+    if name != "adaptive":
+        raise ValueError(f"Unknown chunk strategy: {name}")
+    if _adaptive is None:
+        with _adaptive_lock:
+            if _adaptive is None:
+                _adaptive = AdaptiveChunking(
+                    target_rows=int(os.environ.get("CHUNK_TARGET_ROWS", "20000")),
+                    target_seconds=float(os.environ.get("CHUNK_TARGET_SECONDS", "15")),
+                )
+    return _adaptive
@@ -0,0 +1,260 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+# Parameters that are part of the key on their own (parsed), blanked out of the SQL text
+_PARAM_RE = re.compile(r"@(StrLedgers|FromDate|ToDate)\s*=\s*'[^']*'", re.IGNORECASE)
+
+def request_key(params: dict) -> Tuple:
+    """
+    Normalized identity of a parsed report request: db_code (every db_code
+    of a consolidated request), the set of ledgers, the date range,
+    currency, output format, delivery mode and the rest of the proc call
+    (with @StrLedgers/@FromDate/@ToDate removed and whitespace collapsed).
+    Two requests with the same key produce the same report file.
+    A delta request depends on its recipient's watermarks, so it also keys
+    on the recipient.
+    """
+    sql = _PARAM_RE.sub(lambda m: f"@{m.group(1).lower()}=?", params["sql_proc"])
+    sql = " ".join(sql.split())
+    recipient = params["email_to"].strip().lower() if params.get("delta") else None
+    databases = params.get("databases")
+    if databases:
+        db = ",".join(sorted(str(d["db_code"]).strip().upper() for d in databases))
+    else:
+        db = str(params["db_code"]).strip().upper()
+    return (
+        db,
+        tuple(sorted(set(params["ledger_ids"]))),
+        params["from_date"],
+        params["to_date"],
+        str(params.get("currency") or "").strip().upper(),
+        str(params.get("format") or "xlsx").strip().lower(),
+        str(params.get("delivery") or "attachment"),
+        hashlib.sha256(sql.encode("utf-8")).hexdigest()[:16],
+        recipient,
+    )
+
+LEADER = "leader"        # build and publish the report, then deliver it to this recipient
+FOLLOWER = "follower"    # wait for the build in flight, then deliver it to this recipient
+REUSE = "reuse"          # deliver a finished report (within the window) to this recipient
+DUPLICATE = "duplicate"  # this recipient's delivery is already in flight: wait for its outcome
+
+_PENDING = object()
+
+class _Batch:
+    def __init__(self, key: Hashable, cond: threading.Condition):
+        self.key = key
+        self.cond = cond
+        self.state = "running"  # running -> done | failed
+        self.artifact = None
+        self.error: Optional[BaseException] = None
+        self.recipients: "OrderedDict[str, Any]" = OrderedDict()  # recipient -> outcome or _PENDING
+        self.finished_at: Optional[float] = None
+        self.users = 0  # leader, followers and reuses not yet done with the artifact
+        self.discarded = False
+
+class RequestCoalescer:
+    """
+    Request coalescing for identical reports (see request_key).
+
+    Single-flight: while a report is being built, identical requests join it
+    instead of repeating the DB calls and the export. The leader publishes
+    the built artifact; every request then delivers it to its own recipient
+    on its own thread (deliver), so each gets its own status and outcome,
+    and the leader answers without waiting for anyone else's email. With
+    `window` > 0 the finished artifact is kept for that many seconds, and
+    identical requests in that time are delivered from it directly without
+    a new fetch.
+
+    A recipient who submits again while their delivery is still in flight
+    is not emailed twice (DUPLICATE). `discard(artifact)` is called once the
+    artifact is no longer needed; `idle(artifact)`, with the coalescer's
+    lock held, whenever a kept artifact has no deliveries in progress.
+    """
+
+    def __init__(self, window: float = 0.0, discard: Optional[Callable[[Any], None]] = None,
+                 idle: Optional[Callable[[Any], None]] = None):
+        self.window = max(0.0, float(window))
+        self.discard = discard
+        self.idle = idle
+        self._lock = threading.Lock()
+        self._batches: Dict[Hashable, _Batch] = {}
+        self._stats = {"leaders": 0, "joined_in_flight": 0, "reused": 0, "duplicates": 0, "failed": 0}
+
+    # --- internals (call with self._lock held) ---
+
+    def _expired_locked(self, batch: _Batch, now: float) -> bool:
+        # A finished batch stays joinable while its deliveries are in progress
+        return batch.state != "running" and (
+            batch.state == "failed" or (batch.users == 0 and now - batch.finished_at >= self.window)
+        )
+
+    def _drop_locked(self, batch: _Batch):
+        if self._batches.get(batch.key) is batch:
+            del self._batches[batch.key]
+        if batch.users == 0 and not batch.discarded:
+            batch.discarded = True
+            return batch.artifact
+        return None
+
+    def _release_locked(self, batch: _Batch):
+        """One user is done with the artifact; returns it when it is to be discarded."""
+        batch.users -= 1
+        if batch.users > 0:
+            return None
+        if self._batches.get(batch.key) is not batch or self._expired_locked(batch, time.monotonic()):
+            return self._drop_locked(batch)
+        if self.idle is not None and batch.artifact is not None:
+            try:
+                self.idle(batch.artifact)
+            except Exception as e:
+                logging.warning(f"Failed to release coalesced report: {e}")
+        return None
+
+    def _discard(self, artifact):
+        if artifact is not None and self.discard is not None:
+            try:
+                self.discard(artifact)
+            except Exception as e:
+                logging.warning(f"Failed to discard coalesced report: {e}")
+
+    # --- joining ---
+
+    def join(self, key: Hashable, recipient: str) -> Tuple[_Batch, str]:
+        """Register `recipient` for the report `key`; returns (batch, role)."""
+        now = time.monotonic()
+        stale = None
+        with self._lock:
+            batch = self._batches.get(key)
+            if batch is not None and self._expired_locked(batch, now):
+                stale = self._drop_locked(batch)
+                batch = None
+
+            if batch is None:
+                batch = self._batches[key] = _Batch(key, threading.Condition(self._lock))
+                self._stats["leaders"] += 1
+                role = LEADER
+            elif batch.recipients.get(recipient) is _PENDING:
+                self._stats["duplicates"] += 1
+                role = DUPLICATE
+            elif batch.state == "running":
+                self._stats["joined_in_flight"] += 1
+                role = FOLLOWER
+            else:
+                self._stats["reused"] += 1
+                role = REUSE
+            if role != DUPLICATE:
+                batch.recipients[recipient] = _PENDING
+                batch.users += 1
+        self._discard(stale)
+        if role != LEADER:
+            logging.info(f"Request for {recipient} coalesced with an identical report ({role})")
+        return batch, role
+
+    # --- leader ---
+
+    def publish(self, batch: _Batch, artifact):
+        """Leader: the report is built; waiting followers go on to deliver `artifact`."""
+        with self._lock:
+            batch.artifact = artifact
+            batch.state = "done"
+            batch.finished_at = time.monotonic()
+            batch.cond.notify_all()
+        if self.window > 0:
+            timer = threading.Timer(self.window, self._expire, args=(batch,))
+            timer.daemon = True
+            timer.start()
+
+    def fail(self, batch: _Batch, error: BaseException):
+        """Leader: the report could not be built; every waiting recipient gets `error`."""
+        with self._lock:
+            batch.state = "failed"
+            batch.error = error
+            batch.finished_at = time.monotonic()
+            for recipient, outcome in batch.recipients.items():
+                if outcome is _PENDING:
+                    batch.recipients[recipient] = error
+            self._stats["failed"] += 1
+            batch.cond.notify_all()
+            batch.users -= 1
+            artifact = self._drop_locked(batch)
+        self._discard(artifact)
+
+    # --- every role but DUPLICATE ---
+
+    def deliver(self, batch: _Batch, recipient: str, deliver: Callable[[Any], Any]):
+        """
+        Wait for the batch's build, call `deliver(artifact)` for `recipient`
+        on this thread and return its outcome (or raise its error, or the
+        build's).
+        """
+        try:
+            with self._lock:
+                while batch.state == "running":
+                    batch.cond.wait()
+                artifact = batch.artifact
+            if batch.state == "done":
+                try:
+                    outcome = deliver(artifact)
+                except BaseException as e:
+                    outcome = e
+                with self._lock:
+                    batch.recipients[recipient] = outcome
+                    batch.cond.notify_all()
+        finally:
+            with self._lock:
+                artifact = self._release_locked(batch)
+            self._discard(artifact)
+        return self.wait(batch, recipient)
+
+    def wait(self, batch: _Batch, recipient: str):
+        """Block until `recipient`'s delivery finished; returns its outcome or raises its error."""
+        with self._lock:
+            while batch.recipients.get(recipient, _PENDING) is _PENDING:
+                batch.cond.wait()
+            outcome = batch.recipients[recipient]
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+    def _expire(self, batch: _Batch):
+        with self._lock:
+            # Still in use: dropped by the last delivery's release instead
+            artifact = self._drop_locked(batch) if batch.users == 0 else None
+        self._discard(artifact)
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats)
+            out["active"] = sum(b.state == "running" for b in self._batches.values())
+            out["cached"] = sum(b.state == "done" for b in self._batches.values())
+        return out
+
+_coalescer = None
+_coalescer_lock = threading.Lock()
+
+def get_coalescer(discard: Optional[Callable[[Any], None]] = None,
+                  idle: Optional[Callable[[Any], None]] = None) -> Optional[RequestCoalescer]:
+    """
+    Process-wide coalescer, or None when COALESCE_REQUESTS is off (default on).
+    COALESCE_WINDOW_SECONDS (default 0: in-flight dedup only) sets how long a
+    finished workbook is reused.
+    """
+    global _coalescer
+    if os.environ.get("COALESCE_REQUESTS", "1").lower() not in ("1", "true", "yes"):
+        return None
+    if _coalescer is None:
+        with _coalescer_lock:
+            if _coalescer is None:
+                _coalescer = RequestCoalescer(
+                    window=float(os.environ.get("COALESCE_WINDOW_SECONDS", "0")),
+                    discard=discard,
+                    idle=idle,
+                )
+    return _coalescer
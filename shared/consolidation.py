@@ -0,0 +1,82 @@
+import re
+from typing import Dict, List
+
+# Consolidated (multi-database) requests. Ledger ids repeat across
+# databases, so ledgers of a consolidated report are keyed "DB:ledger_id"
+# (see ledger_key) everywhere after the fetch: frames, metadata, sheets,
+# summaries and the emailed ledger list.
+
+# Columns of the combined summary sheet
+CONSOLIDATED_COLUMNS = [
+    "Company", "Database", "Ledger Code", "Ledger Name",
+    "Opening Balance", "Total Debit", "Total Credit", "Entries", "Closing Balance",
+]
+
+class ConsolidationError(Exception):
+    """Raised for a malformed `databases` list in a consolidated request."""
+    pass
+
+def ledger_key(db_code: str, ledger_id: str) -> str:
+    """Key of one database's ledger in a consolidated report."""
+    return f"{db_code}:{ledger_id}"
+
+def parse_databases(entries) -> List[Dict[str, object]]:
+    """
+    The request's `databases`: a list of {"db_code": ..., "ledgers": ...}
+    with ledgers as a list or a comma-separated string of numeric ids.
+    Returns [{"db_code": str, "ledger_ids": [str, ...]}] in request order;
+    raises ConsolidationError on an empty list, a missing db_code or ledger
+    list, non-numeric ids or a db_code given twice.
+    """
+    if not isinstance(entries, list) or not entries:
+        raise ConsolidationError("`databases` must be a non-empty list of {db_code, ledgers}.")
+
+    databases, seen = [], set()
+    for i, entry in enumerate(entries):
+        if not isinstance(entry, dict) or not entry.get("db_code"):
+            raise ConsolidationError(f"databases[{i}]: missing db_code.")
+        db_code = str(entry["db_code"]).strip()
+        if db_code.upper() in seen:
+            raise ConsolidationError(f"databases[{i}]: db_code {db_code} is listed twice.")
+        seen.add(db_code.upper())
+
+        raw = entry.get("ledgers")
+        if isinstance(raw, str):
+            raw = raw.split(",")
+        ledgers = [str(l).strip() for l in raw or [] if str(l).strip()]
+        if not ledgers:
+            raise ConsolidationError(f"databases[{i}] ({db_code}): no ledgers specified.")
+        invalid = [l for l in ledgers if not re.fullmatch(r"\d+", l)]
+        if invalid:
+            raise ConsolidationError(f"databases[{i}] ({db_code}): non-numeric ledger IDs {invalid}.")
+        databases.append({"db_code": db_code, "ledger_ids": list(dict.fromkeys(ledgers))})
+    return databases
+
+def _rounded(totals):
+    return [round(value, 2) for value in totals]
+
+def consolidated_rows(metadata: Dict[str, Dict[str, str]], summaries: Dict[str, List[float]]) -> List[tuple]:
+    """
+    Rows of the combined summary sheet as (kind, values): a "ledger" row per
+    ledger in report order, a "total" row closing each company (database),
+    and a final "grand" total. `values` follow CONSOLIDATED_COLUMNS.
+    """
+    rows, company, totals, grand = [], None, None, [0.0, 0.0, 0.0, 0, 0.0]
+
+    def close_company():
+        if company is not None:
+            rows.append(("total", [f"Total {company[1]}", company[0], "", "", *_rounded(totals)]))
+
+    for key, values in summaries.items():
+        m = metadata.get(key) or {}
+        db_code = m.get("db_code") or key.split(":", 1)[0]
+        if company is None or company[0] != db_code:
+            close_company()
+            company, totals = (db_code, m.get("company_name") or db_code), [0.0, 0.0, 0.0, 0, 0.0]
+        rows.append(("ledger", [company[1], db_code, m.get("code", key), m.get("name", ""), *values]))
+        for i, value in enumerate(values):
+            totals[i] += value
+            grand[i] += value
+    close_company()
+    rows.append(("grand", ["Grand Total", "", "", "", *_rounded(grand)]))
+    return rows
@@ -0,0 +1,215 @@
+import base64
+import logging
+import os
+import re
+import tempfile
+import time
+import zipfile
+from email.message import EmailMessage
+from email.policy import SMTP as SMTP_POLICY
+from typing import Callable, Dict, List, Optional, Sequence
+
+XLSX_TYPE = ("application", "vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+ZIP_TYPE = ("application", "zip")
+_TYPES = {".xlsx": XLSX_TYPE, ".zip": ZIP_TYPE}
+
+def attachment_type(path: str):
+    """MIME type (maintype, subtype) of a report file, from its extension."""
+    return _TYPES.get(os.path.splitext(path)[1].lower(), ("application", "octet-stream"))
+
+# Raw bytes per base64 read: a multiple of 57, so every chunk encodes to whole 76-char lines
+_B64_CHUNK = 57 * 1024
+_COPY_CHUNK = 64 * 1024
+# Headers, text part and boundaries on top of the attachment
+_MESSAGE_OVERHEAD = 4096
+
+class AttachmentTooLargeError(Exception):
+    """Raised when a report cannot be brought under the max message size."""
+    pass
+
+def encoded_size(raw_bytes: int) -> int:
+    """Size of raw_bytes once base64-encoded in 76-char CRLF lines."""
+    lines = -(-raw_bytes // 57)
+    return lines * 78
+
+def estimate_message_bytes(attachment_bytes: int) -> int:
+    return encoded_size(attachment_bytes) + _MESSAGE_OVERHEAD
+
+class EncodedMessage:
+    """
+    A complete MIME message with one file attachment, encoded into a spooled
+    temporary file instead of memory.
+
+    Headers and the text part come from EmailMessage (so subject/filename
+    encoding is unchanged); the attachment is read and base64-encoded in
+    chunks. The stored bytes use CRLF line endings and are dot-stuffed, i.e.
+    ready to be streamed as the SMTP DATA payload (see SmtpTransport).
+    """
+
+    def __init__(self, headers: Dict[str, str], body: str, attachment_path: str,
+                 filename: str, mimetype=XLSX_TYPE, spool_bytes: int = 1024 * 1024):
+        started = time.perf_counter()
+        token = os.urandom(45)  # encodes to one 60-char line found nowhere else
+        skeleton = EmailMessage()
+        for name, value in headers.items():
+            skeleton[name] = value
+        skeleton.set_content(body)
+        skeleton.add_attachment(token, maintype=mimetype[0], subtype=mimetype[1], filename=filename)
+        raw = skeleton.as_bytes(policy=SMTP_POLICY)
+        prefix, suffix = raw.split(base64.b64encode(token) + b"\r\n", 1)
+
+        self.attachment_bytes = os.path.getsize(attachment_path)
+        self.file = tempfile.SpooledTemporaryFile(max_size=spool_bytes)
+        self.file.write(_dot_stuff(prefix))
+        with open(attachment_path, "rb") as f:
+            while True:
+                chunk = f.read(_B64_CHUNK)
+                if not chunk:
+                    break
+                self.file.write(base64.encodebytes(chunk).replace(b"\n", b"\r\n"))
+        self.file.write(_dot_stuff(suffix))
+        self.size = self.file.tell()
+        self.encode_seconds = time.perf_counter() - started
+
+    def chunks(self, size: int = _COPY_CHUNK):
+        """The DATA payload, from the start, in chunks of `size` bytes."""
+        self.file.seek(0)
+        while True:
+            chunk = self.file.read(size)
+            if not chunk:
+                return
+            yield chunk
+
+    def close(self):
+        self.file.close()
+
+def _dot_stuff(data: bytes) -> bytes:
+    return re.sub(rb"(?m)^\.", b"..", data)
+
+def zip_attachment(path: str, level: int = 6, arcname: Optional[str] = None) -> str:
+    """Deflate `path` into a .zip next to it (streamed from disk); returns the zip path."""
+    zip_path = os.path.splitext(path)[0] + ".zip"
+    with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=level) as zf:
+        zf.write(path, arcname=arcname or os.path.basename(path))
+    return zip_path
+
+class DeliveryPart:
+    """One email of a delivery: the file to attach and the ledgers it covers."""
+
+    def __init__(self, ledgers: Sequence[str], path: str, filename: str, mimetype, temporary: bool):
+        self.ledgers = list(ledgers)
+        self.path = path
+        self.filename = filename
+        self.mimetype = mimetype
+        self.temporary = temporary  # created by the planner, removed after sending
+
+class DeliveryPolicy:
+    """
+    How a report workbook is delivered, chosen from its size.
+
+    Every message must stay under `max_message_bytes` once base64-encoded.
+    The workbook is attached as-is when it fits. Otherwise it is zipped
+    (zip='auto'; 'always' zips every report, 'never' disables it), and if
+    that is still too big and `split` is on, the ledgers are split over
+    several workbooks, one email each, sized from per-ledger row counts.
+    A single ledger that still does not fit raises AttachmentTooLargeError.
+
+    Note .xlsx is itself a zip archive, so zipping it typically saves only a
+    few percent; splitting is what brings very large reports under the limit.
+    Reports that are .zip files already (csv.gz, parquet) are never re-zipped.
+    """
+
+    def __init__(self, max_message_bytes: int = 20 * 1024 * 1024, zip: str = "auto",
+                 zip_level: int = 6, split: bool = True):
+        if zip not in ("auto", "always", "never"):
+            raise ValueError(f"Unknown zip mode: {zip}")
+        self.max_message_bytes = int(max_message_bytes)
+        self.zip = zip
+        self.zip_level = int(zip_level)
+        self.split = split
+
+    def fits(self, path: str) -> bool:
+        return estimate_message_bytes(os.path.getsize(path)) <= self.max_message_bytes
+
+    def plan(
+        self,
+        path: str,
+        ledgers: Sequence[str],
+        write_workbook: Optional[Callable[[List[str], str], None]] = None,
+        ledger_weights: Optional[Dict[str, int]] = None,
+        _temporary: bool = False
+    ) -> List[DeliveryPart]:
+        """
+        Parts to send for the workbook at `path` covering `ledgers`.
+        `write_workbook(ledger_subset, out_path)` re-exports a subset of the
+        ledgers; without it the report cannot be split.
+        """
+        filename = os.path.basename(path)
+        mimetype = attachment_type(path)
+        zipped = mimetype == ZIP_TYPE
+        if (self.zip != "always" or zipped) and self.fits(path):
+            return [DeliveryPart(ledgers, path, filename, mimetype, _temporary)]
+
+        if self.zip != "never" and not zipped:
+            zip_path = zip_attachment(path, self.zip_level)
+            if self.fits(zip_path):
+                if _temporary:
+                    os.remove(path)
+                return [DeliveryPart(ledgers, zip_path, os.path.basename(zip_path), ZIP_TYPE, True)]
+            os.remove(zip_path)
+
+        if not self.split or write_workbook is None or len(ledgers) < 2:
+            raise AttachmentTooLargeError(
+                f"{filename} ({os.path.getsize(path)} bytes) does not fit in a "
+                f"{self.max_message_bytes}-byte message"
+                + ("" if len(ledgers) < 2 else " and the report cannot be split here")
+            )
+
+        groups = _split_ledgers(ledgers, ledger_weights or {}, os.path.getsize(path), self.max_message_bytes)
+        logging.info(f"{filename} is too large for one email; splitting into {len(groups)} workbooks")
+        if _temporary:
+            os.remove(path)
+        parts = []
+        base, ext = os.path.splitext(path)
+        for i, group in enumerate(groups, 1):
+            part_path = f"{base}_part{i}{ext}"
+            write_workbook(group, part_path)
+            parts.extend(self.plan(part_path, group, write_workbook, ledger_weights, _temporary=True))
+        return parts
+
+def _split_ledgers(ledgers: Sequence[str], weights: Dict[str, int], total_bytes: int,
+                   max_bytes: int) -> List[List[str]]:
+    """
+    Consecutive groups of ledgers, each expected to fit in max_bytes, with the
+    workbook's size shared out in proportion to each ledger's weight (rows).
+    """
+    weight = {lid: max(1, weights.get(lid, 1)) for lid in ledgers}
+    total_weight = sum(weight.values())
+    # Aim below the limit: sheet sizes are only roughly proportional to rows
+    budget = max(1, (max_bytes - _MESSAGE_OVERHEAD) * 0.7 * 57 / 78)
+    groups, current, current_bytes = [], [], 0.0
+    for lid in ledgers:
+        share = total_bytes * weight[lid] / total_weight
+        if current and current_bytes + share > budget:
+            groups.append(current)
+            current, current_bytes = [], 0.0
+        current.append(lid)
+        current_bytes += share
+    groups.append(current)
+    if len(groups) == 1:
+        # Weights say it fits but the workbook did not: halve instead
+        mid = len(ledgers) // 2
+        groups = [list(ledgers[:mid]), list(ledgers[mid:])]
+    return groups
+
+def get_delivery_policy() -> DeliveryPolicy:
+    """
+    Policy from EMAIL_MAX_MESSAGE_MB (default 20), EMAIL_ZIP (auto/always/never),
+    EMAIL_ZIP_LEVEL (default 6) and EMAIL_SPLIT (default on).
+    """
+    return DeliveryPolicy(
+        max_message_bytes=int(float(os.environ.get("EMAIL_MAX_MESSAGE_MB", "20")) * 1024 * 1024),
+        zip=os.environ.get("EMAIL_ZIP", "auto").lower(),
+        zip_level=int(os.environ.get("EMAIL_ZIP_LEVEL", "6")),
+        split=os.environ.get("EMAIL_SPLIT", "1").lower() in ("1", "true", "yes"),
+    )
@@ -1,11 +1,31 @@
 import logging
 import os
+from concurrent.futures import FIRST_EXCEPTION, wait
 from email.message import EmailMessage
-import smtplib
+from email.policy import SMTP as SMTP_POLICY
+
+from .delivery import AttachmentTooLargeError, EncodedMessage, ZIP_TYPE, get_delivery_policy
+from .smtp_transport import get_transport
 
 class EmailSendError(Exception):
     """Raised if sending email fails."""
 
+def _remove_quietly(path, what):
+    try:
+        os.remove(path)
+        logging.info(f"Deleted {what}: {path}")
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logging.warning(f"Failed to delete {what}: {e}")
+
+def _ledger_lines(metadata: dict, ledgers) -> str:
+    """'- code – name' per requested ledger with metadata (the code defaults to the ledger id)."""
+    return "\n".join(
+        f"- {metadata.get(l, {}).get('code', l)} – {metadata.get(l, {}).get('name', '')}"
+        for l in ledgers if l in metadata
+    )
+
 def send_email_with_excel(
     recipient: str,
     file_path: str,
@@ -20,69 +40,152 @@ def send_email_with_excel(
     subject: str = "Ledger Report",
     body: str = None,
     cleanup: bool = False,       # If True, delete the file after sending
-    retries: int = 1             # How many times to retry sending on failure
-):
+    retries: int = None,         # Send attempts; default SMTP_RETRIES
+    transport = None,            # SmtpTransport to send through; default the shared one
+    policy = None,               # DeliveryPolicy; default from EMAIL_* settings
+    write_workbook = None,       # write_workbook(ledger_ids, path): lets large reports be split
+    ledger_weights: dict = None  # Rows per ledger, to size split workbooks
+) -> dict:
     """
     Sends the Excel report as an attachment to the given recipient.
     SMTP credentials must be provided.
     If cleanup=True, the file will be deleted after sending (even on error).
+
+    The delivery policy (shared.delivery) decides from the workbook's size
+    whether it is attached as-is, zipped, or split by ledger over several
+    emails ("part i of n"). Each message is base64-encoded in chunks into a
+    spool file and streamed to the relay, so the attachment is never held
+    in memory whole. Every part is encoded before the first is queued, and
+    parts not yet sent are cancelled when one fails, so a split report is
+    not delivered with parts missing.
+
+    Messages go through the process-wide SmtpTransport for the relay, which
+    reuses an authenticated session across sends and retries transient
+    failures with backoff; this call waits for the outcome.
+
+    Returns delivery stats: parts, zipped, attachment_bytes, bytes_sent,
+    encode_seconds, attempts.
     """
     logging.info("Preparing to send email with Excel attachment.")
     if not smtp_server or not smtp_port or not smtp_username or not smtp_password:
         raise ValueError("SMTP credentials (server, port, username, password) are required")
 
-    msg = EmailMessage()
-    msg['Subject'] = subject
-    msg['From'] = smtp_username
-    msg['To'] = recipient if isinstance(recipient, str) else ", ".join(recipient)
+    to_addrs = [recipient] if isinstance(recipient, str) else list(recipient)
+    policy = policy or get_delivery_policy()
+    parts, encoded_parts, futures = [], [], []
+    stats = {"parts": 0, "zipped": False, "attachment_bytes": 0, "bytes_sent": 0,
+             "encode_seconds": 0.0, "attempts": 0}
+    try:
+        try:
+            parts = policy.plan(file_path, requested_ledgers, write_workbook, ledger_weights)
+        except AttachmentTooLargeError as e:
+            raise EmailSendError(str(e))
+        except Exception as e:
+            logging.error(f"Failed to read Excel attachment: {e}")
+            raise
 
-    # Create the default body if not provided
-    if not body:
-        lines = "\n".join(f"- {metadata[l]['code']} – {metadata[l]['name']}" for l in requested_ledgers if l in metadata)
-        body = f"Requested Ledgers:\n{lines}\n\nPlease find attached the requested ledger report."
-    msg.set_content(body)
+        for n, part in enumerate(parts, 1):
+            part_subject = subject if len(parts) == 1 else f"{subject} (part {n} of {len(parts)})"
+            part_body = body
+            # Create the default body if not provided
+            if not part_body:
+                lines = _ledger_lines(metadata, part.ledgers)
+                part_body = f"Requested Ledgers:\n{lines}\n\nPlease find attached the requested ledger report."
+            encoded_parts.append(EncodedMessage(
+                {"Subject": part_subject, "From": smtp_username, "To": ", ".join(to_addrs)},
+                part_body, part.path, part.filename, part.mimetype,
+            ))
 
-    try:
-        with open(file_path, 'rb') as f:
-            msg.add_attachment(
-                f.read(),
-                maintype='application',
-                subtype='vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                filename=os.path.basename(file_path)
+        # Queued only once every part is encoded, so a failed encode sends nothing
+        transport = transport or get_transport(smtp_server, smtp_port, smtp_username, smtp_password)
+        for n, (part, encoded) in enumerate(zip(parts, encoded_parts), 1):
+            stats["parts"] += 1
+            stats["zipped"] = stats["zipped"] or part.mimetype == ZIP_TYPE
+            stats["attachment_bytes"] += encoded.attachment_bytes
+            stats["bytes_sent"] += encoded.size
+            stats["encode_seconds"] += encoded.encode_seconds
+            logging.info(
+                f"Queueing email {n}/{len(parts)} to {recipient} via {smtp_server}:{smtp_port} "
+                f"({part.filename}, {encoded.size} bytes, encoded in {encoded.encode_seconds:.3f}s)"
             )
+            futures.append(transport.submit(encoded, smtp_username, to_addrs, retries))
+
+        done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+        failure = next((f.exception() for f in futures if f in done and f.exception() is not None), None)
+        if failure is not None:
+            raise failure
+        stats["attempts"] = sum(f.result() for f in futures)
+        logging.info(f"Email sent successfully to {recipient}: {stats}")
+    except EmailSendError:
+        raise
     except Exception as e:
-        logging.error(f"Failed to read Excel attachment: {e}")
+        if not parts:
+            raise
+        logging.error(f"Failed to send email: {e}")
+        raise EmailSendError(str(e))
+    finally:
+        # Parts still queued are never sent; ones a worker is sending are
+        # waited for before their spool files are closed
+        wait([f for f in futures if not f.cancel()])
+        for encoded in encoded_parts:
+            encoded.close()
+        for part in parts:
+            if part.temporary:
+                _remove_quietly(part.path, "attachment part")
         if cleanup:
-            try:
-                os.remove(file_path)
-            except Exception as cleanup_error:
-                logging.warning(f"Failed to delete file after read error: {cleanup_error}")
-        raise
+            _remove_quietly(file_path, "attachment file")
+    return stats
 
-    last_exception = None
-    for attempt in range(1, retries + 1):
-        try:
-            logging.info(f"Connecting to SMTP server {smtp_server}:{smtp_port} as {smtp_username} (attempt {attempt})")
-            with smtplib.SMTP(smtp_server, smtp_port) as smtp:
-                smtp.starttls()
-                smtp.login(smtp_username, smtp_password)
-                smtp.send_message(msg, from_addr=smtp_username, to_addrs=[recipient] if isinstance(recipient, str) else recipient)
-            logging.info(f"Email sent successfully to {recipient}")
-            break  # Success, exit retry loop
-        except Exception as e:
-            logging.error(f"Failed to send email on attempt {attempt}: {e}")
-            last_exception = e
-            if attempt == retries:
-                if cleanup:
-                    try:
-                        os.remove(file_path)
-                    except Exception as cleanup_error:
-                        logging.warning(f"Failed to delete file after send error: {cleanup_error}")
-                raise EmailSendError(f"Failed to send email after {retries} attempts: {last_exception}")
-
-    if cleanup:
-        try:
-            os.remove(file_path)
-            logging.info(f"Deleted attachment file: {file_path}")
-        except Exception as e:
-            logging.warning(f"Failed to delete attachment file: {e}")
+def send_email_with_link(
+    recipient: str,
+    link: str,
+    file_name: str,
+    file_bytes: int,
+    expires_at,
+    metadata: dict,
+    requested_ledgers: list,
+    smtp_server: str = None,
+    smtp_port: int = None,
+    smtp_username: str = None,
+    smtp_password: str = None,
+    subject: str = "Ledger Report",
+    body: str = None,
+    retries: int = None,
+    transport = None
+) -> dict:
+    """
+    Sends a download link to the report instead of attaching it (see
+    shared.artifacts.signed_link), through the same SmtpTransport as
+    send_email_with_excel. `expires_at` is when the link stops working.
+
+    Returns delivery stats in the shape of send_email_with_excel's.
+    """
+    if not smtp_server or not smtp_port or not smtp_username or not smtp_password:
+        raise ValueError("SMTP credentials (server, port, username, password) are required")
+
+    to_addrs = [recipient] if isinstance(recipient, str) else list(recipient)
+    if not body:
+        lines = _ledger_lines(metadata, requested_ledgers)
+        body = (
+            f"Requested Ledgers:\n{lines}\n\n"
+            f"Your ledger report is ready to download ({file_name}, {file_bytes / 2**20:.1f} MB):\n{link}\n\n"
+            f"The link is valid until {expires_at:%d-%b-%Y %H:%M}."
+        )
+    msg = EmailMessage()
+    msg["Subject"] = subject
+    msg["From"] = smtp_username
+    msg["To"] = ", ".join(to_addrs)
+    msg.set_content(body)
+
+    transport = transport or get_transport(smtp_server, smtp_port, smtp_username, smtp_password)
+    logging.info(f"Sending report link to {recipient} via {smtp_server}:{smtp_port} ({file_name})")
+    try:
+        attempts = transport.send(msg, smtp_username, to_addrs, retries)
+    except Exception as e:
+        logging.error(f"Failed to send email: {e}")
+        raise EmailSendError(str(e))
+    stats = {"parts": 1, "zipped": False, "attachment_bytes": 0,
+             "bytes_sent": len(msg.as_bytes(policy=SMTP_POLICY)), "encode_seconds": 0.0,
+             "attempts": attempts, "link": True}
+    logging.info(f"Email sent successfully to {recipient}: {stats}")
+    return stats
@@ -1,8 +1,20 @@
 import logging
+import multiprocessing
+import os
 import re
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
 import pandas as pd
+import xlsxwriter
 from datetime import datetime
 
+from .consolidation import CONSOLIDATED_COLUMNS, consolidated_rows
+from .ledger_rows import (CLOSING_RE as _CLOSING_RE, LEDGER_RE as _LEDGER_RE, OPENING_RE as _OPENING_RE,
+                          SLNO_RE as _SLNO_RE, classify as _classify)
+
 def filter_opening_closing(out, opening_re, closing_re):
     """
     Only keep the *first* 'Opening Balance' and the *last* 'Closing Balance' row.
@@ -21,6 +33,287 @@ def filter_opening_closing(out, opening_re, closing_re):
     cleaned = pd.concat([first_open, middle, last_close], ignore_index=True)
     return cleaned
 
+
+# Streaming export: voucher batches held back waiting for a ledger's opening row
+_MAX_HELD_BATCHES = 4
+
+_SUMMARY_LABELS = [
+    "Opening Balance :",
+    "Total Debit      :",
+    "Total Credit     :",
+    "Number of Entries:",
+    "Closing Balance  :"
+]
+
+def _unique_sheet_name(m, used_sheet_names):
+    name = re.sub(r'[\\/*?:"<>|]', "", m.get("name", ""))[:31]
+    orig_name = name
+    i = 1
+    while name in used_sheet_names:
+        # Excel sheet names must be <=31 characters
+        name = (orig_name[:28] + f"_{i}") if len(orig_name) > 28 else f"{orig_name}_{i}"
+        i += 1
+    used_sheet_names.add(name)
+    return name
+
+def _header_lines(m, lid, sheet_name, requested_by, from_date, to_date, currency, requested_at=None):
+    """The five title lines above a ledger's rows: company, address, ledger, period, requester."""
+    request_dt = (requested_at or datetime.now()).strftime("%d-%b-%Y %H:%M")
+    return [
+        m.get("company_name", ""),
+        m.get("company_address", ""),
+        f"Ledger: {m.get('code', lid)} - {sheet_name}",
+        f"Period: {from_date:%d-%b-%Y} to {to_date:%d-%b-%Y}   Currency: {currency}",
+        f"Requested by: {requested_by} at {request_dt}",
+    ]
+
+def _write_sheet_header(ws, columns, fmts, m, lid, sheet_name, requested_by, from_date, to_date, currency,
+                        requested_at=None):
+    """Merged title block (rows 0-4), column headers (row 6) and frozen panes."""
+    num_cols = len(columns)
+    lines = _header_lines(m, lid, sheet_name, requested_by, from_date, to_date, currency, requested_at)
+    for row, line in enumerate(lines):
+        ws.merge_range(row, 0, row, num_cols-1, line, fmts['title' if row == 0 else 'info'])
+
+    for col_num, value in enumerate(columns):
+        ws.write(6, col_num, value, fmts['hdr'])
+    ws.freeze_panes(7, 0)
+
+def _write_summary(ws, summary_row, num_cols, summary_values, fmts):
+    """Summary block (bottom right)."""
+    col0 = max(0, num_cols - 2)
+    col1 = max(0, num_cols - 1)
+    for idx, (lbl, val) in enumerate(zip(_SUMMARY_LABELS, summary_values)):
+        ws.write(summary_row + idx, col0, lbl, fmts['lbl'])
+        ws.write_number(summary_row + idx, col1, val, fmts['val'])
+
+def _write_footer(ws, requested_by, requested_at=None):
+    footer_ts = (requested_at or datetime.now()).strftime('%d-%b-%Y %H:%M:%S')
+    ws.set_footer(f"&CPage &P of &N&R{footer_ts}  {requested_by}")
+
+SUMMARY_SHEET = "Summary"
+
+def _write_consolidated_sheet(ws, fmts, metadata, summaries, requested_by, from_date, to_date, currency,
+                              requested_at=None):
+    """
+    Combined summary sheet of a consolidated report: every ledger's summary
+    block as a row, a total per company and a grand total. `fmts` may be
+    None (plain cells, as in the xlsx-lite report).
+    """
+    fmt = (lambda name: fmts[name]) if fmts else (lambda name: None)
+    request_dt = (requested_at or datetime.now()).strftime("%d-%b-%Y %H:%M")
+    lines = [
+        "Consolidated Ledger Report",
+        f"Period: {from_date:%d-%b-%Y} to {to_date:%d-%b-%Y}   Currency: {currency}",
+        f"Requested by: {requested_by} at {request_dt}",
+    ]
+    for row, line in enumerate(lines):
+        ws.write_string(row, 0, line, fmt('title' if row == 0 else 'info'))
+    ws.write_row(4, 0, CONSOLIDATED_COLUMNS, fmt('hdr'))
+
+    row = 5
+    for kind, values in consolidated_rows(metadata, summaries):
+        text_fmt = fmt('lbl') if kind != "ledger" else None
+        for col, value in enumerate(values):
+            if col < 4:
+                ws.write_string(row, col, str(value), text_fmt)
+            else:
+                ws.write_number(row, col, value, fmt('val'))
+        row += 1 if kind == "ledger" else 2 if kind == "total" else 1
+    if fmts:
+        ws.set_column(0, 0, 32)
+        ws.set_column(1, 2, 12)
+        ws.set_column(3, 3, 32)
+        ws.set_column(4, 8, 16)
+        ws.freeze_panes(5, 0)
+        _write_footer(ws, requested_by, requested_at)
+
+def _add_formats(workbook):
+    return {
+        'title': workbook.add_format({'bold': True, 'font_size': 14, 'align': 'center'}),
+        'info':  workbook.add_format({'italic': True, 'align': 'center'}),
+        'hdr':   workbook.add_format({
+            'bold': True,
+            'bg_color': '#D7E4BC',
+            'border': 1,
+            'align': 'center'
+        }),
+        'lbl':   workbook.add_format({'bold': True, 'border': 1}),
+        'val':   workbook.add_format({'border': 1, 'num_format': '#,##0.00', 'align': 'right'}),
+        # pandas' default datetime_format for to_excel
+        'datetime': workbook.add_format({'num_format': 'yyyy-mm-dd hh:mm:ss'}),
+    }
+
+def _safe_sum(series):
+    return float(series.sum()) if not series.empty else 0.0
+
+def _column_widths(out):
+    """Excel column widths: longest str() value or header, plus 2, capped at 40."""
+    widths = []
+    for col in out.columns:
+        longest = out[col].astype(str).str.len().max() if len(out) else 0
+        widths.append(min(max(longest, len(col)) + 2, 40))
+    return widths
+
+def _format_dates(dates, positions):
+    """
+    'dd-mm-YYYY' strings for dates[positions] (NaN where unparseable).
+    Parsed over the full column, so format inference sees the same first value
+    as before, but strftime only runs once per distinct day.
+    """
+    days = pd.to_datetime(dates, errors="coerce").dt.normalize()
+    codes, uniques = pd.factorize(days)
+    labels = pd.Series(uniques).dt.strftime("%d-%m-%Y")
+    return labels.reindex(codes[positions]).to_numpy()
+
+def _prepare_sheet(df, format_dates=True):
+    """
+    One ledger's rows as written by save_to_excel, in a single pass.
+
+    Rows are classified once as opening/closing/voucher. The first opening row,
+    the vouchers and the last closing row are kept (see filter_opening_closing),
+    ledger and source Sl.No columns are dropped, Sl.No is numbered over the
+    vouchers with a cumulative count, and the summary totals and column widths
+    come from the same classification. With format_dates=False, Voucher Date
+    keeps its datetime values instead of 'dd-mm-YYYY' strings.
+    Returns (out, widths, [opening, debit, credit, entries, closing]).
+    """
+    is_open, is_close = _classify(df['Voucher Number'])
+    middle = ~(is_open | is_close)
+    open_pos = np.flatnonzero(is_open)[:1]
+    close_pos = np.flatnonzero(is_close)[-1:]
+    positions = np.concatenate([open_pos, np.flatnonzero(middle), close_pos])
+
+    keep = [c for c in df.columns if not (_LEDGER_RE.match(c) or _SLNO_RE.match(c))]
+    out = df.iloc[positions][keep].reset_index(drop=True)
+    if "Voucher Date" in out.columns:
+        if format_dates:
+            out["Voucher Date"] = _format_dates(df["Voucher Date"], positions)
+        else:
+            out["Voucher Date"] = pd.to_datetime(out["Voucher Date"], errors="coerce")
+
+    # Classification of the kept rows (an opening row may also match closing)
+    row_open, row_close = is_open[positions], is_close[positions]
+    vouchers = ~(row_open | row_close)
+
+    sl_no = np.full(len(out), '', dtype=object)
+    sl_no[vouchers] = list(range(1, int(vouchers.sum()) + 1))
+    out.insert(0, 'Sl.No', sl_no)
+
+    has_debit = 'Debit' in out.columns
+    opening_bal = _safe_sum(out['Debit'][row_open]) if has_debit else 0.0
+    total_debit = _safe_sum(out['Debit'][vouchers]) if has_debit else 0.0
+    total_credit = _safe_sum(out['Credit'][vouchers]) if 'Credit' in out.columns else 0.0
+    closing_bal = _safe_sum(out['Debit'][row_close]) if has_debit else opening_bal
+    entries = int(vouchers.sum())
+
+    return out, _column_widths(out), [opening_bal, total_debit, total_credit, entries, closing_bal]
+
+_prepare_pool = None
+_prepare_pool_size = 0
+_prepare_pool_lock = threading.Lock()
+
+def _prepare_workers():
+    """
+    EXCEL_PREPARE_WORKERS: processes for the prepare stage (1 = inline).
+    Default: the CPU count, at most 4, as each worker is a spawned
+    interpreter with pandas loaded; a single-CPU host prepares inline.
+    """
+    return max(1, int(os.environ.get("EXCEL_PREPARE_WORKERS") or min(4, os.cpu_count() or 1)))
+
+def get_prepare_pool(workers=None):
+    """
+    Process-wide pool for _prepare_sheet with at least `workers` processes
+    (default _prepare_workers()), created on first use and reused across
+    requests. Asking for more workers than it has replaces it with a larger
+    pool; the old one finishes the sheets already queued on it. Workers are
+    spawned rather than forked: the host process runs other threads (fetch
+    pool, secret refresh) that fork would copy mid-flight.
+    """
+    global _prepare_pool, _prepare_pool_size
+    workers = _prepare_workers() if workers is None else max(1, workers)
+    with _prepare_pool_lock:
+        if _prepare_pool is None or _prepare_pool_size < workers:
+            old = _prepare_pool
+            _prepare_pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            _prepare_pool_size = workers
+            if old is not None:
+                old.shutdown(wait=False)
+        return _prepare_pool
+
+def _reset_prepare_pool():
+    global _prepare_pool, _prepare_pool_size
+    with _prepare_pool_lock:
+        pool, _prepare_pool, _prepare_pool_size = _prepare_pool, None, 0
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def _iter_prepared(ledgers, workers=None, min_rows=None, format_dates=True):
+    """
+    Yield (lid, (out, widths, summary_values)) for each (lid, df) in `ledgers`,
+    in order. `ledgers` may be a lazy stream (see iter_per_ledger_chunked).
+    `format_dates` is passed to _prepare_sheet.
+
+    With more than one worker (`workers`, default _prepare_workers()),
+    ledgers of at least `min_rows` rows (EXCEL_PARALLEL_MIN_ROWS, default
+    20000) are prepared in the process pool, sized for `workers` and only
+    started once such a ledger arrives, at most 2 x workers ahead of the
+    writer; smaller ones, where pickling would cost more than it saves, are
+    prepared inline. If the pool breaks, the remaining sheets are prepared
+    inline.
+    """
+    workers = _prepare_workers() if workers is None else max(1, workers)
+    if min_rows is None:
+        min_rows = int(os.environ.get("EXCEL_PARALLEL_MIN_ROWS", "20000"))
+    if workers < 2:
+        for lid, df in ledgers:
+            yield lid, _prepare_sheet(df, format_dates)
+        return
+
+    pending = deque()  # (lid, df, future or None if not submitted)
+    pool = None
+    inline = False  # set once the pool has failed
+
+    def submit(lid, df):
+        nonlocal pool, inline
+        future = None
+        if not inline and len(df) >= min_rows:
+            try:
+                pool = pool or get_prepare_pool(workers)
+                future = pool.submit(_prepare_sheet, df, format_dates)
+            except (BrokenProcessPool, RuntimeError) as e:
+                logging.warning(f"Sheet prepare pool unavailable ({e}); preparing inline")
+                _reset_prepare_pool()
+                pool, inline = None, True
+        pending.append((lid, df, future))
+
+    def next_ready():
+        nonlocal pool, inline
+        lid, df, future = pending.popleft()
+        if future is not None:
+            try:
+                return lid, future.result()
+            except BrokenProcessPool as e:
+                logging.warning(f"Sheet prepare pool failed ({e}); preparing remaining sheets inline")
+                _reset_prepare_pool()
+                pool, inline = None, True
+        return lid, _prepare_sheet(df, format_dates)
+
+    try:
+        for lid, df in ledgers:
+            submit(lid, df)
+            if len(pending) >= 2 * workers:
+                yield next_ready()
+        while pending:
+            yield next_ready()
+    finally:
+        for _, _, future in pending:
+            if future is not None:
+                future.cancel()
+
 def save_to_excel(
     data_dict,
     out_path,
@@ -29,127 +322,262 @@ def save_to_excel(
     from_date,
     to_date,
     currency,
-    requested_at  # <-- add this
+    requested_at,  # <-- add this
+    prepare_workers=None,
+    consolidated=False
 ):
+    """
+    Write one sheet per ledger in data_dict.
 
-    logging.info(f"Saving Excel to {out_path} for ledgers: {list(data_dict.keys())}")
+    `data_dict` is a dict or an iterable of (ledger_id, DataFrame) pairs in
+    sheet order; each frame is dropped once its sheet is written, so a lazy
+    stream (see iter_per_ledger_chunked with ordered=True) overlaps the fetch
+    with the export and keeps only unwritten ledgers in memory.
 
-    opening_re = re.compile(r'opening\s*balance', re.IGNORECASE)
-    closing_re = re.compile(r'closing\s*balance', re.IGNORECASE)
-    ledger_re  = re.compile(r'(?i)^(ledger[\s._]*code|ledger[\s._]*name)$')
-    slno_re    = re.compile(r'(?i)^\s*sl[\s._]*no\s*\.?$', re.IGNORECASE)
+    Runs in two stages: sheets are prepared (row filtering, Sl.No, dates,
+    widths, totals) across a process pool, see _iter_prepared, and written
+    single-threaded in ledger order as results arrive.
+    `prepare_workers` overrides EXCEL_PREPARE_WORKERS.
+    With `consolidated`, a first "Summary" sheet totals every ledger by
+    company (see _write_consolidated_sheet).
+    Returns {ledger_id: [opening, debit, credit, entries, closing]}.
+    """
+
+    if isinstance(data_dict, dict):
+        logging.info(f"Saving Excel to {out_path} for ledgers: {list(data_dict.keys())}")
+        data_dict = data_dict.items()
+    else:
+        logging.info(f"Saving Excel to {out_path} (pipelined)")
 
+    summaries = {}
     with pd.ExcelWriter(out_path, engine='xlsxwriter') as writer:
         workbook = writer.book
-
-        # Formatting
-        title_fmt = workbook.add_format({'bold': True, 'font_size': 14, 'align': 'center'})
-        info_fmt  = workbook.add_format({'italic': True, 'align': 'center'})
-        hdr_fmt   = workbook.add_format({
-            'bold': True,
-            'bg_color': '#D7E4BC',
-            'border': 1,
-            'align': 'center'
-        })
+        fmts = _add_formats(workbook)
 
         used_sheet_names = set()
-        for lid, df in data_dict.items():
+        if consolidated:
+            summary_ws = workbook.add_worksheet(SUMMARY_SHEET)
+            used_sheet_names.add(SUMMARY_SHEET)
+        for lid, (out, widths, summary_values) in _iter_prepared(data_dict, prepare_workers):
             m = metadata[lid]
-            name = re.sub(r'[\\/*?:"<>|]', "", m.get("name", ""))[:31]
-            orig_name = name
-            i = 1
-            while name in used_sheet_names:
-                # Excel sheet names must be <=31 characters
-                name = (orig_name[:28] + f"_{i}") if len(orig_name) > 28 else f"{orig_name}_{i}"
-                i += 1
-            used_sheet_names.add(name)
-            sheet_name = name
-
-            company = m.get("company_name", "")
-            address = m.get("company_address", "")
-            code = m.get("code", lid)
-
-            out = df.copy()
-            if "Voucher Date" in out.columns:
-                out["Voucher Date"] = pd.to_datetime(out["Voucher Date"], errors="coerce").dt.strftime("%d-%m-%Y")
-
-            # Remove duplicate opening/closing
-            out = filter_opening_closing(out, opening_re, closing_re)
-
-            # Drop unwanted columns
-            out = out.drop(columns=[c for c in out.columns if ledger_re.match(c)], errors='ignore')
-            out = out.drop(columns=[c for c in out.columns if slno_re.match(c)], errors='ignore')
-
-            # Add Sl.No for real vouchers only
-            sl_no = [''] * len(out)
-            is_valid = ~(out['Voucher Number'].str.contains(opening_re, na=False)) & ~(out['Voucher Number'].str.contains(closing_re, na=False))
-            seq = 1
-            for idx, v in enumerate(is_valid):
-                if v:
-                    sl_no[idx] = seq
-                    seq += 1
-            out.insert(0, 'Sl.No', sl_no)
+            sheet_name = _unique_sheet_name(m, used_sheet_names)
 
             out.to_excel(writer, sheet_name=sheet_name, startrow=7, index=False, header=False)
             ws = writer.sheets[sheet_name]
 
             num_cols = len(out.columns)
-            # Header
-            ws.merge_range(0, 0, 0, num_cols-1, company, title_fmt)
-            ws.merge_range(1, 0, 1, num_cols-1, address, info_fmt)
-            ws.merge_range(2, 0, 2, num_cols-1, f"Ledger: {code} - {name}", info_fmt)
-            ws.merge_range(3, 0, 3, num_cols-1, f"Period: {from_date:%d-%b-%Y} to {to_date:%d-%b-%Y}   Currency: {currency}", info_fmt)
-            request_dt = datetime.now().strftime("%d-%b-%Y %H:%M")
-            ws.merge_range(4, 0, 4, num_cols-1, f"Requested by: {requested_by} at {request_dt}", info_fmt)
-
-            # Column headers
-            for col_num, value in enumerate(out.columns.values):
-                ws.write(6, col_num, value, hdr_fmt)
-            ws.freeze_panes(7, 0)
-
-            for i, col in enumerate(out.columns):
-                col_data = out[col].astype(str)
-                max_len = max(col_data.map(len).max(), len(col)) + 2
-                ws.set_column(i, i, min(max_len, 40))
-
-            # --- Summary Block ---
-            opening_row = out.loc[out['Voucher Number'].str.contains(opening_re, na=False)]
-            closing_row = out.loc[out['Voucher Number'].str.contains(closing_re, na=False)]
-            middle_rows = out[
-                ~(out['Voucher Number'].str.contains(opening_re, na=False)) &
-                ~(out['Voucher Number'].str.contains(closing_re, na=False))
-            ]
-
-            def safe_sum(series): return float(series.sum()) if not series.empty else 0.0
-            opening_bal = safe_sum(opening_row['Debit']) if 'Debit' in opening_row else 0.0
-            total_debit = safe_sum(middle_rows['Debit']) if 'Debit' in middle_rows else 0.0
-            total_credit = safe_sum(middle_rows['Credit']) if 'Credit' in middle_rows else 0.0
-            closing_bal = safe_sum(closing_row['Debit']) if 'Debit' in closing_row else opening_bal
-            entries = len(middle_rows)
-
-            lbl_fmt = workbook.add_format({'bold': True, 'border': 1})
-            val_fmt = workbook.add_format({'border': 1, 'num_format': '#,##0.00', 'align': 'right'})
-
-            # Summary block (bottom right)
-            summary_row = 8 + len(out)
-            col0 = max(0, num_cols - 2)
-            col1 = max(0, num_cols - 1)
-
-            summary_labels = [
-                "Opening Balance :",
-                "Total Debit      :",
-                "Total Credit     :",
-                "Number of Entries:",
-                "Closing Balance  :"
-            ]
-            summary_values = [opening_bal, total_debit, total_credit, entries, closing_bal]
-
-            for idx, (lbl, val) in enumerate(zip(summary_labels, summary_values)):
-                ws.write(summary_row + idx, col0, lbl, lbl_fmt)
-                ws.write_number(summary_row + idx, col1, val, val_fmt)
-
-            # Footer
-            footer_ts = datetime.now().strftime('%d-%b-%Y %H:%M:%S')
-            ws.set_footer(f"&CPage &P of &N&R{footer_ts}  {requested_by}")
+            _write_sheet_header(ws, out.columns.values, fmts, m, lid, sheet_name, requested_by, from_date, to_date,
+                                currency, requested_at)
+
+            for i, width in enumerate(widths):
+                ws.set_column(i, i, width)
+
+            _write_summary(ws, 8 + len(out), num_cols, summary_values, fmts)
+            summaries[lid] = summary_values
+
+            _write_footer(ws, requested_by, requested_at)
+            del out  # don't hold this sheet's rows while waiting for the next ledger
+
+        if consolidated:
+            _write_consolidated_sheet(summary_ws, fmts, metadata, summaries, requested_by, from_date, to_date,
+                                      currency, requested_at)
+
+    logging.info(f"Excel file saved: {out_path}")
+    return summaries
+
+def iter_frame_batches(df, batch_rows=50000):
+    """Yield a DataFrame in row slices, for feeding save_to_excel_streaming."""
+    for start in range(0, len(df), batch_rows):
+        yield df.iloc[start:start + batch_rows]
+
+def _cell(value):
+    """Map a DataFrame value to what pandas' to_excel would hand xlsxwriter."""
+    if value is None or value is pd.NaT:
+        return None
+    if isinstance(value, float) and value != value:
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    return value
+
+class _StreamingSheet:
+    """
+    Writes one ledger sheet from a sequence of row batches in a constant_memory
+    workbook, producing the same layout as save_to_excel.
+
+    constant_memory flushes each row once a later row is written, so cells are
+    written strictly row by row with write_row (pandas' to_excel writes column
+    by column and cannot be used here).
+
+    Only the first 'Opening Balance' row and the last 'Closing Balance' row
+    are kept (as in filter_opening_closing); the opening row is written first
+    and the closing row last. Rows that arrive before the first opening row
+    are held back until it appears, for at most _MAX_HELD_BATCHES batches:
+    past that the ledger is taken to have no opening row and the held rows
+    are written (a later opening row is then written where it arrives).
+    Sl.No, column widths and summary totals are accumulated as batches pass
+    through.
+    """
+
+    def __init__(self, workbook, sheet_name, fmts, header_args):
+        self.workbook = workbook
+        self.sheet_name = sheet_name
+        self.fmts = fmts
+        self.header_args = header_args
+        self.ws = None
+        self.columns = None
+        self.widths = None
+        self.next_row = 7
+        self.seq = 0
+        self.opening = None      # first opening row (1-row DataFrame)
+        self.closing = None      # last closing row seen so far
+        self.held = []           # voucher rows seen before the opening row
+        self.waiting = True      # still holding vouchers back for the opening row
+        self.opening_bal = 0.0
+        self.total_debit = 0.0
+        self.total_credit = 0.0
+        self.has_debit = False
+
+    def _prepare(self, batch):
+        out = batch.drop(columns=[c for c in batch.columns if _LEDGER_RE.match(c) or _SLNO_RE.match(c)])
+        if "Voucher Date" in out.columns:
+            out["Voucher Date"] = _format_dates(out["Voucher Date"], np.arange(len(out)))
+        return out
+
+    def _start(self, columns):
+        self.columns = ['Sl.No'] + list(columns)
+        self.widths = [len(c) for c in self.columns]
+        self.has_debit = 'Debit' in columns
+        self.ws = self.workbook.add_worksheet(self.sheet_name)
+        _write_sheet_header(self.ws, self.columns, self.fmts, **self.header_args)
+
+    def _emit(self, rows, vouchers):
+        if rows.empty:
+            return
+        rows = rows.reset_index(drop=True)
+        if vouchers:
+            sl_no = pd.Series(range(self.seq + 1, self.seq + 1 + len(rows)), dtype=object)
+            self.seq += len(rows)
+            if 'Debit' in rows:
+                self.total_debit += _safe_sum(rows['Debit'])
+            if 'Credit' in rows:
+                self.total_credit += _safe_sum(rows['Credit'])
+        else:
+            sl_no = pd.Series([''] * len(rows), dtype=object)
+        rows.insert(0, 'Sl.No', sl_no)
+        rows = rows.reindex(columns=self.columns)
+        for i, col in enumerate(self.columns):
+            self.widths[i] = max(self.widths[i], rows[col].astype(str).str.len().max())
+
+        ws, dt_fmt = self.ws, self.fmts['datetime']
+        for values in rows.itertuples(index=False, name=None):
+            for col, value in enumerate(values):
+                value = _cell(value)
+                if value is None or value == '':
+                    continue
+                if isinstance(value, datetime):
+                    ws.write_datetime(self.next_row, col, value, dt_fmt)
+                else:
+                    ws.write(self.next_row, col, value)
+            self.next_row += 1
+
+    def feed(self, batch):
+        if batch is None or batch.empty:
+            return
+        out = self._prepare(batch)
+        if self.ws is None:
+            self._start(out.columns)
+        is_open, is_close = _classify(out['Voucher Number'])
+
+        if is_close.any():
+            self.closing = out[is_close].iloc[[-1]]
+        if self.opening is None and is_open.any():
+            self.opening = out.iloc[[is_open.argmax()]]
+            self.opening_bal = _safe_sum(self.opening['Debit']) if self.has_debit else 0.0
+            if not self.waiting:
+                logging.warning("Sheet '%s': opening balance row arrived after %d held batches; "
+                                "written after the vouchers before it", self.sheet_name, _MAX_HELD_BATCHES)
+            self._emit(self.opening, vouchers=False)
+            self._release_held()
+        middle = out[~(is_open | is_close)]
+        if self.opening is None and self.waiting:
+            self.held.append(middle)
+            if len(self.held) >= _MAX_HELD_BATCHES:
+                self._release_held()
+        else:
+            self._emit(middle, vouchers=True)
+
+    def _release_held(self):
+        for held in self.held:
+            self._emit(held, vouchers=True)
+        self.held = []
+        self.waiting = False
+
+    def finish(self, requested_by, requested_at=None):
+        if self.ws is None:
+            # No rows at all: header with only the Sl.No column
+            self._start([])
+        self._release_held()
+        if self.closing is not None:
+            self._emit(self.closing, vouchers=False)
+            closing_bal = _safe_sum(self.closing['Debit']) if self.has_debit else self.opening_bal
+        else:
+            closing_bal = 0.0 if self.has_debit else self.opening_bal
+
+        for i, width in enumerate(self.widths):
+            self.ws.set_column(i, i, min(width + 2, 40))
+
+        summary_values = [self.opening_bal, self.total_debit, self.total_credit, self.seq, closing_bal]
+        _write_summary(self.ws, self.next_row + 1, len(self.columns), summary_values, self.fmts)
+        _write_footer(self.ws, requested_by, requested_at)
+        return summary_values
+
+def save_to_excel_streaming(
+    ledger_batches,
+    out_path,
+    metadata,
+    requested_by,
+    from_date,
+    to_date,
+    currency,
+    requested_at,
+    consolidated=False
+):
+    """
+    Constant-memory variant of save_to_excel.
+
+    `ledger_batches` is an iterable of (ledger_id, iterable of DataFrame row
+    batches), consumed in order; each ledger's batches are written straight
+    into an xlsxwriter `constant_memory` workbook, so only one batch per sheet
+    is held at a time. `consolidated` adds the Summary sheet as in save_to_excel.
+    Returns {ledger_id: [opening, debit, credit, entries, closing]}.
+    """
+    logging.info(f"Saving Excel (streaming) to {out_path}")
+    summaries = {}
+    workbook = xlsxwriter.Workbook(out_path, {'constant_memory': True})
+    try:
+        fmts = _add_formats(workbook)
+        used_sheet_names = set()
+        if consolidated:
+            # Written last; constant_memory only needs each sheet's own rows in order
+            summary_ws = workbook.add_worksheet(SUMMARY_SHEET)
+            used_sheet_names.add(SUMMARY_SHEET)
+        for lid, batches in ledger_batches:
+            m = metadata[lid]
+            sheet_name = _unique_sheet_name(m, used_sheet_names)
+            sheet = _StreamingSheet(workbook, sheet_name, fmts, {
+                'm': m, 'lid': lid, 'sheet_name': sheet_name, 'requested_by': requested_by,
+                'from_date': from_date, 'to_date': to_date, 'currency': currency, 'requested_at': requested_at,
+            })
+            for batch in batches:
+                sheet.feed(batch)
+            summaries[lid] = sheet.finish(requested_by, requested_at)
+            logging.info("Sheet '%s' written: %d entries", sheet_name, summaries[lid][3])
+        if consolidated:
+            _write_consolidated_sheet(summary_ws, fmts, metadata, summaries, requested_by, from_date, to_date,
+                                      currency, requested_at)
+    finally:
+        workbook.close()
 
     logging.info(f"Excel file saved: {out_path}")
+    return summaries
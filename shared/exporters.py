@@ -0,0 +1,264 @@
+import abc
+import gzip
+import io
+import json
+import logging
+import zipfile
+from typing import Dict, List
+
+# Report formats for the request's `format` field. pandas, xlsxwriter and
+# pyarrow are imported by the exporters when they run, so a format can be
+# validated while parsing the request without loading the pipeline.
+FORMATS = ("xlsx", "xlsx-lite", "csv.gz", "parquet")
+DEFAULT_FORMAT = "xlsx"
+
+class UnknownFormatError(Exception):
+    """Raised for a report format not in FORMATS."""
+    pass
+
+def _summary_dict(summary_values) -> Dict[str, float]:
+    """Summary block as {label: value}, with the workbook's labels ("Total Debit", ...)."""
+    from .excel_export import _SUMMARY_LABELS
+    return {label.rstrip(" :"): value for label, value in zip(_SUMMARY_LABELS, summary_values)}
+
+class ReportExporter(abc.ABC):
+    """
+    Writes one report file for (ledger_id, DataFrame) pairs.
+
+    export() takes the same arguments as save_to_excel: `ledgers` is a dict
+    or an iterable of pairs in report order (frames may be dropped once
+    written), and returns {ledger_id: [opening, debit, credit, entries,
+    closing]}. With `consolidated` the report also carries the combined
+    per-company summary (shared.consolidation). `suffix` is the end of the
+    report's file name.
+    """
+
+    name = None
+    suffix = None
+
+    @abc.abstractmethod
+    def export(self, ledgers, out_path, metadata, requested_by, from_date, to_date, currency,
+               requested_at, consolidated=False) -> Dict[str, List[float]]:
+        ...
+
+class XlsxExporter(ReportExporter):
+    """
+    The formatted workbook: save_to_excel, or save_to_excel_streaming with
+    streaming=True. Streamed, each ledger frame is written in row batches
+    and dropped, so `ledgers` should be the fetch's generator
+    (iter_per_ledger_chunked, ordered) rather than a dict of every frame.
+    """
+
+    name = "xlsx"
+    suffix = ".xlsx"
+
+    def __init__(self, streaming: bool = False):
+        self.streaming = streaming
+
+    def export(self, ledgers, out_path, metadata, requested_by, from_date, to_date, currency,
+               requested_at, consolidated=False):
+        from .excel_export import iter_frame_batches, save_to_excel, save_to_excel_streaming
+        if self.streaming:
+            pairs = ledgers.items() if isinstance(ledgers, dict) else ledgers
+            return save_to_excel_streaming(
+                ((lid, iter_frame_batches(df)) for lid, df in pairs),
+                out_path, metadata, requested_by, from_date, to_date, currency, requested_at,
+                consolidated=consolidated
+            )
+        return save_to_excel(ledgers, out_path, metadata, requested_by, from_date, to_date, currency,
+                             requested_at, consolidated=consolidated)
+
+class XlsxLiteExporter(ReportExporter):
+    """
+    One plain sheet per ledger: the same title lines, column headers, rows
+    and summary block as save_to_excel, without merged cells, cell formats
+    or column sizing, written row by row in constant_memory mode.
+    """
+
+    name = "xlsx-lite"
+    suffix = ".xlsx"
+
+    def export(self, ledgers, out_path, metadata, requested_by, from_date, to_date, currency,
+               requested_at, consolidated=False):
+        import xlsxwriter
+        from .excel_export import (SUMMARY_SHEET, _SUMMARY_LABELS, _cell, _header_lines, _iter_prepared,
+                                   _unique_sheet_name, _write_consolidated_sheet)
+
+        logging.info(f"Saving Excel (lite) to {out_path}")
+        if isinstance(ledgers, dict):
+            ledgers = ledgers.items()
+        summaries = {}
+        workbook = xlsxwriter.Workbook(out_path, {
+            'constant_memory': True,
+            'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+        })
+        try:
+            used_sheet_names = set()
+            if consolidated:
+                summary_ws = workbook.add_worksheet(SUMMARY_SHEET)
+                used_sheet_names.add(SUMMARY_SHEET)
+            for lid, (out, _, summary_values) in _iter_prepared(ledgers):
+                m = metadata[lid]
+                sheet_name = _unique_sheet_name(m, used_sheet_names)
+                ws = workbook.add_worksheet(sheet_name)
+                header = _header_lines(m, lid, sheet_name, requested_by, from_date, to_date, currency, requested_at)
+                for row, line in enumerate(header):
+                    ws.write_string(row, 0, line)
+                ws.write_row(6, 0, list(out.columns))
+
+                row = 7
+                for values in out.itertuples(index=False, name=None):
+                    ws.write_row(row, 0, [_cell(v) for v in values])
+                    row += 1
+
+                col0, col1 = max(0, len(out.columns) - 2), max(0, len(out.columns) - 1)
+                for i, (label, value) in enumerate(zip(_SUMMARY_LABELS, summary_values)):
+                    ws.write_string(row + 1 + i, col0, label)
+                    ws.write_number(row + 1 + i, col1, value)
+                summaries[lid] = summary_values
+                del out
+            if consolidated:
+                _write_consolidated_sheet(summary_ws, None, metadata, summaries, requested_by, from_date,
+                                          to_date, currency, requested_at)
+        finally:
+            workbook.close()
+        logging.info(f"Excel file saved: {out_path}")
+        return summaries
+
+class _ZippedExporter(ReportExporter):
+    """
+    A .zip with one file per ledger (written by _write_ledger) and a
+    manifest.json holding each ledger's title lines and summary block,
+    as they appear in the workbook (plus the Summary sheet's rows as
+    "consolidated" for a consolidated report). Ledger files are stored,
+    not deflated: they are compressed already. The requester and request
+    time are in manifest.json only, so ledger files never need stamping
+    (see shared.stamping).
+    """
+
+    extension = None
+    format_dates = True
+
+    @abc.abstractmethod
+    def _write_ledger(self, out, entry, header: List[str], summary: Dict[str, float]):
+        """Write one ledger's prepared rows into the open zip entry."""
+        ...
+
+    def export(self, ledgers, out_path, metadata, requested_by, from_date, to_date, currency,
+               requested_at, consolidated=False):
+        from .consolidation import CONSOLIDATED_COLUMNS, consolidated_rows
+        from .excel_export import _header_lines, _iter_prepared, _unique_sheet_name
+
+        logging.info(f"Saving {self.name} report to {out_path}")
+        if isinstance(ledgers, dict):
+            ledgers = ledgers.items()
+        summaries = {}
+        manifest = {
+            "format": self.name,
+            "requested_by": requested_by,
+            "requested_at": f"{requested_at:%Y-%m-%d %H:%M:%S}" if requested_at else None,
+            "from_date": f"{from_date:%Y-%m-%d}",
+            "to_date": f"{to_date:%Y-%m-%d}",
+            "currency": currency,
+            "ledgers": [],
+        }
+        with zipfile.ZipFile(out_path, "w", compression=zipfile.ZIP_STORED) as zf:
+            used_sheet_names = set()
+            for lid, (out, _, summary_values) in _iter_prepared(ledgers, format_dates=self.format_dates):
+                m = metadata[lid]
+                sheet_name = _unique_sheet_name(m, used_sheet_names)
+                header = _header_lines(m, lid, sheet_name, requested_by, from_date, to_date, currency, requested_at)
+                summary = _summary_dict(summary_values)
+                file_name = f"{sheet_name or lid}{self.extension}"
+                with zf.open(file_name, "w") as entry:
+                    # Without the "Requested by" line, which only manifest.json carries
+                    self._write_ledger(out, entry, header[:-1], summary)
+                manifest["ledgers"].append({
+                    "ledger_id": lid,
+                    "code": m.get("code", lid),
+                    "name": m.get("name", ""),
+                    "file": file_name,
+                    "rows": len(out),
+                    "header": header,
+                    "summary": summary,
+                })
+                summaries[lid] = summary_values
+                del out
+            if consolidated:
+                manifest["consolidated"] = [
+                    dict(zip(CONSOLIDATED_COLUMNS, values), row=kind)
+                    for kind, values in consolidated_rows(metadata, summaries)
+                ]
+            zf.writestr("manifest.json", json.dumps(manifest, indent=2, default=str),
+                        compress_type=zipfile.ZIP_DEFLATED)
+        logging.info(f"{self.name} report saved: {out_path}")
+        return summaries
+
+class CsvGzExporter(_ZippedExporter):
+    """A gzip-compressed CSV per ledger (rows as in the workbook, dates as dd-mm-YYYY), zipped."""
+
+    name = "csv.gz"
+    suffix = "_csv.zip"
+    extension = ".csv.gz"
+
+    def __init__(self, level: int = 6):
+        self.level = level
+
+    def _write_ledger(self, out, entry, header, summary):
+        # mtime=0 keeps the bytes identical for identical data
+        with gzip.GzipFile(fileobj=entry, mode="wb", compresslevel=self.level, mtime=0) as gz:
+            with io.TextIOWrapper(gz, encoding="utf-8", newline="") as text:
+                out.to_csv(text, index=False, chunksize=50000)
+
+class ParquetExporter(_ZippedExporter):
+    """
+    A Parquet file per ledger, zipped: Voucher Date as timestamps, Sl.No as
+    a nullable integer, and the title lines and summary also in the file's
+    key/value metadata ("ledger_report").
+    """
+
+    name = "parquet"
+    suffix = "_parquet.zip"
+    extension = ".parquet"
+    format_dates = False
+
+    def __init__(self, compression: str = "zstd"):
+        self.compression = compression
+
+    def _write_ledger(self, out, entry, header, summary):
+        import pandas as pd
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        out = out.copy()
+        out["Sl.No"] = pd.to_numeric(out["Sl.No"].where(out["Sl.No"] != ""), errors="coerce").astype("Int64")
+        table = pa.Table.from_pandas(out, preserve_index=False)
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}),
+            b"ledger_report": json.dumps({"header": header, "summary": summary}).encode("utf-8"),
+        })
+        # The zip entry cannot seek; the file is assembled in memory first
+        buf = io.BytesIO()
+        pq.write_table(table, buf, compression=self.compression)
+        entry.write(buf.getbuffer())
+
+_EXPORTERS = {
+    "xlsx": XlsxExporter,
+    "xlsx-lite": XlsxLiteExporter,
+    "csv.gz": CsvGzExporter,
+    "parquet": ParquetExporter,
+}
+
+def normalize_format(fmt) -> str:
+    """The request's `format` (case-insensitive, default xlsx); raises UnknownFormatError."""
+    name = str(fmt or DEFAULT_FORMAT).strip().lower()
+    if name not in _EXPORTERS:
+        raise UnknownFormatError(f"Unknown report format '{fmt}'; expected one of: {', '.join(FORMATS)}")
+    return name
+
+def get_exporter(fmt=None, streaming: bool = False) -> ReportExporter:
+    """Exporter for a report format; `streaming` selects save_to_excel_streaming for xlsx."""
+    name = normalize_format(fmt)
+    if name == "xlsx":
+        return XlsxExporter(streaming=streaming)
+    return _EXPORTERS[name]()
@@ -1,14 +1,264 @@
 import logging
 import re
+import time
 from datetime import timedelta
-from dateutil.relativedelta import relativedelta
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import List, Dict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, List, Dict, Iterator, Optional, Tuple
 
+import numpy as np
 import pandas as pd
-import pytds
+from pandas.api.types import union_categoricals
 
-from .connection import parse_conn_str, ConnectionStringError
+from .pool import PoolTimeoutError, get_pool
+from .chunk_cache import ChunkCache, template_hash
+from .chunking import MONTHLY, calendar_months
+from .scheduler import SchedulerTimeoutError, get_scheduler
+from .parser import ProcCall, SqlParseError, compile_proc
+from . import tracing
+
+_STR_LEDGERS_RE = re.compile(r"@StrLedgers\s*=\s*\'[^\']+\'", re.IGNORECASE)
+_FROM_DATE_RE = re.compile(r"@FromDate\s*=\s*\'[^\']+\'", re.IGNORECASE)
+_TO_DATE_RE = re.compile(r"@ToDate\s*=\s*\'[^\']+\'", re.IGNORECASE)
+
+# How chunk bounds are written into the proc call (the template's own format)
+_CHUNK_DATE_FORMAT = "%d-%b-%Y %H:%M:%S"
+
+def _build_chunk_sql(sql_template: str, ledger_str: str, start, end) -> str:
+    """
+    Rewrite @StrLedgers/@FromDate/@ToDate in the proc call for one chunk
+    (SQL text path, for templates compile_proc does not accept).
+    """
+    chunk_sql = "SET NOCOUNT ON;\n" + sql_template
+    chunk_sql = _STR_LEDGERS_RE.sub(lambda _: f"@StrLedgers='{ledger_str}'", chunk_sql)
+    chunk_sql = _FROM_DATE_RE.sub(lambda _: f"@FromDate='{start:{_CHUNK_DATE_FORMAT}}'", chunk_sql)
+    chunk_sql = _TO_DATE_RE.sub(lambda _: f"@ToDate='{end:{_CHUNK_DATE_FORMAT}}'", chunk_sql)
+    return chunk_sql
+
+def _bind_chunk(call: ProcCall, ledger_str: str, start, end) -> Dict[str, Any]:
+    """
+    RPC parameters for one chunk. A date the template passes as a quoted
+    literal is bound as text in _build_chunk_sql's format: the proc declares
+    it as a character parameter, and a datetime converted to one by the
+    server loses its seconds (style 0), cutting off the chunk end 23:59:59.
+    """
+    def as_declared(name, value):
+        return value.strftime(_CHUNK_DATE_FORMAT) if isinstance(call.get(name), str) else value
+    return call.bind(
+        StrLedgers=ledger_str,
+        FromDate=as_declared("FromDate", start),
+        ToDate=as_declared("ToDate", end)
+    )
+
+def _compile_template(sql_template: str) -> Optional[ProcCall]:
+    """The template as a ProcCall for RPC execution, or None to fall back to SQL text."""
+    try:
+        return compile_proc(sql_template)
+    except SqlParseError as e:
+        logging.info("SQL template sent as text (not a plain proc call: %s)", e)
+        return None
+
+# Column kinds for a fetch schema ({column name: kind})
+DATETIME = "datetime"  # datetime64
+MONEY = "money"        # float64 (pytds returns Decimal for money/decimal columns)
+CATEGORY = "category"  # categorical, for strings repeated across rows
+
+# Result columns of the ledger proc
+LEDGER_SCHEMA = {
+    "Voucher Date": DATETIME,
+    "Debit": MONEY,
+    "Credit": MONEY,
+    "Voucher Type": CATEGORY,
+    "Narration": CATEGORY,
+    "Ledger Code": CATEGORY,
+    "Ledger Name": CATEGORY,
+}
+
+def _typed(values, kind: Optional[str]) -> pd.Series:
+    """
+    One batch of a column as a Series of `kind`. Values that do not convert
+    cleanly (e.g. text in a money column) are left as pandas infers them.
+    """
+    if isinstance(values, list):
+        try:
+            if kind == MONEY:
+                return pd.Series(values, dtype=np.float64)  # float(Decimal) per value, None -> NaN
+            if kind == CATEGORY:
+                values = pd.Series(values, dtype=object)  # skips inferring a string dtype first
+        except (ValueError, TypeError):
+            pass
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+    try:
+        if kind == DATETIME and not pd.api.types.is_datetime64_any_dtype(series.dtype):
+            return pd.to_datetime(series)
+        if kind == MONEY and series.dtype != np.float64:
+            return pd.to_numeric(series).astype(np.float64)
+        if kind == CATEGORY:
+            if not isinstance(series.dtype, pd.CategoricalDtype):
+                series = series.astype("category")
+            # Same category dtype for every batch, so they can be unioned
+            if series.cat.categories.dtype != object:
+                series = series.cat.set_categories(series.cat.categories.astype(object))
+            return series
+    except (ValueError, TypeError):
+        pass
+    return series
+
+def _concat(parts: List[pd.Series], kind: Optional[str]) -> pd.Series:
+    """Join a column's batches; categorical batches are merged without expanding to strings."""
+    if kind is not None:
+        parts = [_typed(part, kind) for part in parts]
+    if kind == CATEGORY and all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+        series = pd.Series(union_categoricals(parts, ignore_order=True))
+        # Mostly distinct values: categories would only add the codes on top
+        if len(series.cat.categories) * 2 > len(series):
+            series = series.astype(object)
+        return series
+    return parts[0] if len(parts) == 1 else pd.concat(parts, ignore_index=True)
+
+def memory_report(df: pd.DataFrame) -> dict:
+    """Deep memory use of a frame: {"rows", "bytes", "columns": {name: {"dtype", "bytes"}}}."""
+    usage = df.memory_usage(index=False, deep=True)
+    return {
+        "rows": len(df),
+        "bytes": int(usage.sum()),
+        "columns": {col: {"dtype": str(df[col].dtype), "bytes": int(usage[col])} for col in df.columns},
+    }
+
+class _ColumnBuffer:
+    """
+    Accumulates tuple rows column-wise across chunks so a single DataFrame can
+    be built at the end instead of concatenating one frame per chunk.
+    Pending rows are packed into typed Series every `flush_rows` rows, so
+    Python objects are only held for one batch at a time.
+    Result sets whose columns differ from earlier ones are aligned by name,
+    with None filling the gaps (as pd.concat would).
+
+    Columns named in `schema` are converted to its kind (DATETIME, MONEY,
+    CATEGORY) batch by batch, so e.g. Decimal amounts never accumulate as
+    objects; other columns keep pandas' inferred dtype.
+    """
+
+    def __init__(self, flush_rows: int = 5000, schema: Optional[Dict[str, str]] = None):
+        self.flush_rows = flush_rows
+        self.schema = schema or {}
+        self.columns: List[str] = []
+        self._parts: Dict[str, List[pd.Series]] = {}
+        self._pending: Dict[str, list] = {}
+        self._pending_rows = 0
+        self.rows = 0
+
+    def extend(self, cols: List[str], rows: list):
+        if not rows:
+            return
+        for col in cols:
+            if col not in self._parts:
+                # Flushed rows are backfilled in _parts, pending ones in _pending
+                flushed = self.rows - self._pending_rows
+                self.columns.append(col)
+                self._parts[col] = [pd.Series([None] * flushed, dtype=object)] if flushed else []
+                self._pending[col] = [None] * self._pending_rows
+        for col, values in zip(cols, zip(*rows)):
+            self._pending[col].extend(values)
+        if len(cols) != len(self.columns):
+            for col in self.columns:
+                if col not in cols:
+                    self._pending[col].extend([None] * len(rows))
+        self._pending_rows += len(rows)
+        self.rows += len(rows)
+        if self._pending_rows >= self.flush_rows:
+            self._flush()
+
+    def extend_frame(self, df: pd.DataFrame):
+        """Append an already-built DataFrame (e.g. a cached chunk) as-is."""
+        if df.empty:
+            return
+        self._flush()
+        for col in df.columns:
+            if col not in self._parts:
+                self.columns.append(col)
+                self._parts[col] = [pd.Series([None] * self.rows, dtype=object)] if self.rows else []
+                self._pending[col] = []
+        for col in self.columns:
+            if col in df.columns:
+                self._parts[col].append(_typed(df[col].reset_index(drop=True), self.schema.get(col)))
+            else:
+                self._parts[col].append(pd.Series([None] * len(df), dtype=object))
+        self.rows += len(df)
+
+    def _flush(self):
+        if not self._pending_rows:
+            return
+        for col in self.columns:
+            self._parts[col].append(_typed(self._pending[col], self.schema.get(col)))
+            self._pending[col] = []
+        self._pending_rows = 0
+
+    def to_frame(self) -> pd.DataFrame:
+        if not self.rows:
+            return pd.DataFrame()
+        self._flush()
+        data = {}
+        for col in self.columns:
+            data[col] = _concat(self._parts.pop(col), self.schema.get(col))
+        return pd.DataFrame(data, columns=self.columns)
+
+def _read_first_nonempty_set(cursor, buf: _ColumnBuffer, batch_size: int) -> int:
+    """
+    Stream the first non-empty result-set of the current execute into buf,
+    skipping the rest. Returns the number of rows read.
+    """
+    got = 0
+    while True:
+        if cursor.description and not got:
+            cols = [col[0] for col in cursor.description]
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                buf.extend(cols, rows)
+                got += len(rows)
+        if not cursor.nextset():
+            break
+    return got
+
+def _split_by_ledger(
+    df: pd.DataFrame,
+    group: List[str],
+    ledger_column: str,
+    ledger_keys: Optional[Dict[str, str]]
+) -> Dict[str, pd.DataFrame]:
+    """
+    Split a multi-ledger result set back into one DataFrame per ledger id.
+    Rows are matched on `ledger_column`, either against the ledger id itself or
+    against ledger_keys[lid] (e.g. the ledger code from metadata).
+    Ledgers without rows get an empty DataFrame, same as the per-ledger path.
+    """
+    out = {lid: pd.DataFrame() for lid in group}
+    if df.empty:
+        return out
+    if ledger_column not in df.columns:
+        raise ValueError(f"Result set has no '{ledger_column}' column to split ledgers on")
+
+    key_to_lid = {}
+    for lid in group:
+        key = (ledger_keys or {}).get(lid) or lid
+        key_to_lid[str(key).strip()] = lid
+
+    keys = df[ledger_column].astype(str).str.strip()
+    matched = 0
+    for key, part in df.groupby(keys, sort=False):
+        lid = key_to_lid.get(key)
+        if lid is None:
+            continue
+        out[lid] = part.reset_index(drop=True)
+        matched += len(part)
+
+    if matched < len(df):
+        logging.warning(
+            "Dropped %d rows not matching any requested ledger on column '%s'",
+            len(df) - matched, ledger_column
+        )
+    return out
 
 def fetch_per_ledger_chunked(
     conn_str: str,
@@ -17,100 +267,277 @@ def fetch_per_ledger_chunked(
     from_date,
     to_date,
     max_workers: int = 5,
-    retry_attempts: int = 1
+    retry_attempts: int = 1,
+    ledgers_per_call: int = 1,
+    ledger_column: str = "Ledger Code",
+    ledger_keys: Optional[Dict[str, str]] = None,
+    fetch_batch_size: int = 5000,
+    progress: Optional[Callable[[int, int], None]] = None,
+    chunk_cache: Optional[ChunkCache] = None,
+    db_code: Optional[str] = None,
+    chunking=None,
+    job_id: Optional[str] = None,
+    schema: Optional[Dict[str, str]] = None,
+    rpc: bool = True
 ) -> Dict[str, pd.DataFrame]:
     """
     Fetch data for each ledger in calendar-month chunks, in parallel.
     Returns a dict: {ledger_id: DataFrame (possibly empty if error)}
+
+    With ledgers_per_call > 1, ledgers are sent to the proc in groups through a
+    comma-separated @StrLedgers and the combined result is split back per ledger
+    on `ledger_column`. `ledger_keys` maps ledger id -> value in that column
+    (e.g. the metadata code); without it the ledger id itself is matched.
+    Every row the proc returns must carry the ledger column in this mode.
+
+    Rows are streamed with fetchmany(fetch_batch_size) into per-column buffers
+    and each ledger's DataFrame is built once, after its last chunk.
+
+    `progress(done, total)` is called with the number of ledgers finished so
+    far each time a ledger (or group) completes.
+
+    With a chunk_cache, closed periods are served from (and stored to) the
+    cache under db_code one calendar month at a time, whatever window the
+    chunking strategy picked; only open months and cache misses go to the
+    database. Grouped calls are cached per group of ledgers.
+
+    `chunking` picks how the date range is split (shared.chunking); the
+    default is calendar months. With AdaptiveChunking each window is sized
+    from the previous one's row count and latency, and the density learned
+    for (db_code, ledger) carries over to later requests.
+
+    Every proc call holds a slot from the process-wide DB scheduler, which
+    caps in-flight queries per database across requests; `job_id` identifies
+    this request for its round-robin fairness. A pooled connection is
+    borrowed for each call inside its slot, not held across a ledger's
+    chunks. Running out of either raises (PoolTimeoutError,
+    SchedulerTimeoutError) instead of leaving the ledger empty.
+
+    With a `schema` ({column: DATETIME | MONEY | CATEGORY}, e.g. LEDGER_SCHEMA)
+    those columns are converted to compact dtypes while rows are collected
+    (see _ColumnBuffer); memory_report(df) shows what each ledger frame holds.
+
+    With rpc=True the template is parsed once (shared.parser.compile_proc)
+    and each chunk is a parameterized RPC call, cursor.callproc(proc,
+    {"@StrLedgers": ..., "@FromDate": ..., "@ToDate": ..., ...}), so SQL
+    Server reuses one cached plan and no SQL is rebuilt per chunk. Chunk
+    bounds keep the template's literal type: quoted dates are bound as
+    'dd-Mon-YYYY HH:MM:SS' text, exactly as the SQL text path writes them.
+    Templates that are not a single EXEC with literal arguments are sent as
+    rewritten SQL text, as with rpc=False.
+
+    See iter_per_ledger_chunked to consume ledgers as they complete.
+    """
+    results = dict(iter_per_ledger_chunked(
+        conn_str, sql_template, ledgers, from_date, to_date,
+        max_workers=max_workers,
+        retry_attempts=retry_attempts,
+        ledgers_per_call=ledgers_per_call,
+        ledger_column=ledger_column,
+        ledger_keys=ledger_keys,
+        fetch_batch_size=fetch_batch_size,
+        progress=progress,
+        chunk_cache=chunk_cache,
+        db_code=db_code,
+        chunking=chunking,
+        job_id=job_id,
+        schema=schema,
+        rpc=rpc
+    ))
+    return {lid: results[lid] for lid in ledgers}
+
+def iter_per_ledger_chunked(
+    conn_str: str,
+    sql_template: str,
+    ledgers: List[str],
+    from_date,
+    to_date,
+    max_workers: int = 5,
+    retry_attempts: int = 1,
+    ledgers_per_call: int = 1,
+    ledger_column: str = "Ledger Code",
+    ledger_keys: Optional[Dict[str, str]] = None,
+    fetch_batch_size: int = 5000,
+    progress: Optional[Callable[[int, int], None]] = None,
+    chunk_cache: Optional[ChunkCache] = None,
+    db_code: Optional[str] = None,
+    chunking=None,
+    job_id: Optional[str] = None,
+    schema: Optional[Dict[str, str]] = None,
+    rpc: bool = True,
+    ordered: bool = False,
+    max_ahead: Optional[int] = None
+) -> Iterator[Tuple[str, pd.DataFrame]]:
+    """
+    Generator form of fetch_per_ledger_chunked (same arguments): yields
+    (ledger_id, DataFrame) as each ledger (or group) finishes, so a consumer
+    can export and drop ledgers while others are still loading.
+
+    With ordered=True ledgers come out in the order of `ledgers`; ones that
+    finish early are held back until every ledger before them has been yielded.
+
+    `max_ahead` bounds the ledgers fetched or in flight but not yet yielded:
+    no further group is started while that many are outstanding, so a slow
+    consumer holds back the fetch instead of letting frames pile up. Groups
+    are started in request order, so the next ledger due is always among them.
+    Closing the generator early cancels ledgers not yet started.
     """
     logging.info("Starting fetch_per_ledger_chunked for ledgers: %s", ledgers)
-    results = {}
+    ledgers_per_call = max(1, int(ledgers_per_call or 1))
+    groups = [ledgers[i:i + ledgers_per_call] for i in range(0, len(ledgers), ledgers_per_call)]
+    tpl_hash = template_hash(sql_template) if chunk_cache is not None else None
+    chunking = chunking or MONTHLY
+    call = _compile_template(sql_template) if rpc else None
 
-    def proc(lid: str) -> tuple[str, pd.DataFrame]:
+    def proc(group: List[str]) -> Dict[str, pd.DataFrame]:
         """
-        Process a single ledger, fetch data chunked by month.
-        Returns (ledger_id, DataFrame).
-        Logs and returns empty DataFrame on any error.
+        Process a group of ledgers, fetch data chunk by chunk.
+        Returns {ledger_id: DataFrame}.
+        Logs and returns empty DataFrames on any error, except running out of
+        pooled connections or scheduler slots: that is the host being
+        overloaded, not the ledger failing, and fails the request instead of
+        sending a report with the ledger silently empty.
         """
-        logging.info("=== Processing ledger %s ===", lid)
+        label = ",".join(group)
+        logging.info("=== Processing ledger(s) %s ===", label)
         for attempt in range(1, retry_attempts+1):
             try:
-                (server, port), database, user, password = parse_conn_str(conn_str)
-                df_all = pd.DataFrame()
-                with pytds.connect(server=server, database=database, user=user, password=password, port=port, as_dict=True) as conn:
-                    cursor = conn.cursor()
-                    current = from_date
-
-                    while current <= to_date:
-                        chunk_end = min(
-                            current + relativedelta(months=1) - timedelta(seconds=1),
-                            to_date
-                        )
-                        chunk_sql = "SET NOCOUNT ON;\n" + sql_template
-                        chunk_sql = re.sub(
-                            r"@StrLedgers\s*=\s*\'[^\']+\'",
-                            f"@StrLedgers='{lid}'",
-                            chunk_sql,
-                            flags=re.IGNORECASE
-                        )
-                        chunk_sql = re.sub(
-                            r"@FromDate\s*=\s*\'[^\']+\'",
-                            f"@FromDate='{current:%d-%b-%Y %H:%M:%S}'",
-                            chunk_sql,
-                            flags=re.IGNORECASE
-                        )
-                        chunk_sql = re.sub(
-                            r"@ToDate\s*=\s*\'[^\']+\'",
-                            f"@ToDate='{chunk_end:%d-%b-%Y %H:%M:%S}'",
-                            chunk_sql,
-                            flags=re.IGNORECASE
+                buf = _ColumnBuffer(fetch_batch_size, schema)
+                cutoff = chunk_cache.cutoff() if chunk_cache is not None else None
+                planner = chunking.planner((db_code, label), from_date, to_date,
+                                           align_until=cutoff, ledger_count=len(group))
+
+                def run(query, target, start, end):
+                    """One proc call for [start, end] streamed into target: (rows, seconds)."""
+                    if call is not None:
+                        bound = _bind_chunk(call, label, start, end)
+                        logging.debug(
+                            "Ledger %s: chunk %s → %s\nRPC: %s %s",
+                            label, start, end, call.proc, bound
                         )
+                    else:
+                        chunk_sql = _build_chunk_sql(sql_template, label, start, end)
                         logging.debug(
                             "Ledger %s: chunk %s → %s\nSQL: %s",
-                            lid, current, chunk_end, chunk_sql
+                            label, start, end, chunk_sql
+                        )
+
+                    # Execute and stream the first non-empty result-set. The
+                    # connection is borrowed per chunk, inside the slot, so
+                    # queued chunks of other requests do not hold one idle.
+                    queued = time.perf_counter()
+                    with get_scheduler().slot(conn_str, job_id) as slot, \
+                            get_pool().connection(conn_str) as conn:
+                        began = time.perf_counter()
+                        query.set(wait_ms=round((began - queued) * 1000, 3))
+                        cursor = conn.cursor()
+                        if call is not None:
+                            cursor.callproc(call.proc, bound)
+                        else:
+                            cursor.execute(chunk_sql)
+                        rows = slot.rows = _read_first_nonempty_set(cursor, target, fetch_batch_size)
+                    logging.debug("Ledger %s chunk %s→%s returned %d rows", label, start, end, rows)
+                    return rows, time.perf_counter() - began
+
+                for current, chunk_end in planner.windows():
+                    with tracing.span("db.query", ledgers=label) as query:
+                        if chunk_cache is not None and chunk_cache.is_immutable(chunk_end):
+                            # Closed period: cached and fetched per calendar month
+                            got, seconds, hits, calls = 0, 0.0, 0, 0
+                            for start, end in calendar_months(current, chunk_end):
+                                calls += 1
+                                cached = chunk_cache.get(db_code, label, start, end, tpl_hash)
+                                if cached is None:
+                                    target = _ColumnBuffer(fetch_batch_size, schema)
+                                    _, took = run(query, target, start, end)
+                                    seconds += took
+                                    cached = target.to_frame()
+                                    chunk_cache.put(db_code, label, start, end, tpl_hash, cached)
+                                else:
+                                    hits += 1
+                                    logging.debug(
+                                        "Ledger %s chunk %s→%s served from cache (%d rows)",
+                                        label, start, end, len(cached)
+                                    )
+                                got += len(cached)
+                                buf.extend_frame(cached)
+                            if hits:
+                                query.set(cache_hits=hits)
+                        else:
+                            got, seconds = run(query, buf, current, chunk_end)
+                            calls = 1
+
+                        query.set(rows=got)
+                        planner.record(
+                            got, seconds,
+                            (chunk_end - current + timedelta(seconds=1)).total_seconds() / 86400,
+                            calls
                         )
 
-                        # Execute and collect all result-sets
-                        cursor.execute(chunk_sql)
-                        all_sets = []
-                        while True:
-                            if cursor.description:
-                                rows = cursor.fetchall() or []
-                                all_sets.append(rows)
-                                logging.debug(
-                                    "Ledger %s chunk %s→%s returned %d rows in this set",
-                                    lid, current, chunk_end, len(rows)
-                                )
-                            if not cursor.nextset():
-                                break
-
-                        # Select the first non-empty set
-                        for result_set in all_sets:
-                            if result_set:
-                                chunk_df = pd.DataFrame(result_set)
-                                df_all = pd.concat([df_all, chunk_df], ignore_index=True)
-                                break  # Only the first non-empty set
-
-                        current = chunk_end + timedelta(seconds=1)
-
-                logging.info("Ledger %s fetch complete. Rows: %d", lid, len(df_all))
-                return lid, df_all
+                df_all = buf.to_frame()
+                logging.info("Ledger %s fetch complete. Rows: %d", label, len(df_all))
+                if logging.getLogger().isEnabledFor(logging.DEBUG):
+                    logging.debug("Ledger %s memory: %s", label, memory_report(df_all))
+                if len(group) == 1:
+                    return {group[0]: df_all}
+                return _split_by_ledger(df_all, group, ledger_column, ledger_keys)
 
+            except (PoolTimeoutError, SchedulerTimeoutError):
+                logging.error("Ledger %s: no database capacity, failing the fetch", label)
+                raise
             except Exception as e:
-                logging.error("Error fetching ledger %s (attempt %d): %s", lid, attempt, e)
+                logging.error("Error fetching ledger %s (attempt %d): %s", label, attempt, e)
                 if attempt == retry_attempts:
-                    return lid, pd.DataFrame()  # Return empty DataFrame on failure
+                    return {lid: pd.DataFrame() for lid in group}  # Empty DataFrames on failure
+
+    yielded = set()
+    succeeded = 0
+    held: Dict[str, pd.DataFrame] = {}
+    next_index = 0
+
+    def release(ready: Dict[str, pd.DataFrame]):
+        nonlocal next_index
+        if not ordered:
+            yield from ready.items()
+            return
+        held.update(ready)
+        while next_index < len(ledgers) and ledgers[next_index] in held:
+            lid = ledgers[next_index]
+            next_index += 1
+            yield lid, held.pop(lid)
 
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        future_to_lid = {executor.submit(proc, lid): lid for lid in ledgers}
-        for future in as_completed(future_to_lid):
-            lid, df = future.result()
-            results[lid] = df
+    limit = max_ahead or len(ledgers)
+    next_group = 0
+    running = {}  # future -> group
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        while True:
+            outstanding = len(held) + sum(len(g) for g in running.values())
+            while next_group < len(groups) and (
+                not running or outstanding + len(groups[next_group]) <= limit
+            ):
+                group = groups[next_group]
+                next_group += 1
+                running[executor.submit(tracing.bind(proc), group)] = group
+                outstanding += len(group)
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                del running[future]
+                ready = future.result()
+                yielded.update(ready)
+                succeeded += sum(len(df) > 0 for df in ready.values())
+                if progress is not None:
+                    progress(len(yielded), len(ledgers))
+                yield from release(ready)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
 
     # Fill missing entries for any ledger not processed (shouldn't happen, but safe)
-    for lid in ledgers:
-        if lid not in results:
-            results[lid] = pd.DataFrame()
+    missing = {lid: pd.DataFrame() for lid in ledgers if lid not in yielded}
+    yield from release(missing)
 
-    logging.info("Completed fetch for all ledgers. Success: %d/%d", sum(len(df) > 0 for df in results.values()), len(ledgers))
-    return results
+    if chunk_cache is not None:
+        logging.info("Chunk cache stats: %s", chunk_cache.stats())
+    logging.info("Completed fetch for all ledgers. Success: %d/%d", succeeded, len(ledgers))
@@ -0,0 +1,235 @@
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from typing import Callable, Optional
+
+from . import tracing
+
+class JobNotFoundError(Exception):
+    """Raised when a job id is not in the queue."""
+    pass
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id         TEXT PRIMARY KEY,
+    status     TEXT NOT NULL,
+    stage      TEXT,
+    done       INTEGER,
+    total      INTEGER,
+    message    TEXT,
+    error      TEXT,
+    timings    TEXT,
+    payload    TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_jobs_status ON jobs (status, created_at);
+"""
+
+class SqliteJobQueue:
+    """
+    Report job queue and status store on a local SQLite file.
+
+    Stands in for a hosted queue (e.g. Azure Storage queues) so the async
+    mode runs and can be tested without cloud resources. Several processes
+    may share the file; claim() hands each queued job to exactly one worker.
+
+    Job status: queued -> running -> succeeded | failed.
+    While running, `stage` is one of metadata/fetch/export/email (or coalesced, while
+    waiting on an identical report another request is building), with
+    done/total counts where the stage has them (e.g. ledgers fetched).
+    Finished jobs carry `timings`, the per-stage summary of their trace
+    (see shared.tracing.Trace.summary).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(_SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "timings" not in columns:
+                # Queue files created before timings were recorded
+                try:
+                    conn.execute("ALTER TABLE jobs ADD COLUMN timings TEXT")
+                except sqlite3.OperationalError:
+                    pass  # added by another process meanwhile
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, payload: dict) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._conn().execute(
+            "INSERT INTO jobs (id, status, payload, created_at, updated_at) VALUES (?, 'queued', ?, ?, ?)",
+            (job_id, json.dumps(payload), now, now)
+        )
+        logging.info("Queued report job %s", job_id)
+        return job_id
+
+    def claim(self) -> Optional[tuple]:
+        """Mark the oldest queued job running and return (job_id, payload), or None."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id, payload FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', updated_at = ? WHERE id = ?",
+                (time.time(), row["id"])
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return row["id"], json.loads(row["payload"])
+
+    def update(self, job_id: str, stage: str, done: Optional[int] = None, total: Optional[int] = None):
+        self._conn().execute(
+            "UPDATE jobs SET stage = ?, done = ?, total = ?, updated_at = ? WHERE id = ?",
+            (stage, done, total, time.time(), job_id)
+        )
+
+    def succeed(self, job_id: str, message: str, timings: Optional[dict] = None):
+        self._conn().execute(
+            "UPDATE jobs SET status = 'succeeded', message = ?, timings = ?, updated_at = ? WHERE id = ?",
+            (message, json.dumps(timings) if timings else None, time.time(), job_id)
+        )
+
+    def fail(self, job_id: str, error: str, timings: Optional[dict] = None):
+        self._conn().execute(
+            "UPDATE jobs SET status = 'failed', error = ?, timings = ?, updated_at = ? WHERE id = ?",
+            (error, json.dumps(timings) if timings else None, time.time(), job_id)
+        )
+
+    def requeue_stale(self, older_than: float) -> int:
+        """Put running jobs not updated for `older_than` seconds back on the queue (e.g. after a host restart)."""
+        cur = self._conn().execute(
+            "UPDATE jobs SET status = 'queued', updated_at = ? WHERE status = 'running' AND updated_at < ?",
+            (time.time(), time.time() - older_than)
+        )
+        if cur.rowcount:
+            logging.warning("Requeued %d stale report job(s)", cur.rowcount)
+        return cur.rowcount
+
+    def get(self, job_id: str) -> dict:
+        """Status record for a job; the payload is not included."""
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            raise JobNotFoundError(f"Unknown job id: {job_id}")
+        out = {
+            "job_id": row["id"],
+            "status": row["status"],
+            "stage": row["stage"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+        if row["total"] is not None:
+            out["progress"] = {"done": row["done"], "total": row["total"]}
+        if row["message"]:
+            out["message"] = row["message"]
+        if row["error"]:
+            out["error"] = row["error"]
+        if row["timings"]:
+            out["timings"] = json.loads(row["timings"])
+        return out
+
+class JobWorker:
+    """
+    Background thread draining a job queue.
+
+    `handler(payload, report)` runs one job; `report(stage, done=None, total=None)`
+    records progress. The handler's return value becomes the job message, and
+    any exception marks the job failed with str(exception). Each job runs as
+    a trace (shared.tracing) whose summary is stored with its outcome.
+    """
+
+    def __init__(self, queue: SqliteJobQueue, handler: Callable, poll_interval: float = 1.0):
+        self.queue = queue
+        self.handler = handler
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="report-job-worker", daemon=True)
+                self._thread.start()
+
+    def notify(self):
+        """Wake the worker now instead of at the next poll."""
+        self._wake.set()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def run_once(self) -> bool:
+        """Process one queued job, if any. Returns True if a job was run."""
+        claimed = self.queue.claim()
+        if claimed is None:
+            return False
+        job_id, payload = claimed
+        logging.info("Running report job %s", job_id)
+
+        def report(stage, done=None, total=None):
+            self.queue.update(job_id, stage, done, total)
+
+        trace = None
+        try:
+            with tracing.start_trace("report_job", trace_id=job_id) as trace:
+                message = self.handler(payload, report)
+            self.queue.succeed(job_id, message or "", trace.summary())
+            logging.info("Report job %s succeeded", job_id)
+        except Exception as e:
+            logging.error("Report job %s failed: %s", job_id, e)
+            self.queue.fail(job_id, str(e), trace.summary() if trace is not None else None)
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self.run_once():
+                    continue
+            except Exception as e:
+                logging.error("Job worker error: %s", e)
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_job_queue() -> SqliteJobQueue:
+    """
+    Process-wide job queue. The SQLite file lives at JOB_QUEUE_PATH
+    (default: ledger_jobs.sqlite3 in the temp directory).
+    """
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                path = os.environ.get("JOB_QUEUE_PATH") or os.path.join(tempfile.gettempdir(), "ledger_jobs.sqlite3")
+                _queue = SqliteJobQueue(path)
+    return _queue
@@ -0,0 +1,17 @@
+import re
+
+# How the ledger proc's rows and columns are recognized, shared by the
+# exporters and the delta reports (shared.watermarks). No pandas/xlsxwriter
+# import here: callers pass in their own Series.
+
+OPENING_RE = re.compile(r'opening\s*balance', re.IGNORECASE)
+CLOSING_RE = re.compile(r'closing\s*balance', re.IGNORECASE)
+# Ledger code/name columns, repeated on every row and shown in the sheet header instead
+LEDGER_RE  = re.compile(r'(?i)^(ledger[\s._]*code|ledger[\s._]*name)$')
+SLNO_RE    = re.compile(r'(?i)^\s*sl[\s._]*no\s*\.?$', re.IGNORECASE)
+
+def classify(voucher_numbers):
+    """Boolean arrays (is_opening, is_closing) for a 'Voucher Number' column."""
+    is_open = voucher_numbers.str.contains(OPENING_RE, na=False).to_numpy(dtype=bool)
+    is_close = voucher_numbers.str.contains(CLOSING_RE, na=False).to_numpy(dtype=bool)
+    return is_open, is_close
@@ -1,24 +1,12 @@
 import logging
-from typing import List, Dict
-import pytds
+from typing import Hashable, List, Dict, Optional
 
-from .connection import parse_conn_str, ConnectionStringError
+from .connection import ConnectionStringError
+from .metadata_cache import MetadataCache
+from .pool import get_pool
+from .scheduler import get_scheduler
 
-def get_ledger_metadata(conn_str: str, ledger_ids: List[str]) -> Dict[str, Dict[str, str]]:
-    """
-    Fetch ledger code/name and company details for each ledger ID.
-    Returns {ledger_id: {code, name, company_name, company_address}, ...}
-    If a requested ledger ID is not found, the result contains an empty dict for that ID.
-    """
-    logging.info(f"Fetching metadata for ledgers: {ledger_ids}")
-    meta: Dict[str, Dict[str, str]] = {}
-    if not ledger_ids:
-        logging.warning("No ledger IDs provided for metadata fetch.")
-        return meta
-
-    # --- Parameterized query to avoid SQL injection risks ---
-    placeholders = ','.join(['%s'] * len(ledger_ids))
-    query = f"""
+_METADATA_QUERY = """
     SELECT DISTINCT
       d.Alm_ID_N      AS LedgerID,
       d.Ald_Code_V    AS code,
@@ -28,38 +16,102 @@ def get_ledger_metadata(conn_str: str, ledger_ids: List[str]) -> Dict[str, Dict[
     FROM dbo.Fin_AccountLedger_Dtl AS d
     INNER JOIN dbo.Fin_AccountLedger_Mst AS m ON d.Alm_ID_N = m.Alm_ID_N
     LEFT JOIN dbo.Adm_Company_Mst AS c ON m.Cmp_ID_N = c.Cmp_ID_N
-    WHERE d.Alm_ID_N IN ({placeholders})
     """
 
-    (svr, prt), db, usr, pwd = parse_conn_str(conn_str)
-    try:
-        with pytds.connect(server=svr, database=db, user=usr, password=pwd, port=prt) as conn:
-            cur = conn.cursor()
-            logging.debug("Executing metadata query: %s", query)
-            cur.execute(query, tuple(int(l) for l in ledger_ids))
+def _query_metadata(conn_str: str, ledger_ids: Optional[List[str]], job_id: Optional[str]) -> Dict[str, Dict[str, str]]:
+    """
+    Run the metadata join for `ledger_ids`, or for every ledger when None.
+    Returns {ledger_id: {code, name, company_name, company_address}} for the rows found.
+    """
+    # --- Parameterized query to avoid SQL injection risks ---
+    query = _METADATA_QUERY
+    params = None
+    if ledger_ids is not None:
+        query += f"WHERE d.Alm_ID_N IN ({','.join(['%s'] * len(ledger_ids))})\n"
+        params = tuple(int(l) for l in ledger_ids)
 
-            cols = [col[0] for col in cur.description]
-            found_ids = set()
+    found: Dict[str, Dict[str, str]] = {}
+    with get_pool().connection(conn_str) as conn:
+        cur = conn.cursor()
+        logging.debug("Executing metadata query: %s", query)
+        # Not timed: one cheap lookup would set the chunk queries' latency floor
+        with get_scheduler().slot(conn_str, job_id, observe=False):
+            if params is None:
+                cur.execute(query)
+            else:
+                cur.execute(query, params)
+            rows = cur.fetchall()
+
+        cols = [col[0] for col in cur.description]
+        for row in rows:
+            rec = dict(zip(cols, row))
+            found[str(rec['LedgerID'])] = {
+                'code':            rec['code'],
+                'name':            rec['name'],
+                'company_name':    rec.get('company_name') or '',
+                'company_address': rec.get('company_address') or ''
+            }
+    return found
+
+def get_ledger_metadata(
+    conn_str: str,
+    ledger_ids: List[str],
+    job_id: Optional[str] = None,
+    cache: Optional[MetadataCache] = None,
+    db_code: Optional[Hashable] = None
+) -> Dict[str, Dict[str, str]]:
+    """
+    Fetch ledger code/name and company details for each ledger ID.
+    Returns {ledger_id: {code, name, company_name, company_address}, ...}
+    If a requested ledger ID is not found, the result contains an empty dict for that ID.
+    The query runs under a slot from the shared DB scheduler (see shared.scheduler).
+
+    With a cache (and the request's db_code), ids it holds are answered
+    without a query and only the rest are fetched; with cache.prefetch the
+    database's whole ledger master is loaded on first use instead.
+    """
+    logging.info(f"Fetching metadata for ledgers: {ledger_ids}")
+    meta: Dict[str, Dict[str, str]] = {}
+    if not ledger_ids:
+        logging.warning("No ledger IDs provided for metadata fetch.")
+        return meta
+
+    use_cache = cache is not None and db_code is not None
+    try:
+        if use_cache and cache.needs_load(db_code):
+            with cache.load_lock(db_code):
+                if cache.needs_load(db_code):
+                    master = _query_metadata(conn_str, None, job_id)
+                    if cache.load(db_code, master):
+                        logging.info(f"Prefetched metadata for {len(master)} ledgers of {db_code}.")
+                    else:
+                        logging.warning(
+                            f"Ledger master of {db_code} ({len(master)} ledgers) exceeds the metadata "
+                            f"cache; fetching ledgers on demand."
+                        )
 
-            for row in cur.fetchall():
-                rec = dict(zip(cols, row))
-                lid = str(rec['LedgerID'])
-                meta[lid] = {
-                    'code':            rec['code'],
-                    'name':            rec['name'],
-                    'company_name':    rec.get('company_name') or '',
-                    'company_address': rec.get('company_address') or ''
-                }
-                found_ids.add(lid)
+        if use_cache:
+            cached, to_fetch = cache.get_many(db_code, ledger_ids)
+            meta.update(cached)
+        else:
+            to_fetch = [str(l) for l in ledger_ids]
 
+        if to_fetch:
+            found = _query_metadata(conn_str, to_fetch, job_id)
+            if use_cache:
+                cache.put_many(db_code, to_fetch, found)
+            meta.update(found)
             # Fill in any missing ledger IDs with empty dicts
-            missing = set(str(l) for l in ledger_ids) - found_ids
+            missing = set(to_fetch) - set(found)
             if missing:
                 logging.warning(f"Metadata not found for ledgers: {missing}")
                 for mid in missing:
                     meta[mid] = {}
 
-        logging.info(f"Fetched metadata for {len(meta)} ledgers (requested: {len(ledger_ids)}).")
+        logging.info(
+            f"Fetched metadata for {len(meta)} ledgers (requested: {len(ledger_ids)}, "
+            f"from cache: {len(ledger_ids) - len(to_fetch)})."
+        )
         return meta
 
     except ConnectionStringError as ce:
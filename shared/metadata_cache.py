@@ -0,0 +1,192 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Tuple
+
+class _Entry:
+    __slots__ = ("meta", "expires")
+
+    def __init__(self, meta: Optional[Dict[str, str]], expires: float):
+        self.meta = meta  # None: ledger id known not to exist
+        self.expires = expires
+
+class MetadataCache:
+    """
+    In-process cache of ledger metadata (code, name, company name/address),
+    keyed by (db_code, ledger_id), in front of get_ledger_metadata.
+
+    - Entries are fresh for `ttl` seconds; ids the database did not return
+      are remembered as missing for `negative_ttl` seconds.
+    - At most `max_entries` entries are kept, evicting least recently used.
+    - With `prefetch`, the first request for a database loads its whole
+      ledger master in one query (see load()); until that expires, every id
+      is answered from the cache, unknown ones as missing. A master larger
+      than max_entries is not prefetched.
+
+    Thread-safe; stats() reports hits, misses and the hit rate.
+
+    Args:
+        ttl: Seconds a ledger's metadata is served without a query.
+        negative_ttl: Seconds an unknown ledger id is remembered as missing.
+        max_entries: Entries kept across all databases before LRU eviction.
+        prefetch: Load each database's whole ledger master on first use.
+    """
+
+    def __init__(self, ttl: float = 3600.0, negative_ttl: float = 300.0,
+                 max_entries: int = 100000, prefetch: bool = False):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max(1, int(max_entries))
+        self.prefetch = prefetch
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._loaded: Dict[str, float] = {}  # db -> expiry of its full load
+        self._too_large = set()  # dbs whose master does not fit
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._stats = {"hits": 0, "negative_hits": 0, "misses": 0, "prefetches": 0, "evictions": 0}
+
+    @staticmethod
+    def _db(db_code: Hashable) -> str:
+        return str(db_code).strip().upper()
+
+    # --- lookups ---
+
+    def get_many(self, db_code: Hashable, ledger_ids: List[str]) -> Tuple[Dict[str, Dict[str, str]], List[str]]:
+        """
+        (cached, missing): metadata for the ids the cache can answer ({} for
+        ids known not to exist) and the ids that must be queried.
+        """
+        db = self._db(db_code)
+        now = time.monotonic()
+        cached: Dict[str, Dict[str, str]] = {}
+        missing: List[str] = []
+        with self._lock:
+            loaded = self._loaded.get(db, 0.0) > now
+            for lid in ledger_ids:
+                lid = str(lid)
+                key = (db, lid)
+                entry = self._entries.get(key)
+                if entry is not None and entry.expires > now:
+                    self._entries.move_to_end(key)
+                    if entry.meta is None:
+                        self._stats["negative_hits"] += 1
+                        cached[lid] = {}
+                    else:
+                        self._stats["hits"] += 1
+                        cached[lid] = dict(entry.meta)
+                elif loaded:
+                    # Not in the full master: unknown id
+                    self._stats["negative_hits"] += 1
+                    self._set_locked(key, None, now + self.negative_ttl)
+                    cached[lid] = {}
+                else:
+                    self._stats["misses"] += 1
+                    missing.append(lid)
+            self._evict_locked()
+        return cached, missing
+
+    # --- stores ---
+
+    def put_many(self, db_code: Hashable, ledger_ids: List[str], found: Dict[str, Dict[str, str]]):
+        """Store a query's result: `found` for the ids it returned, missing entries for the rest."""
+        db = self._db(db_code)
+        now = time.monotonic()
+        with self._lock:
+            for lid in ledger_ids:
+                lid = str(lid)
+                meta = found.get(lid)
+                if meta:
+                    self._set_locked((db, lid), dict(meta), now + self.ttl)
+                else:
+                    self._set_locked((db, lid), None, now + self.negative_ttl)
+            self._evict_locked()
+
+    def needs_load(self, db_code: Hashable) -> bool:
+        """True when prefetch is on and the database's master is not loaded (or has expired)."""
+        if not self.prefetch:
+            return False
+        db = self._db(db_code)
+        with self._lock:
+            return db not in self._too_large and self._loaded.get(db, 0.0) <= time.monotonic()
+
+    def load_lock(self, db_code: Hashable) -> threading.Lock:
+        """Lock held while loading a database's master, so concurrent requests load it once."""
+        db = self._db(db_code)
+        with self._lock:
+            return self._load_locks.setdefault(db, threading.Lock())
+
+    def load(self, db_code: Hashable, master: Dict[str, Dict[str, str]]) -> bool:
+        """
+        Store a database's whole ledger master. Returns False (and stops
+        prefetching that database) when it does not fit in max_entries.
+        """
+        db = self._db(db_code)
+        now = time.monotonic()
+        with self._lock:
+            self._stats["prefetches"] += 1
+            if len(master) > self.max_entries:
+                self._too_large.add(db)
+                return False
+            for lid, meta in master.items():
+                self._set_locked((db, str(lid)), dict(meta), now + self.ttl)
+            self._loaded[db] = now + self.ttl
+            self._evict_locked()
+        return True
+
+    def invalidate(self, db_code: Optional[Hashable] = None):
+        """Drop one database's entries (or everything)."""
+        with self._lock:
+            if db_code is None:
+                self._entries.clear()
+                self._loaded.clear()
+                return
+            db = self._db(db_code)
+            for key in [k for k in self._entries if k[0] == db]:
+                del self._entries[key]
+            self._loaded.pop(db, None)
+
+    # --- internals (call with self._lock held) ---
+
+    def _set_locked(self, key: Tuple[str, str], meta: Optional[Dict[str, str]], expires: float):
+        self._entries[key] = _Entry(meta, expires)
+        self._entries.move_to_end(key)
+
+    def _evict_locked(self):
+        while len(self._entries) > self.max_entries:
+            (db, _), _ = self._entries.popitem(last=False)
+            # Its master is no longer complete in the cache
+            self._loaded.pop(db, None)
+            self._stats["evictions"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats)
+            out["entries"] = len(self._entries)
+            out["loaded_dbs"] = len(self._loaded)
+        lookups = out["hits"] + out["negative_hits"] + out["misses"]
+        out["hit_rate"] = round((out["hits"] + out["negative_hits"]) / lookups, 3) if lookups else 0.0
+        return out
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_metadata_cache() -> Optional[MetadataCache]:
+    """
+    Process-wide metadata cache, or None when METADATA_CACHE is off (default on).
+    METADATA_TTL_SECONDS / METADATA_NEGATIVE_TTL_SECONDS / METADATA_CACHE_MAX_ENTRIES
+    size it; METADATA_PREFETCH=1 loads each database's ledger master on first use.
+    """
+    global _cache
+    if os.environ.get("METADATA_CACHE", "1").lower() not in ("1", "true", "yes"):
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = MetadataCache(
+                    ttl=float(os.environ.get("METADATA_TTL_SECONDS", "3600")),
+                    negative_ttl=float(os.environ.get("METADATA_NEGATIVE_TTL_SECONDS", "300")),
+                    max_entries=int(os.environ.get("METADATA_CACHE_MAX_ENTRIES", "100000")),
+                    prefetch=os.environ.get("METADATA_PREFETCH", "0").lower() in ("1", "true", "yes"),
+                )
+    return _cache
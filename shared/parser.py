@@ -1,7 +1,8 @@
 import re
 import logging
 from datetime import datetime
-from typing import Tuple, List, Optional
+from functools import lru_cache
+from typing import Any, Dict, Tuple, List, Optional
 
 # Supported date formats for SQL procedure parsing
 _DATE_FORMATS = [
@@ -15,6 +16,101 @@ class SqlParseError(Exception):
     """Custom exception for errors parsing SQL parameters."""
     pass
 
+# EXEC [schema.]proc <args>, optionally after SET NOCOUNT ON
+_EXEC_RE = re.compile(
+    r"^\s*(?:SET\s+NOCOUNT\s+ON\s*;\s*)?EXEC(?:UTE)?\s+"
+    r"(?P<proc>(?:\[[^\]]+\]|\w+)(?:\.(?:\[[^\]]+\]|\w+)){0,2})"
+    r"(?P<args>.*?)\s*;?\s*$",
+    re.IGNORECASE | re.DOTALL
+)
+# One named argument: @Name = 'text' | N'text' | number | NULL, then a comma or the end
+_ARG_RE = re.compile(
+    r"\s*@(?P<name>\w+)\s*=\s*"
+    r"(?:N?'(?P<text>(?:[^']|'')*)'|(?P<number>[-+]?\d+(?:\.\d+)?)|(?P<null>NULL))"
+    r"\s*(?:,|$)",
+    re.IGNORECASE | re.DOTALL
+)
+
+class ProcCall:
+    """
+    A stored-procedure call parsed from its SQL text: the proc name and its
+    named arguments in call order (literal values: str, int, float or None).
+
+    bind() gives the parameters for a parameterized RPC call
+    (cursor.callproc(call.proc, call.bind(...))), so the server sees the
+    same call shape for every chunk and can reuse its cached plan.
+    """
+
+    def __init__(self, proc: str, params: Tuple[Tuple[str, Any], ...]):
+        self.proc = proc
+        self.params = params
+        self._index = {name.lower(): i for i, (name, _) in enumerate(params)}
+
+    def get(self, name: str, default=None):
+        """Value of argument `name` (case-insensitive, without the @)."""
+        i = self._index.get(name.lower())
+        return self.params[i][1] if i is not None else default
+
+    def __contains__(self, name: str) -> bool:
+        return name.lower() in self._index
+
+    def bind(self, **values) -> Dict[str, Any]:
+        """
+        {"@Name": value} for every argument, with those named in `values`
+        (case-insensitive) replaced; names the call does not have are ignored,
+        as a proc rejects parameters it does not declare.
+        """
+        overrides = {name.lower(): value for name, value in values.items()}
+        return {
+            f"@{name}": overrides.get(name.lower(), value)
+            for name, value in self.params
+        }
+
+    def __repr__(self):
+        return f"ProcCall({self.proc!r}, {dict(self.params)!r})"
+
+@lru_cache(maxsize=256)
+def compile_proc(sql_str: str) -> ProcCall:
+    """
+    Parse `EXEC proc @A='x', @B=1, ...` once into a ProcCall (cached per
+    template text). Raises SqlParseError for anything else (several
+    statements, positional or variable arguments, expressions).
+    """
+    match = _EXEC_RE.match(sql_str)
+    if not match:
+        raise SqlParseError("SQL is not a single EXEC of a stored procedure.")
+
+    args = match.group("args")
+    params = []
+    pos = 0
+    while pos < len(args):
+        arg = _ARG_RE.match(args, pos)
+        if not arg or arg.end() == pos:
+            raise SqlParseError(f"Unsupported argument in procedure call: {args[pos:].strip()[:40]!r}")
+        if arg.group("text") is not None:
+            value = arg.group("text").replace("''", "'")
+        elif arg.group("number") is not None:
+            number = arg.group("number")
+            value = float(number) if "." in number else int(number)
+        else:
+            value = None
+        params.append((arg.group("name"), value))
+        pos = arg.end()
+
+    names = [name.lower() for name, _ in params]
+    if len(set(names)) != len(names):
+        raise SqlParseError("Procedure call repeats an argument.")
+    return ProcCall(match.group("proc"), tuple(params))
+
+def _raw_param(sql_str: str, name: str) -> Optional[str]:
+    """Text of a quoted @name argument, from the compiled call when the SQL is a plain EXEC."""
+    try:
+        value = compile_proc(sql_str).get(name)
+        return str(value) if value not in (None, "") else None
+    except SqlParseError:
+        match = re.search(rf"@{name}\s*=\s*\'([^\']+)\'", sql_str, re.IGNORECASE)
+        return match.group(1) if match else None
+
 def extract_dates(sql_str: str) -> Tuple[Optional[datetime], Optional[datetime]]:
     """
     Extracts @FromDate and @ToDate values from a SQL string.
@@ -25,10 +121,10 @@ def extract_dates(sql_str: str) -> Tuple[Optional[datetime], Optional[datetime]]
         SqlParseError if dates are missing or invalid.
     """
     logging.info("Extracting @FromDate and @ToDate from SQL template.")
-    from_match = re.search(r"@FromDate\s*=\s*\'([^\']+)\'", sql_str, re.IGNORECASE)
-    to_match   = re.search(r"@ToDate\s*=\s*\'([^\']+)\'", sql_str, re.IGNORECASE)
+    from_raw = _raw_param(sql_str, "FromDate")
+    to_raw   = _raw_param(sql_str, "ToDate")
 
-    if not from_match or not to_match:
+    if not from_raw or not to_raw:
         msg = "Failed to find @FromDate or @ToDate in SQL string."
         logging.error(msg)
         raise SqlParseError(msg)
@@ -42,8 +138,8 @@ def extract_dates(sql_str: str) -> Tuple[Optional[datetime], Optional[datetime]]
         logging.warning(f"Unable to parse date string '{ds}' with supported formats.")
         return None
 
-    from_date = _parse(from_match.group(1))
-    to_date   = _parse(to_match.group(1))
+    from_date = _parse(from_raw)
+    to_date   = _parse(to_raw)
 
     if from_date is None or to_date is None:
         msg = f"Parsed dates contain None: from_date={from_date}, to_date={to_date}"
@@ -72,13 +168,12 @@ def extract_ledgers(sql_str: str, strict: bool = True) -> List[str]:
         SqlParseError if strict and invalid ledger IDs found.
     """
     logging.info("Extracting @StrLedgers from SQL template.")
-    match = re.search(r"@StrLedgers\s*=\s*\'([^\']+)\'", sql_str, re.IGNORECASE)
-    if not match:
+    raw = _raw_param(sql_str, "StrLedgers")
+    if not raw:
         msg = "@StrLedgers parameter not found in SQL string."
         logging.warning(msg)
         return []
 
-    raw = match.group(1)
     ledgers = [entry.strip() for entry in raw.split(',') if entry.strip()]
     invalid = [l for l in ledgers if not re.fullmatch(r"\d+", l)]
 
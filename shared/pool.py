@@ -0,0 +1,222 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Tuple
+
+import pytds
+
+from .connection import parse_conn_str
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection becomes available within the checkout timeout."""
+    pass
+
+class _Bucket:
+    """Idle connections and in-use count for one (server, port, database, user) key."""
+
+    def __init__(self):
+        self.idle = deque()   # (conn, last_used_monotonic), most recently used on the right
+        self.in_use = 0
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of pytds connections keyed by the parsed
+    (server, port, database, user) of the connection string.
+
+    Args:
+        max_per_key: Max open connections (idle + in use) per key.
+        idle_timeout: Idle connections older than this (seconds) are closed.
+        ping_after: Connections idle longer than this (seconds) are checked
+            with `SELECT 1` before being handed out; 0 checks every checkout.
+        checkout_timeout: Seconds to wait for a free slot before PoolTimeoutError.
+
+    Connections are opened with as_dict=False; callers read column names from
+    cursor.description.
+    """
+
+    def __init__(
+        self,
+        max_per_key: int = 8,
+        idle_timeout: float = 300.0,
+        ping_after: float = 30.0,
+        checkout_timeout: float = 60.0
+    ):
+        self.max_per_key = max(1, int(max_per_key))
+        self.idle_timeout = idle_timeout
+        self.ping_after = ping_after
+        self.checkout_timeout = checkout_timeout
+        self._buckets: Dict[Tuple[str, int, str, str], _Bucket] = {}
+        self._cond = threading.Condition()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "waits": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+            "health_check_failures": 0,
+            "evictions": 0,
+            "discarded": 0,
+        }
+
+    # --- internals (call with self._cond held) ---
+
+    def _evict_idle_locked(self, bucket: _Bucket, now: float):
+        # Oldest connections sit on the left
+        while bucket.idle and now - bucket.idle[0][1] > self.idle_timeout:
+            conn, _ = bucket.idle.popleft()
+            self._stats["evictions"] += 1
+            _close_quietly(conn)
+
+    def _release_slot_locked(self, bucket: _Bucket):
+        bucket.in_use -= 1
+        self._cond.notify()
+
+    # --- checkout / checkin ---
+
+    def _checkout(self, key, bucket: _Bucket):
+        start = time.monotonic()
+        deadline = start + self.checkout_timeout
+        waited = False
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._evict_idle_locked(bucket, now)
+                if bucket.idle:
+                    conn, last_used = bucket.idle.pop()
+                    bucket.in_use += 1
+                    break
+                if bucket.in_use + len(bucket.idle) < self.max_per_key:
+                    conn, last_used = None, None
+                    bucket.in_use += 1
+                    break
+                remaining = deadline - now
+                if remaining <= 0:
+                    raise PoolTimeoutError(
+                        f"No connection available for {key[2]}@{key[0]} within {self.checkout_timeout}s"
+                    )
+                waited = True
+                self._cond.wait(remaining)
+
+            wait_time = time.monotonic() - start
+            if waited:
+                self._stats["waits"] += 1
+                self._stats["wait_time_total"] += wait_time
+                self._stats["wait_time_max"] = max(self._stats["wait_time_max"], wait_time)
+        return conn, last_used
+
+    def _healthy(self, conn) -> bool:
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.fetchall()
+            return True
+        except Exception as e:
+            logging.warning("Pooled connection failed health check: %s", e)
+            return False
+
+    @contextmanager
+    def connection(self, conn_str: str):
+        """
+        Borrow a connection for the given connection string.
+        The connection goes back to the pool when the block exits cleanly and
+        is closed if the block raises.
+        """
+        (server, port), database, user, password = parse_conn_str(conn_str)
+        key = (server, port, database, user)
+        with self._cond:
+            bucket = self._buckets.setdefault(key, _Bucket())
+
+        conn, last_used = self._checkout(key, bucket)
+        try:
+            if conn is not None and time.monotonic() - last_used > self.ping_after and not self._healthy(conn):
+                with self._cond:
+                    self._stats["health_check_failures"] += 1
+                _close_quietly(conn)
+                conn = None
+            with self._cond:
+                self._stats["hits" if conn is not None else "misses"] += 1
+            if conn is None:
+                logging.debug("Opening pooled connection to %s:%s/%s", server, port, database)
+                conn = pytds.connect(server=server, database=database, user=user, password=password, port=port)
+        except Exception:
+            with self._cond:
+                self._release_slot_locked(bucket)
+            raise
+
+        try:
+            yield conn
+        except Exception:
+            with self._cond:
+                self._stats["discarded"] += 1
+                self._release_slot_locked(bucket)
+            _close_quietly(conn)
+            raise
+
+        try:
+            conn.rollback()  # Leave no open transaction behind for the next borrower
+            reusable = True
+        except Exception as e:
+            logging.warning("Discarding pooled connection after rollback failure: %s", e)
+            reusable = False
+        with self._cond:
+            if reusable:
+                bucket.idle.append((conn, time.monotonic()))
+            else:
+                self._stats["discarded"] += 1
+            self._release_slot_locked(bucket)
+        if not reusable:
+            _close_quietly(conn)
+
+    # --- maintenance / observability ---
+
+    def evict_idle(self):
+        """Close idle connections past idle_timeout across all keys."""
+        with self._cond:
+            now = time.monotonic()
+            for bucket in self._buckets.values():
+                self._evict_idle_locked(bucket, now)
+
+    def close_all(self):
+        """Close every idle connection; in-use connections are closed on return."""
+        with self._cond:
+            for bucket in self._buckets.values():
+                while bucket.idle:
+                    _close_quietly(bucket.idle.popleft()[0])
+
+    def stats(self) -> dict:
+        """Snapshot of hit/miss/wait counters plus open/idle counts per key."""
+        with self._cond:
+            out = dict(self._stats)
+            out["keys"] = {
+                f"{k[3]}@{k[0]}:{k[1]}/{k[2]}": {"idle": len(b.idle), "in_use": b.in_use}
+                for k, b in self._buckets.items()
+            }
+        return out
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> ConnectionPool:
+    """
+    Process-wide pool shared by the metadata and fetcher modules.
+    Limits come from DB_POOL_MAX_PER_KEY / DB_POOL_IDLE_SECONDS / DB_POOL_PING_SECONDS.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    max_per_key=int(os.environ.get("DB_POOL_MAX_PER_KEY", "8")),
+                    idle_timeout=float(os.environ.get("DB_POOL_IDLE_SECONDS", "300")),
+                    ping_after=float(os.environ.get("DB_POOL_PING_SECONDS", "30")),
+                )
+    return _pool
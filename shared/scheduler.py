@@ -0,0 +1,245 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Dict, Hashable, Optional, Tuple
+
+from .connection import parse_conn_str
+
+class SchedulerTimeoutError(Exception):
+    """Raised when no query slot for a database frees up within the wait timeout."""
+    pass
+
+class _Waiter:
+    __slots__ = ("event", "granted")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.granted = False
+
+class _Query:
+    """Yielded by DbScheduler.slot(): set `rows` to the rows the query returned."""
+    __slots__ = ("rows",)
+
+    def __init__(self):
+        self.rows = 0
+
+class _Lane:
+    """Slots, waiting jobs and latency state for one (server, port, database)."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self.queues: "OrderedDict[Hashable, deque]" = OrderedDict()  # job -> waiters, in rotation order
+        self.latency_avg: Optional[float] = None
+        self.latency_floor: Optional[float] = None
+        self.successes = 0
+        self.last_backoff = 0.0
+        self.stats = {
+            "queries": 0,
+            "waits": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+            "timeouts": 0,
+            "backoffs": 0,
+            "increases": 0,
+        }
+
+    def queue_depth(self) -> int:
+        return sum(len(q) for q in self.queues.values())
+
+class DbScheduler:
+    """
+    Process-wide cap on in-flight queries per database, shared by every
+    request on the host.
+
+    Waiting queries are granted slots round-robin across jobs (one per job in
+    turn), so one large report cannot starve a small one queued behind it.
+
+    The per-database limit adapts to query latency: the scheduler tracks a
+    moving average of query time per `rows_per_unit` rows (queries returning
+    fewer count as one unit) against a floor, the best average seen. The
+    floor drifts up toward the average by `floor_decay` per query, so one
+    fast spell is forgotten. When the average exceeds `backoff_ratio` times
+    the floor, the limit is cut by `backoff_factor` (at most once per
+    `cooldown` seconds). After `increase_after` consecutive healthy queries
+    it grows by one again, up to `max_in_flight`. Queries run with
+    observe=False (e.g. the metadata lookup) hold a slot but are not timed.
+
+    Args:
+        max_in_flight: Upper bound on concurrent queries per database.
+        min_in_flight: Lower bound the limit never backs off below.
+        wait_timeout: Seconds a query may wait for a slot before SchedulerTimeoutError.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = 8,
+        min_in_flight: int = 1,
+        wait_timeout: float = 300.0,
+        backoff_ratio: float = 2.0,
+        backoff_factor: float = 0.5,
+        increase_after: int = 20,
+        cooldown: float = 5.0,
+        smoothing: float = 0.2,
+        rows_per_unit: int = 1000,
+        floor_decay: float = 0.02
+    ):
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.min_in_flight = max(1, min(int(min_in_flight), self.max_in_flight))
+        self.wait_timeout = wait_timeout
+        self.backoff_ratio = backoff_ratio
+        self.backoff_factor = backoff_factor
+        self.increase_after = increase_after
+        self.cooldown = cooldown
+        self.smoothing = smoothing
+        self.rows_per_unit = max(1, int(rows_per_unit))
+        self.floor_decay = floor_decay
+        self._lanes: Dict[Tuple[str, int, str], _Lane] = {}
+        self._lock = threading.Lock()
+
+    def _lane(self, conn_str: str) -> Tuple[Tuple[str, int, str], _Lane]:
+        (server, port), database, _, _ = parse_conn_str(conn_str)
+        key = (server, port, database)
+        with self._lock:
+            lane = self._lanes.get(key)
+            if lane is None:
+                lane = self._lanes[key] = _Lane(self.max_in_flight)
+        return key, lane
+
+    # --- slot hand-out (call with self._lock held) ---
+
+    def _dispatch_locked(self, lane: _Lane):
+        while lane.in_flight < lane.limit and lane.queues:
+            job, waiters = next(iter(lane.queues.items()))
+            waiter = waiters.popleft()
+            if waiters:
+                lane.queues.move_to_end(job)  # next job's turn
+            else:
+                del lane.queues[job]
+            lane.in_flight += 1
+            waiter.granted = True
+            waiter.event.set()
+
+    def _acquire(self, key, lane: _Lane, job: Hashable) -> float:
+        with self._lock:
+            if lane.in_flight < lane.limit and not lane.queues:
+                lane.in_flight += 1
+                return 0.0
+            waiter = _Waiter()
+            lane.queues.setdefault(job, deque()).append(waiter)
+
+        start = time.monotonic()
+        waiter.event.wait(self.wait_timeout)
+        waited = time.monotonic() - start
+        with self._lock:
+            lane.stats["waits"] += 1
+            lane.stats["wait_time_total"] += waited
+            lane.stats["wait_time_max"] = max(lane.stats["wait_time_max"], waited)
+            if not waiter.granted:
+                lane.stats["timeouts"] += 1
+                waiters = lane.queues.get(job)
+                if waiters is not None:
+                    waiters.remove(waiter)
+                    if not waiters:
+                        del lane.queues[job]
+                raise SchedulerTimeoutError(
+                    f"No query slot for {key[2]}@{key[0]} within {self.wait_timeout}s"
+                )
+        return waited
+
+    def _release(self, lane: _Lane, seconds: Optional[float], completed: bool = True):
+        with self._lock:
+            lane.in_flight -= 1
+            if completed:
+                lane.stats["queries"] += 1
+            if seconds is not None:
+                self._observe_locked(lane, seconds)
+            self._dispatch_locked(lane)
+
+    def _observe_locked(self, lane: _Lane, seconds: float):
+        if lane.latency_avg is None:
+            lane.latency_avg = seconds
+        else:
+            lane.latency_avg += self.smoothing * (seconds - lane.latency_avg)
+        if lane.latency_floor is None or lane.latency_avg < lane.latency_floor:
+            lane.latency_floor = lane.latency_avg
+        else:
+            lane.latency_floor += self.floor_decay * (lane.latency_avg - lane.latency_floor)
+
+        now = time.monotonic()
+        if lane.latency_avg > lane.latency_floor * self.backoff_ratio:
+            lane.successes = 0
+            if now - lane.last_backoff >= self.cooldown and lane.limit > self.min_in_flight:
+                lane.limit = max(self.min_in_flight, int(lane.limit * self.backoff_factor))
+                lane.last_backoff = now
+                lane.stats["backoffs"] += 1
+                logging.warning(
+                    "DB latency %.2fs (floor %.2fs): query limit lowered to %d",
+                    lane.latency_avg, lane.latency_floor, lane.limit
+                )
+            return
+
+        lane.successes += 1
+        if lane.successes >= self.increase_after and lane.limit < self.max_in_flight:
+            lane.limit += 1
+            lane.successes = 0
+            lane.stats["increases"] += 1
+
+    @contextmanager
+    def slot(self, conn_str: str, job: Hashable = None, observe: bool = True):
+        """
+        Hold one query slot for the database in conn_str while the block runs.
+        `job` groups the queries of one request for round-robin fairness.
+        With `observe`, the block's duration per unit of the rows it sets on
+        the yielded handle feeds the latency backoff, unless it raises.
+        """
+        key, lane = self._lane(conn_str)
+        self._acquire(key, lane, job)
+        query = _Query()
+        start = time.monotonic()
+        try:
+            yield query
+        except Exception:
+            self._release(lane, None, completed=False)
+            raise
+        seconds = time.monotonic() - start
+        units = max(1.0, query.rows / self.rows_per_unit)
+        self._release(lane, seconds / units if observe else None)
+
+    def stats(self) -> dict:
+        """Per-database limit, in-flight count, queue depth, waits and latency."""
+        with self._lock:
+            return {
+                f"{k[0]}:{k[1]}/{k[2]}": {
+                    "limit": lane.limit,
+                    "in_flight": lane.in_flight,
+                    "queue_depth": lane.queue_depth(),
+                    "jobs_waiting": len(lane.queues),
+                    "latency_avg": lane.latency_avg,
+                    "latency_floor": lane.latency_floor,
+                    **lane.stats,
+                }
+                for k, lane in self._lanes.items()
+            }
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler() -> DbScheduler:
+    """
+    Process-wide scheduler shared by the metadata and fetcher modules.
+    Limits come from DB_MAX_INFLIGHT / DB_MIN_INFLIGHT / DB_SLOT_WAIT_SECONDS.
+    """
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = DbScheduler(
+                    max_in_flight=int(os.environ.get("DB_MAX_INFLIGHT", "8")),
+                    min_in_flight=int(os.environ.get("DB_MIN_INFLIGHT", "1")),
+                    wait_timeout=float(os.environ.get("DB_SLOT_WAIT_SECONDS", "300")),
+                )
+    return _scheduler
@@ -0,0 +1,158 @@
+import logging
+import threading
+import time
+import types
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional
+
+class SecretNotFoundError(Exception):
+    """Raised when a secret does not exist in Key Vault (possibly served from the negative cache)."""
+    pass
+
+def _is_not_found(exc: Exception) -> bool:
+    # azure.core.exceptions.ResourceNotFoundError, without importing azure.core here
+    return getattr(exc, "status_code", None) == 404 or type(exc).__name__ == "ResourceNotFoundError"
+
+class _Entry:
+    __slots__ = ("value", "fetched_at", "ttl", "missing")
+
+    def __init__(self, value, ttl, missing=False):
+        self.value = value
+        self.fetched_at = time.monotonic()
+        self.ttl = ttl
+        self.missing = missing
+
+class SecretCache:
+    """
+    In-process cache in front of a Key Vault SecretClient. get_secret(name)
+    answers like the client's, so it can stand in wherever a client is used.
+
+    - Values are fresh for `ttl` seconds (or a per-secret TTL from `ttls`).
+    - Past that and up to `max_stale` seconds old, the cached value is still
+      returned while one background refresh picks up rotations.
+    - Older entries (or misses) are fetched inline; concurrent callers for
+      the same secret wait on a single fetch.
+    - Secrets that do not exist are remembered for `negative_ttl` seconds and
+      raise SecretNotFoundError without a Key Vault call.
+    - A failed background refresh keeps serving the stale value until max_stale.
+
+    Args:
+        client: Anything with get_secret(name).value (azure SecretClient).
+        ttl: Default seconds a value is considered fresh.
+        max_stale: Seconds after which a cached value is no longer served.
+        negative_ttl: Seconds a not-found result is cached.
+        ttls: Per-secret TTL overrides, {name: seconds}.
+    """
+
+    def __init__(
+        self,
+        client,
+        ttl: float = 300.0,
+        max_stale: float = 3600.0,
+        negative_ttl: float = 60.0,
+        ttls: Optional[Dict[str, float]] = None
+    ):
+        self.client = client
+        self.ttl = ttl
+        self.max_stale = max(max_stale, ttl)
+        self.negative_ttl = negative_ttl
+        self.ttls = dict(ttls or {})
+        self._entries: Dict[str, _Entry] = {}
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="secret-refresh")
+        self._stats = {"hits": 0, "stale_hits": 0, "negative_hits": 0, "fetches": 0, "fetch_errors": 0}
+
+    def _fetch(self, name: str, future: Future):
+        """Fetch one secret from Key Vault and settle `future` (runs in the caller or refresher thread)."""
+        with self._lock:
+            self._stats["fetches"] += 1
+        try:
+            value = self.client.get_secret(name).value
+            entry = _Entry(value, self.ttls.get(name, self.ttl))
+        except Exception as e:
+            if not _is_not_found(e):
+                with self._lock:
+                    self._stats["fetch_errors"] += 1
+                    self._inflight.pop(name, None)
+                future.set_exception(e)
+                return
+            entry = _Entry(None, self.negative_ttl, missing=True)
+        with self._lock:
+            self._entries[name] = entry
+            self._inflight.pop(name, None)
+        future.set_result(entry)
+
+    def _refresh_in_background(self, name: str):
+        def run(fut):
+            self._fetch(name, fut)
+            if fut.exception() is not None:
+                logging.warning("Background refresh of secret '%s' failed: %s", name, fut.exception())
+
+        with self._lock:
+            if name in self._inflight:
+                return
+            fut = Future()
+            self._inflight[name] = fut
+        self._refresher.submit(run, fut)
+
+    def get(self, name: str) -> str:
+        """
+        Return the secret's value, from cache where possible.
+        Raises SecretNotFoundError for missing secrets, or the client's error if
+        Key Vault cannot be reached and no usable cached value exists.
+        """
+        owner = False
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None:
+                age = time.monotonic() - entry.fetched_at
+                if entry.missing and age <= entry.ttl:
+                    self._stats["negative_hits"] += 1
+                    raise SecretNotFoundError(f"Secret '{name}' not found in Key Vault")
+                if not entry.missing and age <= entry.ttl:
+                    self._stats["hits"] += 1
+                    return entry.value
+                if not entry.missing and age <= self.max_stale:
+                    self._stats["stale_hits"] += 1
+                    stale = entry.value
+                else:
+                    stale = None
+            else:
+                stale = None
+
+            if stale is None:
+                fut = self._inflight.get(name)
+                if fut is None:
+                    fut = Future()
+                    self._inflight[name] = fut
+                    owner = True
+
+        if stale is not None:
+            self._refresh_in_background(name)
+            return stale
+
+        if owner:
+            self._fetch(name, fut)
+        entry = fut.result()
+        if entry.missing:
+            raise SecretNotFoundError(f"Secret '{name}' not found in Key Vault")
+        return entry.value
+
+    def get_secret(self, name: str):
+        """SecretClient-compatible get(): an object whose .value is the cached secret."""
+        return types.SimpleNamespace(name=name, value=self.get(name))
+
+    def invalidate(self, name: Optional[str] = None):
+        """Drop one cached secret, or all of them."""
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(name, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats)
+            out["cached"] = len(self._entries)
+        return out
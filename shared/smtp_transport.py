@@ -0,0 +1,329 @@
+import logging
+import os
+import queue
+import random
+import smtplib
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+class SmtpQueueFullError(Exception):
+    """Raised when the send queue stays full for longer than the enqueue timeout."""
+    pass
+
+class SmtpSendError(Exception):
+    """Raised (through the send future) when a message could not be delivered."""
+    pass
+
+def _is_transient(exc: Exception) -> bool:
+    """4xx replies (421 throttling, 45x busy/local error) and dropped connections are worth retrying."""
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return all(code < 500 for code, _ in exc.recipients.values())
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return exc.smtp_code < 500
+    if isinstance(exc, smtplib.SMTPNotSupportedError):
+        return False
+    # Disconnects, timeouts, refused connections
+    return isinstance(exc, (smtplib.SMTPException, OSError))
+
+class _Outgoing:
+    __slots__ = ("msg", "from_addr", "to_addrs", "retries", "future", "attempt")
+
+    def __init__(self, msg, from_addr, to_addrs, retries):
+        self.msg = msg
+        self.from_addr = from_addr
+        self.to_addrs = to_addrs
+        self.retries = retries
+        self.future = Future()
+        self.attempt = 0
+
+class SmtpTransport:
+    """
+    Persistent, authenticated SMTP sessions to one relay, shared by every send.
+
+    Messages go through a bounded queue drained by `max_connections` worker
+    threads. Each worker keeps its own session open between messages (EHLO,
+    STARTTLS and AUTH happen once per session, not per email). A session is
+    closed after `idle_timeout` seconds without work and checked with NOOP
+    before reuse once idle longer than `noop_after`. A session that fails is
+    dropped and the message retried on a fresh one.
+
+    Transient failures (disconnects, timeouts, 4xx replies such as 421
+    throttling) are retried up to `retries` times with exponential backoff and
+    full jitter: a random delay in [0, min(backoff_max, backoff_base * 2**n)].
+    Permanent 5xx replies fail the message at once.
+
+    Args:
+        max_connections: Sessions (and worker threads) kept open to the relay.
+        queue_size: Messages that may wait for a worker; submit() blocks up to
+            `enqueue_timeout` seconds for space, then raises SmtpQueueFullError.
+        starttls: Upgrade each session with STARTTLS before AUTH.
+    """
+
+    def __init__(
+        self,
+        server: str,
+        port: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        max_connections: int = 2,
+        queue_size: int = 100,
+        idle_timeout: float = 60.0,
+        noop_after: float = 10.0,
+        retries: int = 3,
+        backoff_base: float = 1.0,
+        backoff_max: float = 30.0,
+        enqueue_timeout: float = 30.0,
+        timeout: float = 60.0,
+        starttls: bool = True
+    ):
+        self.server = server
+        self.port = int(port)
+        self.username = username
+        self.password = password
+        self.max_connections = max(1, int(max_connections))
+        self.idle_timeout = idle_timeout
+        self.noop_after = noop_after
+        self.retries = max(1, int(retries))
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.enqueue_timeout = enqueue_timeout
+        self.timeout = timeout
+        self.starttls = starttls
+        self._queue: "queue.Queue[Optional[_Outgoing]]" = queue.Queue(maxsize=max(1, int(queue_size)))
+        self._workers: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self._stats = {
+            "sent": 0,
+            "failed": 0,
+            "retries": 0,
+            "connects": 0,
+            "reconnects": 0,
+            "idle_closes": 0,
+            "noop_failures": 0,
+            "backoff_time_total": 0.0,
+        }
+
+    def _count(self, key: str, value=1):
+        with self._lock:
+            self._stats[key] += value
+
+    def _start_workers(self):
+        with self._lock:
+            if self._closed:
+                raise SmtpSendError("SMTP transport is closed")
+            while len(self._workers) < self.max_connections:
+                t = threading.Thread(
+                    target=self._worker, name=f"smtp-{self.server}-{len(self._workers)}", daemon=True
+                )
+                self._workers.append(t)
+                t.start()
+
+    # --- sessions ---
+
+    def _connect(self) -> smtplib.SMTP:
+        smtp = smtplib.SMTP(self.server, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                smtp.starttls()
+            if self.username and self.password:
+                smtp.login(self.username, self.password)
+        except Exception:
+            _quit_quietly(smtp)
+            raise
+        self._count("connects")
+        logging.info(f"SMTP session opened to {self.server}:{self.port}")
+        return smtp
+
+    def _usable(self, smtp: smtplib.SMTP, idle: float) -> bool:
+        if idle < self.noop_after:
+            return True
+        try:
+            return smtp.noop()[0] == 250
+        except Exception as e:
+            logging.info(f"SMTP session failed NOOP after {idle:.0f}s idle: {e}")
+            self._count("noop_failures")
+            return False
+
+    def _backoff(self, attempt: int) -> float:
+        cap = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+        return random.uniform(0, cap)
+
+    def _worker(self):
+        smtp = None
+        last_used = time.monotonic()
+        while True:
+            try:
+                item = self._queue.get(timeout=self.idle_timeout if smtp is not None else None)
+            except queue.Empty:
+                _quit_quietly(smtp)
+                smtp = None
+                self._count("idle_closes")
+                continue
+            if item is None:  # close()
+                _quit_quietly(smtp)
+                return
+            if not item.future.set_running_or_notify_cancel():
+                continue
+
+            while True:
+                item.attempt += 1
+                try:
+                    if smtp is not None and not self._usable(smtp, time.monotonic() - last_used):
+                        _quit_quietly(smtp)
+                        smtp = None
+                        self._count("reconnects")
+                    if smtp is None:
+                        smtp = self._connect()
+                    if hasattr(item.msg, "chunks"):
+                        _send_streamed(smtp, item.msg, item.from_addr, item.to_addrs)
+                    else:
+                        smtp.send_message(item.msg, from_addr=item.from_addr, to_addrs=item.to_addrs)
+                    last_used = time.monotonic()
+                    self._count("sent")
+                    item.future.set_result(item.attempt)
+                    break
+                except Exception as e:
+                    last_used = time.monotonic()
+                    # Reset the session: after a failed transaction its state is unknown
+                    _quit_quietly(smtp)
+                    smtp = None
+                    if not _is_transient(e) or item.attempt >= item.retries:
+                        logging.error(f"SMTP send to {item.to_addrs} failed on attempt {item.attempt}: {e}")
+                        self._count("failed")
+                        item.future.set_exception(
+                            SmtpSendError(f"Failed to send email after {item.attempt} attempts: {e}")
+                        )
+                        break
+                    delay = self._backoff(item.attempt)
+                    logging.warning(
+                        f"SMTP send to {item.to_addrs} failed on attempt {item.attempt} ({e}); "
+                        f"retrying in {delay:.1f}s"
+                    )
+                    self._count("retries")
+                    self._count("backoff_time_total", delay)
+                    time.sleep(delay)
+
+    # --- public API ---
+
+    def submit(self, msg, from_addr: str, to_addrs: List[str], retries: Optional[int] = None) -> Future:
+        """
+        Queue a message for delivery: an email.message.Message, or a
+        pre-encoded message (shared.delivery.EncodedMessage) whose DATA
+        payload is streamed from its spool file. The returned future resolves to the
+        number of attempts it took, or raises SmtpSendError.
+        """
+        self._start_workers()
+        item = _Outgoing(msg, from_addr, list(to_addrs), max(1, int(retries or self.retries)))
+        try:
+            self._queue.put(item, timeout=self.enqueue_timeout)
+        except queue.Full:
+            raise SmtpQueueFullError(
+                f"SMTP send queue full ({self._queue.maxsize} messages) for {self.enqueue_timeout}s"
+            )
+        return item.future
+
+    def send(self, msg, from_addr: str, to_addrs: List[str], retries: Optional[int] = None,
+             timeout: Optional[float] = None) -> int:
+        """Queue a message and wait for its delivery; returns the attempts used."""
+        return self.submit(msg, from_addr, to_addrs, retries).result(timeout)
+
+    def close(self):
+        """Finish queued messages, then close every session and stop the workers."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            workers = list(self._workers)
+        for _ in workers:
+            self._queue.put(None)
+        for t in workers:
+            t.join()
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats)
+            out["queue_depth"] = self._queue.qsize()
+            out["workers"] = len(self._workers)
+        return out
+
+def _send_streamed(smtp: smtplib.SMTP, encoded, from_addr: str, to_addrs: List[str]):
+    """
+    MAIL/RCPT/DATA with the payload copied chunk by chunk from `encoded`
+    (already CRLF and dot-stuffed), so the message is never held in memory.
+    Declares SIZE when the relay supports it, and fails early (552) when the
+    relay's advertised limit is smaller than the message.
+    """
+    smtp.ehlo_or_helo_if_needed()
+    options = []
+    if smtp.has_extn("size"):
+        limit = int(smtp.esmtp_features.get("size") or 0)
+        if limit and encoded.size > limit:
+            raise smtplib.SMTPResponseException(
+                552, f"Message of {encoded.size} bytes exceeds the relay limit of {limit}".encode()
+            )
+        options.append(f"SIZE={encoded.size}")
+    code, resp = smtp.mail(from_addr, options)
+    if code != 250:
+        smtp.rset()
+        raise smtplib.SMTPSenderRefused(code, resp, from_addr)
+    refused = {}
+    for addr in to_addrs:
+        code, resp = smtp.rcpt(addr)
+        if code not in (250, 251):
+            refused[addr] = (code, resp)
+    if len(refused) == len(to_addrs):
+        smtp.rset()
+        raise smtplib.SMTPRecipientsRefused(refused)
+    code, resp = smtp.docmd("data")
+    if code != 354:
+        raise smtplib.SMTPDataError(code, resp)
+    for chunk in encoded.chunks():
+        smtp.send(chunk)
+    smtp.send(b".\r\n")
+    code, resp = smtp.getreply()
+    if code != 250:
+        raise smtplib.SMTPDataError(code, resp)
+
+def _quit_quietly(smtp):
+    if smtp is None:
+        return
+    try:
+        smtp.quit()
+    except Exception:
+        try:
+            smtp.close()
+        except Exception:
+            pass
+
+_transports: Dict[Tuple[str, int, Optional[str]], Tuple[Optional[str], SmtpTransport]] = {}
+_transports_lock = threading.Lock()
+
+def get_transport(server: str, port: int, username: Optional[str] = None,
+                  password: Optional[str] = None) -> SmtpTransport:
+    """
+    Process-wide transport per (server, port, username); a changed password
+    (e.g. a rotated secret) replaces the transport. Settings come from
+    SMTP_MAX_CONNECTIONS / SMTP_QUEUE_SIZE / SMTP_IDLE_SECONDS /
+    SMTP_RETRIES / SMTP_BACKOFF_SECONDS / SMTP_STARTTLS.
+    """
+    key = (server, int(port), username)
+    with _transports_lock:
+        entry = _transports.get(key)
+        if entry is not None and entry[0] == password:
+            return entry[1]
+        transport = SmtpTransport(
+            server, port, username, password,
+            max_connections=int(os.environ.get("SMTP_MAX_CONNECTIONS", "2")),
+            queue_size=int(os.environ.get("SMTP_QUEUE_SIZE", "100")),
+            idle_timeout=float(os.environ.get("SMTP_IDLE_SECONDS", "60")),
+            retries=int(os.environ.get("SMTP_RETRIES", "3")),
+            backoff_base=float(os.environ.get("SMTP_BACKOFF_SECONDS", "1")),
+            starttls=os.environ.get("SMTP_STARTTLS", "1").lower() in ("1", "true", "yes"),
+        )
+        _transports[key] = (password, transport)
+    if entry is not None:
+        threading.Thread(target=entry[1].close, daemon=True).start()
+    return transport
@@ -0,0 +1,61 @@
+import json
+import os
+import re
+import shutil
+import zipfile
+from datetime import datetime
+from xml.sax.saxutils import escape as _xml_escape
+
+# Requester stamps: the "Requested by: <email> at <time>" title lines, the
+# page footers' time and email, and a zipped report's requested_by and
+# requested_at (manifest.json). They depend on who asked and when, not on
+# the data, so reports are exported with placeholders in their place
+# (REQUESTED_BY, REQUESTED_AT) and stamp_report() writes each recipient's
+# copy. One built report (a coalesced build, a stored artifact) can then be
+# delivered to anyone without carrying another user's email or time.
+
+REQUESTED_BY = "{{requested_by}}"
+
+class _RequestedAt(datetime):
+    """Request time placeholder: formats as {{requested_at:<format>}}, whatever the format."""
+
+    def __format__(self, spec):
+        return "{{requested_at:%s}}" % spec
+
+    def strftime(self, fmt):
+        return self.__format__(fmt)
+
+REQUESTED_AT = _RequestedAt(2000, 1, 1)
+
+_TOKEN_RE = re.compile(rb"\{\{requested_by\}\}|\{\{requested_at:([^}]*)\}\}")
+
+# Report members that can hold stamps, by extension, and how a value is escaped in them
+_ESCAPES = {
+    ".xml": _xml_escape,
+    ".json": lambda text: json.dumps(text)[1:-1],
+}
+
+def _stamp(data: bytes, requested_by: str, requested_at: datetime, escape) -> bytes:
+    def value(m):
+        text = requested_by if m.group(1) is None else requested_at.strftime(m.group(1).decode("utf-8"))
+        return escape(text).encode("utf-8")
+    return _TOKEN_RE.sub(value, data)
+
+def stamp_report(src_path: str, dest_path: str, requested_by: str, requested_at: datetime) -> str:
+    """
+    Copy of a report exported with the placeholders, with `requested_by` and
+    `requested_at` written in. Reports are zip files (xlsx or a zipped
+    format): only their XML and JSON members are rewritten, and every member
+    keeps its compression. Returns dest_path.
+    """
+    if not zipfile.is_zipfile(src_path):
+        shutil.copyfile(src_path, dest_path)
+        return dest_path
+    with zipfile.ZipFile(src_path) as src, zipfile.ZipFile(dest_path, "w") as dest:
+        for info in src.infolist():
+            data = src.read(info)
+            escape = _ESCAPES.get(os.path.splitext(info.filename)[1].lower())
+            if escape is not None and b"{{requested_" in data:
+                data = _stamp(data, requested_by, requested_at, escape)
+            dest.writestr(info, data)
+    return dest_path
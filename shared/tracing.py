@@ -0,0 +1,295 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+class Span:
+    """One timed operation in a trace; `attributes` carries counts such as rows and bytes."""
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], attributes: dict):
+        self.trace = trace
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = dict(attributes)
+        self.start_ns = time.time_ns()
+        self._started = time.perf_counter()
+        self.duration: Optional[float] = None  # seconds, once ended
+        self.error: Optional[str] = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def add(self, **counts):
+        """Add to numeric attributes (e.g. rows per batch)."""
+        for key, value in counts.items():
+            self.attributes[key] = self.attributes.get(key, 0) + value
+
+    def end(self, error: Optional[BaseException] = None):
+        if self.duration is None:
+            self.duration = time.perf_counter() - self._started
+            if error is not None:
+                self.error = f"{type(error).__name__}: {error}"
+
+    @property
+    def end_ns(self) -> int:
+        return self.start_ns + int((self.duration or 0.0) * 1e9)
+
+    def as_dict(self) -> dict:
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start_ns / 1e9,
+            "duration_ms": round((self.duration or 0.0) * 1000, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+class _NullSpan:
+    """Stands in for a span outside any trace, so instrumented code needs no checks."""
+
+    def set(self, **attributes):
+        pass
+
+    def add(self, **counts):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+# Innermost open span of the current request (follows threads started through bind())
+_current: contextvars.ContextVar = contextvars.ContextVar("tracing_span", default=None)
+
+class Trace:
+    """
+    The spans of one request or job, under a root span named `name`.
+
+    Spans are opened with span() (in this module) while the trace is active;
+    finish() ends the root span and hands the trace to the exporters.
+    summary() aggregates span durations and counts per span name.
+    """
+
+    def __init__(self, name: str, trace_id: Optional[str] = None, exporters: Optional[List] = None):
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.exporters = get_exporters() if exporters is None else exporters
+        self._lock = threading.Lock()
+        self.spans: List[Span] = []
+        self.root = self._open(name, None, {})
+
+    def _open(self, name: str, parent_id: Optional[str], attributes: dict) -> Span:
+        span = Span(self, name, parent_id, attributes)
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    def finish(self, error: Optional[BaseException] = None):
+        self.root.end(error)
+        for exporter in self.exporters:
+            try:
+                exporter.export(self)
+            except Exception as e:
+                logging.warning(f"Trace exporter {type(exporter).__name__} failed: {e}")
+
+    def summary(self) -> dict:
+        """{"total_ms", "stages": {name: {"ms", "count", <summed numeric attributes>}}}, in start order."""
+        stages: Dict[str, dict] = {}
+        with self._lock:
+            spans = [s for s in self.spans if s is not self.root and s.duration is not None]
+        for span in spans:
+            stage = stages.setdefault(span.name, {"ms": 0.0, "count": 0})
+            stage["ms"] += span.duration * 1000
+            stage["count"] += 1
+            for key, value in span.attributes.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    stage[key] = stage.get(key, 0) + value
+            if span.error:
+                stage["errors"] = stage.get("errors", 0) + 1
+        for stage in stages.values():
+            for key, value in stage.items():
+                if isinstance(value, float):
+                    stage[key] = round(value, 1 if key == "ms" else 3)
+        return {"total_ms": round((self.root.duration or 0.0) * 1000, 1), "stages": stages}
+
+    def server_timing(self) -> str:
+        """The summary as a Server-Timing header value."""
+        summary = self.summary()
+        parts = [
+            f'{name};dur={stage["ms"]}' + (f';desc="{stage["count"]} calls"' if stage["count"] > 1 else "")
+            for name, stage in summary["stages"].items()
+        ]
+        parts.append(f'total;dur={summary["total_ms"]}')
+        return ", ".join(parts)
+
+@contextmanager
+def start_trace(name: str, trace_id: Optional[str] = None, exporters: Optional[List] = None) -> Iterator[Trace]:
+    """Run the block as a new trace (root span `name`), exported when the block exits."""
+    trace = Trace(name, trace_id, exporters)
+    token = _current.set(trace.root)
+    error = None
+    try:
+        yield trace
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _current.reset(token)
+        trace.finish(error)
+
+@contextmanager
+def span(name: str, activate: bool = True, **attributes):
+    """
+    Time the block as a child of the current span. Yields the span, for
+    set()/add() of rows, bytes and the like. Outside a trace this does nothing.
+
+    Spans opened inside the block are its children unless activate=False,
+    which a generator must use when it yields from within the block (the
+    current span would otherwise leak to its consumer).
+    """
+    parent = _current.get()
+    if parent is None:
+        yield _NULL_SPAN
+        return
+    s = parent.trace._open(name, parent.span_id, attributes)
+    token = _current.set(s) if activate else None
+    try:
+        yield s
+    except BaseException as e:
+        s.end(e)
+        raise
+    finally:
+        if token is not None:
+            _current.reset(token)
+        s.end()
+
+def current_trace() -> Optional[Trace]:
+    parent = _current.get()
+    return parent.trace if parent is not None else None
+
+def bind(fn: Callable) -> Callable:
+    """
+    `fn` running under the caller's current span, for work handed to other
+    threads (e.g. executor.submit(bind(fn), ...)); each call gets its own
+    copy of the context.
+    """
+    ctx = contextvars.copy_context()
+
+    def bound(*args, **kwargs):
+        return ctx.copy().run(fn, *args, **kwargs)
+    return bound
+
+class JsonLogExporter:
+    """
+    JSON log lines on the `ledger.trace` logger: one per trace at `level`,
+    the root span (see Span.as_dict) with the trace's summary(), and one per
+    child span at `span_level` (DEBUG by default, so the per-chunk db.query
+    spans of a large report are only logged when that is enabled).
+    """
+
+    def __init__(self, logger: Optional[logging.Logger] = None, level: int = logging.INFO,
+                 span_level: int = logging.DEBUG):
+        self.logger = logger or logging.getLogger("ledger.trace")
+        self.level = level
+        self.span_level = span_level
+
+    def export(self, trace: Trace):
+        if self.logger.isEnabledFor(self.level):
+            root = dict(trace.root.as_dict(), summary=trace.summary())
+            self.logger.log(self.level, json.dumps(root, default=str))
+        if self.logger.isEnabledFor(self.span_level):
+            for s in trace.spans:
+                if s is not trace.root:
+                    self.logger.log(self.span_level, json.dumps(s.as_dict(), default=str))
+
+class OTelExporter:
+    """
+    Replays finished traces through the OpenTelemetry API (opentelemetry-api,
+    optional), keeping start/end times, parents and attributes, so they reach
+    whatever SDK/exporter the host has configured.
+    """
+
+    def __init__(self, tracer=None):
+        if tracer is None:
+            from opentelemetry import trace as otel_trace
+            tracer = otel_trace.get_tracer("ledger-report")
+        from opentelemetry.trace import set_span_in_context, Status, StatusCode
+        self.tracer = tracer
+        self._set_span_in_context = set_span_in_context
+        self._error_status = Status(StatusCode.ERROR)
+
+    def export(self, trace: Trace):
+        created = {}
+        for s in sorted(trace.spans, key=lambda s: s.start_ns):
+            parent = created.get(s.parent_id)
+            otel_span = self.tracer.start_span(
+                s.name,
+                context=self._set_span_in_context(parent) if parent is not None else None,
+                start_time=s.start_ns,
+                attributes={k: v for k, v in s.attributes.items() if isinstance(v, (str, bool, int, float))},
+            )
+            if s.error:
+                otel_span.set_status(self._error_status)
+            created[s.span_id] = otel_span
+        for s in trace.spans:
+            created[s.span_id].end(end_time=s.end_ns)
+
+class InMemoryExporter:
+    """Keeps finished traces in `traces` (e.g. for tests and benchmarks)."""
+
+    def __init__(self):
+        self.traces: List[Trace] = []
+        self._lock = threading.Lock()
+
+    def export(self, trace: Trace):
+        with self._lock:
+            self.traces.append(trace)
+
+    @property
+    def spans(self) -> List[Span]:
+        with self._lock:
+            return [s for t in self.traces for s in t.spans]
+
+    def clear(self):
+        with self._lock:
+            self.traces.clear()
+
+_EXPORTERS = {"json": JsonLogExporter, "otel": OTelExporter, "memory": InMemoryExporter}
+
+_exporters = None
+_exporters_lock = threading.Lock()
+
+def get_exporters() -> list:
+    """
+    Process-wide exporters, from TRACE_EXPORTERS: a comma-separated list of
+    json (default; per-request summary lines, see JsonLogExporter), otel and
+    memory, or "none".
+    """
+    global _exporters
+    if _exporters is None:
+        with _exporters_lock:
+            if _exporters is None:
+                exporters = []
+                for name in os.environ.get("TRACE_EXPORTERS", "json").split(","):
+                    name = name.strip().lower()
+                    if not name or name == "none":
+                        continue
+                    if name not in _EXPORTERS:
+                        logging.warning(f"Unknown trace exporter: {name}")
+                        continue
+                    try:
+                        exporters.append(_EXPORTERS[name]())
+                    except ImportError as e:
+                        logging.warning(f"Trace exporter {name} unavailable: {e}")
+                _exporters = exporters
+    return _exporters
+
+def add_exporter(exporter):
+    """Register an extra process-wide exporter (e.g. an InMemoryExporter)."""
+    exporters = get_exporters()
+    with _exporters_lock:
+        exporters.append(exporter)
@@ -0,0 +1,225 @@
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from .chunk_cache import template_hash
+from .ledger_rows import LEDGER_RE, classify
+
+_SECOND = timedelta(seconds=1)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS watermarks (
+    recipient    TEXT NOT NULL,
+    db_code      TEXT NOT NULL,
+    ledger_id    TEXT NOT NULL,
+    report_key   TEXT NOT NULL,
+    period_from  TEXT NOT NULL,
+    watermark    TEXT NOT NULL,
+    opening      REAL NOT NULL,
+    total_debit  REAL NOT NULL,
+    total_credit REAL NOT NULL,
+    entries      INTEGER NOT NULL,
+    closing      REAL NOT NULL,
+    updated_at   REAL NOT NULL,
+    PRIMARY KEY (recipient, db_code, ledger_id, report_key)
+);
+"""
+
+def watermark_key(sql_proc: str, currency: str) -> str:
+    """Which report a watermark belongs to: the proc call without its ledger/date values, and the currency."""
+    return f"{template_hash(sql_proc)}|{str(currency or '').strip().upper()}"
+
+class Watermark:
+    """
+    The last delivered report for one ledger: its period (`period_from` to
+    `watermark`, the last instant it covered) and its summary block.
+    """
+
+    def __init__(self, ledger_id: str, period_from: datetime, watermark: datetime, opening: float,
+                 total_debit: float, total_credit: float, entries: int, closing: float):
+        self.ledger_id = ledger_id
+        self.period_from = period_from
+        self.watermark = watermark
+        self.opening = opening
+        self.total_debit = total_debit
+        self.total_credit = total_credit
+        self.entries = entries
+        self.closing = closing
+
+class SqliteWatermarkStore:
+    """
+    Per-(recipient, db_code, ledger, report) watermarks of delivered reports,
+    on a local SQLite file (several processes may share it).
+
+    record() is called after a report was sent; plan_delta() reads the
+    watermarks back to decide whether the next request can be a delta.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _recipient(recipient: str) -> str:
+        return recipient.strip().lower()
+
+    @staticmethod
+    def _db(db_code) -> str:
+        return str(db_code).strip().upper()
+
+    def get(self, recipient: str, db_code, report_key: str, ledger_ids: List[str]) -> Dict[str, Watermark]:
+        """Watermarks held for these ledgers (ledgers without one are left out)."""
+        if not ledger_ids:
+            return {}
+        placeholders = ",".join("?" * len(ledger_ids))
+        rows = self._conn().execute(
+            f"SELECT * FROM watermarks WHERE recipient = ? AND db_code = ? AND report_key = ? "
+            f"AND ledger_id IN ({placeholders})",
+            (self._recipient(recipient), self._db(db_code), report_key, *[str(l) for l in ledger_ids]),
+        ).fetchall()
+        return {
+            row["ledger_id"]: Watermark(
+                row["ledger_id"],
+                datetime.fromisoformat(row["period_from"]),
+                datetime.fromisoformat(row["watermark"]),
+                row["opening"], row["total_debit"], row["total_credit"], row["entries"], row["closing"],
+            )
+            for row in rows
+        }
+
+    def record(self, recipient: str, db_code, report_key: str, period_from: datetime, watermark: datetime,
+               summaries: Dict[str, List[float]]):
+        """
+        Store the watermark of a delivered report: `summaries` is
+        {ledger_id: [opening, debit, credit, entries, closing]} as returned
+        by the exporters, `period_from` the start of the requested period and
+        `watermark` its end.
+        """
+        now = time.time()
+        rows = [
+            (self._recipient(recipient), self._db(db_code), str(lid), report_key,
+             period_from.isoformat(), watermark.isoformat(),
+             float(opening), float(debit), float(credit), int(entries), float(closing), now)
+            for lid, (opening, debit, credit, entries, closing) in summaries.items()
+        ]
+        with self._conn() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO watermarks (recipient, db_code, ledger_id, report_key, period_from, "
+                "watermark, opening, total_debit, total_credit, entries, closing, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def clear(self, recipient: Optional[str] = None):
+        """Forget every watermark (or one recipient's), so their next reports are full."""
+        with self._conn() as conn:
+            if recipient is None:
+                conn.execute("DELETE FROM watermarks")
+            else:
+                conn.execute("DELETE FROM watermarks WHERE recipient = ?", (self._recipient(recipient),))
+
+class DeltaPlan:
+    """A delta report: fetch from `start` (just after `since`), opening from `carried`."""
+
+    def __init__(self, since: datetime, carried: Dict[str, Watermark]):
+        self.since = since
+        self.start = since + _SECOND
+        self.carried = carried
+
+def plan_delta(store: SqliteWatermarkStore, recipient: str, db_code, report_key: str,
+               ledger_ids: List[str], from_date: datetime, to_date: datetime) -> Optional[DeltaPlan]:
+    """
+    A DeltaPlan when the recipient's last report for these ledgers covered
+    the same period start (e.g. the same year-to-date) up to a common
+    watermark before `to_date`; otherwise None and the report is full.
+    """
+    marks = store.get(recipient, db_code, report_key, ledger_ids)
+    reason = None
+    if set(marks) != {str(l) for l in ledger_ids}:
+        reason = "no earlier report for every ledger"
+    elif any(m.period_from != from_date for m in marks.values()):
+        reason = "period start changed"
+    elif len({m.watermark for m in marks.values()}) != 1:
+        reason = "ledgers were last reported up to different times"
+    else:
+        since = next(iter(marks.values())).watermark
+        if not from_date <= since < to_date:
+            reason = f"nothing after the last report ({since:%d-%b-%Y %H:%M:%S})"
+    if reason is not None:
+        logging.info(f"Delta report for {recipient} not possible ({reason}); sending the full period.")
+        return None
+    logging.info(f"Delta report for {recipient}: vouchers after {since:%d-%b-%Y %H:%M:%S}")
+    return DeltaPlan(since, marks)
+
+def carry_forward(data_dict: Dict[str, pd.DataFrame], plan: DeltaPlan,
+                  tolerance: float = 0.005) -> Optional[Dict[str, pd.DataFrame]]:
+    """
+    Delta frames with each ledger opening at the closing balance of the last
+    delivered report: an Opening Balance row is added where the proc did not
+    return one.
+
+    Where the proc did return one, it must match the carried balance; a
+    difference means vouchers on or before the watermark changed since the
+    last report (backdated or late postings), and None is returned so the
+    caller sends the full period instead. So is a ledger that came back
+    empty (failed fetch).
+    """
+    out = {}
+    for lid, df in data_dict.items():
+        carried = plan.carried[lid].closing
+        if df.empty or "Voucher Number" not in df.columns or "Debit" not in df.columns:
+            logging.warning(f"Delta for ledger {lid}: no rows fetched; sending the full period.")
+            return None
+        is_open, _ = classify(df["Voucher Number"])
+        if is_open.any():
+            opening = float(df["Debit"].iloc[int(is_open.argmax())])
+            if abs(opening - carried) > tolerance:
+                logging.warning(
+                    f"Delta for ledger {lid}: opening balance {opening:.2f} at {plan.start:%d-%b-%Y %H:%M:%S} "
+                    f"differs from the last report's closing {carried:.2f}; sending the full period."
+                )
+                return None
+            out[lid] = df
+            continue
+        row = {col: df[col].iloc[0] if LEDGER_RE.match(col) else None for col in df.columns}
+        row.update({"Voucher Date": plan.start, "Voucher Number": "Opening Balance", "Debit": carried, "Credit": 0.0})
+        out[lid] = pd.concat([pd.DataFrame([row]), df], ignore_index=True)
+    return out
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_watermark_store() -> Optional[SqliteWatermarkStore]:
+    """
+    Process-wide watermark store, or None when DELTA_REPORTS is off (default on).
+    The SQLite file lives at WATERMARK_DB_PATH (default: ledger_watermarks.sqlite3
+    in the temp directory).
+    """
+    global _store
+    if os.environ.get("DELTA_REPORTS", "1").lower() not in ("1", "true", "yes"):
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                path = os.environ.get("WATERMARK_DB_PATH") or os.path.join(
+                    tempfile.gettempdir(), "ledger_watermarks.sqlite3")
+                _store = SqliteWatermarkStore(path)
+    return _store
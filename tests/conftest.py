@@ -0,0 +1,20 @@
+"""
+Tests run offline against the benchmarks' fake driver: it is installed as
+`pytds` before any shared module imports the real one.
+"""
+import pytest
+
+from benchmarks.fake_pytds import FakeBackend, Stats, install
+from benchmarks.synthetic import SyntheticLedgers
+
+CONN_STR = "Server=fake,1433;Database=erp;User Id=test;Password=test"
+
+DATA = SyntheticLedgers(ledger_count=2, vouchers_per_month=5)
+BACKEND = FakeBackend(DATA)
+install(BACKEND)
+
+@pytest.fixture
+def backend():
+    """The fake backend with its counters reset."""
+    BACKEND.stats = Stats()
+    return BACKEND
@@ -0,0 +1,35 @@
+from datetime import datetime
+
+from shared.chunk_cache import ChunkCache
+from shared.chunking import AdaptiveChunking, MONTHLY, calendar_months
+from shared.fetcher import fetch_per_ledger_chunked
+
+from .conftest import CONN_STR, DATA
+
+SQL = "EXEC dbo.Fin_LedgerReport @StrLedgers='1', @FromDate='01-Jan-2023', @ToDate='31-Dec-2023'"
+FROM, TO = datetime(2023, 1, 1), datetime(2023, 12, 31, 23, 59, 59)
+
+def _fetch(cache, chunking, from_date=FROM):
+    return fetch_per_ledger_chunked(CONN_STR, SQL, DATA.ledger_ids, from_date, TO, max_workers=1,
+                                    chunk_cache=cache, db_code="T", chunking=chunking)
+
+def test_calendar_months_split_at_month_boundaries():
+    windows = list(calendar_months(datetime(2023, 1, 15), datetime(2023, 3, 10)))
+    assert windows == [
+        (datetime(2023, 1, 15), datetime(2023, 1, 31, 23, 59, 59)),
+        (datetime(2023, 2, 1), datetime(2023, 2, 28, 23, 59, 59)),
+        (datetime(2023, 3, 1), datetime(2023, 3, 10)),
+    ]
+
+def test_adaptive_windows_reuse_monthly_cache_entries(tmp_path, backend):
+    cache = ChunkCache(str(tmp_path))
+    cold = _fetch(cache, MONTHLY)
+    trips = backend.stats.round_trips
+    assert trips > 0
+
+    # Different window sizes, same closed months: every chunk comes from the cache
+    for target_rows in (3, 40, 10000):
+        warm = _fetch(cache, AdaptiveChunking(target_rows=target_rows, initial_days=45))
+        assert backend.stats.round_trips == trips
+        for lid in DATA.ledger_ids:
+            assert len(warm[lid]) == len(cold[lid])
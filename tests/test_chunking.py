@@ -0,0 +1,21 @@
+from datetime import datetime
+
+from shared.chunking import AdaptiveChunking
+
+def _density_after_one_window(ledger_count, rows, calls=1):
+    strategy = AdaptiveChunking(target_rows=1000, initial_days=10)
+    planner = strategy.planner("k", datetime(2024, 1, 1), datetime(2024, 12, 31), ledger_count=ledger_count)
+    windows = planner.windows()
+    next(windows)
+    planner.record(rows, 0.1, 10.0, calls)
+    next(windows)
+    return strategy.density("k")
+
+def test_balance_rows_are_subtracted_per_ledger():
+    # 5 ledgers x (opening + closing) around 100 vouchers over 10 days
+    assert _density_after_one_window(ledger_count=5, rows=110) == 10.0
+
+def test_balance_rows_are_subtracted_per_call():
+    # Same window read as 2 monthly calls: 2 balance rows per ledger per call
+    assert _density_after_one_window(ledger_count=5, rows=120, calls=2) == 10.0
+    assert _density_after_one_window(ledger_count=1, rows=102) == 10.0
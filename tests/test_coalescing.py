@@ -0,0 +1,76 @@
+import threading
+
+import pytest
+
+from shared.coalescing import DUPLICATE, FOLLOWER, LEADER, REUSE, RequestCoalescer
+
+def _in_thread(fn, *args):
+    out = {}
+
+    def run():
+        try:
+            out["result"] = fn(*args)
+        except BaseException as e:
+            out["error"] = e
+
+    t = threading.Thread(target=run)
+    t.start()
+    return t, out
+
+def test_each_recipient_delivers_itself():
+    discarded = []
+    coalescer = RequestCoalescer(discard=discarded.append)
+    batch, role = coalescer.join("k", "lead@example.com")
+    assert role == LEADER
+    assert coalescer.join("k", "follow@example.com")[1] == FOLLOWER
+    assert coalescer.join("k", "follow@example.com")[1] == DUPLICATE
+
+    release = threading.Event()
+
+    def slow(artifact):
+        release.wait(5)
+        raise RuntimeError(f"smtp down for {artifact}")
+
+    follower, follower_out = _in_thread(coalescer.deliver, batch, "follow@example.com", slow)
+    duplicate, duplicate_out = _in_thread(coalescer.wait, batch, "follow@example.com")
+    coalescer.publish(batch, "report")
+    # The leader answers with its own outcome while the follower is still sending
+    assert coalescer.deliver(batch, "lead@example.com", lambda artifact: f"sent {artifact}") == "sent report"
+    assert follower.is_alive() and not discarded
+
+    release.set()
+    follower.join()
+    duplicate.join()
+    assert str(follower_out["error"]) == "smtp down for report"
+    assert duplicate_out["error"] is follower_out["error"]
+    assert discarded == ["report"]
+    assert coalescer.join("k", "lead@example.com")[1] == LEADER
+
+def test_build_failure_reaches_followers():
+    coalescer = RequestCoalescer()
+    batch, _ = coalescer.join("k", "lead@example.com")
+    coalescer.join("k", "follow@example.com")
+    follower, out = _in_thread(coalescer.deliver, batch, "follow@example.com", lambda artifact: "sent")
+    coalescer.fail(batch, ValueError("fetch failed"))
+    follower.join()
+    assert str(out["error"]) == "fetch failed"
+    assert coalescer.stats()["failed"] == 1
+
+def test_kept_report_is_reused_then_discarded():
+    discarded, idle = [], []
+    coalescer = RequestCoalescer(window=60, discard=discarded.append, idle=idle.append)
+    batch, _ = coalescer.join("k", "lead@example.com")
+    coalescer.publish(batch, "report")
+    coalescer.deliver(batch, "lead@example.com", lambda artifact: "sent")
+    assert idle == ["report"] and not discarded
+
+    again, role = coalescer.join("k", "later@example.com")
+    assert (again, role) == (batch, REUSE)
+
+    def refused(artifact):
+        raise RuntimeError("recipient refused")
+
+    with pytest.raises(RuntimeError):
+        coalescer.deliver(batch, "later@example.com", refused)
+    coalescer._expire(batch)
+    assert discarded == ["report"]
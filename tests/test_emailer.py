@@ -0,0 +1,74 @@
+import email
+from concurrent.futures import Future
+
+import pytest
+
+from shared import emailer
+from shared.delivery import XLSX_TYPE, DeliveryPart
+from shared.emailer import EmailSendError, send_email_with_excel
+
+SMTP = dict(smtp_server="relay", smtp_port=25, smtp_username="reports@example.com", smtp_password="secret")
+
+class _Policy:
+    def __init__(self, parts):
+        self.parts = parts
+
+    def plan(self, path, ledgers, write_workbook=None, ledger_weights=None):
+        return self.parts
+
+class _Transport:
+    """Records submitted messages; `outcomes` settles each future (an int of attempts, an exception, or None)."""
+
+    def __init__(self, events, outcomes):
+        self.events = events
+        self.outcomes = list(outcomes)
+        self.futures = []
+
+    def submit(self, msg, from_addr, to_addrs, retries=None):
+        self.events.append(("submit", b"".join(msg.chunks())))
+        future, outcome = Future(), self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            future.set_running_or_notify_cancel()
+            future.set_exception(outcome)
+        elif outcome is not None:
+            future.set_running_or_notify_cancel()
+            future.set_result(outcome)
+        self.futures.append(future)
+        return future
+
+def _parts(tmp_path, n):
+    parts = []
+    for i in range(1, n + 1):
+        path = tmp_path / f"part{i}.xlsx"
+        path.write_bytes(b"x" * 10)
+        parts.append(DeliveryPart([str(1000 + i)], str(path), path.name, XLSX_TYPE, False))
+    return parts
+
+def _body(raw):
+    message = email.message_from_bytes(raw)
+    return next(part for part in message.walk() if part.get_content_type() == "text/plain").get_payload(decode=True).decode("utf-8")
+
+def test_ledger_without_metadata_is_listed_by_id(tmp_path):
+    events = []
+    (part,) = _parts(tmp_path, 1)
+    part.ledgers = ["1001", "1002"]
+    send_email_with_excel("a@example.com", part.path, {"1001": {}, "1002": {"code": "C2", "name": "Bank"}},
+                          part.ledgers, policy=_Policy([part]), transport=_Transport(events, [1]), **SMTP)
+    assert _body(events[0][1]).splitlines()[1:3] == ["- 1001 – ", "- C2 – Bank"]
+
+def test_failed_part_cancels_the_parts_still_queued(tmp_path, monkeypatch):
+    events = []
+    encode = emailer.EncodedMessage
+
+    def encoded(*args, **kw):
+        events.append(("encode", args[3]))
+        return encode(*args, **kw)
+
+    monkeypatch.setattr(emailer, "EncodedMessage", encoded)
+    transport = _Transport(events, [1, RuntimeError("452 mailbox full"), None])
+    with pytest.raises(EmailSendError, match="452 mailbox full"):
+        send_email_with_excel("a@example.com", "unused.xlsx", {}, ["1001", "1002", "1003"],
+                              policy=_Policy(_parts(tmp_path, 3)), transport=transport, **SMTP)
+
+    assert [kind for kind, _ in events] == ["encode"] * 3 + ["submit"] * 3
+    assert transport.futures[2].cancelled()
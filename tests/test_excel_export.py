@@ -0,0 +1,81 @@
+from datetime import datetime
+
+import pandas as pd
+import xlsxwriter
+
+from shared import excel_export
+from shared.excel_export import _MAX_HELD_BATCHES, _StreamingSheet, iter_frame_batches
+
+META = {"1001": {"code": "1001", "name": "Cash", "company_name": "Test Co"}}
+ARGS = dict(metadata=META, requested_by="a@example.com", from_date=datetime(2024, 1, 1),
+            to_date=datetime(2024, 1, 31), currency="QAR", requested_at=datetime(2024, 2, 1))
+
+def _vouchers(n, opening=False):
+    rows = [{"Voucher Date": datetime(2024, 1, 1 + i % 28), "Voucher Number": f"V{i}",
+             "Narration": "x", "Debit": 1.0, "Credit": 0.0} for i in range(n)]
+    if opening:
+        rows.insert(0, {"Voucher Date": datetime(2024, 1, 1), "Voucher Number": "Opening Balance",
+                        "Narration": "", "Debit": 10.0, "Credit": 0.0})
+    return pd.DataFrame(rows)
+
+def _sheet(path):
+    return pd.read_excel(path, sheet_name=0, header=None)
+
+def test_streaming_without_opening_row_holds_bounded_batches(tmp_path):
+    workbook = xlsxwriter.Workbook(str(tmp_path / "s.xlsx"), {"constant_memory": True})
+    sheet = _StreamingSheet(workbook, "Cash", excel_export._add_formats(workbook), {
+        "m": META["1001"], "lid": "1001", "sheet_name": "Cash", "requested_by": "a@example.com",
+        "from_date": ARGS["from_date"], "to_date": ARGS["to_date"], "currency": "QAR"})
+    for batch in iter_frame_batches(_vouchers(50), batch_rows=5):
+        sheet.feed(batch)
+        assert len(sheet.held) < _MAX_HELD_BATCHES
+    assert sheet.finish("a@example.com")[3] == 50
+    workbook.close()
+
+def test_streaming_matches_save_to_excel_without_opening_row(tmp_path):
+    df = _vouchers(30)
+    excel_export.save_to_excel(data_dict={"1001": df}, out_path=str(tmp_path / "a.xlsx"), **ARGS)
+    excel_export.save_to_excel_streaming(ledger_batches=[("1001", iter_frame_batches(df, batch_rows=4))],
+                                         out_path=str(tmp_path / "b.xlsx"), **ARGS)
+    pd.testing.assert_frame_equal(_sheet(tmp_path / "a.xlsx"), _sheet(tmp_path / "b.xlsx"))
+
+def test_streaming_puts_opening_row_first(tmp_path):
+    df = _vouchers(10, opening=True)
+    excel_export.save_to_excel(data_dict={"1001": df}, out_path=str(tmp_path / "a.xlsx"), **ARGS)
+    excel_export.save_to_excel_streaming(ledger_batches=[("1001", iter_frame_batches(df, batch_rows=3))],
+                                         out_path=str(tmp_path / "b.xlsx"), **ARGS)
+    pd.testing.assert_frame_equal(_sheet(tmp_path / "a.xlsx"), _sheet(tmp_path / "b.xlsx"))
+
+class _FakeProcessPool:
+    """ProcessPoolExecutor stand-in that runs submitted work inline."""
+
+    def __init__(self, max_workers, mp_context=None):
+        self.max_workers = max_workers
+        self.submitted = 0
+        self.shut_down = False
+
+    def submit(self, fn, *args):
+        from concurrent.futures import Future
+        self.submitted += 1
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+def test_prepare_pool_is_sized_by_the_requested_workers(monkeypatch):
+    monkeypatch.setattr(excel_export, "ProcessPoolExecutor", _FakeProcessPool)
+    monkeypatch.setattr(excel_export, "_prepare_pool", None)
+    monkeypatch.setattr(excel_export, "_prepare_pool_size", 0)
+    ledgers = [("1001", _vouchers(3, opening=True)), ("1002", _vouchers(30, opening=True))]
+
+    assert len(list(excel_export._iter_prepared(ledgers[:1], workers=2, min_rows=10))) == 1
+    assert excel_export._prepare_pool is None  # no ledger big enough to start it
+
+    small = excel_export.get_prepare_pool(2)
+    prepared = list(excel_export._iter_prepared(ledgers, workers=3, min_rows=10))
+    pool = excel_export._prepare_pool
+    assert [lid for lid, _ in prepared] == ["1001", "1002"]
+    assert (pool.max_workers, pool.submitted, small.shut_down) == (3, 1, True)
+    assert excel_export.get_prepare_pool(2) is pool
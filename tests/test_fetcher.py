@@ -0,0 +1,79 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from shared import fetcher
+from shared.fetcher import _ColumnBuffer, _bind_chunk, _build_chunk_sql, fetch_per_ledger_chunked
+from shared.parser import compile_proc
+from shared.pool import ConnectionPool, PoolTimeoutError
+
+from .conftest import CONN_STR, DATA
+
+SQL = "EXEC dbo.Fin_LedgerReport @StrLedgers='1', @FromDate='01-Jan-2024', @ToDate='31-Mar-2024'"
+
+def _values(series):
+    """Column values with missing cells (None or NaN) as None."""
+    return [None if pd.isna(v) else v for v in series]
+
+def test_column_added_mid_stream_is_backfilled_once():
+    buf = _ColumnBuffer()
+    buf.extend(["a"], [(1,), (2,)])
+    buf.extend(["a", "b"], [(3, "x")])
+
+    df = buf.to_frame()
+    assert buf.rows == 3
+    assert list(df.columns) == ["a", "b"]
+    assert _values(df["a"]) == [1, 2, 3]
+    assert _values(df["b"]) == [None, None, "x"]
+
+def test_column_added_after_flush_and_pending_rows():
+    buf = _ColumnBuffer(flush_rows=2)
+    buf.extend(["a"], [(1,), (2,)])  # flushed
+    buf.extend(["a"], [(3,)])  # pending
+    buf.extend(["a", "b"], [(4, "y")])  # flushes again
+
+    df = buf.to_frame()
+    assert len(df) == 4
+    assert _values(df["a"]) == [1, 2, 3, 4]
+    assert _values(df["b"]) == [None, None, None, "y"]
+
+def test_column_missing_from_later_set_is_filled():
+    buf = _ColumnBuffer()
+    buf.extend(["a", "b"], [(1, "x")])
+    buf.extend(["a"], [(2,)])
+    buf.extend(["a", "c"], [(3, "z")])
+
+    df = buf.to_frame()
+    assert list(df.columns) == ["a", "b", "c"]
+    assert _values(df["a"]) == [1, 2, 3]
+    assert _values(df["b"]) == ["x", None, None]
+    assert _values(df["c"]) == [None, None, "z"]
+
+def test_rpc_binds_quoted_dates_as_the_sql_text_does():
+    template = "EXEC dbo.P @StrLedgers='1', @FromDate='01-Jan-2024', @ToDate='31-Jan-2024', @Mode=1"
+    start, end = datetime(2024, 1, 1), datetime(2024, 1, 31, 23, 59, 59)
+    bound = _bind_chunk(compile_proc(template), "1001,1002", start, end)
+    assert bound == {"@StrLedgers": "1001,1002", "@FromDate": "01-Jan-2024 00:00:00",
+                     "@ToDate": "31-Jan-2024 23:59:59", "@Mode": 1}
+    assert "@ToDate='31-Jan-2024 23:59:59'" in _build_chunk_sql(template, "1001,1002", start, end)
+
+def _fetch(**kw):
+    return fetch_per_ledger_chunked(CONN_STR, SQL, DATA.ledger_ids, datetime(2024, 1, 1),
+                                    datetime(2024, 3, 31, 23, 59, 59), **kw)
+
+def test_ledgers_share_a_connection_chunk_by_chunk(monkeypatch, backend):
+    pool = ConnectionPool(max_per_key=1, checkout_timeout=5)
+    monkeypatch.setattr(fetcher, "get_pool", lambda: pool)
+    frames = _fetch(max_workers=len(DATA.ledger_ids))
+
+    assert all(len(df) for df in frames.values())
+    assert backend.stats.connects == 1
+    assert [key["in_use"] for key in pool.stats()["keys"].values()] == [0]
+
+def test_exhausted_pool_fails_the_fetch(monkeypatch):
+    pool = ConnectionPool(max_per_key=1, checkout_timeout=0.05)
+    monkeypatch.setattr(fetcher, "get_pool", lambda: pool)
+    with pool.connection(CONN_STR):
+        with pytest.raises(PoolTimeoutError):
+            _fetch(retry_attempts=2)
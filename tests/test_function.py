@@ -0,0 +1,110 @@
+"""
+MyFunction end to end against the benchmarks' Key Vault and SMTP stubs,
+with the artifact store on and coalescing off.
+"""
+import email
+import io
+import re
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+import pytest
+
+from benchmarks.fake_azure import HttpRequest, install as install_azure
+from benchmarks.fake_smtp import StubSmtpServer
+from tests.conftest import DATA
+
+BASE_URL = "https://reports.example.com/reports/download"
+BODY = {
+    "sql_proc": f"EXEC dbo.Fin_LedgerReport @StrLedgers='{','.join(DATA.ledger_ids)}', "
+                f"@FromDate='01-Jan-2024', @ToDate='31-Mar-2024'",
+    "db_code": "TEST",
+}
+
+@pytest.fixture(scope="module")
+def function(tmp_path_factory):
+    server = StubSmtpServer(keep_data=True).start()
+    with pytest.MonkeyPatch.context() as mp:
+        for name, value in {
+            "KEYVAULT_URL": "https://fake.vault.local/", "STARTUP_PREWARM": "0", "SMTP_STARTTLS": "0",
+            "COALESCE_REQUESTS": "0", "DELTA_REPORTS": "0", "ARTIFACT_STORE": "1",
+            "ARTIFACT_STORE_DIR": str(tmp_path_factory.mktemp("artifacts")), "ARTIFACT_BASE_URL": BASE_URL,
+        }.items():
+            mp.setenv(name, value)
+        vault = install_azure({
+            "sql-connection-template": "Server=fake,1433;Database={db};User Id=test;Password=test",
+            "db-map-TEST": "erp",
+            "email-smtp-server": server.host,
+            "email-smtp-port": str(server.port),
+            "email-username": "reports@example.com",
+            "email-password": "secret",
+            "artifact-link-secret": "test-link-secret",
+        })
+        import MyFunction
+        import ReportDownload
+        yield MyFunction, server, ReportDownload, vault
+    server.stop()
+
+def _post(function, **fields):
+    main, server = function[0].main, function[1]
+    sent = len(server.messages)
+    resp = main(HttpRequest("POST", "http://localhost/MyFunction", body=dict(BODY, **fields)))
+    assert resp.status_code == 200, resp.get_body()
+    return email.message_from_bytes(server.messages[sent]["data"])
+
+def _requested_by(workbook: bytes) -> str:
+    return pd.read_excel(io.BytesIO(workbook), sheet_name=0, header=None).iloc[4, 0]
+
+def test_reused_report_shows_current_requester(function):
+    store = function[0].get_artifact_store()
+    first = _post(function, email_to="first@example.com")
+    hits = store.stats()["hits"]
+    second = _post(function, email_to="second@example.com")
+    assert store.stats()["hits"] == hits + 1
+
+    attachment = next(part for part in second.walk() if part.get_filename()).get_payload(decode=True)
+    assert _requested_by(attachment).startswith("Requested by: second@example.com at ")
+    assert b"first@example.com" not in attachment
+    assert "second@example.com" in second["Subject"] and "first@example.com" in first["Subject"]
+
+def test_download_link_is_stamped_for_its_recipient(function):
+    message = _post(function, email_to="linked@example.com", delivery="link")
+    link = re.search(r"https://\S+", message.get_payload(decode=True).decode("utf-8")).group(0)
+    assert link.startswith(BASE_URL + "?")
+    query = {k: v[0] for k, v in parse_qs(urlsplit(link).query).items()}
+
+    download = function[2].main
+    resp = download(HttpRequest("GET", BASE_URL, params=query))
+    assert resp.status_code == 200
+    assert _requested_by(resp.get_body()).startswith("Requested by: linked@example.com at ")
+    assert download(HttpRequest("GET", BASE_URL, params=dict(query, to="someone@example.com"))).status_code == 403
+
+def test_link_on_a_keyed_url_is_not_sent(function, monkeypatch):
+    monkeypatch.setattr(function[0], "_artifact_base_url", "https://reports.example.com/api/MyFunction?code=key")
+    message = _post(function, email_to="keyed@example.com", delivery="link")
+    assert [part.get_filename() for part in message.walk() if part.get_filename()]
+    assert "code=" not in message.as_string()
+
+def test_streaming_export_is_fed_by_the_fetch(function, monkeypatch):
+    p = function[0]._ready()
+    monkeypatch.setattr(function[0], "_excel_streaming", True)
+    monkeypatch.setattr(p, "fetch_per_ledger_chunked", None)  # only iter_per_ledger_chunked may fetch
+    message = _post(function, email_to="streamed@example.com")
+    attachment = next(part for part in message.walk() if part.get_filename()).get_payload(decode=True)
+    assert _requested_by(attachment).startswith("Requested by: streamed@example.com at ")
+
+def test_missing_connection_template_fails_the_request(function, monkeypatch):
+    module, vault = function[0], function[3]
+    template = "sql-connection-template"
+    monkeypatch.setattr(module, "_startup", None)
+    monkeypatch.delitem(vault.secrets, template)
+    module._get_secrets().invalidate(template)
+    try:
+        resp = module.main(HttpRequest("POST", "http://localhost/MyFunction",
+                                       body=dict(BODY, email_to="nobody@example.com")))
+        assert resp.status_code == 500
+        assert resp.get_body().decode().startswith(f"Startup error: Required secret '{template}'")
+    finally:
+        monkeypatch.undo()
+        module._get_secrets().invalidate(template)
+    assert _post(function, email_to="again@example.com")
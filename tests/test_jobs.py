@@ -0,0 +1,60 @@
+import threading
+
+import pytest
+
+from shared.jobs import JobNotFoundError, JobWorker, SqliteJobQueue
+
+def test_each_job_is_claimed_once(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    queues = [SqliteJobQueue(path), SqliteJobQueue(path)]  # as two processes sharing the file
+    ids = {queues[0].enqueue({"n": n}) for n in range(40)}
+
+    claimed, lock = [], threading.Lock()
+
+    def drain(queue):
+        while True:
+            job = queue.claim()
+            if job is None:
+                return
+            with lock:
+                claimed.append(job[0])
+
+    threads = [threading.Thread(target=drain, args=(queues[i % 2],)) for i in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(claimed) == sorted(ids)
+    assert {queues[1].get(job_id)["status"] for job_id in ids} == {"running"}
+
+def test_stale_running_job_is_requeued(tmp_path):
+    queue = SqliteJobQueue(str(tmp_path / "jobs.sqlite3"))
+    job_id = queue.enqueue({"n": 1})
+    assert queue.claim() == (job_id, {"n": 1})
+    assert queue.claim() is None
+
+    assert queue.requeue_stale(older_than=60) == 0
+    assert queue.requeue_stale(older_than=-1) == 1
+    assert queue.get(job_id)["status"] == "queued"
+    assert queue.claim() == (job_id, {"n": 1})
+
+def test_worker_records_outcome_and_progress(tmp_path):
+    queue = SqliteJobQueue(str(tmp_path / "jobs.sqlite3"))
+
+    def handler(payload, report):
+        report("fetch", 1, 2)
+        if payload.get("fail"):
+            raise ValueError("no such ledger")
+        return "sent"
+
+    worker = JobWorker(queue, handler)
+    ok, bad = queue.enqueue({}), queue.enqueue({"fail": True})
+    assert worker.run_once() and worker.run_once() and not worker.run_once()
+
+    done = queue.get(ok)
+    assert (done["status"], done["message"], done["progress"]) == ("succeeded", "sent", {"done": 1, "total": 2})
+    assert "timings" in done
+    failed = queue.get(bad)
+    assert (failed["status"], failed["error"], failed["stage"]) == ("failed", "no such ledger", "fetch")
+    with pytest.raises(JobNotFoundError):
+        queue.get("missing")
@@ -0,0 +1,55 @@
+from datetime import datetime
+
+import pytest
+
+from shared.parser import SqlParseError, _raw_param, compile_proc, extract_dates, extract_ledgers
+
+SQL = ("SET NOCOUNT ON; EXEC [dbo].Fin_LedgerReport @StrLedgers='1001, 1002', "
+       "@FromDate='01-Jan-2024', @ToDate = '31-Mar-2024 23:59:59', @Mode=2, @Rate=1.5, "
+       "@Note=N'it''s', @Branch=NULL;")
+
+def test_compile_proc_keeps_literal_types():
+    call = compile_proc(SQL)
+    assert call.proc == "[dbo].Fin_LedgerReport"
+    assert dict(call.params) == {
+        "StrLedgers": "1001, 1002", "FromDate": "01-Jan-2024", "ToDate": "31-Mar-2024 23:59:59",
+        "Mode": 2, "Rate": 1.5, "Note": "it's", "Branch": None,
+    }
+    assert call.get("fromdate") == "01-Jan-2024" and "TODATE" in call
+    assert call.bind(fromdate="x", Unknown=1)["@FromDate"] == "x"
+    assert "@Unknown" not in call.bind(Unknown=1)
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM Ledger",
+    "EXEC dbo.P @A='x'; EXEC dbo.Q",
+    "EXEC dbo.P 'x', 1",
+    "EXEC dbo.P @A=@Other",
+    "EXEC dbo.P @A=1, @a=2",
+])
+def test_compile_proc_rejects_anything_but_literal_arguments(sql):
+    with pytest.raises(SqlParseError):
+        compile_proc(sql)
+
+def test_raw_param_reads_compiled_and_text_templates():
+    assert _raw_param(SQL, "strledgers") == "1001, 1002"
+    assert _raw_param(SQL, "Mode") == "2"
+    assert _raw_param(SQL, "Branch") is None
+    text = "DECLARE @x int = 1; EXEC dbo.P @StrLedgers='7,8', @FromDate='2024-01-01'"
+    assert _raw_param(text, "StrLedgers") == "7,8"
+    assert _raw_param(text, "ToDate") is None
+
+def test_extract_dates():
+    assert extract_dates(SQL) == (datetime(2024, 1, 1), datetime(2024, 3, 31, 23, 59, 59))
+    with pytest.raises(SqlParseError):
+        extract_dates("EXEC dbo.P @FromDate='01-Jan-2024'")
+    with pytest.raises(SqlParseError):
+        extract_dates("EXEC dbo.P @FromDate='2024-02-01', @ToDate='2024-01-01'")
+    with pytest.raises(SqlParseError):
+        extract_dates("EXEC dbo.P @FromDate='Jan 1 2024', @ToDate='2024-01-31'")
+
+def test_extract_ledgers():
+    assert extract_ledgers(SQL) == ["1001", "1002"]
+    assert extract_ledgers("EXEC dbo.P @FromDate='2024-01-01'") == []
+    with pytest.raises(SqlParseError):
+        extract_ledgers("EXEC dbo.P @StrLedgers='1001,abc'")
+    assert extract_ledgers("EXEC dbo.P @StrLedgers='1001,abc'", strict=False) == ["1001"]
@@ -0,0 +1,72 @@
+from shared import scheduler
+from shared.scheduler import DbScheduler
+
+from .conftest import CONN_STR
+
+class _Clock:
+    """Stands in for the time module: slot() durations are whatever run() advances."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+def _run(sched, clock, seconds, rows=0, observe=True):
+    with sched.slot(CONN_STR, "job", observe=observe) as query:
+        clock.now += seconds
+        query.rows = rows
+
+def _lane(sched):
+    (stats,) = sched.stats().values()
+    return stats
+
+def test_fast_metadata_query_does_not_pin_the_limit(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(scheduler, "time", clock)
+    sched = DbScheduler(max_in_flight=8, cooldown=0)
+
+    _run(sched, clock, 0.010, observe=False)
+    for _ in range(500):
+        _run(sched, clock, 0.080, rows=500)
+
+    lane = _lane(sched)
+    assert lane["limit"] == 8
+    assert lane["backoffs"] == 0
+    assert lane["queries"] == 501
+
+def test_stale_floor_decays_and_the_limit_recovers(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(scheduler, "time", clock)
+    sched = DbScheduler(max_in_flight=8, cooldown=0)
+
+    _run(sched, clock, 0.010)
+    for _ in range(500):
+        _run(sched, clock, 0.080)
+
+    lane = _lane(sched)
+    assert lane["backoffs"] > 0
+    assert lane["increases"] > 0
+    assert lane["limit"] == 8
+
+def test_latency_is_taken_per_row_unit(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(scheduler, "time", clock)
+    sched = DbScheduler(max_in_flight=8, cooldown=0)
+
+    # Small and large chunks at the same per-row speed
+    for i in range(200):
+        rows = 1000 if i % 2 else 20000
+        _run(sched, clock, 0.05 * rows / 1000, rows=rows)
+    assert _lane(sched)["backoffs"] == 0
+
+def test_slow_database_still_backs_off(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(scheduler, "time", clock)
+    sched = DbScheduler(max_in_flight=8, cooldown=0)
+
+    for _ in range(50):
+        _run(sched, clock, 0.05, rows=5000)
+    for _ in range(10):
+        _run(sched, clock, 1.0, rows=5000)
+    assert _lane(sched)["limit"] < 8
@@ -0,0 +1,103 @@
+import threading
+import time
+import types
+
+import pytest
+
+from shared import secret_cache
+from shared.secret_cache import SecretCache, SecretNotFoundError
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+class _NotFound(Exception):
+    status_code = 404
+
+class _Client:
+    """SecretClient stand-in: `values` by name, or raises `error` (an exception) when set."""
+
+    def __init__(self, **values):
+        self.values = values
+        self.error = None
+        self.calls = 0
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def get_secret(self, name):
+        self.calls += 1
+        self.gate.wait(5)
+        if self.error is not None:
+            raise self.error
+        if name not in self.values:
+            raise _NotFound(name)
+        return types.SimpleNamespace(value=self.values[name])
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(secret_cache, "time", clock)
+    return clock
+
+def _settled(cache, fetches):
+    deadline = time.monotonic() + 5
+    while cache.stats()["fetches"] < fetches or cache._inflight:
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+def test_stale_value_is_served_while_refresh_fails(clock):
+    client = _Client(pw="v1")
+    cache = SecretCache(client, ttl=10, max_stale=100)
+    assert cache.get("pw") == "v1"
+
+    client.error = ConnectionError("vault unreachable")
+    clock.now = 50
+    assert cache.get("pw") == "v1"
+    _settled(cache, 2)
+    assert cache.get("pw") == "v1"  # refresh failed: still the stale value
+    _settled(cache, 3)
+    assert cache.stats()["fetch_errors"] == 2
+
+    clock.now = 200
+    with pytest.raises(ConnectionError):
+        cache.get("pw")
+
+def test_background_refresh_picks_up_rotation(clock):
+    client = _Client(pw="v1")
+    cache = SecretCache(client, ttl=10, max_stale=100)
+    cache.get("pw")
+    client.values["pw"] = "v2"
+    clock.now = 20
+    assert cache.get("pw") == "v1"
+    _settled(cache, 2)
+    assert cache.get("pw") == "v2"
+
+def test_missing_secret_is_cached_negatively(clock):
+    client = _Client()
+    cache = SecretCache(client, negative_ttl=60)
+    for _ in range(3):
+        with pytest.raises(SecretNotFoundError):
+            cache.get("nope")
+    assert client.calls == 1
+    clock.now = 61
+    with pytest.raises(SecretNotFoundError):
+        cache.get("nope")
+    assert client.calls == 2
+
+def test_concurrent_misses_share_one_fetch(clock):
+    client = _Client(pw="v1")
+    client.gate.clear()
+    cache = SecretCache(client)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_secret("pw").value)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    while not cache._inflight:
+        time.sleep(0.001)
+    client.gate.set()
+    for t in threads:
+        t.join()
+    assert results == ["v1"] * 8 and client.calls == 1
@@ -0,0 +1,53 @@
+from email.message import EmailMessage
+
+import pytest
+
+from benchmarks.fake_smtp import StubSmtpServer
+from shared.smtp_transport import SmtpSendError, SmtpTransport
+
+@pytest.fixture
+def relay(request):
+    server = StubSmtpServer(**getattr(request, "param", {})).start()
+    yield server
+    server.stop()
+
+def _transport(relay, **kw):
+    return SmtpTransport(relay.host, relay.port, "reports@example.com", "secret", max_connections=1,
+                         backoff_base=0, starttls=False, **kw)
+
+def _message(body="hello"):
+    msg = EmailMessage()
+    msg["From"], msg["To"], msg["Subject"] = "reports@example.com", "a@example.com", "Report"
+    msg.set_content(body)
+    return msg
+
+def test_messages_share_one_authenticated_session(relay):
+    transport = _transport(relay)
+    try:
+        assert [transport.send(_message(), "reports@example.com", ["a@example.com"]) for _ in range(3)] == [1, 1, 1]
+    finally:
+        transport.close()
+    assert (relay.counters["sessions"], relay.counters["auths"], len(relay.messages)) == (1, 1, 3)
+
+@pytest.mark.parametrize("relay", [{"messages_per_session": 1, "keep_data": True}], indirect=True)
+def test_transient_4xx_is_retried_on_a_new_session(relay):
+    transport = _transport(relay)
+    try:
+        assert transport.send(_message("first"), "reports@example.com", ["a@example.com"]) == 1
+        # The relay answers 421 to a second message on the session, then hangs up
+        assert transport.send(_message("second"), "reports@example.com", ["a@example.com"]) == 2
+    finally:
+        transport.close()
+    assert relay.counters["throttled"] == 1 and relay.counters["sessions"] == 2
+    assert transport.stats()["retries"] == 1
+    assert [b"second" in m["data"] for m in relay.messages] == [False, True]
+
+@pytest.mark.parametrize("relay", [{"max_message_bytes": 64}], indirect=True)
+def test_permanent_5xx_fails_without_retry(relay):
+    transport = _transport(relay, retries=3)
+    try:
+        with pytest.raises(SmtpSendError, match="after 1 attempts"):
+            transport.send(_message("x" * 200), "reports@example.com", ["a@example.com"])
+    finally:
+        transport.close()
+    assert transport.stats()["failed"] == 1 and not relay.messages
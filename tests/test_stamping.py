@@ -0,0 +1,42 @@
+import json
+import zipfile
+from datetime import datetime
+
+import pandas as pd
+
+from shared.exporters import get_exporter
+from shared.stamping import REQUESTED_AT, REQUESTED_BY, stamp_report
+
+META = {"1001": {"code": "1001", "name": "Cash", "company_name": "Test Co"}}
+FRAMES = {"1001": pd.DataFrame([{"Voucher Date": datetime(2024, 1, 2), "Voucher Number": "V1",
+                                 "Narration": "x", "Debit": 1.0, "Credit": 0.0}])}
+AT = datetime(2024, 2, 1, 9, 30, 15)
+
+def _export(fmt, path):
+    get_exporter(fmt).export(ledgers=FRAMES, out_path=str(path), metadata=META, requested_by=REQUESTED_BY,
+                             from_date=datetime(2024, 1, 1), to_date=datetime(2024, 1, 31), currency="QAR",
+                             requested_at=REQUESTED_AT)
+
+def _text(path):
+    with zipfile.ZipFile(path) as zf:
+        return b"".join(zf.read(name) for name in zf.namelist() if name.endswith((".xml", ".json")))
+
+def test_stamped_workbook_shows_requester(tmp_path):
+    _export("xlsx", tmp_path / "neutral.xlsx")
+    stamp_report(str(tmp_path / "neutral.xlsx"), str(tmp_path / "a.xlsx"), "a&b@example.com", AT)
+
+    sheet = pd.read_excel(tmp_path / "a.xlsx", sheet_name=0, header=None)
+    assert sheet.iloc[4, 0] == "Requested by: a&b@example.com at 01-Feb-2024 09:30"
+    assert b"01-Feb-2024 09:30:15  a&amp;b@example.com" in _text(tmp_path / "a.xlsx")  # page footer
+    assert b"{{requested_" not in _text(tmp_path / "a.xlsx")
+
+def test_stamped_zipped_report_manifest(tmp_path):
+    _export("csv.gz", tmp_path / "neutral.zip")
+    stamp_report(str(tmp_path / "neutral.zip"), str(tmp_path / "a.zip"), 'a"b@example.com', AT)
+
+    with zipfile.ZipFile(tmp_path / "a.zip") as zf:
+        manifest = json.loads(zf.read("manifest.json"))
+        assert zf.getinfo("Cash.csv.gz").compress_type == zipfile.ZIP_STORED
+    assert manifest["requested_by"] == 'a"b@example.com'
+    assert manifest["requested_at"] == "2024-02-01 09:30:15"
+    assert manifest["ledgers"][0]["header"][-1] == 'Requested by: a"b@example.com at 01-Feb-2024 09:30'
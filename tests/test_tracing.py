@@ -0,0 +1,27 @@
+import json
+import logging
+
+from shared import tracing
+from shared.tracing import JsonLogExporter
+
+def _run(exporter):
+    with tracing.start_trace("report", exporters=[exporter]):
+        for rows in (10, 20, 30):
+            with tracing.span("db.query", rows=rows):
+                pass
+
+def test_json_exporter_logs_one_summary_line_per_trace(caplog):
+    logger = logging.getLogger("ledger.trace.test")
+    with caplog.at_level(logging.INFO, logger=logger.name):
+        _run(JsonLogExporter(logger))
+    (line,) = [json.loads(r.getMessage()) for r in caplog.records]
+    assert line["name"] == "report"
+    assert line["summary"]["stages"]["db.query"]["count"] == 3
+    assert line["summary"]["stages"]["db.query"]["rows"] == 60
+
+def test_json_exporter_logs_spans_at_debug(caplog):
+    logger = logging.getLogger("ledger.trace.test")
+    with caplog.at_level(logging.DEBUG, logger=logger.name):
+        _run(JsonLogExporter(logger))
+    assert [r.levelno for r in caplog.records] == [logging.INFO] + [logging.DEBUG] * 3
+    assert [json.loads(r.getMessage())["name"] for r in caplog.records[1:]] == ["db.query"] * 3
@@ -0,0 +1,64 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from shared.watermarks import SqliteWatermarkStore, carry_forward, plan_delta
+
+YEAR = datetime(2024, 1, 1)
+JAN_END = datetime(2024, 1, 31, 23, 59, 59)
+FEB_END = datetime(2024, 2, 29, 23, 59, 59)
+KEY = "tpl|QAR"
+
+@pytest.fixture
+def store(tmp_path):
+    store = SqliteWatermarkStore(str(tmp_path / "marks.sqlite3"))
+    store.record("A@example.com", "erp", KEY, YEAR, JAN_END, {"1001": [0, 5, 2, 3, 3.0], "1002": [1, 0, 0, 0, 1.0]})
+    return store
+
+def _plan(store, **kw):
+    args = dict(recipient="a@example.com", db_code="ERP", report_key=KEY, ledger_ids=["1001", "1002"],
+                from_date=YEAR, to_date=FEB_END)
+    args.update(kw)
+    return plan_delta(store, **args)
+
+def test_delta_starts_after_the_common_watermark(store):
+    plan = _plan(store)
+    assert (plan.since, plan.start) == (JAN_END, datetime(2024, 2, 1))
+    assert plan.carried["1001"].closing == 3.0
+
+@pytest.mark.parametrize("change", [
+    dict(ledger_ids=["1001", "1003"]),  # no earlier report for 1003
+    dict(from_date=datetime(2024, 1, 2)),  # period start changed
+    dict(to_date=JAN_END),  # nothing after the last report
+    dict(report_key="other|QAR"),
+    dict(recipient="b@example.com"),
+])
+def test_full_report_when_no_delta_applies(store, change):
+    assert _plan(store, **change) is None
+
+def test_full_report_when_ledgers_were_reported_up_to_different_times(store):
+    store.record("a@example.com", "erp", KEY, YEAR, datetime(2024, 1, 15), {"1002": [1, 0, 0, 0, 1.0]})
+    assert _plan(store) is None
+
+def _vouchers(*rows):
+    return pd.DataFrame([{"Ledger Code": "C1", "Voucher Date": datetime(2024, 2, 5), "Voucher Number": number,
+                          "Debit": debit, "Credit": 0.0} for number, debit in rows])
+
+def test_carry_forward_opens_at_the_last_closing(store):
+    plan = _plan(store)
+    out = carry_forward({"1001": _vouchers(("V1", 2.0)), "1002": _vouchers(("Opening Balance", 1.0), ("V2", 4.0))},
+                        plan)
+    opening = out["1001"].iloc[0]
+    assert (opening["Voucher Number"], opening["Debit"], opening["Ledger Code"]) == ("Opening Balance", 3.0, "C1")
+    assert opening["Voucher Date"] == plan.start
+    assert list(out["1001"]["Voucher Number"]) == ["Opening Balance", "V1"]
+    assert len(out["1002"]) == 2  # the proc's own opening row matched
+
+def test_carry_forward_refuses_a_changed_opening(store):
+    # Backdated postings moved the opening away from the delivered closing balance
+    frames = {"1001": _vouchers(("Opening Balance", 7.5), ("V1", 2.0)), "1002": _vouchers(("V2", 4.0))}
+    assert carry_forward(frames, _plan(store)) is None
+
+def test_carry_forward_refuses_an_empty_ledger(store):
+    assert carry_forward({"1001": pd.DataFrame(), "1002": _vouchers(("V2", 4.0))}, _plan(store)) is None